@@ -1,15 +1,112 @@
 import streamlit as st
 import pandas as pd
 from sqlalchemy import func, desc
-from src.models import init_db, HanjaInfo, UserProgress
+from src.models import init_db, Document, HanjaInfo, DEFAULT_USER_ID
 from src.quiz import QuizGenerator
+from src.readmodel import ReadModelCache, get_snapshot_path
 from src.repository import HanjaRepository
-from src.api import get_top_hanja, get_top_radicals, get_top_hanja_in_words
+from src.search import search_hanja, search_words
+from src.scope import DocumentScope, GLOBAL_SCOPE
+from src.distinctive import DistinctiveIndex
+# Not src.api: importing it would also load FastAPI and the ingestion pipeline
+from src.analysis import top_hanja_response, top_radicals_response, word_chars_response, char_words_response
+from src.analysis import distinctive_response
+
+# Initialize DB, Quiz Generator & Repository once per server process (not on every rerun)
+@st.cache_resource
+def get_resources():
+    SessionLocal = init_db()
+    return SessionLocal, QuizGenerator(SessionLocal, read_models=ReadModelCache(path=get_snapshot_path())), HanjaRepository()
+
+SessionLocal, quiz_gen, repository = get_resources()
+
+@st.cache_resource
+def get_distinctive_index():
+    return DistinctiveIndex()
+
+def get_data_version() -> int:
+    # Bumped by ingestion and progress import; keys the cached data below
+    db = SessionLocal()
+    try:
+        return repository.get_data_version(db)
+    finally:
+        db.close()
+
+@st.cache_data(show_spinner=False)
+def load_top_hanja_table(data_version: int) -> pd.DataFrame:
+    db = SessionLocal()
+    try:
+        data = top_hanja_response(db, quiz_gen.read_models, page=1, size=100, scope=GLOBAL_SCOPE)
+        df_data = []
+        for item in data["items"]:
+            h = item.hanja
+            reading = h.readings[0] if h.readings else None
+            meaning = f"{reading.meaning} {reading.sound}" if reading else ""
+            df_data.append(
+                {
+                    "순위": len(df_data) + 1,
+                    "한자": h.char,
+                    "훈음": meaning,
+                    "빈도": item.frequency,
+                    "부수": h.radical,
+                    "획수": h.strokes,
+                }
+            )
+        return pd.DataFrame(df_data)
+    finally:
+        db.close()
+
+@st.cache_data(show_spinner=False)
+def load_top_radicals_table(data_version: int) -> pd.DataFrame:
+    db = SessionLocal()
+    try:
+        data = top_radicals_response(db, quiz_gen.read_models, page=1, size=50, scope=GLOBAL_SCOPE)
+        df_data = []
+        for item in data["items"]:
+            df_data.append(
+                {
+                    "순위": len(df_data) + 1,
+                    "부수": item.radical,
+                    "총 빈도": item.frequency,
+                }
+            )
+        return pd.DataFrame(df_data)
+    finally:
+        db.close()
+
+@st.cache_data(show_spinner=False)
+def load_top_word_chars_table(data_version: int) -> pd.DataFrame:
+    db = SessionLocal()
+    try:
+        data = word_chars_response(db, quiz_gen.read_models, page=1, size=100, scope=GLOBAL_SCOPE)
+        df_data = []
+        for item in data["items"]:
+            hinfo = item.hanja_info
+            reading = "?"
+            if hinfo and hinfo.readings:
+                reading = f"{hinfo.readings[0].meaning} {hinfo.readings[0].sound}"
+
+            df_data.append(
+                {
+                    "순위": len(df_data) + 1,
+                    "한자": item.char,
+                    "훈음": reading,
+                    "단어 내 빈도": item.frequency,
+                }
+            )
+        return pd.DataFrame(df_data)
+    finally:
+        db.close()
+
+@st.cache_data(show_spinner=False)
+def load_radicals(data_version: int) -> list:
+    return quiz_gen.get_all_radicals()
 
-# Initialize DB, Quiz Generator & Repository
-SessionLocal = init_db()
-quiz_gen = QuizGenerator(SessionLocal)
-repository = HanjaRepository()
+def invalidate_data_caches():
+    load_top_hanja_table.clear()
+    load_top_radicals_table.clear()
+    load_top_word_chars_table.clear()
+    load_radicals.clear()
 
 st.set_page_config(
     page_title="Hanja Master", layout="wide", initial_sidebar_state="expanded"
@@ -18,6 +115,8 @@ st.set_page_config(
 # --- Sidebar Navigation ---
 st.sidebar.title("📚 Hanja Master")
 mode = st.sidebar.radio("메뉴 선택", ["📊 데이터 조회", "📝 실전 퀴즈", "📈 학습 현황", "💾 데이터 관리"]) # Add 데이터 관리
+# Learner whose progress is quizzed, shown and backed up (study groups share one database)
+user_id = st.sidebar.text_input("학습자", value=DEFAULT_USER_ID).strip() or DEFAULT_USER_ID
 
 # ... (Existing Modes) ...
 
@@ -31,7 +130,7 @@ if mode == "💾 데이터 관리":
         st.write("현재 저장된 한자/단어의 중요도 레벨 데이터를 CSV 파일로 다운로드합니다.")
         
         if st.button("데이터 로드"):
-            progress_data = repository.get_flat_progress(db)
+            progress_data = repository.get_flat_progress(db, user_id=user_id)
             if progress_data:
                 df_export = pd.DataFrame(progress_data)
                 csv = df_export.to_csv(index=False).encode('utf-8-sig') # BOM for Excel compatibility
@@ -63,7 +162,10 @@ if mode == "💾 데이터 관리":
                     st.dataframe(df_import.head())
                     if st.button("🔄 데이터 적용하기"):
                         data_list = df_import.to_dict('records')
-                        count = repository.import_progress_data(db, data_list)
+                        count = repository.import_progress_data(db, data_list, user_id=user_id)
+                        # The import bumped the data version; also drop cached entries right away
+                        invalidate_data_caches()
+                        quiz_gen.samplers.invalidate(user_id)
                         st.success(f"성공적으로 {count}개의 항목을 업데이트했습니다!")
             except Exception as e:
                 st.error(f"파일 처리 중 오류 발생: {e}")
@@ -73,66 +175,98 @@ if mode == "💾 데이터 관리":
 if mode == "📊 데이터 조회":
     st.title("기출 데이터 분석 및 조회")
 
-    tab1, tab2, tab3 = st.tabs(["최빈출 한자", "최빈출 부수", "단어 형성 빈출자"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["최빈출 한자", "최빈출 부수", "단어 형성 빈출자", "검색", "특징 한자"])
+    data_version = get_data_version()
 
-    db = SessionLocal()
-    try:
-        with tab1:
-            st.subheader("가장 많이 출제된 한자 TOP 100")
-            data = get_top_hanja(page=1, size=100, db=db)
-            df_data = []
-            for item in data["items"]:
-                h = item.hanja
-                reading = h.readings[0] if h.readings else None
-                meaning = f"{reading.meaning} {reading.sound}" if reading else ""
-                df_data.append(
-                    {
-                        "순위": len(df_data) + 1,
-                        "한자": h.char,
-                        "훈음": meaning,
-                        "빈도": item.frequency,
-                        "부수": h.radical,
-                        "획수": h.strokes,
-                    }
-                )
-            st.dataframe(pd.DataFrame(df_data), use_container_width=True)
-
-        with tab2:
-            st.subheader("가장 많이 출제된 부수 TOP 50")
-            data = get_top_radicals(page=1, size=50, db=db)
-            df_data = []
-            for item in data["items"]:
-                df_data.append(
-                    {
-                        "순위": len(df_data) + 1,
-                        "부수": item.radical,
-                        "총 빈도": item.frequency,
-                    }
-                )
-            st.dataframe(pd.DataFrame(df_data), use_container_width=True)
-
-        with tab3:
-            st.subheader("단어를 가장 많이 만드는 한자 TOP 100")
-            data = get_top_hanja_in_words(page=1, size=100, db=db)
-            df_data = []
-            for item in data["items"]:
-                hinfo = item.hanja_info
-                reading = "?"
-                if hinfo and hinfo.readings:
-                    reading = f"{hinfo.readings[0].meaning} {hinfo.readings[0].sound}"
-
-                df_data.append(
-                    {
-                        "순위": len(df_data) + 1,
-                        "한자": item.char,
-                        "훈음": reading,
-                        "단어 내 빈도": item.frequency,
-                    }
-                )
-            st.dataframe(pd.DataFrame(df_data), use_container_width=True)
+    with tab1:
+        st.subheader("가장 많이 출제된 한자 TOP 100")
+        st.dataframe(load_top_hanja_table(data_version), use_container_width=True)
 
-    finally:
-        db.close()
+    with tab2:
+        st.subheader("가장 많이 출제된 부수 TOP 50")
+        st.dataframe(load_top_radicals_table(data_version), use_container_width=True)
+
+    with tab3:
+        st.subheader("단어를 가장 많이 만드는 한자 TOP 100")
+        df_word_chars = load_top_word_chars_table(data_version)
+        st.dataframe(df_word_chars, use_container_width=True)
+
+        if not df_word_chars.empty:
+            selected_char = st.selectbox("한자별 단어 보기", df_word_chars["한자"].tolist())
+            db = SessionLocal()
+            try:
+                data = char_words_response(db, quiz_gen.read_models, selected_char, page=1, size=100, scope=GLOBAL_SCOPE)
+            finally:
+                db.close()
+            st.caption(f"'{selected_char}'이(가) 들어간 단어 {data['total']}개 (빈도순 상위 100개)")
+            st.dataframe(pd.DataFrame(
+                [{"단어": item.word.word, "음": item.word.sound, "빈도": item.frequency} for item in data["items"]]
+            ), use_container_width=True, hide_index=True)
+
+    with tab4:
+        col1, col2, col3 = st.columns([3, 2, 1])
+        query = col1.text_input("검색어", placeholder="예: 學, 배울, 학교").strip()
+        search_fields = {"전체": "all", "한자/단어": "text", "음": "sound", "뜻": "meaning"}
+        field = search_fields[col2.radio("검색 대상", list(search_fields), horizontal=True)]
+        prefix = col3.checkbox("앞부분 일치")
+        if query:
+            db = SessionLocal()
+            try:
+                hanja_results = search_hanja(db, query, field=field, prefix=prefix, limit=50)
+                word_results = search_words(db, query, field=field, prefix=prefix, limit=50)
+                st.markdown(f"**한자** ({len(hanja_results)})")
+                if hanja_results:
+                    st.dataframe(pd.DataFrame([
+                        {
+                            "한자": h.char,
+                            "훈음": ", ".join(f"{r.meaning} {r.sound}" for r in h.readings),
+                            "부수": h.radical,
+                            "획수": h.strokes,
+                        }
+                        for h in hanja_results
+                    ]), use_container_width=True, hide_index=True)
+                st.markdown(f"**단어** ({len(word_results)})")
+                if word_results:
+                    st.dataframe(pd.DataFrame(
+                        [{"단어": word, "음": sound} for _, word, sound in word_results]
+                    ), use_container_width=True, hide_index=True)
+            finally:
+                db.close()
+
+    with tab5:
+        st.subheader("선택한 시험지에서 유독 많이 나온 한자/단어")
+        st.caption("전체 기출 대비 선택한 문서에서 비중이 큰 순서입니다 (빈도가 높아도 어디에나 나오는 글자는 낮게 평가).")
+        db = SessionLocal()
+        try:
+            collections = [c.name for c, _ in repository.list_collections(db)]
+            filenames = dict(db.query(Document.id, Document.filename).order_by(Document.id).all())
+            col1, col2, col3 = st.columns([3, 1, 1])
+            target = col1.radio("비교 대상", ["컬렉션", "문서"] if collections else ["문서"], horizontal=True)
+            if target == "컬렉션":
+                scope = DocumentScope(collection=col1.selectbox("컬렉션", collections))
+            else:
+                selected = col1.multiselect("문서", list(filenames), format_func=filenames.get)
+                scope = DocumentScope(document_ids=selected)
+            kind = {"한자": "hanja", "단어": "word"}[col2.radio("종류", ["한자", "단어"])]
+            method = {"로그 오즈": "log_odds", "TF-IDF": "tfidf"}[col3.radio("점수", ["로그 오즈", "TF-IDF"])]
+
+            if scope.is_global:
+                st.info("비교할 문서나 컬렉션을 선택하세요.")
+            else:
+                data = distinctive_response(db, get_distinctive_index(), kind, method, 50, scope)
+                rows = []
+                for item in data["items"]:
+                    if item.hanja is not None:
+                        reading = item.hanja.readings[0] if item.hanja.readings else None
+                        row = {"한자": item.hanja.char, "훈음": f"{reading.meaning} {reading.sound}" if reading else ""}
+                    else:
+                        row = {"단어": item.word.word, "음": item.word.sound}
+                    row.update({"선택 문서 빈도": item.frequency, "전체 빈도": item.corpus_frequency, "점수": round(item.score, 3)})
+                    rows.append(row)
+                st.caption(f"문서 {data['documents']}개 기준")
+                st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+        finally:
+            db.close()
 
 # --- Mode 2: Quiz ---
 elif mode == "📝 실전 퀴즈":
@@ -157,7 +291,7 @@ elif mode == "📝 실전 퀴즈":
     min_importance_level = 0
     
     if quiz_mode == "부수별 학습":
-        radicals = quiz_gen.get_all_radicals()
+        radicals = load_radicals(get_data_version())
         selected_radical = st.sidebar.selectbox("부수 선택", radicals, on_change=reset_quiz)
     elif quiz_mode == "중요도별 복습":
         min_importance_level = st.sidebar.slider("최소 중요도 레벨", 0, 10, 1, on_change=reset_quiz)
@@ -179,12 +313,13 @@ elif mode == "📝 실전 퀴즈":
     q_type = q_type_options[q_type_label]
 
     # Initialize Session State
-    if 'quiz_state' not in st.session_state:
+    if 'quiz_state' not in st.session_state or st.session_state.quiz_state.get('user_id') != user_id:
         st.session_state.quiz_state = {
             'q_data': None,
             'score': 0,
             'total': 0,
-            'result': None
+            'result': None,
+            'user_id': user_id
         }
 
     def next_question():
@@ -196,7 +331,7 @@ elif mode == "📝 실전 퀴즈":
         }
         actual_mode = mode_key_map.get(quiz_mode, 'random')
 
-        q = quiz_gen.generate_quiz(mode=actual_mode, q_type=q_type, radical=selected_radical, min_importance_level=min_importance_level)
+        q = quiz_gen.generate_quiz(mode=actual_mode, q_type=q_type, radical=selected_radical, min_importance_level=min_importance_level, user_id=user_id)
         
         if q:
             st.session_state.quiz_state['q_data'] = q
@@ -226,8 +361,10 @@ elif mode == "📝 실전 퀴즈":
                     hanja_id=question.get("hanja_id"),
                     word_id=question.get("word_id"),
                     change=-1,
+                    user_id=user_id,
                 )
                 db.commit()
+                quiz_gen.update_cached_level(user_id, hanja_id=progress.hanja_id, word_id=progress.word_id, level=progress.importance_level)
                 st.session_state.quiz_state["new_level"] = progress.importance_level
 
             else:
@@ -238,8 +375,10 @@ elif mode == "📝 실전 퀴즈":
                     hanja_id=question.get("hanja_id"),
                     word_id=question.get("word_id"),
                     change=+1,
+                    user_id=user_id,
                 )
                 db.commit()
+                quiz_gen.update_cached_level(user_id, hanja_id=progress.hanja_id, word_id=progress.word_id, level=progress.importance_level)
                 st.session_state.quiz_state["new_level"] = progress.importance_level
         finally:
             db.close()
@@ -291,65 +430,77 @@ elif mode == "📝 실전 퀴즈":
 elif mode == "📈 학습 현황":
     st.title("학습 현황")
 
+    def importance_status(level: int) -> str:
+        return "🔥 집중 학습" if level > 5 else ("✅ 안정" if level < 3 else "⚠️ 보통")
+
+    def render_progress_table(db, kind: str, target_label: str):
+        # Filtering and paging run in SQL; only the visible page is loaded
+        page_key = f"progress_{kind}_page"
+
+        def reset_page():
+            st.session_state[page_key] = 1
+
+        col1, col2, col3 = st.columns([2, 3, 1])
+        search = col1.text_input("검색", key=f"progress_{kind}_search", placeholder="한자/단어 또는 음·뜻", on_change=reset_page)
+        min_level, max_level = col2.slider("중요도 레벨", 0, 10, (0, 10), key=f"progress_{kind}_levels", on_change=reset_page)
+        page_size = col3.selectbox("표시 개수", [20, 50, 100], key=f"progress_{kind}_size", on_change=reset_page)
+        filters = dict(
+            size=page_size,
+            min_level=min_level,
+            max_level=None if max_level == 10 else max_level, # the top of the slider also covers levels above 10
+            search=search.strip() or None,
+            user_id=user_id,
+        )
+
+        page = st.session_state.get(page_key, 1)
+        total, rows = repository.get_progress_page(db, kind, page=page, **filters)
+        if not total:
+            st.info("조건에 맞는 학습 기록이 없습니다." if search or min_level or max_level < 10 else "아직 학습 기록이 없습니다. 퀴즈를 풀어보세요!")
+            return
+        page_count = -(-total // page_size)
+        if page > page_count: # data or learner changed since the page was chosen
+            page = st.session_state[page_key] = page_count
+            total, rows = repository.get_progress_page(db, kind, page=page, **filters)
+
+        table = []
+        for row in rows:
+            item = {target_label: row["target"]}
+            if kind == "hanja":
+                item["훈음"] = f"{row['meaning']} {row['sound']}" if row["sound"] else "정보 없음"
+                item["부수"] = row["radical"]
+            else:
+                item["음"] = row["sound"]
+            item["중요도 레벨"] = row["importance_level"]
+            item["상태"] = importance_status(row["importance_level"])
+            item["마지막 학습일"] = row["last_tested_at"].strftime("%Y-%m-%d %H:%M") if row["last_tested_at"] else ""
+            table.append(item)
+        st.dataframe(pd.DataFrame(table), use_container_width=True, hide_index=True)
+
+        col1, col2 = st.columns([1, 5])
+        col1.number_input("페이지", min_value=1, max_value=page_count, key=page_key)
+        start = (page - 1) * page_size
+        col2.caption(f"총 {total}개 중 {start + 1}–{start + len(rows)} ({page}/{page_count} 페이지)")
+
     db = SessionLocal()
     try:
         st.markdown("### 중요도 분포")
-        # ... (Chart logic could be added here)
-
-        st.subheader("학습 중인 한자 (Lv.1 이상)")
-        hanja_progress = (
-            db.query(UserProgress)
-            .filter(UserProgress.hanja_id != None)
-            .order_by(
-                UserProgress.importance_level.desc(), UserProgress.last_tested_at.asc()
-            )
-            .all()
-        )
-
-        if hanja_progress:
-            df_hanja_progress = []
-            for up in hanja_progress:
-                hanja = up.hanja
-                reading = hanja.readings[0] if hanja and hanja.readings else None
-                meaning_sound = (f"{reading.meaning} {reading.sound}" if reading else "정보 없음")
-                df_hanja_progress.append({
-                    "한자": hanja.char if hanja else "없음",
-                    "훈음": meaning_sound,
-                    "부수": hanja.radical if hanja else "없음",
-                    "중요도 레벨": up.importance_level,
-                    "상태": "🔥 집중 학습" if up.importance_level > 5 else ("✅ 안정" if up.importance_level < 3 else "⚠️ 보통"),
-                    "마지막 학습일": up.last_tested_at.strftime("%Y-%m-%d %H:%M"),
-                })
-            st.dataframe(pd.DataFrame(df_hanja_progress), use_container_width=True)
+        histogram = repository.get_importance_histogram(db, user_id=user_id)
+        if histogram:
+            df_histogram = pd.DataFrame(histogram, columns=["중요도 레벨", "한자", "단어"]).set_index("중요도 레벨")
+            col1, col2 = st.columns(2)
+            col1.metric("학습 중인 한자", int(df_histogram["한자"].sum()))
+            col2.metric("학습 중인 단어", int(df_histogram["단어"].sum()))
+            st.bar_chart(df_histogram)
         else:
             st.info("아직 학습 기록이 없습니다. 퀴즈를 풀어보세요!")
 
-        st.divider()
+        st.subheader("학습 중인 한자")
+        render_progress_table(db, "hanja", "한자")
 
-        st.subheader("학습 중인 단어 (Lv.1 이상)")
-        word_progress = (
-            db.query(UserProgress)
-            .filter(UserProgress.word_id != None)
-            .order_by(
-                UserProgress.importance_level.desc(), UserProgress.last_tested_at.asc()
-            )
-            .all()
-        )
+        st.divider()
 
-        if word_progress:
-            df_word_progress = []
-            for up in word_progress:
-                word = up.word
-                df_word_progress.append({
-                    "단어": word.word if word else "없음",
-                    "음": word.sound if word else "없음",
-                    "중요도 레벨": up.importance_level,
-                    "상태": "🔥 집중 학습" if up.importance_level > 5 else ("✅ 안정" if up.importance_level < 3 else "⚠️ 보통"),
-                    "마지막 학습일": up.last_tested_at.strftime("%Y-%m-%d %H:%M"),
-                })
-            st.dataframe(pd.DataFrame(df_word_progress), use_container_width=True)
-        else:
-            st.info("아직 학습 기록이 없습니다. 퀴즈를 풀어보세요!")
+        st.subheader("학습 중인 단어")
+        render_progress_table(db, "word", "단어")
 
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
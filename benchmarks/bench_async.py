@@ -0,0 +1,96 @@
+"""
+Sync vs async API comparison.
+
+Starts `src.api:app` (sync handlers on the threadpool) and `src.api_async:app`
+(async handlers on aiosqlite) one after the other on the same seeded database
+and drives the `/analysis/*` endpoints at increasing client concurrency,
+reporting throughput and p50/p99 latency per implementation.
+
+    python -m benchmarks.bench_async --concurrency 10 100 400 --duration 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.load_quiz import _free_port, _percentile, seed_database, start_server
+
+APPS = {"sync": "src.api:app", "async": "src.api_async:app"}
+PATHS = ["/analysis/hanja", "/analysis/radicals", "/analysis/words/chars"]
+
+async def client_loop(client, stop_at, latencies, errors):
+    i = 0
+    while time.monotonic() < stop_at:
+        path = PATHS[i % len(PATHS)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            response = await client.get(path, params={"page": 1, "size": 20})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+        except httpx.HTTPError:
+            errors.append(path)
+
+async def drive(url: str, concurrency: int, duration: float) -> dict:
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        stop_at = time.monotonic() + duration
+        await asyncio.gather(*(client_loop(client, stop_at, latencies, errors) for _ in range(concurrency)))
+    if not latencies:
+        return {"concurrency": concurrency, "requests": 0, "errors": len(errors)}
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "requests_per_sec": len(latencies) / duration,
+        "p50_ms": statistics.median(latencies) * 1000.0,
+        "p99_ms": _percentile(latencies, 99) * 1000.0,
+    }
+
+def run(concurrency_levels, duration: float, documents: int) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        seed_database(workdir, documents)
+        for name, app in APPS.items():
+            port = _free_port()
+            server = start_server(workdir, port, app=app)
+            try:
+                url = f"http://127.0.0.1:{port}"
+                asyncio.run(drive(url, 1, 1.0)) # warm up (engine creation, first queries)
+                results[name] = [asyncio.run(drive(url, c, duration)) for c in concurrency_levels]
+            finally:
+                server.terminate()
+                server.wait()
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the sync and async analysis APIs under concurrent load.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 400])
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per concurrency level")
+    parser.add_argument("--documents", type=int, default=10, help="Synthetic documents to seed the DB with")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    results = run(args.concurrency, args.duration, args.documents)
+
+    print(f"{'impl':6s} {'clients':>8s} {'req/s':>9s} {'p50 ms':>9s} {'p99 ms':>9s} {'errors':>7s}")
+    for name, rows in results.items():
+        for r in rows:
+            if not r["requests"]:
+                print(f"{name:6s} {r['concurrency']:8d} {'-':>9s} {'-':>9s} {'-':>9s} {r['errors']:7d}")
+                continue
+            print(f"{name:6s} {r['concurrency']:8d} {r['requests_per_sec']:9.1f} "
+                  f"{r['p50_ms']:9.2f} {r['p99_ms']:9.2f} {r['errors']:7d}")
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+HanjaExtractor 처리량 벤치마크.
+
+확장 블록을 포함한 기본 charset의 extract가 기존 단일 블록 정규식(U+4E00–U+9FFF)보다
+느려지지 않았는지 확인합니다. 코퍼스는 고정 시드의 합성 코퍼스(benchmarks.corpus)이고,
+두 구현을 번갈아 timeit으로 `repeat`번씩 재어 최솟값(best-of-N)을 비교합니다.
+비율이 `--min-ratio`보다 낮으면 종료 코드 1로 끝납니다.
+
+    python -m benchmarks.bench_extractor [--repeat 7] [--min-ratio 0.9]
+"""
+import argparse
+import re
+import sys
+import timeit
+
+from benchmarks.corpus import CorpusConfig, generate_corpus
+from src.extractor import HanjaExtractor
+
+LEGACY_PATTERN = re.compile(r'[一-鿿]+')
+# 고정 코퍼스: 같은 설정은 항상 같은 텍스트를 만듭니다 (약 200,000자)
+CORPUS_CONFIG = CorpusConfig(n_documents=40, chars_per_document=5000, seed=42)
+DEFAULT_MIN_RATIO = 0.9 # 측정 잡음을 감안한 허용 하한
+
+def legacy_extract(text):
+    individual_chars = set()
+    words = set()
+    for match in LEGACY_PATTERN.findall(text):
+        for char in match:
+            individual_chars.add(char)
+        if len(match) >= 2:
+            words.add(match)
+    return list(individual_chars), list(words)
+
+def make_text(config: CorpusConfig = CORPUS_CONFIG) -> str:
+    return "\n".join(text for _, text in generate_corpus(config))
+
+def best_of(fns: dict, text: str, repeat: int = 7, number: int = 3) -> dict:
+    """각 함수의 1회 실행 시간(초)의 최솟값. 라운드마다 번갈아 재서 시스템 부하 변화가 양쪽에 고르게 걸립니다."""
+    timers = {name: timeit.Timer(lambda fn=fn: fn(text)) for name, fn in fns.items()}
+    best = {name: float("inf") for name in fns}
+    for _ in range(repeat):
+        for name, timer in timers.items():
+            best[name] = min(best[name], timer.timeit(number) / number)
+    return best
+
+def run(repeat: int = 7, config: CorpusConfig = CORPUS_CONFIG) -> dict:
+    text = make_text(config)
+    extractor = HanjaExtractor()
+    best = best_of({"legacy": legacy_extract, "extract": extractor.extract}, text, repeat)
+    return {
+        "chars": len(text),
+        "seed": config.seed,
+        "repeat": repeat,
+        "legacy_chars_per_sec": len(text) / best["legacy"],
+        "extract_chars_per_sec": len(text) / best["extract"],
+        "ratio": best["legacy"] / best["extract"],
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare HanjaExtractor.extract with the single-block regex.")
+    parser.add_argument("--repeat", type=int, default=7, help="Rounds; the best round of each is compared")
+    parser.add_argument("--min-ratio", type=float, default=DEFAULT_MIN_RATIO,
+                        help="Fail when legacy time / extract time is below this")
+    args = parser.parse_args(argv)
+
+    result = run(args.repeat)
+    print(f"Text length: {result['chars']} chars (seed {result['seed']}, best of {result['repeat']})")
+    print(f"Legacy regex: {result['legacy_chars_per_sec']:,.0f} chars/sec")
+    print(f"Extractor:    {result['extract_chars_per_sec']:,.0f} chars/sec")
+    print(f"Speed ratio (>= 1.0 means no slowdown): {result['ratio']:.2f}")
+    if result["ratio"] < args.min_ratio:
+        print(f"FAIL: ratio below {args.min_ratio:.2f}")
+        return 1
+    print(f"OK: ratio >= {args.min_ratio:.2f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""
+Compares two benchmark result files and fails on regressions.
+
+    python -m benchmarks.compare baseline.json current.json --threshold 0.10
+
+A benchmark regresses when its median time grows by more than the threshold
+(relative). Exits with status 1 if any benchmark regressed.
+"""
+import argparse
+import json
+import sys
+
+def load(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)["results"]
+
+def compare(baseline: dict, current: dict, threshold: float = 0.10) -> list:
+    """
+    Returns a list of (name, baseline_median, current_median, change, regressed)
+    for benchmarks present in both result sets.
+    """
+    rows = []
+    for name in sorted(set(baseline) & set(current)):
+        before = baseline[name]["median"]
+        after = current[name]["median"]
+        change = (after - before) / before if before else 0.0
+        rows.append((name, before, after, change, change > threshold))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative slowdown (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    baseline, current = load(args.baseline), load(args.current)
+    rows = compare(baseline, current, args.threshold)
+
+    for name, before, after, change, regressed in rows:
+        flag = "REGRESSION" if regressed else ""
+        print(f"{name:40s} {before * 1000:10.2f} ms -> {after * 1000:10.2f} ms  {change:+7.1%} {flag}")
+    for name in sorted(set(baseline) ^ set(current)):
+        print(f"{name:40s} only in {'baseline' if name in baseline else 'current'}")
+
+    regressions = [row for row in rows if row[4]]
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}.")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
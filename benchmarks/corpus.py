@@ -0,0 +1,82 @@
+"""
+Deterministic synthetic corpus generator for benchmarks.
+
+Documents are Korean filler text interleaved with Hanja words drawn from a
+fixed vocabulary with Zipfian frequencies, so a handful of words dominate
+the corpus the way common characters dominate real exam papers.
+"""
+import csv
+import os
+import random
+from itertools import accumulate
+
+HANJA_CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src', 'data', 'hanja.csv')
+
+def load_reference_chars(path: str = HANJA_CSV_PATH) -> list:
+    """Characters from the reference dictionary, so generated text hits RefHanja lookups."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [row['hanja'] for row in csv.DictReader(f)]
+
+class CorpusConfig:
+    def __init__(self, n_documents: int = 20, chars_per_document: int = 5000, hanja_density: float = 0.3,
+                 vocabulary_size: int = 2000, zipf_s: float = 1.1, max_word_length: int = 4, seed: int = 42):
+        self.n_documents = n_documents
+        self.chars_per_document = chars_per_document
+        self.hanja_density = hanja_density        # Probability that a token is a Hanja word
+        self.vocabulary_size = vocabulary_size    # Number of distinct Hanja words/chars
+        self.zipf_s = zipf_s                      # Zipf exponent (1.0 = classic Zipf)
+        self.max_word_length = max_word_length
+        self.seed = seed
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+def build_vocabulary(config: CorpusConfig, rng: random.Random) -> list:
+    chars = load_reference_chars()
+    vocabulary = set()
+    while len(vocabulary) < config.vocabulary_size:
+        length = rng.randint(1, config.max_word_length)
+        vocabulary.add("".join(rng.choice(chars) for _ in range(length)))
+    # Sort before shuffling so the rank order does not depend on set iteration order
+    vocabulary = sorted(vocabulary)
+    rng.shuffle(vocabulary)
+    return vocabulary
+
+def zipf_cum_weights(n: int, s: float) -> list:
+    return list(accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+def generate_corpus(config: CorpusConfig = None) -> list:
+    """
+    Returns a list of (filename, text) tuples. The same config always
+    produces the same corpus.
+    """
+    config = config or CorpusConfig()
+    rng = random.Random(config.seed)
+    vocabulary = build_vocabulary(config, rng)
+    cum_weights = zipf_cum_weights(len(vocabulary), config.zipf_s)
+    hangul = [chr(c) for c in range(0xAC00, 0xAC00 + 400)]
+
+    documents = []
+    for doc_index in range(config.n_documents):
+        parts = []
+        length = 0
+        while length < config.chars_per_document:
+            if rng.random() < config.hanja_density:
+                token = rng.choices(vocabulary, cum_weights=cum_weights)[0]
+            else:
+                token = "".join(rng.choice(hangul) for _ in range(rng.randint(1, 6)))
+            parts.append(token)
+            length += len(token) + 1
+        documents.append((f"synthetic_{doc_index:04d}.txt", " ".join(parts)))
+    return documents
+
+def write_corpus(documents: list, directory: str) -> list:
+    """Writes documents as .txt files and returns their paths."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for filename, text in documents:
+        path = os.path.join(directory, filename)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        paths.append(path)
+    return paths
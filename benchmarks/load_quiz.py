@@ -0,0 +1,161 @@
+"""
+Load test for the quiz HTTP API.
+
+Simulates many concurrent learners, each looping "GET /quiz/next" followed by
+"POST /quiz/answer", and reports p50/p99 latency per route. With --users N the
+learners are spread over N learner ids (per-user progress and question pools). By default a local
+uvicorn server is started on a temporary database seeded from the synthetic
+corpus; pass --url to target an already running server instead.
+
+    python -m benchmarks.load_quiz --learners 300 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.corpus import CorpusConfig, generate_corpus, write_corpus
+from benchmarks.run import quiet, seed_progress
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+Q_TYPES = ["hanja_to_meaning", "meaning_to_hanja"]
+
+def _percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    k = max(0, int(round(pct / 100.0 * len(ordered))) - 1)
+    return ordered[k]
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def seed_database(workdir: str, documents: int):
+    """Ingests a small synthetic corpus into workdir/hanja.db (the API's default DB)."""
+    import main as main_module
+    from src.models import init_db
+    db_url = f"sqlite:///{os.path.join(workdir, 'hanja.db')}"
+    corpus = generate_corpus(CorpusConfig(n_documents=documents, chars_per_document=2000))
+    paths = write_corpus(corpus, os.path.join(workdir, "corpus"))
+    with quiet():
+        main_module.main(paths + ["--db-url", db_url, "--quiet"])
+    seed_progress(init_db(db_url))
+
+def start_server(workdir: str, port: int, workers: int = 1, app: str = "src.api:app") -> subprocess.Popen:
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=workdir, env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=1).raise_for_status()
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("Server did not start within 30 seconds")
+
+async def learner(client: httpx.AsyncClient, user_id: str, measure_from: float, stop_at: float, latencies: dict, errors: list):
+    rng = random.Random()
+    while time.monotonic() < stop_at:
+        # Requests started during the warm-up (cold question pool, connection setup) are not recorded
+        measured = time.monotonic() >= measure_from
+        q_type = rng.choice(Q_TYPES)
+        try:
+            start = time.perf_counter()
+            response = await client.get("/quiz/next", params={"q_type": q_type, "user_id": user_id})
+            if measured:
+                latencies["next"].append(time.perf_counter() - start)
+            response.raise_for_status()
+            question = response.json()
+
+            # Answer correctly about 70% of the time (the first option is right 1/4 of the time)
+            answer = question["options"][0] if rng.random() < 0.7 else "?"
+            start = time.perf_counter()
+            response = await client.post("/quiz/answer", json={
+                "q_type": q_type, "answer": answer, "user_id": user_id,
+                "hanja_id": question["hanja_id"], "word_id": question["word_id"],
+            })
+            if measured:
+                latencies["answer"].append(time.perf_counter() - start)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            errors.append(str(e))
+
+async def run_load(url: str, learners: int, duration: float, warmup: float = 2.0, users: int = 1) -> dict:
+    latencies = {"next": [], "answer": []}
+    errors = []
+    limits = httpx.Limits(max_connections=learners, max_keepalive_connections=learners)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        measure_from = time.monotonic() + warmup
+        stop_at = measure_from + duration
+        await asyncio.gather(*(
+            learner(client, f"learner-{i % users}", measure_from, stop_at, latencies, errors) for i in range(learners)
+        ))
+
+    results = {"learners": learners, "users": users, "duration_seconds": duration, "errors": len(errors)}
+    for route, values in latencies.items():
+        if not values:
+            continue
+        results[route] = {
+            "requests": len(values),
+            "requests_per_sec": len(values) / duration,
+            "p50_ms": statistics.median(values) * 1000.0,
+            "p99_ms": _percentile(values, 99) * 1000.0,
+            "max_ms": max(values) * 1000.0,
+        }
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the quiz API with concurrent simulated learners.")
+    parser.add_argument("--url", help="Target an already running server instead of starting one")
+    parser.add_argument("--learners", type=int, default=200, help="Concurrent simulated clients")
+    parser.add_argument("--users", type=int, default=1, help="Distinct learner ids the clients are spread over")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to measure")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds to run before measuring")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the local server")
+    parser.add_argument("--documents", type=int, default=10, help="Synthetic documents to seed the local DB with")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        server = None
+        url = args.url
+        if url is None:
+            seed_database(workdir, args.documents)
+            port = _free_port()
+            server = start_server(workdir, port, args.workers)
+            url = f"http://127.0.0.1:{port}"
+        try:
+            results = asyncio.run(run_load(url, args.learners, args.duration, args.warmup, args.users))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    print(f"{results['learners']} learners ({results['users']} learner ids), "
+          f"{results['duration_seconds']:.0f}s, {results['errors']} errors")
+    for route in ("next", "answer"):
+        if route in results:
+            r = results[route]
+            print(f"  {route:7s} {r['requests']:7d} req  {r['requests_per_sec']:8.1f} req/s  "
+                  f"p50 {r['p50_ms']:7.2f} ms  p99 {r['p99_ms']:7.2f} ms")
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
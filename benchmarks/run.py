@@ -0,0 +1,322 @@
+"""
+Benchmark suite runner.
+
+Measures extraction, full `main.py` ingestion, reference dictionary loading,
+quiz generation per mode and every `/analysis/*` endpoint against a
+synthetic corpus, plus the import time of the entry points (`python -X
+importtime` in a fresh interpreter), and writes the results as JSON.
+
+    python -m benchmarks.run --output benchmarks/results/current.json
+    python -m benchmarks.compare benchmarks/results/baseline.json benchmarks/results/current.json
+"""
+import argparse
+import ast
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+from benchmarks.corpus import CorpusConfig, generate_corpus, write_corpus
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), 'results', 'latest.json')
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def measure(fn, repeat: int = 5, warmup: int = 1) -> dict:
+    """Runs fn repeatedly and returns timing statistics in seconds."""
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {
+        "repeat": repeat,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "max": max(timings),
+    }
+
+@contextlib.contextmanager
+def quiet():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+# --- Individual benchmarks ---
+
+def bench_extract(documents, repeat):
+    from src.extractor import HanjaExtractor, WordSegmenter, load_word_list
+    text = "\n".join(text for _, text in documents)
+    plain = HanjaExtractor()
+    segmented = HanjaExtractor(segmenter=WordSegmenter(load_word_list()))
+    results = {}
+    for name, extractor in [("extract", plain), ("extract_segmented", segmented)]:
+        stats = measure(lambda: extractor.extract(text), repeat)
+        stats["chars_per_sec"] = len(text) / stats["median"]
+        results[name] = stats
+    return results
+
+def bench_load_dictionary(workdir, repeat):
+    from src.models import init_db
+    from src.loader import DictionaryLoader
+    counter = iter(range(repeat + 1))
+
+    def load():
+        Session = init_db(f"sqlite:///{os.path.join(workdir, f'dict_{next(counter)}.db')}")
+        with quiet():
+            DictionaryLoader(Session).load_csv_data()
+    return {"load_csv_data": measure(load, repeat, warmup=0)}
+
+def bench_ingest(paths, db_url):
+    """Ingests every document through main.main(); each document is timed once (ingestion is not repeatable)."""
+    import main as main_module
+    timings = []
+    for path in paths:
+        start = time.perf_counter()
+        with quiet():
+            main_module.main([path, "--db-url", db_url, "--quiet"])
+        timings.append(time.perf_counter() - start)
+    total = sum(timings)
+    return {"ingest_document": {
+        "repeat": len(timings),
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "max": max(timings),
+        "docs_per_sec": len(timings) / total,
+    }}
+
+def seed_progress(Session, n: int = 200):
+    from src.models import HanjaInfo, UsageExample, UserProgress
+    session = Session()
+    try:
+        for i, (hid,) in enumerate(session.query(HanjaInfo.id).limit(n).all()):
+            session.add(UserProgress(hanja_id=hid, importance_level=i % 10))
+        for i, (wid,) in enumerate(session.query(UsageExample.id).limit(n).all()):
+            session.add(UserProgress(word_id=wid, importance_level=i % 10))
+        session.commit()
+    finally:
+        session.close()
+
+def bench_quiz(Session, repeat):
+    from src.quiz import QuizGenerator
+    gen = QuizGenerator(Session)
+    radicals = gen.get_all_radicals()
+    radical = radicals[0] if radicals else None
+    cases = {
+        "quiz_random": dict(mode='random', q_type='hanja_to_meaning'),
+        "quiz_radical": dict(mode='radical', q_type='hanja_to_meaning', radical=radical),
+        "quiz_word": dict(mode='word', q_type='word_to_sound'),
+        "quiz_importance_review": dict(mode='importance_review', q_type='hanja_to_meaning'),
+    }
+    return {name: measure(lambda kw=kw: gen.generate_quiz(**kw), repeat) for name, kw in cases.items()}
+
+# Routes that need more than paging parameters
+ROUTE_PARAMS = {"/analysis/distinctive": "&document_id=1"}
+
+def sample_char(Session) -> str:
+    """The most frequent Hanja of the corpus, to fill the `{char}` routes."""
+    from src.readmodel import ReadModelCache
+    session = Session()
+    try:
+        _, top = ReadModelCache().get(session).top_hanja(0, 1)
+        return top[0][0].char
+    finally:
+        session.close()
+
+def bench_api(Session, repeat):
+    from fastapi.testclient import TestClient
+    from src.api import app, get_db
+    path_params = {"{char}": quote(sample_char(Session))}
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        client = TestClient(app)
+        results = {}
+        for route in app.routes:
+            path = getattr(route, "path", "")
+            if not path.startswith("/analysis/"):
+                continue
+            url = path
+            for name, value in path_params.items():
+                url = url.replace(name, value)
+            if "{" in url:
+                continue
+            url = f"{url}?page=1&size=20{ROUTE_PARAMS.get(path, '')}"
+            results[f"api {path}"] = measure(lambda url=url: client.get(url).raise_for_status(), repeat)
+        return results
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+def run(config: CorpusConfig, repeat: int = 5) -> dict:
+    from src.models import init_db
+    documents = generate_corpus(config)
+    results = bench_startup(repeat)
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = write_corpus(documents, os.path.join(workdir, "corpus"))
+        db_url = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+        results.update(bench_extract(documents, repeat))
+        results.update(bench_load_dictionary(workdir, min(repeat, 3)))
+        results.update(bench_ingest(paths, db_url))
+
+        Session = init_db(db_url)
+        seed_progress(Session)
+        results.update(bench_quiz(Session, repeat))
+        results.update(bench_api(Session, repeat))
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "corpus": config.as_dict(),
+        },
+        "results": results,
+    }
+
+def app_imports() -> str:
+    """The top-level import statements of app.py (importing the script itself would run the Streamlit page)."""
+    with open(os.path.join(REPO_ROOT, "app.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+# Entry points timed by bench_startup: name -> statement run in a fresh interpreter
+STARTUP_STATEMENTS = {
+    "main": "import main",
+    "init_progress": "import init_progress",
+    "debug_quiz": "import debug_quiz",
+    "api": "import src.api",
+    "app": None, # app_imports()
+}
+
+# Heavy packages reported per entry point ("heavy_imports"). The ones an entry point is meant to load
+# at start-up are listed here with the reason; any other one shows up as "unexpected".
+HEAVY_PACKAGES = ("numpy", "pandas", "fastapi", "streamlit", "pypdf", "hanja")
+DELIBERATELY_EAGER = {
+    "api": {
+        "fastapi": "the application itself",
+        "numpy": "src.cooccurrence and src.distinctive, imported by the routes; every analysis or quiz request needs it",
+    },
+    "app": {
+        "streamlit": "the page itself",
+        "pandas": "the default page renders DataFrames on the first run",
+        "numpy": "pandas",
+    },
+}
+
+def heavy_imports(name: str, modules: set) -> dict:
+    """{package: reason or "unexpected"} of the HEAVY_PACKAGES among `modules`."""
+    expected = DELIBERATELY_EAGER.get(name, {})
+    return {package: expected.get(package, "unexpected") for package in HEAVY_PACKAGES if package in modules}
+
+def import_times(statement: str) -> list:
+    """[(depth, module, cumulative seconds)] from `python -X importtime -c statement`, in output order."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement], cwd=REPO_ROOT,
+        capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            module = name.strip()
+            rows.append(((len(name) - len(name.lstrip()) - 1) // 2, module, int(cumulative) / 1e6))
+    return rows
+
+def statement_imports(rows: list, preloaded: set) -> list:
+    """The rows imported by the statement itself: the subtrees of its top-level imports (a child precedes its parent)."""
+    kept, subtree = [], []
+    for row in rows:
+        subtree.append(row)
+        depth, module, _ = row
+        if depth == 0:
+            if module not in preloaded:
+                kept.extend(subtree)
+            subtree = []
+    return kept
+
+def bench_startup(repeat):
+    """
+    Import time of each entry point in a fresh interpreter (interpreter start-up
+    excluded), with the slowest packages and project modules it pulled in.
+    """
+    preloaded = {module for depth, module, _ in import_times("pass") if depth == 0}
+    entry_modules = {statement.split()[-1] for statement in STARTUP_STATEMENTS.values() if statement}
+    results = {}
+    for name, statement in STARTUP_STATEMENTS.items():
+        runs = []
+        for _ in range(repeat + 1): # the first run writes the bytecode caches
+            rows = statement_imports(import_times(statement or app_imports()), preloaded)
+            runs.append((sum(t for depth, _, t in rows if depth == 0), rows))
+        runs = sorted(runs[1:], key=lambda run: run[0])
+        totals = [total for total, _ in runs]
+        slowest = sorted(
+            ((module, t) for _, module, t in runs[len(runs) // 2][1]
+             if module not in entry_modules and ("." not in module or module.startswith("src."))),
+            key=lambda item: -item[1],
+        )
+        results[f"startup {name}"] = {
+            "repeat": repeat,
+            "min": totals[0],
+            "median": statistics.median(totals),
+            "max": totals[-1],
+            "slowest_imports": dict(slowest[:8]),
+            "heavy_imports": heavy_imports(name, {module for _, module, _ in runs[len(runs) // 2][1]}),
+        }
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the hanja-extractor benchmark suite.")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Path of the JSON result file")
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--chars", type=int, default=5000, help="Characters per document")
+    parser.add_argument("--density", type=float, default=0.3, help="Probability that a token is a Hanja word")
+    parser.add_argument("--vocabulary", type=int, default=2000)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    config = CorpusConfig(
+        n_documents=args.documents, chars_per_document=args.chars, hanja_density=args.density,
+        vocabulary_size=args.vocabulary, zipf_s=args.zipf, seed=args.seed,
+    )
+    report = run(config, repeat=args.repeat)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    for name, stats in report["results"].items():
+        print(f"{name:40s} median {stats['median'] * 1000:10.2f} ms")
+        for package, reason in stats.get("heavy_imports", {}).items():
+            print(f"{'':40s} loads {package}: {reason}")
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
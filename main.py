@@ -1,128 +1,161 @@
 import argparse
-import hashlib
-from src.models import init_db
-from src.extractor import HanjaExtractor
-from src.dictionary import HanjaDictionary
-from src.repository import HanjaRepository
-from src.reader import read_file
-from src.loader import DictionaryLoader
-from sqlalchemy.orm import sessionmaker
-
-def calculate_hash(content: str) -> str:
-    return hashlib.sha256(content.encode('utf-8')).hexdigest()
-
-def main():
+import json
+import sys
+import time
+from src.models import init_db, HanjaInfo, UsageExample
+from src.ingest import IngestionPipeline, DocumentReport, summarize, calculate_hash, STAGES, NEAR_DUPLICATE_POLICIES
+from src.minhash import DEFAULT_SIMILARITY_THRESHOLD
+from src.loader import DictionaryLoader, REFERENCE_CSV
+from src.refresh import DictionaryRefresher
+from src.readmodel import get_snapshot_path, write_snapshot
+from src.instrumentation import instrument_session_factory, get_active_stats
+
+SAMPLE_TEXT = "이것은 學을 배우는 학생들을 위한 교과서입니다. 人生은 배움의 연속입니다."
+
+class ProgressBar:
+    """Single-line progress bar on stderr, redrawn at most every `interval` seconds."""
+
+    def __init__(self, label: str, stream=None, width: int = 30, interval: float = 0.1):
+        self.label = label
+        self.stream = stream or sys.stderr
+        self.width = width
+        self.interval = interval
+        self._last_draw = 0.0
+
+    def update(self, done: int, total: int):
+        now = time.perf_counter()
+        if done < total and now - self._last_draw < self.interval:
+            return
+        self._last_draw = now
+        filled = int(self.width * done / total) if total else self.width
+        bar = "#" * filled + "-" * (self.width - filled)
+        self.stream.write(f"\r{self.label} [{bar}] {done}/{total}")
+        if done >= total:
+            self.stream.write("\n")
+        self.stream.flush()
+
+def print_document_report(report: DocumentReport):
+    if report.status == "skipped":
+        if report.near_duplicate_of is not None:
+            print(f"Skipping: Document '{report.filename}' is a near-duplicate of '{report.near_duplicate_of}' "
+                  f"(similarity {report.similarity:.2f}).")
+        else:
+            print(f"Skipping: Document '{report.filename}' already processed.")
+        return
+    if report.status == "error":
+        print(f"--- An Error Occurred in '{report.filename}': {report.error} ---")
+        return
+    d = report.to_dict()
+    print(f"Processed '{report.filename}': {report.chars} chars, {report.hanja_count} Hanja, "
+          f"{report.word_count} words in {d['total_seconds']:.2f}s ({d['chars_per_sec']:,.0f} chars/sec)")
+    print("  " + ", ".join(f"{stage} {report.stage_seconds[stage] * 1000:.1f}ms" for stage in STAGES))
+    if report.near_duplicate_of is not None:
+        print(f"  Warning: near-duplicate of '{report.near_duplicate_of}' (similarity {report.similarity:.2f})")
+    for item in report.failed_items:
+        print(f"  Error processing {item}")
+
+def update_snapshot(Session_factory, args):
+    if not args.snapshot:
+        return
+    model = write_snapshot(Session_factory, args.snapshot)
+    if not args.quiet:
+        print(f"Read model snapshot: {args.snapshot} (data version {model.data_version}, {model.nbytes / 1e6:.1f} MB)")
+
+def main(argv=None):
     # 0. Parse CLI arguments
     parser = argparse.ArgumentParser(description="Extract Hanja from text or PDF files.")
-    parser.add_argument("file", nargs="?", help="Path to the input file (.txt or .pdf)")
-    args = parser.parse_args()
+    parser.add_argument("files", nargs="*", help="Paths to the input files (.txt or .pdf)")
+    parser.add_argument("--db-url", default="sqlite:///hanja.db", help="SQLAlchemy database URL")
+    parser.add_argument("--profile-sql", action="store_true", help="Record per-statement SQL timings and print a report at the end")
+    parser.add_argument("--slow-query-ms", type=float, default=None, help="Log statements slower than this (with --profile-sql)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only print the final summary (no progress bar or per-document lines)")
+    parser.add_argument("--report", metavar="PATH", help="Write per-document stage metrics and the summary as JSON")
+    parser.add_argument("--collection", metavar="NAME", help="Add the documents to this named collection (see /collections)")
+    parser.add_argument("--near-duplicates", choices=NEAR_DUPLICATE_POLICIES, default="flag",
+                        help="Documents whose Hanja are nearly identical to an earlier one: ingest and warn (flag), skip, or do not check (off)")
+    parser.add_argument("--similarity-threshold", type=float, default=DEFAULT_SIMILARITY_THRESHOLD,
+                        help="Estimated Jaccard similarity of Hanja shingles above which documents are near-duplicates")
+    parser.add_argument("--refresh-dictionary", nargs="?", const=REFERENCE_CSV, metavar="CSV",
+                        help="Update the reference dictionary from hanja.csv (or CSV) and re-enrich only the changed collected Hanja, then exit")
+    parser.add_argument("--dry-run", action="store_true", help="With --refresh-dictionary, only report the differences")
+    parser.add_argument("--snapshot", metavar="PATH", default=get_snapshot_path(),
+                        help="Regenerate the shared read model snapshot file of the API workers (default: $HANJA_SNAPSHOT_PATH)")
+    args = parser.parse_args(argv)
 
     # 1. Initialize the database and get a Session factory
-    Session_factory = init_db()
+    Session_factory = init_db(args.db_url)
+    if args.profile_sql:
+        instrument_session_factory(Session_factory, slow_threshold_ms=args.slow_query_ms)
     
     # 1.1 Pre-load Reference Dictionary
-    print("--- Checking Reference Dictionary ---")
+    if not args.quiet:
+        print("--- Checking Reference Dictionary ---")
     loader = DictionaryLoader(Session_factory)
     loader.load_csv_data()
 
-    session = Session_factory() # Create a single session for this run
-    
-    # 2. Create instances of the components
-    extractor = HanjaExtractor()
-    dictionary = HanjaDictionary()
-    repository = HanjaRepository()
+    if args.refresh_dictionary:
+        report = DictionaryRefresher(Session_factory).refresh(args.refresh_dictionary, dry_run=args.dry_run)
+        counts = report.to_dict()
+        print(f"\nReference changes: {counts['added']} added, {counts['changed']} changed, {counts['removed']} removed")
+        if not args.dry_run:
+            print(f"Collected Hanja updated: {counts['hanja_updated']} ({counts['readings_replaced']} readings replaced)")
+            update_snapshot(Session_factory, args)
+        return 0
 
-    print("\n--- Hanja Extraction and Storage Process ---")
+    # 2. Ingest documents
+    pipeline = IngestionPipeline(
+        Session_factory, collection=args.collection,
+        near_duplicates=args.near_duplicates, similarity_threshold=args.similarity_threshold,
+    )
+    if not args.quiet:
+        print("\n--- Hanja Extraction and Storage Process ---")
 
-    try:
-        # 3. Determine text source
-        text_to_process = ""
-        filename = "sample_text"
-        if args.file:
-            print(f"Reading file: {args.file}")
-            try:
-                text_to_process = read_file(args.file)
-                filename = args.file
-            except Exception as e:
-                print(f"Error reading file: {e}")
-                return
-        else:
+    reports = []
+    start = time.perf_counter()
+    if args.files:
+        for path in args.files:
+            progress = None if args.quiet else ProgressBar(path).update
+            reports.append(pipeline.ingest_file(path, on_progress=progress))
+            if not args.quiet:
+                print_document_report(reports[-1])
+    else:
+        if not args.quiet:
             print("No file provided. Using default sample text.")
-            text_to_process = "이것은 學을 배우는 학생들을 위한 교과서입니다. 人生은 배움의 연속입니다."
-        
-        # 3.1 Idempotency Check
-        file_hash = calculate_hash(text_to_process)
-        existing_doc = repository.get_document_by_hash(session, file_hash)
-        
-        if existing_doc:
-            print(f"Skipping: Document '{filename}' (Hash: {file_hash[:8]}...) already processed.")
-            return # Stop processing if duplicate
-
-        print(f"Processing new document: '{filename}'")
-        current_doc = repository.create_document(session, filename, file_hash)
-
-        print(f"\nProcessing Text (Length: {len(text_to_process)} chars)...")
-        
-        # 4. Extract Hanja characters and words
-        individual_hanja, hanja_words = extractor.extract(text_to_process)
-        print(f"Extracted individual Hanja: {len(individual_hanja)} items")
-        print(f"Extracted Hanja words: {len(hanja_words)} items")
-
-        # 5. Look up and save individual Hanja information
-        print("\n--- Processing Individual Hanja ---")
-        for char in individual_hanja:
-            try:
-                # Pass session to lookup
-                hanja_info = dictionary.lookup(session, char)
-                repository.add_hanja_info(
-                    session, 
-                    char=hanja_info["char"],
-                    sound=hanja_info["sound"],
-                    meaning=hanja_info["meaning"],
-                    radical=hanja_info["radical"],
-                    strokes=hanja_info["strokes"],
-                    readings=hanja_info.get("readings")
-                )
-                # Update frequency for this specific document
-                repository.update_document_hanja_frequency(session, current_doc.id, char)
-                print(f"Processed: {char} ({hanja_info['meaning']} {hanja_info['sound']})")
-                
-            except ValueError as e:
-                print(f"Error processing '{char}': {e}")
-            except Exception as e:
-                print(f"An unexpected error occurred for '{char}': {e}")
-
-        # 6. Save usage examples (Hanja words)
-        print("\n--- Processing Hanja Words ---")
-        for word in hanja_words:
-            word_sound = dictionary.get_word_sound(word)
-            repository.add_usage_example(session, word=word, sound=word_sound)
-            # Update frequency for this specific document
-            repository.update_document_word_frequency(session, current_doc.id, word)
-            print(f"Processed Word: {word} ({word_sound})")
-
-        # 7. Verify by retrieving all saved data
-        print("\n--- Stored Data Verification ---")
-        all_hanja = repository.get_all_hanja_info(session) # Pass the session
-        print(f"\nTotal Unique Hanja stored: {len(all_hanja)}")
-        for h in all_hanja[:5]: # Show first 5
-             readings_str = ", ".join([f"{r.meaning} {r.sound}" for r in h.readings])
-             print(f"- {h.char} (Radical: {h.radical}, Strokes: {h.strokes}): {readings_str}")
-
-        all_examples = repository.get_all_usage_examples(session) # Pass the session
-        print(f"Total Unique Words stored: {len(all_examples)}")
-        
-        session.commit() # Commit all changes at the end
-        print("\n--- Process Completed ---")
-
-    except Exception as e:
-        session.rollback() # Rollback on error
-        print(f"\n--- An Error Occurred: {e} ---")
-        import traceback
-        traceback.print_exc()
+        reports.append(pipeline.ingest_text(SAMPLE_TEXT, "sample_text"))
+        if not args.quiet:
+            print_document_report(reports[-1])
+    summary = summarize(reports, time.perf_counter() - start)
+
+    # 3. Summary
+    session = Session_factory()
+    try:
+        summary["total_hanja_stored"] = session.query(HanjaInfo).count()
+        summary["total_words_stored"] = session.query(UsageExample).count()
     finally:
-        session.close() # Always close the session
+        session.close()
+
+    print("\n--- Ingestion Summary ---")
+    print(f"Documents: {summary['ingested']} ingested, {summary['skipped']} skipped, {summary['errors']} errors, "
+          f"{summary['near_duplicates']} near-duplicates")
+    print(f"Throughput: {summary['docs_per_sec']:.2f} docs/sec, {summary['chars_per_sec']:,.0f} chars/sec "
+          f"({summary['wall_seconds']:.2f}s)")
+    print("Stages: " + ", ".join(f"{stage} {summary['stage_seconds'][stage]:.2f}s" for stage in STAGES))
+    print(f"Total Unique Hanja stored: {summary['total_hanja_stored']}")
+    print(f"Total Unique Words stored: {summary['total_words_stored']}")
+    update_snapshot(Session_factory, args)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump({"documents": [r.to_dict() for r in reports], "summary": summary}, f, indent=2, ensure_ascii=False)
+        print(f"Report written to {args.report}")
+
+    stats = get_active_stats()
+    if stats is not None:
+        print("\n--- SQL Query Profile ---")
+        print(stats.format_report())
+
+    return 1 if summary["errors"] else 0
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
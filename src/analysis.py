@@ -0,0 +1,284 @@
+"""
+Query builders and responses of the `/analysis/*` tables.
+
+Shared by the route handlers of `src.api` and `src.api_async` and by the
+Streamlit app, which calls the `*_response` functions directly: this module
+needs SQLAlchemy and the response models but not FastAPI, so the app does not
+import the whole API (and its ingestion queue) at start-up. Errors are raised
+as HTTPException (Starlette's, which FastAPI turns into the same responses).
+"""
+from collections import Counter
+
+from sqlalchemy import select, func, desc, distinct
+from sqlalchemy.orm import selectinload
+from starlette.exceptions import HTTPException
+
+from src.models import HanjaInfo, DocumentHanja, DocumentWord, UsageExample, WordChar, CollectionHanja, CollectionWord
+from src.scope import DocumentScope, GLOBAL_SCOPE
+from src.readmodel import ReadModel, ReadModelCache
+from src.cooccurrence import CooccurrenceIndex
+from src.distinctive import DistinctiveIndex
+from src.schemas import (
+    HanjaFrequencyResponse,
+    RadicalFrequencyResponse,
+    WordCharFrequencyResponse,
+    WordFrequencyResponse,
+    RelatedHanjaResponse,
+    DistinctiveItemResponse,
+)
+
+# Every builder takes a DocumentScope (src/scope.py); the global scope keeps the plain
+# aggregate over all occurrence rows, other scopes go through scoped_frequencies.
+
+def check_scope(db, scope: DocumentScope):
+    if scope.collection is not None and db.execute(select(scope.collection_id_query())).scalar() is None:
+        raise HTTPException(status_code=404, detail="Collection not found.")
+
+def scoped_frequencies(occurrence, aggregate, target: str, scope: DocumentScope):
+    """
+    Subquery (target_id, frequency) of per-target frequencies within the scope: read from
+    the collection's precomputed `aggregate` table for a collection-only scope, otherwise
+    summed from the `occurrence` rows of the scope's documents.
+    """
+    if scope.collection_only:
+        return (
+            select(getattr(aggregate, target).label("target_id"), aggregate.frequency.label("frequency"))
+            .where(aggregate.collection_id == scope.collection_id_query())
+            .subquery()
+        )
+    column = getattr(occurrence, target)
+    return (
+        select(column.label("target_id"), func.sum(occurrence.frequency).label("frequency"))
+        .where(occurrence.document_id.in_(scope.document_ids_query()))
+        .group_by(column)
+        .subquery()
+    )
+
+def top_hanja_queries(offset: int, size: int, scope: DocumentScope = GLOBAL_SCOPE):
+    """(total, items) statements for the most frequent Hanja."""
+    if not scope.is_global:
+        freq = scoped_frequencies(DocumentHanja, CollectionHanja, "hanja_id", scope)
+        total = select(func.count()).select_from(freq)
+        items = (
+            select(HanjaInfo, freq.c.frequency.label('total_freq'))
+            .join(freq, freq.c.target_id == HanjaInfo.id).order_by(desc(freq.c.frequency), desc(freq.c.target_id))
+            .offset(offset).limit(size)
+            .options(selectinload(HanjaInfo.readings))
+        )
+        return total, items
+    total = select(func.count(distinct(DocumentHanja.hanja_id)))
+    items = (
+        select(HanjaInfo, func.sum(DocumentHanja.frequency).label('total_freq'))
+        .join(DocumentHanja).group_by(HanjaInfo.id).order_by(desc('total_freq'))
+        .offset(offset).limit(size)
+        .options(selectinload(HanjaInfo.readings))
+    )
+    return total, items
+
+def top_radicals_queries(offset: int, size: int, scope: DocumentScope = GLOBAL_SCOPE):
+    """(total, items) statements for the most frequent radicals."""
+    if not scope.is_global:
+        freq = scoped_frequencies(DocumentHanja, CollectionHanja, "hanja_id", scope)
+        total = select(func.count()).select_from(
+            select(HanjaInfo.radical).join(freq, freq.c.target_id == HanjaInfo.id).distinct().subquery()
+        )
+        items = (
+            select(HanjaInfo.radical, func.sum(freq.c.frequency).label('radical_freq'))
+            .join(freq, freq.c.target_id == HanjaInfo.id).filter(HanjaInfo.radical != None)
+            .group_by(HanjaInfo.radical).order_by(desc('radical_freq'), HanjaInfo.radical)
+            .offset(offset).limit(size)
+        )
+        return total, items
+    total = select(func.count()).select_from(
+        select(HanjaInfo.radical).join(DocumentHanja).distinct().subquery()
+    )
+    items = (
+        select(HanjaInfo.radical, func.sum(DocumentHanja.frequency).label('radical_freq'))
+        .join(DocumentHanja).filter(HanjaInfo.radical != None)
+        .group_by(HanjaInfo.radical).order_by(desc('radical_freq'))
+        .offset(offset).limit(size)
+    )
+    return total, items
+
+def word_frequencies_query(scope: DocumentScope = GLOBAL_SCOPE):
+    if not scope.is_global:
+        freq = scoped_frequencies(DocumentWord, CollectionWord, "word_id", scope)
+        return select(UsageExample.word, freq.c.frequency).join(freq, freq.c.target_id == UsageExample.id)
+    return select(UsageExample.word, func.sum(DocumentWord.frequency)).join(DocumentWord).group_by(UsageExample.id)
+
+def char_words_queries(char: str, offset: int, size: int, scope: DocumentScope = GLOBAL_SCOPE):
+    """
+    (total, items) statements for the words containing `char` (via word_chars), most frequent
+    first. Globally this includes collected words without occurrences; a scope keeps only the
+    words occurring in its documents.
+    """
+    word_ids = select(WordChar.word_id).where(WordChar.char == char).distinct().subquery()
+    if not scope.is_global:
+        freq = scoped_frequencies(DocumentWord, CollectionWord, "word_id", scope)
+        total = select(func.count()).select_from(word_ids).join(freq, freq.c.target_id == word_ids.c.word_id)
+        items = (
+            select(UsageExample, freq.c.frequency.label('word_freq'))
+            .join(word_ids, word_ids.c.word_id == UsageExample.id)
+            .join(freq, freq.c.target_id == UsageExample.id)
+            .order_by(desc('word_freq'), UsageExample.word)
+            .offset(offset).limit(size)
+        )
+        return total, items
+    total = select(func.count()).select_from(word_ids)
+    frequency = func.coalesce(func.sum(DocumentWord.frequency), 0).label('word_freq')
+    items = (
+        select(UsageExample, frequency)
+        .join(word_ids, word_ids.c.word_id == UsageExample.id)
+        .outerjoin(DocumentWord, DocumentWord.word_id == UsageExample.id)
+        .group_by(UsageExample.id).order_by(desc('word_freq'), UsageExample.word)
+        .offset(offset).limit(size)
+    )
+    return total, items
+
+def hanja_by_chars_query(chars):
+    return select(HanjaInfo).where(HanjaInfo.char.in_(list(chars))).options(selectinload(HanjaInfo.readings))
+
+def hanja_by_ids_query(hanja_ids):
+    return select(HanjaInfo).where(HanjaInfo.id.in_(list(hanja_ids))).options(selectinload(HanjaInfo.readings))
+
+def count_word_chars(word_frequencies) -> list:
+    """[(char, frequency)] of characters within words, most frequent first."""
+    char_counter = Counter()
+    for word, freq in word_frequencies:
+        for char in word:
+            char_counter[char] += freq
+    return char_counter.most_common()
+
+def word_chars_page(model: ReadModel, offset: int, size: int) -> tuple:
+    """(total, items) of the global /analysis/words/chars table from the read model."""
+    total, chars = model.top_word_chars(offset, size)
+    items = [
+        WordCharFrequencyResponse(char=char, frequency=freq, hanja_info=model.hanja_by_char(char))
+        for char, freq in chars
+    ]
+    return total, items
+
+def top_hanja_response(db, read_models: ReadModelCache, page: int, size: int, scope: DocumentScope = GLOBAL_SCOPE) -> dict:
+    check_scope(db, scope)
+    offset = (page - 1) * size
+    if scope.is_global:
+        # Served from the in-memory snapshot of the current data version
+        total, results = read_models.get(db).top_hanja(offset, size)
+    else:
+        total_query, items_query = top_hanja_queries(offset, size, scope)
+        
+        # Query for total count (of unique hanjas that appeared)
+        total = db.execute(total_query).scalar()
+        results = db.execute(items_query).all()
+    
+    items = []
+    for hanja, freq in results:
+        items.append(HanjaFrequencyResponse(hanja=hanja, frequency=freq))
+        
+    return {
+        "total": total,
+        "items": items,
+        "page": page,
+        "size": size
+    }
+
+def top_radicals_response(db, read_models: ReadModelCache, page: int, size: int, scope: DocumentScope = GLOBAL_SCOPE) -> dict:
+    check_scope(db, scope)
+    offset = (page - 1) * size
+    if scope.is_global:
+        total, results = read_models.get(db).top_radicals(offset, size)
+    else:
+        total_query, items_query = top_radicals_queries(offset, size, scope)
+        
+        # Total unique radicals that appeared; group by radical and sum frequency
+        total = db.execute(total_query).scalar()
+        results = db.execute(items_query).all()
+    
+    items = []
+    for radical, freq in results:
+        items.append(RadicalFrequencyResponse(radical=radical, frequency=freq))
+        
+    return {
+        "total": total,
+        "items": items,
+        "page": page,
+        "size": size
+    }
+
+def word_chars_response(db, read_models: ReadModelCache, page: int, size: int, scope: DocumentScope = GLOBAL_SCOPE) -> dict:
+    """
+    Characters within words (calculated in memory for now).
+    Note: Pagination here is simulated on the full result set because calculation is complex.
+    The global table is precomputed in the read model; scoped ones are counted per request.
+    """
+    check_scope(db, scope)
+    if scope.is_global:
+        total, items = word_chars_page(read_models.get(db), (page - 1) * size, size)
+        return {"total": total, "items": items, "page": page, "size": size}
+
+    # 1. Count characters over all words and their frequencies
+    sorted_chars = count_word_chars(db.execute(word_frequencies_query(scope)).all())
+    total = len(sorted_chars)
+    
+    # 2. Paginate in memory
+    start = (page - 1) * size
+    end = start + size
+    paged_data = sorted_chars[start:end]
+    
+    # 3. Enrich with HanjaInfo (one query for the page)
+    hanja_by_char = {h.char: h for h in db.execute(hanja_by_chars_query(c for c, _ in paged_data)).scalars()}
+    items = []
+    for char, freq in paged_data:
+        items.append(WordCharFrequencyResponse(char=char, frequency=freq, hanja_info=hanja_by_char.get(char)))
+        
+    return {
+        "total": total,
+        "items": items,
+        "page": page,
+        "size": size
+    }
+
+def char_words_response(db, read_models: ReadModelCache, char: str, page: int, size: int,
+                        scope: DocumentScope = GLOBAL_SCOPE) -> dict:
+    check_scope(db, scope)
+    if scope.is_global:
+        total, results = read_models.get(db).char_words(char, (page - 1) * size, size)
+    else:
+        total_query, items_query = char_words_queries(char, (page - 1) * size, size, scope)
+        total = db.execute(total_query).scalar()
+        results = db.execute(items_query).all()
+    items = [WordFrequencyResponse(word=word, frequency=freq) for word, freq in results]
+    return {"total": total, "items": items, "page": page, "size": size}
+
+def related_hanja_response(db, index: CooccurrenceIndex, char: str, source: str, k: int,
+                           scope: DocumentScope = GLOBAL_SCOPE) -> dict:
+    check_scope(db, scope)
+    hanja = db.execute(hanja_by_chars_query([char])).scalar()
+    if hanja is None:
+        raise HTTPException(status_code=404, detail="Hanja not collected.")
+    row_keys = None
+    if not scope.is_global:
+        # Co-occurrence counted over the scope's documents, or the words occurring in them
+        keys_query = scope.document_ids_query() if source == "document" else scope.word_ids_query()
+        row_keys = db.execute(keys_query).scalars().all()
+    related = index.related(db, hanja.id, source=source, k=k, row_keys=row_keys)
+    by_id = {h.id: h for h in db.execute(hanja_by_ids_query(hanja_id for hanja_id, _, _ in related)).scalars()}
+    items = [RelatedHanjaResponse(hanja=by_id[hanja_id], count=count, score=score) for hanja_id, count, score in related]
+    return {"char": char, "source": source, "items": items}
+
+def distinctive_response(db, index: DistinctiveIndex, kind: str, method: str, k: int, scope: DocumentScope) -> dict:
+    if scope.is_global:
+        raise HTTPException(status_code=422, detail="Select the documents to compare with the corpus (document_id, filename, ingest dates or collection).")
+    check_scope(db, scope)
+    documents, ranked = index.distinctive(db, db.execute(scope.document_ids_query()).scalars().all(), kind=kind, method=method, k=k)
+    target_ids = [target_id for target_id, _, _, _ in ranked]
+    if kind == "hanja":
+        by_id = {h.id: {"hanja": h} for h in db.execute(hanja_by_ids_query(target_ids)).scalars()}
+    else:
+        words = db.execute(select(UsageExample).where(UsageExample.id.in_(target_ids))).scalars()
+        by_id = {w.id: {"word": w} for w in words}
+    items = [
+        DistinctiveItemResponse(**by_id[target_id], frequency=count, corpus_frequency=corpus_count, score=score)
+        for target_id, count, corpus_count, score in ranked
+    ]
+    return {"kind": kind, "method": method, "documents": documents, "items": items}
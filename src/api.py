@@ -1,127 +1,544 @@
-from fastapi import FastAPI, Depends, Query
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, suppress
+from fastapi import FastAPI, Depends, Query, Path, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from collections import Counter
+from sqlalchemy import select, func, desc
+from datetime import date
+from typing import List
 
-from src.models import init_db, HanjaInfo, DocumentHanja, DocumentWord, UsageExample
+from src.models import init_db, DEFAULT_USER_ID, CollectionDocument, IngestJob
+from src.repository import HanjaRepository
+from src.scope import DocumentScope
+from src.instrumentation import get_active_stats
+from src.metrics import REGISTRY, DatabaseStatsCollector, instrument_pool
+from src.quiz import QuizGenerator, QuestionPool
+from src.readmodel import ReadModelCache, get_snapshot_path
+from src.progress import BatchedProgressWriter
+from src.cooccurrence import COOCCURRENCE_SOURCES, CooccurrenceIndex
+from src.distinctive import DISTINCTIVE_KINDS, DISTINCTIVE_METHODS, DistinctiveIndex
+from src.search import SEARCH_FIELDS, search_hanja, search_words
+from src.jobs import JOB_STATUSES, IngestJobQueue
+from src.database import SingleWriter
+from src.reader import SUPPORTED_EXTENSIONS
+from src.analysis import (
+    top_hanja_response,
+    top_radicals_response,
+    word_chars_response,
+    char_words_response,
+    related_hanja_response,
+    distinctive_response,
+)
 from src.schemas import (
     PaginatedHanjaResponse, 
-    HanjaFrequencyResponse, 
     PaginatedRadicalResponse, 
-    RadicalFrequencyResponse,
     PaginatedWordCharResponse,
-    WordCharFrequencyResponse
+    QuizQuestionResponse,
+    QuizBatchResponse,
+    QuizAnswerRequest,
+    QuizAnswerResponse,
+    WordResponse,
+    PaginatedWordResponse,
+    RelatedHanjaListResponse,
+    SearchResponse,
+    CollectionRequest,
+    CollectionResponse,
+    DistinctiveResponse,
+    IngestJobResponse
+)
+
+QUIZ_MODES = "^(random|radical|word|importance_review)$"
+QUIZ_TYPES = "^(hanja_to_meaning|meaning_to_hanja|word_to_sound|sound_to_word)$"
+COOCCURRENCE_SOURCE_PATTERN = f"^({'|'.join(COOCCURRENCE_SOURCES)})$"
+SEARCH_FIELD_PATTERN = f"^({'|'.join(SEARCH_FIELDS)})$"
+DISTINCTIVE_KIND_PATTERN = f"^({'|'.join(DISTINCTIVE_KINDS)})$"
+DISTINCTIVE_METHOD_PATTERN = f"^({'|'.join(DISTINCTIVE_METHODS)})$"
+JOB_STATUS_PATTERN = f"^({'|'.join(JOB_STATUSES)})$"
+USER_ID_QUERY = Query(DEFAULT_USER_ID, min_length=1, max_length=64, description="Learner whose progress weights the questions")
+
+_question_pool = None
+_read_models = None
+_progress_writer = None
+_cooccurrence_index = None
+_distinctive_index = None
+_ingest_queue = None
+_db_writer = None
+_db_stats = None
+# Guards the creation of the singletons above: FastAPI runs sync dependencies in a threadpool, so two
+# first requests could otherwise each build one (two SingleWriters, an orphaned progress buffer).
+# Reentrant because the getters call each other.
+_singletons_lock = threading.RLock()
+
+@asynccontextmanager
+async def lifespan(app):
+    # Resume the jobs left queued (or stale "running") by a previous process without waiting for an upload
+    get_ingest_queue()
+    yield
+    # Flush buffered quiz answers on shutdown
+    if _progress_writer is not None:
+        _progress_writer.close()
+    # Let the ingestion workers finish their current document; queued jobs resume on the next start
+    if _ingest_queue is not None:
+        _ingest_queue.close()
+    if _db_writer is not None:
+        _db_writer.close()
+    if _db_stats is not None:
+        _db_stats.close()
+
+app = FastAPI(title="Hanja Analysis API", lifespan=lifespan)
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    "hanja_http_request_duration_seconds", "HTTP request latency by route.", ["method", "route", "status"]
 )
+METRICS_REFRESH_SECONDS = float(os.environ.get("HANJA_METRICS_REFRESH_SECONDS", "60"))
+DB_URL_ENV = "HANJA_DB_URL"
+DEFAULT_DB_URL = "sqlite:///hanja.db"
+UPLOAD_DIR = os.environ.get("HANJA_UPLOAD_DIR", "uploads")
+INGEST_WORKERS = int(os.environ.get("HANJA_INGEST_WORKERS", "2"))
+MAX_UPLOAD_BYTES = int(os.environ.get("HANJA_MAX_UPLOAD_MB", "50")) * 1024 * 1024
 
-app = FastAPI(title="Hanja Analysis API")
+def get_db_url() -> str:
+    return os.environ.get(DB_URL_ENV, DEFAULT_DB_URL)
+
+_session_factory = None
+
+def get_session_factory():
+    """Creates the engine (and runs migrations) once per process instead of per request."""
+    global _session_factory, _db_stats
+    if _session_factory is None:
+        with _singletons_lock:
+            if _session_factory is None:
+                _session_factory = init_db(get_db_url())
+                engine = _session_factory.kw["bind"]
+                instrument_pool(engine)
+                _db_stats = DatabaseStatsCollector(engine, refresh_seconds=METRICS_REFRESH_SECONDS)
+                _db_stats.start()
+                REGISTRY.add_collector(_db_stats)
+    return _session_factory
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (e.g. /analysis/hanja), not the raw URL, to bound cardinality
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        REQUEST_LATENCY.observe(time.perf_counter() - start, method=request.method, route=route_path, status=status)
+
+def get_read_models() -> ReadModelCache:
+    """
+    The process's read model snapshot, shared by the global /analysis routes and
+    the quiz; mapped from the HANJA_SNAPSHOT_PATH file when it is set.
+    """
+    global _read_models
+    if _read_models is None:
+        with _singletons_lock:
+            if _read_models is None:
+                _read_models = ReadModelCache(path=get_snapshot_path())
+    return _read_models
+
+def get_question_pool() -> QuestionPool:
+    global _question_pool
+    if _question_pool is None:
+        with _singletons_lock:
+            if _question_pool is None:
+                _question_pool = QuestionPool(QuizGenerator(get_session_factory(), read_models=get_read_models()))
+    return _question_pool
+
+def get_cooccurrence_index() -> CooccurrenceIndex:
+    global _cooccurrence_index
+    if _cooccurrence_index is None:
+        with _singletons_lock:
+            if _cooccurrence_index is None:
+                _cooccurrence_index = CooccurrenceIndex()
+    return _cooccurrence_index
+
+def get_distinctive_index() -> DistinctiveIndex:
+    global _distinctive_index
+    if _distinctive_index is None:
+        with _singletons_lock:
+            if _distinctive_index is None:
+                _distinctive_index = DistinctiveIndex()
+    return _distinctive_index
+
+def get_db_writer() -> SingleWriter:
+    """The process's single writer: ingestion and quiz progress writes are serialized through it."""
+    global _db_writer
+    if _db_writer is None:
+        with _singletons_lock:
+            if _db_writer is None:
+                _db_writer = SingleWriter(get_session_factory())
+    return _db_writer
+
+def get_ingest_queue() -> IngestJobQueue:
+    global _ingest_queue
+    if _ingest_queue is None:
+        with _singletons_lock:
+            if _ingest_queue is None:
+                _ingest_queue = IngestJobQueue(
+                    get_session_factory(), UPLOAD_DIR, workers=INGEST_WORKERS, writer=get_db_writer(),
+                    on_ingested=lambda report: refresh_read_models(),
+                )
+                _ingest_queue.start()
+    return _ingest_queue
+
+def refresh_read_models():
+    """Brings the read model (and the shared snapshot file) up to date, so other workers only map it."""
+    session = get_session_factory()()
+    try:
+        get_read_models().get(session)
+    finally:
+        session.close()
+
+def get_progress_writer() -> BatchedProgressWriter:
+    global _progress_writer
+    if _progress_writer is None:
+        with _singletons_lock:
+            if _progress_writer is None:
+                _progress_writer = BatchedProgressWriter(get_session_factory(), writer=get_db_writer())
+    return _progress_writer
 
 # Dependency
 def get_db():
-    SessionLocal = init_db()
+    SessionLocal = get_session_factory()
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+# --- Analysis (query builders and responses in src/analysis.py) ---
+
+def get_document_scope(
+    document_id: List[int] = Query(None, description="Only these documents (repeat the parameter for several)"),
+    filename: str = Query(None, min_length=1, max_length=200, description="Filename pattern with * and ? wildcards, e.g. 2023_*.pdf"),
+    ingested_from: date = Query(None, description="Documents ingested on or after this date"),
+    ingested_to: date = Query(None, description="Documents ingested on or before this date"),
+    collection: str = Query(None, min_length=1, max_length=100, description="Documents of this named collection"),
+) -> DocumentScope:
+    """Document filters shared by the /analysis routes; all given filters must match."""
+    return DocumentScope(document_id, filename, ingested_from, ingested_to, collection)
+
 @app.get("/analysis/hanja", response_model=PaginatedHanjaResponse)
 def get_top_hanja(
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db)
+    scope: DocumentScope = Depends(get_document_scope),
+    db: Session = Depends(get_db),
+    read_models: ReadModelCache = Depends(get_read_models)
 ):
     """
     Get most frequent Hanja characters with pagination.
     """
-    offset = (page - 1) * size
-    
-    # Query for total count (of unique hanjas that appeared)
-    total = db.query(DocumentHanja.hanja_id).distinct().count()
-    
-    # Query for items
-    results = db.query(
-        HanjaInfo, 
-        func.sum(DocumentHanja.frequency).label('total_freq')
-    ).join(DocumentHanja).group_by(HanjaInfo.id).order_by(desc('total_freq')).offset(offset).limit(size).all()
-    
-    items = []
-    for hanja, freq in results:
-        items.append(HanjaFrequencyResponse(hanja=hanja, frequency=freq))
-        
-    return {
-        "total": total,
-        "items": items,
-        "page": page,
-        "size": size
-    }
+    return top_hanja_response(db, read_models, page, size, scope)
 
 @app.get("/analysis/radicals", response_model=PaginatedRadicalResponse)
 def get_top_radicals(
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db)
+    scope: DocumentScope = Depends(get_document_scope),
+    db: Session = Depends(get_db),
+    read_models: ReadModelCache = Depends(get_read_models)
 ):
     """
     Get most frequent radicals with pagination.
     """
-    offset = (page - 1) * size
-    
-    # Total unique radicals that appeared
-    total = db.query(HanjaInfo.radical).join(DocumentHanja).distinct().count()
-    
-    # Group by radical and sum frequency
-    results = db.query(
-        HanjaInfo.radical,
-        func.sum(DocumentHanja.frequency).label('radical_freq')
-    ).join(DocumentHanja).filter(HanjaInfo.radical != None).group_by(HanjaInfo.radical).order_by(desc('radical_freq')).offset(offset).limit(size).all()
-    
-    items = []
-    for radical, freq in results:
-        items.append(RadicalFrequencyResponse(radical=radical, frequency=freq))
-        
-    return {
-        "total": total,
-        "items": items,
-        "page": page,
-        "size": size
-    }
+    return top_radicals_response(db, read_models, page, size, scope)
 
 @app.get("/analysis/words/chars", response_model=PaginatedWordCharResponse)
 def get_top_hanja_in_words(
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=100),
+    scope: DocumentScope = Depends(get_document_scope),
+    db: Session = Depends(get_db),
+    read_models: ReadModelCache = Depends(get_read_models)
+):
+    """
+    Get most frequent characters appearing WITHIN words.
+    """
+    return word_chars_response(db, read_models, page, size, scope)
+
+@app.get("/analysis/chars/{char}/words", response_model=PaginatedWordResponse)
+def get_words_for_char(
+    char: str = Path(..., min_length=1, max_length=1),
+    page: int = Query(1, ge=1),
+    size: int = Query(20, ge=1, le=100),
+    scope: DocumentScope = Depends(get_document_scope),
+    db: Session = Depends(get_db),
+    read_models: ReadModelCache = Depends(get_read_models)
+):
+    """
+    Get the collected words containing a character, most frequent first.
+    """
+    return char_words_response(db, read_models, char, page, size, scope)
+
+@app.get("/analysis/chars/{char}/related", response_model=RelatedHanjaListResponse)
+def get_related_hanja(
+    char: str = Path(..., min_length=1, max_length=1),
+    source: str = Query("document", pattern=COOCCURRENCE_SOURCE_PATTERN, description="Co-occurrence in the same document or the same word"),
+    k: int = Query(10, ge=1, le=100),
+    scope: DocumentScope = Depends(get_document_scope),
+    db: Session = Depends(get_db),
+    index: CooccurrenceIndex = Depends(get_cooccurrence_index)
+):
+    """
+    Get the Hanja most often appearing together with a character, by cosine similarity of their co-occurrence.
+    """
+    return related_hanja_response(db, index, char, source, k, scope)
+
+@app.get("/analysis/distinctive", response_model=DistinctiveResponse)
+def get_distinctive(
+    kind: str = Query("hanja", pattern=DISTINCTIVE_KIND_PATTERN),
+    method: str = Query("log_odds", pattern=DISTINCTIVE_METHOD_PATTERN, description="log_odds: z-score against the rest of the corpus, tfidf: share in the selection x idf"),
+    k: int = Query(20, ge=1, le=100),
+    scope: DocumentScope = Depends(get_document_scope),
+    db: Session = Depends(get_db),
+    index: DistinctiveIndex = Depends(get_distinctive_index)
+):
+    """
+    Get the Hanja or words unusually frequent in the selected documents compared with the whole corpus (see src.distinctive).
+    """
+    return distinctive_response(db, index, kind, method, k, scope)
+
+# --- Collections ---
+
+def _collection_response(db, collection) -> CollectionResponse:
+    count = db.query(func.count(CollectionDocument.id)).filter_by(collection_id=collection.id).scalar()
+    return CollectionResponse(name=collection.name, document_count=count, created_at=collection.created_at)
+
+def _collection_document_ids(db, request: CollectionRequest) -> list:
+    scope = DocumentScope(request.document_ids, request.filename, request.ingested_from, request.ingested_to)
+    if scope.is_global:
+        raise HTTPException(status_code=422, detail="Select documents by document_ids, filename or ingest dates.")
+    return db.execute(scope.document_ids_query()).scalars().all()
+
+@app.get("/collections", response_model=List[CollectionResponse])
+def list_collections(db: Session = Depends(get_db)):
+    """
+    List the named document collections usable as `collection` scope of the /analysis routes.
+    """
+    return [
+        CollectionResponse(name=c.name, document_count=count, created_at=c.created_at)
+        for c, count in HanjaRepository().list_collections(db)
+    ]
+
+@app.put("/collections/{name}", response_model=CollectionResponse)
+def put_collection(request: CollectionRequest, name: str = Path(..., min_length=1, max_length=100), db: Session = Depends(get_db)):
+    """
+    Create a collection or replace its documents with the ones matching the request filters.
+    """
+    collection = HanjaRepository().set_collection_documents(db, name, _collection_document_ids(db, request))
+    db.commit()
+    return _collection_response(db, collection)
+
+@app.post("/collections/{name}/documents", response_model=CollectionResponse)
+def add_collection_documents(request: CollectionRequest, name: str = Path(..., min_length=1, max_length=100), db: Session = Depends(get_db)):
+    """
+    Add the documents matching the request filters to a collection (created if missing).
+    """
+    collection = HanjaRepository().add_documents_to_collection(db, name, _collection_document_ids(db, request))
+    db.commit()
+    return _collection_response(db, collection)
+
+@app.delete("/collections/{name}", status_code=204)
+def delete_collection(name: str = Path(..., min_length=1, max_length=100), db: Session = Depends(get_db)):
+    """
+    Delete a collection (its documents are kept).
+    """
+    if not HanjaRepository().delete_collection(db, name):
+        raise HTTPException(status_code=404, detail="Collection not found.")
+    db.commit()
+
+# --- Document uploads ---
+
+# The body is read from the request stream, so it is declared for the OpenAPI schema only
+UPLOAD_BODY = {"requestBody": {"required": True, "content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}}}}
+
+@app.post("/documents", response_model=IngestJobResponse, status_code=202, openapi_extra=UPLOAD_BODY)
+async def upload_document(
+    request: Request,
+    filename: str = Query(..., min_length=1, max_length=255, description="Name of the uploaded file (.txt or .pdf), stored as the document filename"),
+    collection: str = Query(None, min_length=1, max_length=100, description="Also add the document to this named collection"),
+    db: Session = Depends(get_db),
+    jobs: IngestJobQueue = Depends(get_ingest_queue)
+):
+    """
+    Upload a document (raw file bytes as the request body) and queue its ingestion.
+    Returns at once; poll GET /jobs/{id} for the outcome.
+    The body is streamed to the upload directory, so at most one chunk is held in memory.
+    """
+    if os.path.splitext(filename)[1].lower() not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(status_code=422, detail=f"Unsupported file type; expected one of {', '.join(SUPPORTED_EXTENSIONS)}.")
+    declared = request.headers.get("content-length")
+    if declared is not None and declared.isdigit():
+        if int(declared) == 0:
+            raise HTTPException(status_code=422, detail="The uploaded file is empty.")
+        if int(declared) > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="The uploaded file is too large.")
+
+    path = jobs.upload_path(filename)
+    size = 0
+    try:
+        # Disk writes run in the thread pool; unbuffered, so closing does no I/O on the event loop
+        f = await run_in_threadpool(open, path, "wb", buffering=0)
+        try:
+            async for chunk in request.stream():
+                size += len(chunk)
+                # Also enforced while streaming: the header may be missing (chunked) or wrong
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail="The uploaded file is too large.")
+                await run_in_threadpool(f.write, chunk)
+        finally:
+            f.close()
+        if size == 0:
+            raise HTTPException(status_code=422, detail="The uploaded file is empty.")
+    except BaseException:
+        with suppress(FileNotFoundError): # open() itself may have failed
+            os.remove(path)
+        raise
+    job_id = await run_in_threadpool(jobs.submit_stored, os.path.basename(filename), path, collection)
+    return await run_in_threadpool(db.get, IngestJob, job_id)
+
+@app.get("/jobs", response_model=List[IngestJobResponse])
+def list_jobs(
+    status: str = Query(None, pattern=JOB_STATUS_PATTERN),
+    limit: int = Query(50, ge=1, le=500),
     db: Session = Depends(get_db)
 ):
     """
-    Get most frequent characters appearing WITHIN words (calculated in memory for now).
-    Note: Pagination here is simulated on the full result set because calculation is complex.
-    For very large datasets, this needs optimization (pre-calculation table).
-    """
-    # 1. Get all words and frequencies
-    words = db.query(UsageExample, func.sum(DocumentWord.frequency).label('total_freq')).join(DocumentWord).group_by(UsageExample.id).all()
-    
-    char_counter = Counter()
-    for word_obj, freq in words:
-        for char in word_obj.word:
-            char_counter[char] += freq
-            
-    # 2. Sort and Paginate in memory
-    sorted_chars = char_counter.most_common()
-    total = len(sorted_chars)
-    
-    start = (page - 1) * size
-    end = start + size
-    paged_data = sorted_chars[start:end]
-    
-    # 3. Enrich with HanjaInfo
-    items = []
-    for char, freq in paged_data:
-        hanja_info = db.query(HanjaInfo).filter_by(char=char).first()
-        items.append(WordCharFrequencyResponse(char=char, frequency=freq, hanja_info=hanja_info))
-        
-    return {
-        "total": total,
-        "items": items,
-        "page": page,
-        "size": size
-    }
+    List the most recent ingestion jobs, newest first.
+    """
+    query = select(IngestJob).order_by(desc(IngestJob.id)).limit(limit)
+    if status is not None:
+        query = query.where(IngestJob.status == status)
+    return db.execute(query).scalars().all()
+
+@app.get("/jobs/{job_id}", response_model=IngestJobResponse)
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    """
+    Get the status of an ingestion job (queued, running, done or failed).
+    """
+    job = db.get(IngestJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+@app.get("/search", response_model=SearchResponse)
+def search(
+    q: str = Query(..., min_length=1, max_length=50),
+    field: str = Query("all", pattern=SEARCH_FIELD_PATTERN, description="text: the Hanja/word itself, sound: 음, meaning: 뜻 (Hanja only)"),
+    prefix: bool = Query(False, description="Match only texts starting with q instead of containing it"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """
+    Search collected Hanja (character and readings) and words (word and sound) through the full-text index.
+    """
+    hanja = search_hanja(db, q, field=field, prefix=prefix, limit=limit)
+    words = [WordResponse(id=i, word=word, sound=sound) for i, word, sound in search_words(db, q, field=field, prefix=prefix, limit=limit)]
+    return {"query": q, "hanja": hanja, "words": words}
+
+def _question_response(q: dict, q_type: str) -> QuizQuestionResponse:
+    # The correct answer is not sent; it is recomputed from the target on submission
+    return QuizQuestionResponse(
+        q_text=q["q_text"], options=q["options"], info=q.get("info"), q_type=q_type,
+        hanja_id=q.get("hanja_id"), word_id=q.get("word_id"),
+    )
+
+@app.get("/quiz/next", response_model=QuizQuestionResponse)
+def get_next_question(
+    mode: str = Query("random", pattern=QUIZ_MODES),
+    q_type: str = Query("hanja_to_meaning", pattern=QUIZ_TYPES),
+    radical: str = None,
+    min_importance_level: int = Query(0, ge=0),
+    user_id: str = USER_ID_QUERY,
+    pool: QuestionPool = Depends(get_question_pool)
+):
+    """
+    Serve the next quiz question from the in-memory question pool.
+    """
+    questions = pool.get(1, mode=mode, q_type=q_type, radical=radical, min_importance_level=min_importance_level, user_id=user_id)
+    if not questions:
+        raise HTTPException(status_code=404, detail="No question could be generated for these settings.")
+    return _question_response(questions[0], q_type)
+
+@app.get("/quiz/batch", response_model=QuizBatchResponse)
+def get_question_batch(
+    count: int = Query(10, ge=1, le=50),
+    mode: str = Query("random", pattern=QUIZ_MODES),
+    q_type: str = Query("hanja_to_meaning", pattern=QUIZ_TYPES),
+    radical: str = None,
+    min_importance_level: int = Query(0, ge=0),
+    user_id: str = USER_ID_QUERY,
+    pool: QuestionPool = Depends(get_question_pool)
+):
+    """
+    Serve several quiz questions at once (may return fewer than requested).
+    """
+    questions = pool.get(count, mode=mode, q_type=q_type, radical=radical, min_importance_level=min_importance_level, user_id=user_id)
+    return {"items": [_question_response(q, q_type) for q in questions]}
+
+@app.post("/quiz/answer", response_model=QuizAnswerResponse)
+def submit_answer(
+    submission: QuizAnswerRequest,
+    pool: QuestionPool = Depends(get_question_pool),
+    writer: BatchedProgressWriter = Depends(get_progress_writer)
+):
+    """
+    Check an answer and record the importance change (correct -1, wrong +1).
+    The progress write is batched; the returned level already includes this answer.
+    """
+    if not (submission.hanja_id or submission.word_id):
+        raise HTTPException(status_code=422, detail="Either hanja_id or word_id must be provided.")
+    # The session is closed inside the handler rather than by a yield dependency, so the
+    # connection goes back to the pool even when every threadpool worker is busy under load.
+    session = pool.quiz_gen.Session()
+    try:
+        correct_answer = pool.quiz_gen.get_correct_answer(
+            session, submission.q_type, hanja_id=submission.hanja_id, word_id=submission.word_id
+        )
+        if correct_answer is None:
+            raise HTTPException(status_code=404, detail="Question target not found.")
+        is_correct = submission.answer == correct_answer
+        level = writer.record(
+            hanja_id=submission.hanja_id, word_id=submission.word_id,
+            change=-1 if is_correct else +1, session=session, user_id=submission.user_id
+        )
+        pool.quiz_gen.update_cached_level(
+            submission.user_id, hanja_id=submission.hanja_id, word_id=submission.word_id, level=level
+        )
+    finally:
+        session.close()
+    return QuizAnswerResponse(correct=is_correct, correct_answer=correct_answer, importance_level=level)
+
+@app.get("/debug/queries")
+def get_query_profile(limit: int = Query(50, ge=1, le=500), reset: bool = False):
+    """
+    SQL query profile (per-statement count, total and p95 time, calling method).
+    Only available when profiling is enabled (HANJA_SQL_PROFILE=1).
+    """
+    stats = get_active_stats()
+    if stats is None:
+        raise HTTPException(status_code=404, detail="SQL profiling is not enabled (set HANJA_SQL_PROFILE=1).")
+    report = {"summary": stats.summary(), "queries": stats.report(limit)}
+    if reset:
+        stats.reset()
+    return report
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    Prometheus text-format metrics: request latency histograms per route, DB pool
+    checkouts, cache hit/miss counters, database size and per-table row counts
+    (refreshed at most every HANJA_METRICS_REFRESH_SECONDS).
+    """
+    get_session_factory() # Make sure pool/DB collectors are registered
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,224 @@
+"""
+Async variant of the analysis API.
+
+Same `/analysis/*` routes and response models as `src.api`, but served by
+`async def` handlers on an aiosqlite engine (SQLAlchemy asyncio extension), so
+slow clients hold a coroutine instead of one of the threadpool's worker
+threads. Requires the optional async dependencies (`pip install .[async]`:
+SQLAlchemy's asyncio extra and aiosqlite).
+
+    uvicorn src.api_async:app
+
+Schema migrations (and the DB statistics behind /metrics) still go through the
+sync engine of `src.api.get_session_factory` on first use.
+"""
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Depends, Query, Path
+from fastapi.responses import PlainTextResponse
+try:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+except ImportError as e: # greenlet missing
+    raise ImportError("The async API requires SQLAlchemy's asyncio extra: pip install 'sqlalchemy[asyncio]' aiosqlite") from e
+
+from src.metrics import instrument_pool
+from src.database import configure_sqlite
+from src.cooccurrence import CooccurrenceIndex
+from src.distinctive import DistinctiveIndex
+from src.readmodel import ReadModelCache
+from src.scope import DocumentScope
+from src.analysis import (
+    top_hanja_queries,
+    top_radicals_queries,
+    word_frequencies_query,
+    hanja_by_chars_query,
+    count_word_chars,
+    word_chars_page,
+    char_words_queries,
+    check_scope,
+    related_hanja_response,
+    distinctive_response,
+)
+from src.api import (
+    get_db_url,
+    get_session_factory,
+    record_request_latency,
+    get_metrics,
+    get_read_models,
+    get_document_scope,
+    get_cooccurrence_index,
+    get_distinctive_index,
+    COOCCURRENCE_SOURCE_PATTERN,
+    DISTINCTIVE_KIND_PATTERN,
+    DISTINCTIVE_METHOD_PATTERN,
+)
+from src.schemas import (
+    PaginatedHanjaResponse,
+    HanjaFrequencyResponse,
+    PaginatedRadicalResponse,
+    RadicalFrequencyResponse,
+    PaginatedWordCharResponse,
+    WordCharFrequencyResponse,
+    PaginatedWordResponse,
+    WordFrequencyResponse,
+    RelatedHanjaListResponse,
+    DistinctiveResponse
+)
+
+def to_async_url(db_url: str) -> str:
+    """sqlite:///hanja.db -> sqlite+aiosqlite:///hanja.db"""
+    if db_url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + db_url[len("sqlite://"):]
+    return db_url
+
+_async_session_factory = None
+
+def get_async_session_factory():
+    """Migrates the database with the sync engine, then creates the async engine (once per process)."""
+    global _async_session_factory
+    if _async_session_factory is None:
+        get_session_factory()
+        try:
+            engine = create_async_engine(to_async_url(get_db_url()))
+        except ImportError as e:
+            raise ImportError("The async API requires aiosqlite: pip install 'sqlalchemy[asyncio]' aiosqlite") from e
+        configure_sqlite(engine.sync_engine)
+        instrument_pool(engine.sync_engine)
+        _async_session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    return _async_session_factory
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    if _async_session_factory is not None:
+        await _async_session_factory.kw["bind"].dispose()
+
+app = FastAPI(title="Hanja Analysis API (async)", lifespan=lifespan)
+app.middleware("http")(record_request_latency)
+app.add_api_route("/metrics", get_metrics, methods=["GET"], response_class=PlainTextResponse)
+
+# Dependency
+async def get_async_db():
+    AsyncSessionLocal = get_async_session_factory()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+@app.get("/analysis/hanja", response_model=PaginatedHanjaResponse)
+async def get_top_hanja(
+    page: int = Query(1, ge=1),
+    size: int = Query(20, ge=1, le=100),
+    scope: DocumentScope = Depends(get_document_scope),
+    db: AsyncSession = Depends(get_async_db),
+    read_models: ReadModelCache = Depends(get_read_models)
+):
+    """
+    Get most frequent Hanja characters with pagination.
+    """
+    await db.run_sync(check_scope, scope)
+    if scope.is_global:
+        total, results = (await db.run_sync(read_models.get)).top_hanja((page - 1) * size, size)
+    else:
+        total_query, items_query = top_hanja_queries((page - 1) * size, size, scope)
+        total = (await db.execute(total_query)).scalar()
+        results = (await db.execute(items_query)).all()
+    items = [HanjaFrequencyResponse(hanja=hanja, frequency=freq) for hanja, freq in results]
+    return {"total": total, "items": items, "page": page, "size": size}
+
+@app.get("/analysis/radicals", response_model=PaginatedRadicalResponse)
+async def get_top_radicals(
+    page: int = Query(1, ge=1),
+    size: int = Query(20, ge=1, le=100),
+    scope: DocumentScope = Depends(get_document_scope),
+    db: AsyncSession = Depends(get_async_db),
+    read_models: ReadModelCache = Depends(get_read_models)
+):
+    """
+    Get most frequent radicals with pagination.
+    """
+    await db.run_sync(check_scope, scope)
+    if scope.is_global:
+        total, results = (await db.run_sync(read_models.get)).top_radicals((page - 1) * size, size)
+    else:
+        total_query, items_query = top_radicals_queries((page - 1) * size, size, scope)
+        total = (await db.execute(total_query)).scalar()
+        results = (await db.execute(items_query)).all()
+    items = [RadicalFrequencyResponse(radical=radical, frequency=freq) for radical, freq in results]
+    return {"total": total, "items": items, "page": page, "size": size}
+
+@app.get("/analysis/words/chars", response_model=PaginatedWordCharResponse)
+async def get_top_hanja_in_words(
+    page: int = Query(1, ge=1),
+    size: int = Query(20, ge=1, le=100),
+    scope: DocumentScope = Depends(get_document_scope),
+    db: AsyncSession = Depends(get_async_db),
+    read_models: ReadModelCache = Depends(get_read_models)
+):
+    """
+    Get most frequent characters appearing WITHIN words (paginated in memory).
+    """
+    await db.run_sync(check_scope, scope)
+    if scope.is_global:
+        total, items = word_chars_page(await db.run_sync(read_models.get), (page - 1) * size, size)
+        return {"total": total, "items": items, "page": page, "size": size}
+    sorted_chars = count_word_chars((await db.execute(word_frequencies_query(scope))).all())
+    start = (page - 1) * size
+    paged_data = sorted_chars[start:start + size]
+
+    hanja_rows = (await db.execute(hanja_by_chars_query(c for c, _ in paged_data))).scalars()
+    hanja_by_char = {h.char: h for h in hanja_rows}
+    items = [
+        WordCharFrequencyResponse(char=char, frequency=freq, hanja_info=hanja_by_char.get(char))
+        for char, freq in paged_data
+    ]
+    return {"total": len(sorted_chars), "items": items, "page": page, "size": size}
+
+@app.get("/analysis/chars/{char}/words", response_model=PaginatedWordResponse)
+async def get_words_for_char(
+    char: str = Path(..., min_length=1, max_length=1),
+    page: int = Query(1, ge=1),
+    size: int = Query(20, ge=1, le=100),
+    scope: DocumentScope = Depends(get_document_scope),
+    db: AsyncSession = Depends(get_async_db),
+    read_models: ReadModelCache = Depends(get_read_models)
+):
+    """
+    Get the collected words containing a character, most frequent first.
+    """
+    await db.run_sync(check_scope, scope)
+    if scope.is_global:
+        total, results = (await db.run_sync(read_models.get)).char_words(char, (page - 1) * size, size)
+    else:
+        total_query, items_query = char_words_queries(char, (page - 1) * size, size, scope)
+        total = (await db.execute(total_query)).scalar()
+        results = (await db.execute(items_query)).all()
+    items = [WordFrequencyResponse(word=word, frequency=freq) for word, freq in results]
+    return {"total": total, "items": items, "page": page, "size": size}
+
+@app.get("/analysis/chars/{char}/related", response_model=RelatedHanjaListResponse)
+async def get_related_hanja(
+    char: str = Path(..., min_length=1, max_length=1),
+    source: str = Query("document", pattern=COOCCURRENCE_SOURCE_PATTERN),
+    k: int = Query(10, ge=1, le=100),
+    scope: DocumentScope = Depends(get_document_scope),
+    db: AsyncSession = Depends(get_async_db),
+    index: CooccurrenceIndex = Depends(get_cooccurrence_index)
+):
+    """
+    Get the Hanja most often appearing together with a character (see src.cooccurrence).
+    """
+    # The engine reads through a sync session; run it on the async session's connection
+    return await db.run_sync(lambda session: related_hanja_response(session, index, char, source, k, scope))
+
+@app.get("/analysis/distinctive", response_model=DistinctiveResponse)
+async def get_distinctive(
+    kind: str = Query("hanja", pattern=DISTINCTIVE_KIND_PATTERN),
+    method: str = Query("log_odds", pattern=DISTINCTIVE_METHOD_PATTERN),
+    k: int = Query(20, ge=1, le=100),
+    scope: DocumentScope = Depends(get_document_scope),
+    db: AsyncSession = Depends(get_async_db),
+    index: DistinctiveIndex = Depends(get_distinctive_index)
+):
+    """
+    Get the Hanja or words unusually frequent in the selected documents (see src.distinctive).
+    """
+    return await db.run_sync(lambda session: distinctive_response(session, index, kind, method, k, scope))
@@ -0,0 +1,148 @@
+import re
+import unicodedata
+from typing import Dict, Iterable, Optional, Tuple
+
+# Unicode 블록 정의: name -> (start, end) (end 포함)
+CJK_BLOCKS: Dict[str, Tuple[int, int]] = {
+    "unified": (0x4E00, 0x9FFF),          # CJK Unified Ideographs (기본 한자)
+    "ext_a": (0x3400, 0x4DBF),            # CJK Unified Ideographs Extension A
+    "ext_b": (0x20000, 0x2A6DF),          # Extension B
+    "ext_c": (0x2A700, 0x2B73F),          # Extension C
+    "ext_d": (0x2B740, 0x2B81F),          # Extension D
+    "ext_e": (0x2B820, 0x2CEAF),          # Extension E
+    "ext_f": (0x2CEB0, 0x2EBEF),          # Extension F
+    "ext_g": (0x30000, 0x3134F),          # Extension G
+    "compat": (0xF900, 0xFAFF),           # CJK Compatibility Ideographs
+    "compat_sup": (0x2F800, 0x2FA1F),     # CJK Compatibility Ideographs Supplement
+}
+
+COMPAT_BLOCKS = ("compat", "compat_sup")
+DEFAULT_BLOCKS = tuple(CJK_BLOCKS.keys())
+
+# 분류 테이블 값
+NOT_HANJA = 0
+HANJA = 1
+HANJA_COMPAT = 2  # NFKC 정규화로 통합 한자로 접히는 호환 한자
+
+
+class HanjaCharset:
+    """
+    한자로 취급할 Unicode 블록 집합.
+
+    생성 시 코드포인트 분류 테이블(bytearray)과 호환 한자 폴딩 맵을 미리 계산해 두므로,
+    글자 단위 판별은 테이블 인덱싱 한 번으로 끝납니다.
+    텍스트 전체 스캔은 같은 테이블에서 유도한 문자 클래스 정규식을 사용합니다.
+    """
+
+    def __init__(self, blocks: Optional[Iterable[str]] = None):
+        blocks = tuple(blocks) if blocks is not None else DEFAULT_BLOCKS
+        unknown = [b for b in blocks if b not in CJK_BLOCKS]
+        if unknown:
+            raise ValueError(f"알 수 없는 Unicode 블록: {unknown}")
+        self.blocks = blocks
+
+        ranges = sorted(CJK_BLOCKS[b] for b in blocks)
+        self._max_codepoint = max(end for _, end in ranges)
+        self.table = bytearray(self._max_codepoint + 1)
+        self.fold_map: Dict[str, str] = {}
+
+        for name in blocks:
+            start, end = CJK_BLOCKS[name]
+            self.table[start:end + 1] = bytes([HANJA]) * (end - start + 1)
+            if name in COMPAT_BLOCKS:
+                for cp in range(start, end + 1):
+                    ch = chr(cp)
+                    folded = unicodedata.normalize("NFKC", ch)
+                    # 호환 블록 안의 일부 글자는 분해가 없는 고유 한자(예: U+FA0E)이므로 그대로 둡니다.
+                    if folded != ch and len(folded) == 1:
+                        self.table[cp] = HANJA_COMPAT
+                        self.fold_map[ch] = folded
+
+        # 정규식 문자 클래스는 개별 글자 나열 대신 연속 구간으로 만들어야 sre가 빠르게 매칭합니다.
+        self.pattern = re.compile(f"[{_class_body(ranges)}]+")
+
+        # 스캔용 정규식: BMP 구간은 비트맵으로 컴파일되어 싸지만, 보충 평면(astral) 구간은
+        # 글자마다 순차 비교되므로 하나의 넓은 구간으로 합칩니다. 그 사이 빈 구간에 걸린 글자는
+        # (실제 텍스트에서는 드물기 때문에) 추출된 한자 구간에서만 분류 테이블로 다시 걸러냅니다.
+        bmp_ranges = [r for r in ranges if r[1] <= 0xFFFF]
+        astral_ranges = [r for r in ranges if r[0] > 0xFFFF]
+        scan_ranges = list(bmp_ranges)
+        self._gap_pattern = None
+        if astral_ranges:
+            lo, hi = astral_ranges[0][0], astral_ranges[-1][1]
+            scan_ranges.append((lo, hi))
+            gaps = self._table_ranges(NOT_HANJA, lo, hi)
+            if gaps:
+                self._gap_pattern = re.compile(f"[{_class_body(gaps)}]+")
+        self._scan_pattern = re.compile(f"[{_class_body(scan_ranges)}]+")
+        # 후처리가 필요할 수 있는 글자(보충 평면, 호환 블록)가 있는지 한 번에 확인하는 단일 검사
+        self._suspect_pattern = re.compile("[\uf900-\ufaff\U00010000-\U0010ffff]")
+
+        compat_ranges = self._table_ranges(HANJA_COMPAT, 0, self._max_codepoint)
+        self._compat_pattern = re.compile(f"[{_class_body(compat_ranges)}]") if compat_ranges else None
+
+    def _table_ranges(self, value: int, lo: int, hi: int):
+        """분류 테이블에서 [lo, hi] 안의 값이 value인 연속 구간 목록을 만듭니다."""
+        # 글자마다 파이썬 루프를 도는 대신 바이트 정규식으로 구간을 찾습니다 (DEFAULT_CHARSET은 import 시 생성).
+        run = re.compile(re.escape(bytes([value])) + b"+")
+        return [(m.start(), m.end() - 1) for m in run.finditer(self.table, lo, hi + 1)]
+
+    def classify(self, char: str) -> int:
+        cp = ord(char)
+        if cp > self._max_codepoint:
+            return NOT_HANJA
+        return self.table[cp]
+
+    def is_hanja(self, char: str) -> bool:
+        return self.classify(char) != NOT_HANJA
+
+    def fold(self, text: str) -> str:
+        """호환 한자를 NFKC 기준의 통합 한자로 바꿉니다. 호환 한자가 없으면 원본을 그대로 반환합니다."""
+        if self._compat_pattern is None or not self._compat_pattern.search(text):
+            return text
+        fold_map = self.fold_map
+        return self._compat_pattern.sub(lambda m: fold_map[m.group()], text)
+
+    def find_runs(self, text: str):
+        """텍스트에서 연속된 한자 구간(호환 한자는 폴딩된 상태)을 반환합니다."""
+        runs = self._scan_pattern.findall(text)
+        if not runs or (self._gap_pattern is None and self._compat_pattern is None):
+            return runs
+        # 후처리는 보충 평면/호환 블록 글자가 들어 있는 구간에만 적용합니다. 그런 글자는 드물기 때문에
+        # 전체 구간을 정규식으로 다시 훑는 대신 해당 구간만 찾아 고칩니다.
+        joined = " ".join(runs)
+        fixed = {}
+        pos = index = counted = 0
+        while True:
+            m = self._suspect_pattern.search(joined, pos)
+            if m is None:
+                break
+            start = joined.rfind(" ", 0, m.start()) + 1
+            end = joined.find(" ", m.end())
+            index += joined.count(" ", counted, start)  # 구간 번호 = 앞선 공백 수
+            counted = start
+            run = runs[index]
+            pieces = run if self._gap_pattern is None else self._gap_pattern.sub(" ", run)
+            pieces = self.fold(pieces)
+            if pieces != run:
+                fixed[index] = pieces.split()
+            if end < 0:
+                break
+            pos = end
+        if not fixed:
+            return runs
+        result = []
+        prev = 0
+        for index in sorted(fixed):
+            result.extend(runs[prev:index])
+            result.extend(fixed[index])
+            prev = index + 1
+        result.extend(runs[prev:])
+        return result
+
+
+def _class_body(ranges) -> str:
+    return "".join(f"{chr(s)}-{chr(e)}" for s, e in ranges)
+
+
+DEFAULT_CHARSET = HanjaCharset()
@@ -0,0 +1,254 @@
+"""
+Character co-occurrence: which Hanja appear together in the same document or
+the same word.
+
+The raw data are two sparse incidence matrices kept in memory as NumPy CSR
+arrays, built in one vectorised pass from the tables that already persist them:
+
+    documents x Hanja   from document_hanja
+    words x Hanja       from word_chars (joined to hanja_info on char)
+
+The co-occurrence matrix is their Gram matrix C = B^T B. It is never
+materialised (document co-occurrence is close to dense: n^2 entries for n
+collected Hanja); a row of it is one sparse product, computed per query:
+C[i] = B^T (B e_i), i.e. the column counts of the rows that contain i. Rows
+are ranked by cosine similarity C[i, j] / sqrt(C[i, i] * C[j, j]) so that very
+common characters do not relate to everything.
+
+Queries can be restricted to a subset of the rows (the documents of a scope,
+or the words occurring in them): the counts and the diagonal are then taken
+over the selected rows only.
+
+Ingestion only appends rows (new documents, new words), so the matrices are
+updated incrementally when the data version changes: only the new pairs are
+read and sorted, and the CSC side is merged rather than re-sorted. Matrices are
+immutable (readers keep using the previous one), so an append still copies both
+forms, O(nnz) per refresh. When Hanja were added the word matrix is rebuilt,
+since older words may contain the new characters; when the Hanja ids are not a
+prefix of the previous ones (a Hanja was removed) both matrices are rebuilt.
+"""
+import threading
+from itertools import chain
+
+import numpy as np
+from sqlalchemy import text
+
+from src.repository import HanjaRepository
+
+COOCCURRENCE_SOURCES = ("document", "word")
+
+class IncidenceMatrix:
+    """
+    Immutable sparse 0/1 matrix of rows (documents or words) x columns (Hanja),
+    in CSR form (`indptr`, `indices`) plus its transpose in CSC form
+    (`col_indptr`, `col_rows`) for the rows-containing-a-column lookup.
+    `row_keys` holds the document/word id of each row (ascending).
+    """
+
+    def __init__(self, n_columns: int = 0, indptr: np.ndarray = None, indices: np.ndarray = None,
+                 row_keys: np.ndarray = None, col_indptr: np.ndarray = None, col_rows: np.ndarray = None):
+        self.n_columns = n_columns
+        self.indptr = np.zeros(1, dtype=np.int64) if indptr is None else indptr
+        self.indices = np.zeros(0, dtype=np.int32) if indices is None else indices
+        self.row_keys = np.zeros(0, dtype=np.int64) if row_keys is None else row_keys
+        if col_rows is None:
+            rows = np.repeat(np.arange(self.n_rows, dtype=np.int32), np.diff(self.indptr))
+            col_rows = rows[np.argsort(self.indices, kind="stable")]
+            col_indptr = np.zeros(n_columns + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.indices, minlength=n_columns), out=col_indptr[1:])
+        self.col_indptr, self.col_rows = col_indptr, col_rows
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.indptr) - 1
+
+    def with_rows(self, row_keys: np.ndarray, columns: np.ndarray, n_columns: int) -> "IncidenceMatrix":
+        """
+        Returns a matrix with rows appended, given as (row_key, column) pairs; each distinct
+        key becomes one row, in key order (after the existing rows). Duplicate pairs are
+        dropped. `n_columns` may grow; existing entries keep their columns.
+
+        Only the appended pairs are sorted. Both forms are still copied into new arrays,
+        so an append costs O(nnz) memory traffic (no O(nnz log nnz) sort): this matrix
+        stays valid for the readers holding it.
+        """
+        # Existing columns, padded with empty ones for the added columns
+        old_col_indptr = np.r_[self.col_indptr, np.full(n_columns - self.n_columns, self.col_indptr[-1])]
+        if not len(row_keys):
+            return IncidenceMatrix(n_columns, self.indptr, self.indices, self.row_keys, old_col_indptr, self.col_rows)
+        # One int64 key per pair: np.unique sorts by row, then column, and drops duplicates
+        row_keys, columns = np.divmod(np.unique(row_keys * n_columns + columns), n_columns)
+        columns = columns.astype(np.int32)
+        first = np.r_[True, row_keys[1:] != row_keys[:-1]]
+        starts = np.flatnonzero(first)
+        indptr = np.concatenate([self.indptr, self.indptr[-1] + np.r_[starts[1:], len(row_keys)]])
+        indices = np.concatenate([self.indices, columns])
+        keys = np.concatenate([self.row_keys, row_keys[starts]])
+
+        # CSC merge: every column keeps its existing rows, followed by the appended rows (larger row numbers)
+        old_counts = np.diff(old_col_indptr)
+        new_counts = np.bincount(columns, minlength=n_columns)
+        col_indptr = np.zeros(n_columns + 1, dtype=np.int64)
+        np.cumsum(old_counts + new_counts, out=col_indptr[1:])
+        col_rows = np.empty(col_indptr[-1], dtype=np.int32)
+        shift = col_indptr[:-1] - old_col_indptr[:-1] # appended entries of the preceding columns
+        col_rows[np.arange(len(self.col_rows)) + np.repeat(shift, old_counts)] = self.col_rows
+        order = np.argsort(columns, kind="stable")
+        rows = (self.n_rows - 1 + np.cumsum(first)).astype(np.int32) # row number of each appended pair
+        sorted_columns = columns[order]
+        new_starts = np.r_[0, np.cumsum(new_counts)[:-1]]
+        positions = col_indptr[sorted_columns] + old_counts[sorted_columns] + np.arange(len(order)) - new_starts[sorted_columns]
+        col_rows[positions] = rows[order]
+        return IncidenceMatrix(n_columns, indptr, indices, keys, col_indptr, col_rows)
+
+    def row_mask(self, keys) -> np.ndarray:
+        """Boolean mask of the rows whose key is in `keys`."""
+        return np.isin(self.row_keys, np.asarray(keys, dtype=np.int64))
+
+    def column_counts(self, mask: np.ndarray = None) -> np.ndarray:
+        """Number of rows containing each column (the diagonal of B^T B), optionally over the masked rows only."""
+        if mask is None:
+            return np.diff(self.col_indptr)
+        return np.bincount(self.indices[np.repeat(mask, np.diff(self.indptr))], minlength=self.n_columns)
+
+    def cooccurrence_row(self, column: int, mask: np.ndarray = None) -> np.ndarray:
+        """Row `column` of B^T B: for every column, the number of rows shared with `column`."""
+        rows = self.col_rows[self.col_indptr[column]:self.col_indptr[column + 1]]
+        if mask is not None:
+            rows = rows[mask[rows]]
+        starts, ends = self.indptr[rows], self.indptr[rows + 1]
+        lengths = ends - starts
+        # Gather the column indices of all those rows without a Python loop
+        offsets = np.repeat(starts - np.r_[0, np.cumsum(lengths)[:-1]], lengths)
+        gathered = self.indices[offsets + np.arange(lengths.sum())]
+        return np.bincount(gathered, minlength=self.n_columns)
+
+class CooccurrenceIndex:
+    """
+    In-memory co-occurrence engine over the collected Hanja. Thread-safe; call
+    `related` freely, it refreshes itself when the data version changes.
+    """
+
+    def __init__(self, repository: HanjaRepository = None):
+        self.repository = repository or HanjaRepository()
+        self.hanja_ids = np.zeros(0, dtype=np.int64) # column -> hanja_info.id (ascending)
+        self._hanja_chars = [] # column -> hanja_info.char
+        self.matrices = {source: IncidenceMatrix() for source in COOCCURRENCE_SOURCES}
+        self.data_version = None
+        self._last_document_id = 0
+        self._last_word_id = 0
+        self._lock = threading.Lock()
+
+    def _columns_of(self, hanja_ids: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self.hanja_ids, hanja_ids)
+
+    def _load_hanja(self, session) -> str:
+        """
+        Reloads the column axis. Returns "same", "appended" (the previous Hanja are a
+        prefix of the new ones, so existing columns are unchanged) or "changed".
+        Characters are compared with the ids, since SQLite reuses the id of a removed last row.
+        """
+        rows = session.execute(text("SELECT id, char FROM hanja_info ORDER BY id")).all()
+        hanja_ids = np.fromiter((i for i, _ in rows), dtype=np.int64, count=len(rows))
+        hanja_chars = [char for _, char in rows]
+        previous, previous_chars = self.hanja_ids, self._hanja_chars
+        self.hanja_ids, self._hanja_chars = hanja_ids, hanja_chars
+        if not np.array_equal(hanja_ids[:len(previous)], previous) or hanja_chars[:len(previous_chars)] != previous_chars:
+            return "changed"
+        return "appended" if len(hanja_ids) > len(previous) else "same"
+
+    def _fetch_pairs(self, session, sql: str, params: dict) -> tuple:
+        """
+        (row keys, columns) of the (key, hanja_id) rows, ordered by key. The reads are not
+        one snapshot: a Hanja committed after `_load_hanja` has no column yet, so the rows
+        from the first key referring to one on are left for the next refresh (that
+        commit also bumped the data version).
+        """
+        rows = session.execute(text(sql), params).all()
+        pairs = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=2 * len(rows)).reshape(-1, 2)
+        keys, hanja_ids = pairs[:, 0], pairs[:, 1]
+        columns = self._columns_of(hanja_ids)
+        known = columns < len(self.hanja_ids)
+        known[known] = self.hanja_ids[columns[known]] == hanja_ids[known]
+        if not known.all():
+            end = np.searchsorted(keys, keys[~known].min()) # keys are sorted: keep the complete rows before it
+            keys, columns = keys[:end], columns[:end]
+        return keys, columns
+
+    def _append_documents(self, session):
+        keys, columns = self._fetch_pairs(session, """
+            SELECT document_id, hanja_id FROM document_hanja
+            WHERE document_id > :last ORDER BY document_id
+        """, {"last": self._last_document_id})
+        self.matrices["document"] = self.matrices["document"].with_rows(keys, columns, len(self.hanja_ids))
+        if len(keys):
+            self._last_document_id = int(keys[-1])
+
+    def _append_words(self, session):
+        keys, columns = self._fetch_pairs(session, """
+            SELECT word_chars.word_id, hanja_info.id FROM word_chars
+            JOIN hanja_info ON hanja_info.char = word_chars.char
+            WHERE word_chars.word_id > :last ORDER BY word_chars.word_id
+        """, {"last": self._last_word_id})
+        self.matrices["word"] = self.matrices["word"].with_rows(keys, columns, len(self.hanja_ids))
+        if len(keys):
+            self._last_word_id = int(keys[-1])
+
+    def rebuild(self, session):
+        """Builds both matrices from scratch in one pass over document_hanja and word_chars."""
+        self._load_hanja(session)
+        self.matrices = {source: IncidenceMatrix(len(self.hanja_ids)) for source in COOCCURRENCE_SOURCES}
+        self._last_document_id = self._last_word_id = 0
+        self._append_documents(session)
+        self._append_words(session)
+
+    def refresh(self, session) -> bool:
+        """
+        Brings the matrices up to date if the data version changed: appends the
+        documents/words added since the last refresh. Returns True if anything was read.
+        """
+        version = self.repository.get_data_version(session)
+        if version == self.data_version:
+            return False
+        with self._lock:
+            if version == self.data_version:
+                return False
+            hanja = "changed" if self.data_version is None else self._load_hanja(session)
+            if hanja == "changed":
+                # First load, or Hanja removed: the existing columns no longer line up
+                self.rebuild(session)
+            else:
+                if hanja == "appended":
+                    # Existing document rows keep their columns (new ids sort last); words may now match new Hanja
+                    self.matrices["word"] = IncidenceMatrix(len(self.hanja_ids))
+                    self._last_word_id = 0
+                self._append_documents(session)
+                self._append_words(session)
+            self.data_version = version
+        return True
+
+    def related(self, session, hanja_id: int, source: str = "document", k: int = 10, row_keys=None) -> list:
+        """
+        Top-k Hanja co-occurring with `hanja_id` in the same documents or words.
+        Returns [(hanja_id, count, score)] by descending cosine similarity; empty if
+        the Hanja is unknown or never co-occurs. `row_keys` (document or word ids)
+        restricts the counts to those rows.
+        """
+        if source not in self.matrices:
+            raise ValueError(f"Unknown co-occurrence source: {source}")
+        self.refresh(session)
+        with self._lock:
+            hanja_ids, matrix = self.hanja_ids, self.matrices[source]
+        column = int(np.searchsorted(hanja_ids, hanja_id))
+        if column >= len(hanja_ids) or hanja_ids[column] != hanja_id:
+            return []
+        mask = None if row_keys is None else matrix.row_mask(row_keys)
+        counts = matrix.cooccurrence_row(column, mask)
+        counts[column] = 0
+        candidates = np.flatnonzero(counts)
+        if not len(candidates):
+            return []
+        diagonal = matrix.column_counts(mask)
+        scores = counts[candidates] / np.sqrt(diagonal[column] * diagonal[candidates])
+        order = np.lexsort((-counts[candidates], -scores))[:k] # by score, then count
+        return [(int(hanja_ids[c]), int(counts[c]), float(score)) for c, score in zip(candidates[order], scores[order])]
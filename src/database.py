@@ -0,0 +1,140 @@
+"""
+Shared SQLite connection settings and the single-writer queue.
+
+The API, the async API, the Streamlit app, main.py and init_progress.py all
+open the database through `models.init_db` (the async engine through
+`configure_sqlite` directly), so every connection gets the same settings:
+
+    journal_mode=WAL     readers see the last committed state while a write
+                         transaction is open, instead of waiting for it
+    synchronous=NORMAL   WAL commits without an fsync per transaction
+    busy_timeout         a writer waits for the write lock (held by another
+                         process, e.g. main.py next to the API) instead of
+                         failing at once with "database is locked"
+
+SQLite still allows one writer at a time. Within a process, `SingleWriter`
+serializes writes instead of letting threads (ingestion workers, progress
+flushes) compete for the lock: callers submit a function of a session, and one
+thread runs the queued functions together in a short BEGIN IMMEDIATE
+transaction, each in its own savepoint so one failure does not undo the rest.
+"""
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+from sqlalchemy import event, text
+
+BUSY_TIMEOUT_ENV = "HANJA_BUSY_TIMEOUT_MS"
+DEFAULT_BUSY_TIMEOUT_MS = 30000
+
+def get_busy_timeout_ms() -> int:
+    return int(os.environ.get(BUSY_TIMEOUT_ENV, DEFAULT_BUSY_TIMEOUT_MS))
+
+def configure_sqlite(engine, busy_timeout_ms: int = None):
+    """Applies the shared pragmas to every new connection of a SQLite engine (no-op for other databases)."""
+    if engine.dialect.name != "sqlite":
+        return
+    timeout = get_busy_timeout_ms() if busy_timeout_ms is None else busy_timeout_ms
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # busy_timeout first: switching to WAL needs a lock another connection may hold
+        cursor.execute(f"PRAGMA busy_timeout = {int(timeout)}")
+        cursor.execute("PRAGMA journal_mode = WAL") # in-memory databases stay in "memory" mode
+        cursor.execute("PRAGMA synchronous = NORMAL")
+        cursor.close()
+
+class SingleWriter:
+    """
+    Runs write functions `fn(session) -> result` one batch at a time on a
+    dedicated thread. Up to `max_batch` queued functions share one transaction;
+    `submit` returns a Future, `run` waits for the result (or re-raises the
+    function's exception). Functions must not keep ORM objects beyond the call:
+    the session is closed after the batch.
+    """
+
+    def __init__(self, session_factory, max_batch: int = 32):
+        self.Session = session_factory
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, fn) -> Future:
+        if self._closed:
+            raise RuntimeError("The writer is closed")
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("A write function cannot wait for another write")
+        future = Future()
+        self._ensure_thread()
+        self._queue.put((fn, future))
+        return future
+
+    def run(self, fn, timeout: float = None):
+        return self.submit(fn).result(timeout)
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._execute(batch)
+                    return
+                batch.append(item)
+            self._execute(batch)
+
+    def _execute(self, batch: list):
+        batch = [(fn, future) for fn, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        outcomes = []
+        session = self.Session()
+        try:
+            if session.get_bind().dialect.name == "sqlite":
+                # Take the write lock up front (waiting up to busy_timeout) rather than on the first write
+                session.execute(text("BEGIN IMMEDIATE"))
+            for fn, future in batch:
+                try:
+                    with session.begin_nested():
+                        outcomes.append((future, fn(session), None))
+                except Exception as e:
+                    outcomes.append((future, None, e))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        finally:
+            session.close()
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def close(self):
+        """Runs the writes already queued, then stops the thread."""
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
@@ -1,4 +1,4 @@
-import hanja
+from src.charset import DEFAULT_CHARSET
 from src.models import RefHanja, RefHanjaReading
 
 class HanjaDictionary:
@@ -6,8 +6,8 @@ class HanjaDictionary:
     한자 캐릭터에 대한 음, 뜻, 부수, 획수 정보를 조회하는 클래스.
     DB의 Reference Dictionary(RefHanja)를 조회하며, 없을 경우 hanja 라이브러리를 fallback으로 사용합니다.
     """
-    def __init__(self):
-        pass
+    def __init__(self, charset=None):
+        self.charset = charset or DEFAULT_CHARSET
 
     def lookup(self, session, char: str) -> dict:
         """
@@ -15,7 +15,7 @@ class HanjaDictionary:
         
         Args:
             session: SQLAlchemy session.
-            char (str): 조회할 한자 한 글자.
+            char (str): 조회할 한자 한 글자. 호환 한자는 통합 한자로 바꿔서 조회합니다.
             
         Returns:
             dict: 한자 정보 {'char', 'sound', 'meaning', 'radical', 'strokes', 'readings'}.
@@ -23,29 +23,37 @@ class HanjaDictionary:
         if not char or len(char) != 1:
             raise ValueError("lookup 메소드에는 한 글자의 한자만 전달해야 합니다.")
 
-        if not ('\u4e00' <= char <= '\u9fff'):
+        if not self.charset.is_hanja(char):
              raise ValueError("입력된 문자는 한자가 아닙니다.")
+        char = self.charset.fold(char)
 
         # 1. Try to find in RefHanja DB
         ref_hanja = session.query(RefHanja).filter_by(char=char).first()
         
         if ref_hanja:
-            readings = []
-            for r in ref_hanja.readings:
-                readings.append({'meaning': r.meaning, 'sound': r.sound})
-            
-            first_reading = readings[0] if readings else {'meaning': '미상', 'sound': ''}
-            
-            return {
-                "char": char,
-                "sound": first_reading['sound'],
-                "meaning": first_reading['meaning'],
-                "radical": ref_hanja.radical,
-                "strokes": ref_hanja.strokes,
-                "readings": readings
-            }
+            readings = [{'meaning': r.meaning, 'sound': r.sound} for r in ref_hanja.readings]
+            return self.reference_info(char, ref_hanja.radical, ref_hanja.strokes, readings)
 
         # 2. Fallback to hanja library
+        return self.fallback_info(char)
+
+    def reference_info(self, char: str, radical: str, strokes: int, readings: list) -> dict:
+        """
+        참조 사전 항목(부수, 획수, 읽기 목록)을 lookup 결과 형식으로 바꿉니다.
+        첫 번째 읽기가 대표 음/뜻이 됩니다.
+        """
+        first_reading = readings[0] if readings else {'meaning': '미상', 'sound': ''}
+        return {
+            "char": char,
+            "sound": first_reading['sound'],
+            "meaning": first_reading['meaning'],
+            "radical": radical,
+            "strokes": strokes,
+            "readings": readings
+        }
+
+    def fallback_info(self, char: str) -> dict:
+        """참조 사전에 없는 한자의 lookup 결과: hanja 라이브러리의 음과 '미상' 뜻."""
         sound = self._get_sound(char)
         return {
             "char": char,
@@ -57,9 +65,11 @@ class HanjaDictionary:
         }
 
     def _get_sound(self, char: str) -> str:
-        return hanja.translate(char, mode='substitution')
+        return self.get_word_sound(char)
 
     def get_word_sound(self, word: str) -> str:
+        # hanja 라이브러리는 처음 음을 읽을 때 불러옵니다 (사전만 쓰는 명령은 불러오지 않음).
+        import hanja
         return hanja.translate(word, mode='substitution')
 
     
\ No newline at end of file
@@ -1,12 +1,119 @@
-import re
-from typing import List, Tuple
+import os
+from typing import Iterable, List, Optional, Tuple
+
+from src.charset import DEFAULT_CHARSET, HanjaCharset
+
+DEFAULT_WORD_LIST_PATH = os.path.join(os.path.dirname(__file__), 'data', 'words.txt')
+
+def load_word_list(path: str = DEFAULT_WORD_LIST_PATH) -> List[str]:
+    """
+    참조 한자어 목록 파일을 읽습니다. 한 줄에 한 단어, '#'으로 시작하는 줄은 무시합니다.
+    파일이 없으면 빈 리스트를 반환합니다.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+class WordSegmenter:
+    """
+    사전 기반 한자 단어 분절기.
+
+    알려진 단어들로 트라이를 만들고, 한자 구간마다 동적 계획법으로
+    '사전 단어로 덮이는 글자 수 최대, 그중 단어 수 최소'인 분절을 고릅니다.
+    각 위치에서 트라이를 최대 max_word_length 글자만 따라가므로 텍스트 길이에 선형입니다.
+    """
+    _END = ''
+
+    def __init__(self, words: Iterable[str] = (), max_word_length: int = 4):
+        self.max_word_length = max_word_length
+        self._trie = {}
+        self._size = 0
+        for word in words:
+            self.add_word(word)
+
+    def __len__(self):
+        return self._size
+
+    def add_word(self, word: str) -> bool:
+        """
+        단어를 사전에 추가합니다. 2글자 미만이거나 max_word_length를 넘는 단어는
+        (기존에 쌓인 긴 '가짜 단어'가 다시 통째로 매칭되지 않도록) 무시합니다.
+        """
+        if not word or not (2 <= len(word) <= self.max_word_length):
+            return False
+        node = self._trie
+        for char in word:
+            node = node.setdefault(char, {})
+        if self._END not in node:
+            node[self._END] = True
+            self._size += 1
+        return True
+
+    def _matches(self, run: str, start: int):
+        """run[start:]에서 시작하는 사전 단어들의 끝 위치를 차례로 반환합니다."""
+        node = self._trie
+        limit = min(len(run), start + self.max_word_length)
+        for i in range(start, limit):
+            node = node.get(run[i])
+            if node is None:
+                return
+            if self._END in node:
+                yield i + 1
+
+    def segment(self, run: str) -> List[str]:
+        """
+        연속된 한자 구간을 단어들로 나눕니다.
+
+        - max_word_length 이하의 짧은 구간은 사전 단어로 전부 덮이면 그 분절을,
+          아니면 구간 전체를 (새 단어로) 그대로 반환합니다.
+        - 더 긴 구간은 사전 단어로 덮이는 부분만 반환하고, 덮이지 않는 글자는 버립니다.
+          (개별 한자로는 이미 집계됩니다.)
+        """
+        n = len(run)
+        if n < 2:
+            return []
+
+        # best[i] = (덮인 글자 수, -단어 수), prev[i] = (이전 위치, 단어 여부)
+        best = [None] * (n + 1)
+        prev = [None] * (n + 1)
+        best[0] = (0, 0)
+        for i in range(n):
+            covered, neg_count = best[i]
+            skip = (covered, neg_count)
+            if best[i + 1] is None or skip > best[i + 1]:
+                best[i + 1] = skip
+                prev[i + 1] = (i, False)
+            for end in self._matches(run, i):
+                cand = (covered + end - i, neg_count - 1)
+                if best[end] is None or cand > best[end]:
+                    best[end] = cand
+                    prev[end] = (i, True)
+
+        if n <= self.max_word_length and best[n][0] < n:
+            return [run]
+
+        segments = []
+        pos = n
+        while pos > 0:
+            start, is_word = prev[pos]
+            if is_word:
+                segments.append(run[start:pos])
+            pos = start
+        segments.reverse()
+        return segments
 
 class HanjaExtractor:
     """
     텍스트에서 한자(단일 글자)와 한자 단어(연속된 2자 이상)를 추출합니다.
+    segmenter가 주어지면 긴 한자 구간을 사전 단어 단위로 나눕니다.
     """
-    # CJK Unified Ideographs 범위 (기본 한자)
-    HANJA_PATTERN = re.compile(r'[\u4e00-\u9fff]+')
+    # 기본 설정: 통합 한자 + 확장 A~G + 호환 한자(NFKC 폴딩)
+    HANJA_PATTERN = DEFAULT_CHARSET.pattern
+
+    def __init__(self, charset: Optional[HanjaCharset] = None, segmenter: Optional[WordSegmenter] = None):
+        self.charset = charset or DEFAULT_CHARSET
+        self.segmenter = segmenter
 
     def extract(self, text: str) -> Tuple[List[str], List[str]]:
         """
@@ -23,18 +130,17 @@ class HanjaExtractor:
         if not text:
             return [], []
 
-        matches = self.HANJA_PATTERN.findall(text)
+        matches = self.charset.find_runs(text)
         
-        individual_chars = set()
-        words = set()
+        # 개별 한자: 구간들을 이어 붙여 한 번에 집합으로 만듭니다 (글자 단위 루프보다 빠름)
+        individual_chars = set("".join(matches))
 
-        for match in matches:
-            # 개별 한자 추가
-            for char in match:
-                individual_chars.add(char)
-            
+        if self.segmenter is None:
             # 2글자 이상이면 단어로 추가
-            if len(match) >= 2:
-                words.add(match)
+            words = {match for match in matches if len(match) >= 2}
+        else:
+            words = set()
+            for match in matches:
+                words.update(self.segmenter.segment(match))
 
         return list(individual_chars), list(words)
@@ -0,0 +1,263 @@
+import hashlib
+import time
+from contextlib import contextmanager
+
+from src.extractor import HanjaExtractor, WordSegmenter, load_word_list
+from src.dictionary import HanjaDictionary
+from src.repository import HanjaRepository
+from src.reader import read_file
+from src.minhash import MinHasher, DEFAULT_SIMILARITY_THRESHOLD, estimate_similarity, signature_from_bytes, signature_to_bytes
+
+STAGES = ["read", "hash", "similarity", "extract", "lookup", "db_write", "commit"]
+NEAR_DUPLICATE_POLICIES = ("flag", "skip", "off")
+
+def calculate_hash(content: str) -> str:
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+class DocumentReport:
+    """Per-document ingestion metrics: seconds spent in each stage plus item counts."""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.status = "pending" # 'ingested', 'skipped' (duplicate) or 'error'
+        self.error = None
+        self.document_id = None # the stored document, also for an exact duplicate
+        self.near_duplicate_of = None # filename of the most similar earlier document, if above the threshold
+        self.similarity = None
+        self.chars = 0
+        self.hanja_count = 0
+        self.word_count = 0
+        self.failed_items = []
+        self.stage_seconds = {stage: 0.0 for stage in STAGES}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds[name] += time.perf_counter() - start
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(self.stage_seconds.values())
+
+    def to_dict(self) -> dict:
+        total = self.total_seconds
+        return {
+            "filename": self.filename,
+            "status": self.status,
+            "error": self.error,
+            "document_id": self.document_id,
+            "near_duplicate_of": self.near_duplicate_of,
+            "similarity": self.similarity,
+            "chars": self.chars,
+            "hanja": self.hanja_count,
+            "words": self.word_count,
+            "failed_items": self.failed_items,
+            "stage_seconds": dict(self.stage_seconds),
+            "total_seconds": total,
+            "chars_per_sec": self.chars / total if total else 0.0,
+        }
+
+def summarize(reports: list, wall_seconds: float) -> dict:
+    """Aggregates document reports into corpus-level throughput numbers."""
+    ingested = [r for r in reports if r.status == "ingested"]
+    chars = sum(r.chars for r in ingested)
+    stage_totals = {stage: sum(r.stage_seconds[stage] for r in reports) for stage in STAGES}
+    return {
+        "documents": len(reports),
+        "ingested": len(ingested),
+        "skipped": sum(1 for r in reports if r.status == "skipped"),
+        "errors": sum(1 for r in reports if r.status == "error"),
+        "near_duplicates": sum(1 for r in reports if r.near_duplicate_of is not None),
+        "chars": chars,
+        "wall_seconds": wall_seconds,
+        "docs_per_sec": len(ingested) / wall_seconds if wall_seconds else 0.0,
+        "chars_per_sec": chars / wall_seconds if wall_seconds else 0.0,
+        "stage_seconds": stage_totals,
+    }
+
+class IngestionPipeline:
+    """
+    Reads a document, extracts Hanja/words, enriches them from the dictionary and
+    stores them, timing each stage. One session (and commit) per document; with a
+    `writer` (src.database.SingleWriter) the write transaction runs on the writer's
+    thread, serialized with the process's other writes.
+    With `collection`, every ingested (or already ingested) document is added to
+    that named collection in the same transaction.
+
+    Near-duplicates (MinHash similarity of the Hanja shingles >= `similarity_threshold`
+    with an earlier document, see src.minhash) are ingested and flagged
+    (`near_duplicates="flag"`), not ingested (`"skip"`), or not checked (`"off"`).
+    """
+
+    def __init__(self, session_factory, extractor=None, dictionary=None, repository=None, collection: str = None,
+                 near_duplicates: str = "flag", similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+                 minhasher: MinHasher = None, writer=None):
+        if near_duplicates not in NEAR_DUPLICATE_POLICIES:
+            raise ValueError(f"Unknown near-duplicate policy: {near_duplicates}")
+        self.Session = session_factory
+        self.dictionary = dictionary or HanjaDictionary()
+        self.repository = repository or HanjaRepository()
+        self.collection = collection
+        self.near_duplicates = near_duplicates
+        self.similarity_threshold = similarity_threshold
+        self.minhasher = minhasher or MinHasher()
+        self.writer = writer
+        self._extractor = extractor
+
+    def _get_extractor(self, session):
+        if self._extractor is None:
+            # Word segmentation vocabulary: collected words + reference word list
+            segmenter = WordSegmenter(self.repository.get_all_words(session) + load_word_list())
+            self._extractor = HanjaExtractor(segmenter=segmenter)
+        return self._extractor
+
+    def _find_near_duplicate(self, session, signature) -> tuple:
+        """(document_id, filename, similarity) of the most similar earlier document above the threshold, or None."""
+        if signature is None:
+            return None
+        best = None
+        for document_id, filename, stored in self.repository.get_signature_candidates(session, self.minhasher.buckets(signature)):
+            similarity = estimate_similarity(signature, signature_from_bytes(stored))
+            if similarity >= self.similarity_threshold and (best is None or similarity > best[2]):
+                best = (document_id, filename, similarity)
+        return best
+
+    def ingest_file(self, path: str, on_progress=None, filename: str = None) -> DocumentReport:
+        """Reads and ingests a file, stored under `filename` (default: the path)."""
+        filename = filename or path
+        report = DocumentReport(filename)
+        try:
+            with report.stage("read"):
+                text = read_file(path)
+        except Exception as e:
+            report.status = "error"
+            report.error = f"Error reading file: {e}"
+            return report
+        return self.ingest_text(text, filename, report=report, on_progress=on_progress)
+
+    def _write(self, session, fn):
+        """Runs fn(session) in a write transaction: through the shared writer if any, else on the session."""
+        if self.writer is not None:
+            return self.writer.run(fn)
+        result = fn(session)
+        session.commit()
+        return result
+
+    def ingest_text(self, text: str, filename: str, report: DocumentReport = None, on_progress=None) -> DocumentReport:
+        """
+        Ingests already-read text. on_progress(done, total) is called after each
+        character/word is looked up.
+
+        Everything that only reads (duplicate checks, extraction, dictionary
+        lookups) happens before the write transaction, which then only stores
+        the results.
+        """
+        report = report or DocumentReport(filename)
+        report.chars = len(text)
+        dictionary, repository = self.dictionary, self.repository
+
+        session = self.Session()
+        try:
+            # Idempotency Check
+            with report.stage("hash"):
+                file_hash = calculate_hash(text)
+                existing_doc = repository.get_document_by_hash(session, file_hash)
+            if existing_doc:
+                document_id = report.document_id = existing_doc.id
+                signature = None
+                if self.near_duplicates != "off" and not repository.has_document_signature(session, document_id):
+                    # Documents ingested before signatures existed get one when their file is seen again
+                    with report.stage("similarity"):
+                        signature = self.minhasher.signature(text)
+                if self.collection or signature is not None:
+                    with report.stage("commit"):
+                        self._write(session, lambda s: self._update_existing(s, document_id, signature))
+                report.status = "skipped"
+                return report
+
+            signature = near_duplicate = None
+            if self.near_duplicates != "off":
+                with report.stage("similarity"):
+                    signature = self.minhasher.signature(text)
+                    near_duplicate = self._find_near_duplicate(session, signature)
+                if near_duplicate is not None:
+                    report.near_duplicate_of = near_duplicate[1]
+                    report.similarity = near_duplicate[2]
+                    if self.near_duplicates == "skip":
+                        report.status = "skipped"
+                        return report
+
+            extractor = self._get_extractor(session)
+            with report.stage("extract"):
+                individual_hanja, hanja_words = extractor.extract(text)
+            report.hanja_count = len(individual_hanja)
+            report.word_count = len(hanja_words)
+
+            hanja_infos, word_sounds = [], []
+            total = len(individual_hanja) + len(hanja_words)
+            with report.stage("lookup"):
+                for char in individual_hanja:
+                    try:
+                        hanja_infos.append(dictionary.lookup(session, char))
+                    except Exception as e:
+                        report.failed_items.append(f"{char}: {e}")
+                    if on_progress:
+                        on_progress(len(hanja_infos) + len(report.failed_items), total)
+                for word in hanja_words:
+                    word_sounds.append((word, dictionary.get_word_sound(word)))
+                    if on_progress:
+                        on_progress(len(individual_hanja) + len(word_sounds), total)
+            session.rollback() # end the read before waiting for the write lock
+
+            def write(session):
+                existing = repository.get_document_by_hash(session, file_hash)
+                if existing is not None: # the same text was stored since the check above
+                    return existing.id, False
+                self._store(session, filename, file_hash, signature, near_duplicate, hanja_infos, word_sounds, report)
+                return report.document_id, True
+
+            # "commit": waiting for the write lock and committing; the writes themselves count as db_write
+            before, start = report.stage_seconds["db_write"], time.perf_counter()
+            report.document_id, stored = self._write(session, write)
+            report.stage_seconds["commit"] += time.perf_counter() - start - (report.stage_seconds["db_write"] - before)
+            report.status = "ingested" if stored else "skipped"
+            if stored and extractor.segmenter is not None:
+                for word, _ in word_sounds:
+                    extractor.segmenter.add_word(word)
+        except Exception as e:
+            session.rollback()
+            report.status = "error"
+            report.error = str(e)
+            report.document_id = None
+        finally:
+            session.close()
+        return report
+
+    def _update_existing(self, session, document_id: int, signature):
+        repository = self.repository
+        if self.collection:
+            repository.add_documents_to_collection(session, self.collection, [document_id])
+        if signature is not None and not repository.has_document_signature(session, document_id):
+            repository.add_document_signature(
+                session, document_id, signature_to_bytes(signature), self.minhasher.buckets(signature)
+            )
+
+    def _store(self, session, filename, file_hash, signature, near_duplicate, hanja_infos, word_sounds, report):
+        repository = self.repository
+        with report.stage("db_write"):
+            current_doc = repository.create_document(session, filename, file_hash)
+            report.document_id = current_doc.id
+            if signature is not None:
+                repository.add_document_signature(
+                    session, current_doc.id, signature_to_bytes(signature), self.minhasher.buckets(signature),
+                    near_duplicate_of=near_duplicate[0] if near_duplicate else None,
+                    similarity=near_duplicate[2] if near_duplicate else None,
+                )
+
+            repository.add_document_occurrences(session, current_doc.id, hanja_infos, word_sounds)
+            if self.collection:
+                repository.add_documents_to_collection(session, self.collection, [current_doc.id])
+            repository.bump_data_version(session)
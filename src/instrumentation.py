@@ -0,0 +1,192 @@
+"""
+Opt-in SQL query instrumentation.
+
+Hooks SQLAlchemy's `before_cursor_execute` / `after_cursor_execute` events to
+record, per statement, how often it ran, its total, max and p95 time and which
+repository / quiz / API method issued it. Memory per statement is bounded: the
+count, total and max are running aggregates and the p95 comes from a fixed-size
+random sample of the durations. Statements slower than a threshold
+are logged as they happen.
+
+Enable with the `HANJA_SQL_PROFILE=1` environment variable (picked up by
+`init_db`), `main.py --profile-sql`, or by calling `instrument_engine()`.
+"""
+import logging
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENV = "HANJA_SQL_PROFILE"
+SLOW_QUERY_ENV = "HANJA_SLOW_QUERY_MS"
+DEFAULT_SLOW_QUERY_MS = 100.0
+DEFAULT_SAMPLE_SIZE = 1000 # durations kept per statement for the percentiles
+
+# Frames from files under the project directory are reported as the calling method
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_SKIP_FILES = {os.path.abspath(__file__)}
+_WHITESPACE = re.compile(r"\s+")
+
+def _percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = max(0, math.ceil(pct / 100.0 * len(sorted_values)) - 1)
+    return sorted_values[k]
+
+def find_caller() -> str:
+    """
+    Returns 'Class.method' (or 'function') of the nearest project frame on the
+    stack, skipping SQLAlchemy internals and this module.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(_PROJECT_DIR) and filename not in _SKIP_FILES and "site-packages" not in filename:
+            code = frame.f_code
+            qualname = getattr(code, "co_qualname", None)
+            if qualname is None:
+                owner = frame.f_locals.get("self")
+                qualname = f"{type(owner).__name__}.{code.co_name}" if owner is not None else code.co_name
+            return qualname
+        frame = frame.f_back
+    return "<unknown>"
+
+class _Timing:
+    """Running count/total/max of one statement plus a uniform sample of its durations (reservoir sampling)."""
+    __slots__ = ("count", "total", "max", "sample")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.sample = []
+
+    def add(self, duration: float, sample_size: int, rng: random.Random):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        if len(self.sample) < sample_size:
+            self.sample.append(duration)
+        else:
+            # Every duration seen so far stays in the sample with probability sample_size / count
+            i = rng.randrange(self.count)
+            if i < sample_size:
+                self.sample[i] = duration
+
+class QueryStats:
+    """
+    Thread-safe per-(statement, caller) timing aggregator. The p95 is exact up to
+    `sample_size` executions of a statement and estimated from a sample beyond.
+    """
+
+    def __init__(self, slow_threshold_ms: float = DEFAULT_SLOW_QUERY_MS, sample_size: int = DEFAULT_SAMPLE_SIZE):
+        self.slow_threshold_ms = slow_threshold_ms
+        self.sample_size = sample_size
+        self._lock = threading.Lock()
+        self._timings = {}
+        self._rng = random.Random()
+        self.slow_queries = 0
+
+    def record(self, statement: str, caller: str, duration: float):
+        key = (_WHITESPACE.sub(" ", statement).strip(), caller)
+        slow = duration * 1000.0 >= self.slow_threshold_ms
+        with self._lock:
+            timing = self._timings.get(key)
+            if timing is None:
+                timing = self._timings[key] = _Timing()
+            timing.add(duration, self.sample_size, self._rng)
+            if slow:
+                self.slow_queries += 1
+        if slow:
+            logger.warning("Slow query (%.1f ms) from %s: %s", duration * 1000.0, caller, key[0][:500])
+
+    def reset(self):
+        with self._lock:
+            self._timings.clear()
+            self.slow_queries = 0
+
+    def report(self, limit: int = None) -> list:
+        """Per-statement stats sorted by total time (descending). Times are in milliseconds."""
+        with self._lock:
+            items = [(key, t.count, t.total, t.max, sorted(t.sample)) for key, t in self._timings.items()]
+        rows = []
+        for (statement, caller), count, total, longest, sample in items:
+            rows.append({
+                "statement": statement,
+                "caller": caller,
+                "count": count,
+                "total_ms": total * 1000.0,
+                "mean_ms": total / count * 1000.0,
+                "p95_ms": _percentile(sample, 95) * 1000.0,
+                "max_ms": longest * 1000.0,
+            })
+        rows.sort(key=lambda r: r["total_ms"], reverse=True)
+        return rows[:limit] if limit else rows
+
+    def summary(self) -> dict:
+        rows = self.report()
+        return {
+            "statements": len(rows),
+            "queries": sum(r["count"] for r in rows),
+            "total_ms": sum(r["total_ms"] for r in rows),
+            "slow_queries": self.slow_queries,
+            "slow_threshold_ms": self.slow_threshold_ms,
+        }
+
+    def format_report(self, limit: int = 20) -> str:
+        summary = self.summary()
+        lines = [
+            f"SQL profile: {summary['queries']} queries, {summary['statements']} distinct statements, "
+            f"{summary['total_ms']:.1f} ms total, {summary['slow_queries']} slow (>= {self.slow_threshold_ms:.0f} ms)",
+            f"{'count':>7} {'total ms':>10} {'p95 ms':>8}  caller / statement",
+        ]
+        for row in self.report(limit):
+            lines.append(f"{row['count']:>7} {row['total_ms']:>10.1f} {row['p95_ms']:>8.2f}  {row['caller']}")
+            lines.append(f"{'':>28}{row['statement'][:120]}")
+        return "\n".join(lines)
+
+_active_stats = None
+
+def get_active_stats():
+    """The QueryStats of the most recently instrumented engine, or None if profiling is off."""
+    return _active_stats
+
+def instrument_engine(engine, stats: QueryStats = None, slow_threshold_ms: float = None) -> QueryStats:
+    """
+    Attaches timing listeners to the engine (once) and returns its QueryStats.
+    """
+    global _active_stats
+    existing = getattr(engine, "_hanja_query_stats", None)
+    if existing is not None:
+        _active_stats = existing
+        return existing
+
+    if stats is None:
+        if slow_threshold_ms is None:
+            slow_threshold_ms = float(os.environ.get(SLOW_QUERY_ENV, DEFAULT_SLOW_QUERY_MS))
+        stats = QueryStats(slow_threshold_ms)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start_time"].pop()
+        stats.record(statement, find_caller(), time.perf_counter() - start)
+
+    engine._hanja_query_stats = stats
+    _active_stats = stats
+    return stats
+
+def instrument_session_factory(session_factory, **kwargs) -> QueryStats:
+    return instrument_engine(session_factory.kw["bind"], **kwargs)
+
+def profiling_enabled() -> bool:
+    return os.environ.get(PROFILE_ENV, "").lower() in ("1", "true", "yes")
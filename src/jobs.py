@@ -0,0 +1,313 @@
+"""
+Background ingestion of uploaded documents.
+
+`IngestJobQueue.submit` stores the upload under `upload_dir`, records an
+IngestJob row (status "queued") and returns at once; a fixed pool of worker
+threads runs the IngestionPipeline on queued jobs, so at most `workers`
+documents are processed at a time and API requests never wait for an ingest.
+
+Every job runs in its own sessions: the worker marks it "running", ingests the
+file (one transaction, see IngestionPipeline) and records the outcome. A failed
+attempt (e.g. the database was locked by another writer) is queued again after
+`retry_delay * 2 ** (attempts - 1)` seconds until `max_attempts`, then the job
+is "failed" with its last error. Jobs are persisted: `start()` queues the jobs
+left "queued", and every `stale_after` seconds the queue reclaims "running"
+jobs started longer than `stale_after` ago (their process stopped mid-ingest).
+Fresh "running" jobs are left alone, since another API worker process may be
+processing them; claiming a job is a conditional UPDATE, so two processes never
+run the same job. With a `writer` (src.database.SingleWriter), the job
+bookkeeping and the document writes go through it, so workers only run their
+reads and extraction in parallel. `on_ingested(report)` is called after each job that stored a
+document (the API regenerates its read model snapshot there).
+"""
+import logging
+import os
+import queue
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import or_, update
+from sqlalchemy.sql import func
+
+from src.ingest import IngestionPipeline
+from src.models import IngestJob
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+DEFAULT_STALE_AFTER = 600.0 # seconds; well above the time one document takes to ingest
+
+class IngestJobQueue:
+    def __init__(self, session_factory, upload_dir: str, workers: int = 2, max_attempts: int = 3,
+                 retry_delay: float = 1.0, pipeline_factory=None, writer=None, on_ingested=None,
+                 stale_after: float = DEFAULT_STALE_AFTER):
+        if workers < 1:
+            raise ValueError("At least one worker is required")
+        self.Session = session_factory
+        self.upload_dir = upload_dir
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.stale_after = stale_after
+        self.writer = writer
+        self.on_ingested = on_ingested
+        # One pipeline per job: its word segmenter then includes the words of documents ingested meanwhile
+        self.pipeline_factory = pipeline_factory or (
+            lambda collection: IngestionPipeline(session_factory, collection=collection, writer=writer)
+        )
+        self._queue = queue.Queue()
+        self._threads = []
+        self._timers = {} # pending retries (timer -> job id) and the periodic reclaim (timer -> None)
+        self._unfinished = 0 # submitted or re-queued jobs not yet done/failed
+        self._idle = threading.Condition()
+        self._closed = False
+
+    def start(self):
+        """Queues the jobs left unfinished (see `reclaim`), starts the workers and the periodic reclaim."""
+        self.reclaim(include_fresh_queued=True)
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"ingest-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._schedule_reclaim()
+
+    def reclaim(self, include_fresh_queued: bool = False) -> int:
+        """
+        Re-queues the "running" jobs started more than `stale_after` seconds ago and
+        queues them here, with the "queued" jobs (at start, all of them; later only
+        those older than the cutoff, i.e. left behind by a stopped process).
+        Returns the number of jobs queued.
+        """
+        # Naive UTC, as the database's CURRENT_TIMESTAMP stored in started_at/created_at
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=self.stale_after)
+        def requeue(session):
+            session.execute(
+                update(IngestJob)
+                .where(IngestJob.status == "running", or_(IngestJob.started_at == None, IngestJob.started_at < cutoff))
+                .values(status="queued")
+            )
+            query = session.query(IngestJob.id).filter(IngestJob.status == "queued")
+            if not include_fresh_queued:
+                query = query.filter(or_(IngestJob.started_at < cutoff, IngestJob.created_at < cutoff))
+            return query.order_by(IngestJob.id).all()
+        job_ids = [job_id for (job_id,) in self._write(requeue)]
+        for job_id in job_ids:
+            self._enqueue(job_id) # a job queued twice is claimed once
+        return len(job_ids)
+
+    def _schedule_reclaim(self):
+        def run():
+            with self._idle:
+                self._timers.pop(timer, None)
+            if self._closed:
+                return
+            try:
+                self.reclaim()
+            except Exception:
+                logger.exception("Reclaiming stale ingestion jobs failed")
+            self._schedule_reclaim()
+        timer = threading.Timer(self.stale_after, run)
+        timer.daemon = True
+        with self._idle:
+            if self._closed:
+                return
+            self._timers[timer] = None
+        timer.start()
+
+    def submit(self, filename: str, content: bytes, collection: str = None) -> int:
+        """Stores an uploaded file and queues its ingestion. Returns the job id."""
+        path = self.upload_path(filename)
+        with open(path, "wb") as f:
+            f.write(content)
+        return self.submit_stored(filename, path, collection=collection)
+
+    def upload_path(self, filename: str) -> str:
+        """A new path under `upload_dir` for an upload of `filename` (callers streaming the body write it there)."""
+        if self._closed:
+            raise RuntimeError("The ingestion queue is closed")
+        os.makedirs(self.upload_dir, exist_ok=True)
+        _, ext = os.path.splitext(filename)
+        return os.path.join(self.upload_dir, f"{uuid.uuid4().hex}{ext.lower()}")
+
+    def submit_stored(self, filename: str, path: str, collection: str = None) -> int:
+        """Queues the ingestion of an upload already written to `path` (see `upload_path`). Returns the job id."""
+        if self._closed:
+            raise RuntimeError("The ingestion queue is closed")
+        def add(session):
+            job = IngestJob(filename=filename, path=path, collection=collection, status="queued")
+            session.add(job)
+            session.flush()
+            return job.id
+        job_id = self._write(add)
+        self._enqueue(job_id)
+        return job_id
+
+    def _write(self, fn):
+        """fn(session) in a write transaction, through the writer if any."""
+        if self.writer is not None:
+            return self.writer.run(fn)
+        session = self.Session()
+        try:
+            result = fn(session)
+            session.commit()
+            return result
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _enqueue(self, job_id: int):
+        with self._idle:
+            if self._closed: # stays "queued" in the database for the next start()
+                return
+            self._unfinished += 1
+            self._queue.put(job_id)
+
+    def _finished(self):
+        with self._idle:
+            self._unfinished -= 1
+            self._idle.notify_all()
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Blocks until every queued job is done or failed (retries included). False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._unfinished == 0, timeout)
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            try:
+                self._run(job_id)
+            except Exception:
+                # The job could not be claimed (e.g. the database was unavailable): still queued in the database
+                logger.exception("Could not claim ingestion job %s", job_id)
+                self._finished()
+
+    def _run(self, job_id: int):
+        def claim(session):
+            # Conditional UPDATE: of several workers (or processes) holding this id, one claims it
+            claimed = session.execute(
+                update(IngestJob).where(IngestJob.id == job_id, IngestJob.status == "queued")
+                .values(status="running", attempts=IngestJob.attempts + 1, started_at=func.now())
+            ).rowcount
+            if not claimed:
+                return None
+            job = session.get(IngestJob, job_id)
+            return job.path, job.filename, job.collection
+        claimed = self._write(claim)
+        if claimed is None:
+            self._finished()
+            return
+        path, filename, collection = claimed
+        try:
+            self._process(job_id, path, filename, collection)
+        except Exception as e:
+            logger.exception("Ingestion job %s failed", job_id)
+            self._release(job_id, f"{type(e).__name__}: {e}")
+
+    def _process(self, job_id: int, path: str, filename: str, collection: str):
+        report = self.pipeline_factory(collection).ingest_file(path, filename=filename)
+
+        def record(session):
+            job = session.get(IngestJob, job_id)
+            retry = report.status == "error" and job.attempts < self.max_attempts
+            job.error = report.error
+            if retry:
+                job.status = "queued"
+            else:
+                job.status = "failed" if report.status == "error" else "done"
+                job.result = None if report.status == "error" else report.status
+                job.document_id = report.document_id
+                job.near_duplicate_of = report.near_duplicate_of
+                job.finished_at = func.now()
+            return retry, job.attempts
+        retry, attempts = self._write(record)
+
+        if retry:
+            self._retry_later(job_id, self.retry_delay * 2 ** (attempts - 1))
+            return
+        if report.status != "error" and os.path.exists(path):
+            os.remove(path) # failed uploads are kept for inspection
+        if report.status == "ingested" and self.on_ingested is not None:
+            try:
+                self.on_ingested(report)
+            except Exception:
+                logger.exception("Post-ingestion hook failed for job %s", job_id)
+        self._finished()
+
+    def _release(self, job_id: int, error: str):
+        """After an unexpected error in a claimed job: queued again for a retry, or failed after max_attempts."""
+        def release(session):
+            job = session.get(IngestJob, job_id)
+            if job is None or job.status != "running":
+                return False, 0
+            retry = job.attempts < self.max_attempts
+            job.error = error
+            job.status = "queued" if retry else "failed"
+            if not retry:
+                job.finished_at = func.now()
+            return retry, job.attempts
+        try:
+            retry, attempts = self._write(release)
+        except Exception:
+            # Left "running": reclaimed once stale (see reclaim)
+            logger.exception("Could not release ingestion job %s", job_id)
+            retry = False
+        if retry:
+            self._retry_later(job_id, self.retry_delay * 2 ** (attempts - 1))
+        else:
+            self._finished()
+
+    def _retry_later(self, job_id: int, delay: float):
+        """Re-queues the job after `delay`; once closed it stays "queued" in the database for the next start()."""
+        def requeue():
+            with self._idle:
+                self._timers.pop(timer, None)
+                closed = self._closed
+                if not closed:
+                    self._queue.put(job_id)
+            if closed:
+                self._finished()
+        timer = threading.Timer(delay, requeue)
+        timer.daemon = True
+        with self._idle:
+            if self._closed:
+                timer = None
+            else:
+                self._timers[timer] = job_id
+        if timer is None:
+            self._finished()
+            return
+        timer.start()
+
+    def close(self, wait: bool = True):
+        """
+        Stops the workers after their current job. Jobs still queued or waiting
+        for a retry stay "queued" in the database for the next start().
+        """
+        with self._idle:
+            self._closed = True
+            timers, self._timers = self._timers, {}
+        dropped = 0
+        for timer, job_id in timers.items():
+            timer.cancel()
+            dropped += job_id is not None # None: the periodic reclaim
+        # Drop the backlog so the stop markers are taken next
+        while True:
+            try:
+                dropped += self._queue.get_nowait() is not None
+            except queue.Empty:
+                break
+        with self._idle:
+            self._unfinished -= dropped
+            self._idle.notify_all()
+        for _ in self._threads:
+            self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
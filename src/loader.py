@@ -1,13 +1,47 @@
 import csv
 import ast
 import os
+from typing import NamedTuple
 from src.models import RefHanja, RefHanjaReading
 
+REFERENCE_CSV = os.path.join(os.path.dirname(__file__), 'data', 'hanja.csv')
+
+class RefEntry(NamedTuple):
+    """One reference dictionary entry; readings are (sound, meaning) pairs in dictionary order."""
+    radical: str
+    strokes: int
+    level: str
+    readings: tuple
+
+def parse_readings(value: str) -> tuple:
+    """Parses the meaning column, e.g. "[[['집'], ['가']]]" -> (('가', '집'),)."""
+    readings = []
+    try:
+        meaning_data = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return ()
+    if isinstance(meaning_data, list):
+        for item in meaning_data:
+            if isinstance(item, list) and len(item) == 2:
+                hun = item[0][0] if item[0] else ""
+                eum = item[1][0] if item[1] else ""
+                readings.append((eum, hun))
+    return tuple(readings)
+
+def read_reference_csv(path: str = REFERENCE_CSV) -> dict:
+    """Reads a hanja.csv snapshot into {char: RefEntry}, in file order."""
+    entries = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            strokes = int(row['total_strokes']) if row['total_strokes'].isdigit() else 0
+            entries[row['hanja']] = RefEntry(row['radical'], strokes, row['level'], parse_readings(row['meaning']))
+    return entries
+
 class DictionaryLoader:
     def __init__(self, session_factory):
         self.Session = session_factory
 
-    def load_csv_data(self):
+    def load_csv_data(self, data_path: str = REFERENCE_CSV):
         session = self.Session()
         try:
             # Check if data already exists
@@ -15,52 +49,30 @@ class DictionaryLoader:
                 print("Reference dictionary already loaded. Skipping.")
                 return
 
-            data_path = os.path.join(os.path.dirname(__file__), 'data', 'hanja.csv')
             print(f"Loading dictionary from {data_path}...")
             
             if not os.path.exists(data_path):
                 print(f"Error: Data file not found at {data_path}")
                 return
 
-            with open(data_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                count = 0
-                for row in reader:
-                    char = row['hanja']
-                    strokes = int(row['total_strokes']) if row['total_strokes'].isdigit() else 0
-                    
-                    hanja = RefHanja(
-                        char=char,
-                        radical=row['radical'],
-                        strokes=strokes,
-                        level=row['level']
-                    )
-                    session.add(hanja)
-                    session.flush() # Get ID
-
-                    try:
-                        # Parse meaning: "[[['집'], ['가']]]"
-                        meaning_data = ast.literal_eval(row['meaning'])
-                        if isinstance(meaning_data, list):
-                            for item in meaning_data:
-                                if isinstance(item, list) and len(item) == 2:
-                                    hun = item[0][0] if item[0] else ""
-                                    eum = item[1][0] if item[1] else ""
-                                    reading = RefHanjaReading(
-                                        hanja_id=hanja.id,
-                                        meaning=hun,
-                                        sound=eum
-                                    )
-                                    session.add(reading)
-                    except (ValueError, SyntaxError):
-                        pass
-                    
-                    count += 1
-                    if count % 1000 == 0:
-                        print(f"Loaded {count} entries...")
+            count = 0
+            for char, entry in read_reference_csv(data_path).items():
+                hanja = RefHanja(
+                    char=char,
+                    radical=entry.radical,
+                    strokes=entry.strokes,
+                    level=entry.level
+                )
+                hanja.readings = [RefHanjaReading(sound=sound, meaning=meaning) for sound, meaning in entry.readings]
+                session.add(hanja)
                 
-                session.commit()
-                print(f"Successfully loaded {count} Hanja entries into Reference Dictionary.")
+                count += 1
+                if count % 1000 == 0:
+                    session.flush()
+                    print(f"Loaded {count} entries...")
+            
+            session.commit()
+            print(f"Successfully loaded {count} Hanja entries into Reference Dictionary.")
         
         except Exception as e:
             session.rollback()
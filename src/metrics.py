@@ -0,0 +1,271 @@
+"""
+Minimal Prometheus-style metrics (text exposition format 0.0.4) without an
+extra dependency: counters, gauges and histograms with labels, a process-wide
+registry, SQLAlchemy pool instrumentation and a database statistics collector
+refreshed in the background.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event, inspect, text
+
+from src.models import Base
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labelnames, values, extra=None) -> str:
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def collect(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items
+        ]
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {} # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def get_count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[-1] if series else 0
+
+    def collect(self) -> list:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = self.header()
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', '+Inf'))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector):
+        """collector() is called before each render to update gauges (must be cheap)."""
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in list(self._collectors):
+            collector()
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+CACHE_REQUESTS = REGISTRY.counter(
+    "hanja_cache_requests_total", "Cache lookups by cache name and result (hit/miss).", ["cache", "result"]
+)
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+# --- SQLAlchemy connection pool ---
+
+POOL_CHECKOUTS = REGISTRY.counter("hanja_db_pool_checkouts_total", "Connections checked out of the pool.")
+POOL_CONNECTS = REGISTRY.counter("hanja_db_pool_connects_total", "New DB-API connections opened by the pool.")
+POOL_CHECKED_OUT = REGISTRY.gauge("hanja_db_pool_checked_out", "Connections currently checked out.")
+
+def instrument_pool(engine):
+    """Attaches pool event listeners to the engine (once)."""
+    if getattr(engine, "_hanja_pool_metrics", False):
+        return
+    engine._hanja_pool_metrics = True
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_conn, record):
+        POOL_CONNECTS.inc()
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_conn, record, proxy):
+        POOL_CHECKOUTS.inc()
+        POOL_CHECKED_OUT.inc()
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_conn, record):
+        POOL_CHECKED_OUT.dec()
+
+# --- Database size and row counts ---
+
+class DatabaseStatsCollector:
+    """
+    Publishes database size and per-table row counts as gauges. COUNT(*) over
+    every table is too expensive to run on a scrape, so `start()` refreshes the
+    values on a background thread every `refresh_seconds` and a scrape only
+    publishes the cached values and their age. Only the model tables are counted
+    (`tables`, by default Base.metadata's), not SQLite's internal or FTS5 shadow tables.
+    """
+
+    def __init__(self, engine, registry: Registry = REGISTRY, refresh_seconds: float = 60.0, tables=None):
+        self.engine = engine
+        self.refresh_seconds = refresh_seconds
+        self.tables = sorted(tables if tables is not None else Base.metadata.tables)
+        self._refreshed_at = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.size_gauge = registry.gauge("hanja_db_size_bytes", "Size of the database file in bytes.")
+        self.rows_gauge = registry.gauge("hanja_db_table_rows", "Row count per table (cached).", ["table"])
+        self.age_gauge = registry.gauge("hanja_db_stats_age_seconds", "Seconds since the DB statistics were refreshed.")
+
+    def _database_size(self, conn) -> int:
+        path = self.engine.url.database
+        if self.engine.dialect.name == "sqlite" and path and path != ":memory:" and os.path.exists(path):
+            size = os.path.getsize(path)
+            wal = path + "-wal"
+            return size + (os.path.getsize(wal) if os.path.exists(wal) else 0)
+        if self.engine.dialect.name == "sqlite":
+            page_count = conn.execute(text("PRAGMA page_count")).scalar()
+            page_size = conn.execute(text("PRAGMA page_size")).scalar()
+            return page_count * page_size
+        return 0
+
+    def refresh(self):
+        with self.engine.connect() as conn:
+            self.size_gauge.set(self._database_size(conn))
+            existing = set(inspect(conn).get_table_names())
+            for table in self.tables:
+                if table not in existing:
+                    continue
+                count = conn.execute(text(f'SELECT COUNT(*) FROM "{table}"')).scalar()
+                self.rows_gauge.set(count, table=table)
+        self._refreshed_at = time.monotonic()
+
+    def start(self):
+        """Refreshes now and then every `refresh_seconds` on a daemon thread, until `close()`."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="db-stats", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Refreshing the database statistics failed")
+            self._stop.wait(self.refresh_seconds)
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __call__(self):
+        # Never queries the database: the values are refreshed by the background thread
+        fresh = self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.refresh_seconds
+        record_cache("db_stats", hit=fresh)
+        if self._refreshed_at is not None:
+            self.age_gauge.set(time.monotonic() - self._refreshed_at)
@@ -0,0 +1,254 @@
+"""
+Versioned schema migrations.
+
+`Base.metadata.create_all` only creates missing tables; it never adds indexes,
+columns or constraints to tables that already exist. Every schema change that
+has to reach existing `hanja.db` files is therefore registered here as an
+ordered `Migration` step, and `init_db` runs the pending steps on startup.
+
+Each step receives the engine and manages its own (short) transactions so that
+long data fixes can be committed in batches instead of holding the database
+lock for the whole migration. Steps must be idempotent: if a run is interrupted
+the step is executed again on the next startup.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateTable
+
+from src.models import Base, DEFAULT_USER_ID
+from src.search import rebuild_search_index
+
+SCHEMA_VERSION_TABLE = "schema_version"
+DEFAULT_BATCH_SIZE = 500
+
+class Migration:
+    def __init__(self, version: int, description: str, upgrade):
+        self.version = version
+        self.description = description
+        self.upgrade = upgrade
+
+    def __repr__(self):
+        return f"<Migration(version={self.version}, description='{self.description}')>"
+
+# --- Schema version bookkeeping ---
+
+def _ensure_version_table(conn):
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {SCHEMA_VERSION_TABLE} (version INTEGER NOT NULL)"))
+
+def get_schema_version(engine) -> int:
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        version = conn.execute(text(f"SELECT MAX(version) FROM {SCHEMA_VERSION_TABLE}")).scalar()
+    return version or 0
+
+def set_schema_version(engine, version: int):
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        conn.execute(text(f"DELETE FROM {SCHEMA_VERSION_TABLE}"))
+        conn.execute(text(f"INSERT INTO {SCHEMA_VERSION_TABLE} (version) VALUES (:v)"), {"v": version})
+
+# --- Helpers for migration steps ---
+
+def create_missing_indexes(engine, table_names=None, batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    Creates indexes declared on the models that are missing from the database.
+    Each index is built in its own transaction so concurrent readers are only
+    blocked for one index build at a time. Before a unique index is created on
+    an occurrence table, duplicate rows are merged in batches.
+    """
+    with engine.connect() as conn:
+        inspector = inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+        missing = []
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            if table_names is not None and table.name not in table_names:
+                continue
+            existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+            missing.extend(index for index in table.indexes if index.name not in existing)
+
+    for index in missing:
+        if index.unique and index.table.name in OCCURRENCE_TABLES:
+            merge_duplicate_occurrences(engine, index.table.name, OCCURRENCE_TABLES[index.table.name], batch_size)
+        with engine.begin() as conn:
+            index.create(conn, checkfirst=True)
+
+# Occurrence tables whose (document_id, target_id) pairs must be unique
+# before their unique index can be created on an existing database.
+OCCURRENCE_TABLES = {
+    "document_hanja": "hanja_id",
+    "document_words": "word_id",
+}
+
+def merge_duplicate_occurrences(engine, table: str, target_col: str, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Collapses duplicate (document_id, target) rows into the lowest id, summing
+    frequencies. Works through the duplicate groups `batch_size` at a time,
+    committing after each batch. Returns the number of groups merged.
+    """
+    merged = 0
+    while True:
+        with engine.begin() as conn:
+            groups = conn.execute(text(f"""
+                SELECT document_id, {target_col}, MIN(id), SUM(frequency)
+                FROM {table}
+                GROUP BY document_id, {target_col}
+                HAVING COUNT(*) > 1
+                LIMIT :limit
+            """), {"limit": batch_size}).fetchall()
+            if not groups:
+                return merged
+            for document_id, target_id, keep_id, total in groups:
+                conn.execute(text(f"UPDATE {table} SET frequency = :total WHERE id = :id"),
+                             {"total": total, "id": keep_id})
+                conn.execute(text(f"""
+                    DELETE FROM {table}
+                    WHERE document_id = :doc AND {target_col} = :target AND id != :id
+                """), {"doc": document_id, "target": target_id, "id": keep_id})
+            merged += len(groups)
+
+def rebuild_table(engine, table_name: str, new_column_values: dict = None):
+    """
+    Recreates a table from its model definition and copies the rows over, in one
+    transaction. SQLite's ALTER TABLE cannot drop or change column constraints
+    (e.g. a UNIQUE column), so such changes need a rebuild. Columns missing from
+    the old table are filled from `new_column_values` ({column: SQL expression})
+    or their defaults. Indexes are created afterwards by create_missing_indexes.
+    """
+    table = Base.metadata.tables[table_name]
+    old_name = f"{table_name}_old"
+    new_column_values = new_column_values or {}
+    with engine.begin() as conn:
+        old_columns = {c["name"] for c in inspect(conn).get_columns(table_name)}
+        conn.execute(text(f'ALTER TABLE "{table_name}" RENAME TO "{old_name}"'))
+        conn.execute(CreateTable(table))
+        targets, sources = [], []
+        for column in table.columns:
+            if column.name in old_columns:
+                targets.append(f'"{column.name}"')
+                sources.append(f'"{column.name}"')
+            elif column.name in new_column_values:
+                targets.append(f'"{column.name}"')
+                sources.append(new_column_values[column.name])
+        conn.execute(text(
+            f'INSERT INTO "{table_name}" ({", ".join(targets)}) SELECT {", ".join(sources)} FROM "{old_name}"'
+        ))
+        conn.execute(text(f'DROP TABLE "{old_name}"'))
+
+def backfill_word_chars(engine, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Fills the word_chars index for words that have no rows yet (words collected
+    before the table existed), `batch_size` words per transaction. New words get
+    their rows when the UsageExample is constructed. Returns the number of words indexed.
+    """
+    last = indexed = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(text("""
+                SELECT id, word FROM usage_examples
+                WHERE id > :last AND NOT EXISTS (SELECT 1 FROM word_chars WHERE word_chars.word_id = usage_examples.id)
+                ORDER BY id
+                LIMIT :limit
+            """), {"last": last, "limit": batch_size}).fetchall()
+            if not rows:
+                return indexed
+            conn.execute(
+                text("INSERT INTO word_chars (word_id, position, char) VALUES (:word_id, :position, :char)"),
+                [{"word_id": word_id, "position": i, "char": c} for word_id, word in rows for i, c in enumerate(word)],
+            )
+        last = rows[-1][0]
+        indexed += len(rows)
+
+def rebuild_lsh_buckets(engine, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Recomputes the LSH buckets of every stored signature with the current
+    banding (src.minhash.LSH_BANDS), `batch_size` documents per transaction.
+    Buckets of another banding never match new ones, so near-duplicates of older
+    documents would go unnoticed. Returns the number of documents re-bucketed.
+    """
+    from src.minhash import MinHasher, signature_from_bytes
+    hasher = MinHasher()
+    last = rebuilt = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(text("""
+                SELECT document_id, signature FROM document_signatures
+                WHERE document_id > :last ORDER BY document_id LIMIT :limit
+            """), {"last": last, "limit": batch_size}).fetchall()
+            if not rows:
+                return rebuilt
+            conn.execute(
+                text("DELETE FROM document_lsh_buckets WHERE document_id > :last AND document_id <= :until"),
+                {"last": last, "until": rows[-1][0]},
+            )
+            conn.execute(
+                text("INSERT INTO document_lsh_buckets (document_id, bucket) VALUES (:document_id, :bucket)"),
+                [{"document_id": document_id, "bucket": bucket}
+                 for document_id, signature in rows for bucket in hasher.buckets(signature_from_bytes(signature))],
+            )
+        last = rows[-1][0]
+        rebuilt += len(rows)
+
+# --- Migration steps ---
+
+def _add_occurrence_indexes(engine):
+    create_missing_indexes(engine, table_names={
+        "document_hanja", "document_words", "hanja_readings", "hanja_info", "ref_hanja_readings",
+    })
+
+def _add_progress_user_id(engine):
+    with engine.connect() as conn:
+        columns = {c["name"] for c in inspect(conn).get_columns("user_progress")}
+    if "user_id" not in columns:
+        # Existing progress belongs to the single learner of earlier versions
+        rebuild_table(engine, "user_progress", {"user_id": f"'{DEFAULT_USER_ID}'"})
+    create_missing_indexes(engine, table_names={"user_progress"})
+
+def _add_progress_level_index(engine):
+    create_missing_indexes(engine, table_names={"user_progress"})
+
+def _add_scope_indexes(engine):
+    create_missing_indexes(engine, table_names={"documents", "document_hanja", "document_words"})
+
+MIGRATIONS = [
+    Migration(1, "Occurrence table composite/unique indexes, reading and radical indexes", _add_occurrence_indexes),
+    Migration(2, "Per-learner progress: user_progress.user_id with (user_id, target) unique indexes", _add_progress_user_id),
+    Migration(3, "Learning-status index: user_progress (user_id, importance_level DESC, last_tested_at, hanja_id)", _add_progress_level_index),
+    Migration(4, "Full-text search: FTS5 tables over usage_examples and hanja_readings, backfilled", rebuild_search_index),
+    Migration(5, "Character-to-words index: word_chars backfilled from usage_examples", backfill_word_chars),
+    Migration(6, "Document scopes: documents.created_at and covering (document_id, target, frequency) occurrence indexes", _add_scope_indexes),
+    Migration(7, "Near-duplicate detection: LSH buckets recomputed for 32 bands of 4 rows", rebuild_lsh_buckets),
+]
+
+def latest_version(migrations=None) -> int:
+    migrations = MIGRATIONS if migrations is None else migrations
+    return max((m.version for m in migrations), default=0)
+
+def run_migrations(engine, migrations=None) -> list:
+    """
+    Applies pending migrations in version order and records the schema version
+    after each step. Returns the list of applied migrations.
+    """
+    migrations = sorted(MIGRATIONS if migrations is None else migrations, key=lambda m: m.version)
+    current = get_schema_version(engine)
+    applied = []
+    for migration in migrations:
+        if migration.version <= current:
+            continue
+        migration.upgrade(engine)
+        set_schema_version(engine, migration.version)
+        applied.append(migration)
+    return applied
+
+def upgrade_database(engine):
+    """
+    Brings a database up to the latest schema. Fresh databases are created from
+    the models and stamped with the latest version; existing databases get the
+    missing tables from create_all and then the pending migration steps.
+    """
+    is_new = not inspect(engine).has_table("documents")
+    Base.metadata.create_all(engine)
+    if is_new:
+        set_schema_version(engine, latest_version())
+        return []
+    return run_migrations(engine)
@@ -0,0 +1,102 @@
+"""
+MinHash signatures and LSH buckets for near-duplicate document detection.
+
+The file-hash check at ingest only catches byte-identical text; a re-scanned or
+re-exported exam differs in OCR noise, spacing and Hangul but keeps nearly the
+same sequence of Hanja. A document is therefore represented by the set of its
+Hanja shingles (every run of `shingle_size` consecutive Hanja, non-Hanja text
+removed), and two documents are near-duplicates when the Jaccard similarity of
+those sets is high.
+
+`MinHasher.signature` compresses the set into `num_perm` minimum hash values
+(the fraction of equal positions in two signatures estimates the Jaccard
+similarity). `MinHasher.buckets` splits the signature into `bands` bands and
+hashes each one: documents sharing any bucket are the LSH candidates, found
+through an index lookup per band instead of a comparison with every stored
+document. Two documents of similarity s share a bucket with probability
+1 - (1 - s^rows)^bands; with 32 bands of 4 rows the curve is steepest around
+(1/32)^(1/4) ≈ 0.42, well below the 0.8 threshold: recall at 0.8 is
+1 - (1 - 0.8^4)^32 > 0.9999999 (16 bands of 8 rows would only reach ≈ 0.947).
+The price is more candidates between ~0.3 and 0.6 (0.56 at 0.4), which the
+signature comparison at ingest then rejects.
+
+NumPy is imported on first use, so commands that only import the ingestion
+pipeline (main.py) do not pay for it at start-up.
+"""
+import hashlib
+from typing import TYPE_CHECKING
+
+from src.charset import DEFAULT_CHARSET, HanjaCharset
+
+NUM_PERM = 128
+LSH_BANDS = 32
+SHINGLE_SIZE = 3
+DEFAULT_SIMILARITY_THRESHOLD = 0.8
+
+if TYPE_CHECKING:
+    import numpy as np
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_MIX = 0x9E3779B97F4A7C15 # Fibonacci hashing multiplier
+_CHUNK = 8192 # shingles hashed per step (bounds the num_perm x chunk work array)
+
+class MinHasher:
+    def __init__(self, num_perm: int = NUM_PERM, bands: int = LSH_BANDS, shingle_size: int = SHINGLE_SIZE,
+                 charset: HanjaCharset = None, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self.charset = charset or DEFAULT_CHARSET
+        import numpy as np
+        # Universal hash family h(x) = (a * x + b) mod p over 32-bit shingle hashes; a * x < 2^63
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MERSENNE_PRIME, num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, _MERSENNE_PRIME, num_perm, dtype=np.uint64)[:, None]
+
+    def shingles(self, text: str) -> "np.ndarray":
+        """Distinct Hanja shingles of the text as uint64 (code points packed 21 bits each)."""
+        import numpy as np
+        hanja = "".join(self.charset.find_runs(text))
+        codes = np.frombuffer(hanja.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        k = self.shingle_size
+        if len(codes) < k:
+            return np.zeros(0, dtype=np.uint64)
+        packed = np.zeros(len(codes) - k + 1, dtype=np.uint64)
+        for i in range(k):
+            packed = (packed << np.uint64(21)) | codes[i:len(codes) - k + 1 + i]
+        return np.unique(packed)
+
+    def signature(self, text: str) -> "np.ndarray":
+        """MinHash signature (num_perm uint32 values), or None if the text has no shingle."""
+        import numpy as np
+        shingles = self.shingles(text)
+        if not len(shingles):
+            return None
+        prime = np.uint64(_MERSENNE_PRIME)
+        hashed = (shingles * np.uint64(_MIX)) >> np.uint64(32) # uint64 wrap-around, keep the well-mixed high bits
+        signature = np.full(self.num_perm, prime, dtype=np.uint64)
+        for start in range(0, len(hashed), _CHUNK):
+            values = (self._a * hashed[start:start + _CHUNK] + self._b) % prime
+            np.minimum(signature, values.min(axis=1), out=signature)
+        return signature.astype(np.uint32)
+
+    def buckets(self, signature: "np.ndarray") -> list:
+        """One signed 64-bit bucket id per band (band-prefixed, so equal rows in different bands differ)."""
+        rows = signature.reshape(self.bands, -1)
+        return [
+            int.from_bytes(hashlib.blake2b(band.tobytes(), digest_size=8, person=i.to_bytes(4, "little")).digest(), "little", signed=True)
+            for i, band in enumerate(rows)
+        ]
+
+def signature_to_bytes(signature: "np.ndarray") -> bytes:
+    return signature.astype("<u4").tobytes()
+
+def signature_from_bytes(data: bytes) -> "np.ndarray":
+    import numpy as np
+    return np.frombuffer(data, dtype="<u4")
+
+def estimate_similarity(a: "np.ndarray", b: "np.ndarray") -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return float((a == b).mean())
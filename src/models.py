@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
-from sqlalchemy.orm import DeclarativeBase, sessionmaker, relationship
+from sqlalchemy import Column, Integer, BigInteger, Float, LargeBinary, String, ForeignKey, DateTime, Text, Index, DDL, event, text
+from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker, relationship
 from sqlalchemy.sql import func
 
 class Base(DeclarativeBase):
@@ -28,7 +28,7 @@ class RefHanjaReading(Base):
     __tablename__ = "ref_hanja_readings"
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    hanja_id = Column(Integer, ForeignKey("ref_hanja.id"), nullable=False)
+    hanja_id = Column(Integer, ForeignKey("ref_hanja.id"), nullable=False, index=True)
     sound = Column(String, nullable=False)
     meaning = Column(String, nullable=True)
     
@@ -38,7 +38,11 @@ class RefHanjaReading(Base):
 
 class Document(Base):
     __tablename__ = "documents"
-    
+    __table_args__ = (
+        # Ingest date-range scopes of the analysis queries
+        Index("ix_documents_created_at", "created_at"),
+    )
+
     id = Column(Integer, primary_key=True, autoincrement=True)
     filename = Column(String, nullable=False)
     file_hash = Column(String, unique=True, nullable=False) 
@@ -58,7 +62,7 @@ class HanjaInfo(Base):
     char = Column(String(1), unique=True, nullable=False)
     # We can copy data from RefHanja for faster access or join. 
     # Copying is often better for independent adjustment.
-    radical = Column(String, nullable=True)
+    radical = Column(String, nullable=True, index=True)
     strokes = Column(Integer, nullable=True)
     
     readings = relationship("HanjaReading", back_populates="hanja", cascade="all, delete-orphan")
@@ -72,7 +76,7 @@ class HanjaReading(Base):
     __tablename__ = "hanja_readings"
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    hanja_id = Column(Integer, ForeignKey("hanja_info.id"), nullable=False)
+    hanja_id = Column(Integer, ForeignKey("hanja_info.id"), nullable=False, index=True)
     sound = Column(String, nullable=False)
     meaning = Column(String, nullable=True)
     
@@ -86,12 +90,51 @@ class UsageExample(Base):
     sound = Column(String, nullable=True)
     
     occurrences = relationship("DocumentWord", back_populates="word")
+    chars = relationship("WordChar", back_populates="word", cascade="all, delete-orphan", order_by="WordChar.position")
 
     def __repr__(self):
         return f"<UsageExample(word='{self.word}')>"
 
+class WordChar(Base):
+    """
+    Inverted index from characters to the words containing them (one row per position).
+    Keyed by the character rather than hanja_info.id: a word may contain characters that
+    were never collected as HanjaInfo; hanja_info is joined through its unique `char`.
+    """
+    __tablename__ = "word_chars"
+    __table_args__ = (
+        # Word -> characters, in order
+        Index("ix_word_chars_word_position", "word_id", "position", unique=True),
+        # Character -> words
+        Index("ix_word_chars_char_word", "char", "word_id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    word_id = Column(Integer, ForeignKey("usage_examples.id"), nullable=False)
+    position = Column(Integer, nullable=False)
+    char = Column(String(1), nullable=False)
+
+    word = relationship("UsageExample", back_populates="chars")
+
+    def __repr__(self):
+        return f"<WordChar(char='{self.char}', position={self.position})>"
+
+@event.listens_for(UsageExample, "init")
+def _init_word_chars(target, args, kwargs):
+    # Every new word is indexed by its characters (existing databases: migrations.backfill_word_chars)
+    if kwargs.get("word") and "chars" not in kwargs:
+        kwargs["chars"] = [WordChar(position=i, char=c) for i, c in enumerate(kwargs["word"])]
+
 class DocumentHanja(Base):
     __tablename__ = "document_hanja"
+    __table_args__ = (
+        # One row per (document, hanja); also serves document_id-only lookups (leftmost prefix)
+        Index("ix_document_hanja_document_hanja", "document_id", "hanja_id", unique=True),
+        # Aggregates across documents join/group on hanja_id
+        Index("ix_document_hanja_hanja_id", "hanja_id"),
+        # Aggregates over a subset of documents read (hanja_id, frequency) from the index alone
+        Index("ix_document_hanja_document_cover", "document_id", "hanja_id", "frequency"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
@@ -103,6 +146,11 @@ class DocumentHanja(Base):
 
 class DocumentWord(Base):
     __tablename__ = "document_words"
+    __table_args__ = (
+        Index("ix_document_words_document_word", "document_id", "word_id", unique=True),
+        Index("ix_document_words_word_id", "word_id"),
+        Index("ix_document_words_document_cover", "document_id", "word_id", "frequency"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
@@ -112,13 +160,127 @@ class DocumentWord(Base):
     document = relationship("Document", back_populates="word_occurrences")
     word = relationship("UsageExample", back_populates="occurrences")
 
+class DocumentSignature(Base):
+    """
+    MinHash signature of a document's Hanja shingles (src/minhash.py), stored at ingest
+    for near-duplicate detection. `near_duplicate_of` flags a document ingested although
+    it was similar to an earlier one.
+    """
+    __tablename__ = "document_signatures"
+
+    document_id = Column(Integer, ForeignKey("documents.id"), primary_key=True)
+    signature = Column(LargeBinary, nullable=False) # NUM_PERM little-endian uint32
+    near_duplicate_of = Column(Integer, ForeignKey("documents.id"), nullable=True)
+    similarity = Column(Float, nullable=True)
+
+class DocumentLshBucket(Base):
+    """LSH buckets of a signature, one per band: documents sharing a bucket are near-duplicate candidates."""
+    __tablename__ = "document_lsh_buckets"
+    __table_args__ = (
+        # Bucket -> documents, answered from the index alone
+        Index("ix_document_lsh_buckets_bucket_document", "bucket", "document_id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
+    bucket = Column(BigInteger, nullable=False)
+
+class Collection(Base):
+    """Named set of documents (e.g. one exam year) that the analysis queries can be scoped to."""
+    __tablename__ = "collections"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String, unique=True, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    documents = relationship("CollectionDocument", back_populates="collection", cascade="all, delete-orphan")
+
+    def __repr__(self):
+        return f"<Collection(name='{self.name}')>"
+
+class CollectionDocument(Base):
+    """Collection membership."""
+    __tablename__ = "collection_documents"
+    __table_args__ = (
+        Index("ix_collection_documents_collection_document", "collection_id", "document_id", unique=True),
+        Index("ix_collection_documents_document_id", "document_id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    collection_id = Column(Integer, ForeignKey("collections.id"), nullable=False)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
+
+    collection = relationship("Collection", back_populates="documents")
+    document = relationship("Document")
+
+class CollectionHanja(Base):
+    """
+    Precomputed Hanja frequencies per collection: the sum of document_hanja over its
+    documents. Maintained by the repository whenever membership changes (documents
+    themselves never change after ingest).
+    """
+    __tablename__ = "collection_hanja"
+    __table_args__ = (
+        Index("ix_collection_hanja_collection_hanja", "collection_id", "hanja_id", unique=True),
+        # Rankings read in order from the index
+        Index("ix_collection_hanja_collection_frequency", "collection_id", "frequency", "hanja_id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    collection_id = Column(Integer, ForeignKey("collections.id"), nullable=False)
+    hanja_id = Column(Integer, ForeignKey("hanja_info.id"), nullable=False)
+    frequency = Column(Integer, nullable=False, default=0)
+
+class CollectionWord(Base):
+    """Precomputed word frequencies per collection (see CollectionHanja)."""
+    __tablename__ = "collection_words"
+    __table_args__ = (
+        Index("ix_collection_words_collection_word", "collection_id", "word_id", unique=True),
+        Index("ix_collection_words_collection_frequency", "collection_id", "frequency", "word_id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    collection_id = Column(Integer, ForeignKey("collections.id"), nullable=False)
+    word_id = Column(Integer, ForeignKey("usage_examples.id"), nullable=False)
+    frequency = Column(Integer, nullable=False, default=0)
+
+class IngestJob(Base):
+    """Uploaded document waiting for or processed by the ingestion workers (src/jobs.py)."""
+    __tablename__ = "ingest_jobs"
+    __table_args__ = (
+        # Unfinished jobs re-queued at startup
+        Index("ix_ingest_jobs_status", "status"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    filename = Column(String, nullable=False) # uploaded name, stored as Document.filename
+    path = Column(String, nullable=False) # stored upload
+    collection = Column(String, nullable=True)
+    status = Column(String, nullable=False, default="queued") # queued, running, done or failed
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True) # last error, kept while retrying
+    result = Column(String, nullable=True) # DocumentReport status when done: ingested or skipped
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=True)
+    near_duplicate_of = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+DEFAULT_USER_ID = "default" # Learner that owns progress recorded before per-user progress existed
+
 class UserProgress(Base):
-    """Tracks user's learning progress for Hanja and Words, including importance level."""
+    """Tracks each learner's progress for Hanja and Words, including importance level."""
     __tablename__ = "user_progress"
+    __table_args__ = (
+        # One row per (learner, target); also serves user_id-only lookups (leftmost prefix)
+        Index("ix_user_progress_user_hanja", "user_id", "hanja_id", unique=True),
+        Index("ix_user_progress_user_word", "user_id", "word_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    hanja_id = Column(Integer, ForeignKey("hanja_info.id"), nullable=True, unique=True) # Hanja and word progress are mutually exclusive and unique
-    word_id = Column(Integer, ForeignKey("usage_examples.id"), nullable=True, unique=True) # Hanja and word progress are mutually exclusive and unique
+    user_id = Column(String, nullable=False, default=DEFAULT_USER_ID, server_default=DEFAULT_USER_ID)
+    hanja_id = Column(Integer, ForeignKey("hanja_info.id"), nullable=True) # Hanja and word progress are mutually exclusive
+    word_id = Column(Integer, ForeignKey("usage_examples.id"), nullable=True) # Hanja and word progress are mutually exclusive
     importance_level = Column(Integer, default=5) # 5: default, 0: master, >5: hard
     last_tested_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
@@ -127,10 +289,79 @@ class UserProgress(Base):
 
     def __repr__(self):
         target = self.hanja.char if self.hanja else (self.word.word if self.word else "Unknown")
-        return f"<UserProgress(target='{target}', importance_level={self.importance_level})>"
+        return f"<UserProgress(user_id='{self.user_id}', target='{target}', importance_level={self.importance_level})>"
+
+# Learning-status page: a learner's rows in display order (level desc, oldest first) and the
+# per-level histogram are read from this index alone; hanja_id tells Hanja from word rows.
+Index(
+    "ix_user_progress_user_level",
+    UserProgress.user_id, UserProgress.importance_level.desc(), UserProgress.last_tested_at, UserProgress.hanja_id,
+)
+
+class AppMeta(Base):
+    """Key/value application metadata, e.g. the data version that keys UI caches."""
+    __tablename__ = "app_meta"
+
+    key = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+DATA_VERSION_KEY = "data_version"
+
+# --- Full-text search index (SQLite FTS5) ---
+# Words and readings are mirrored into FTS5 tables (rowid = source row id) with one
+# token per character, so a phrase query matches any substring: "學" finds 大學 and
+# 學校, "배울" finds the meaning "배울". Queries live in src/search.py.
+SEARCH_TABLES = {
+    "usage_examples_fts": "CREATE VIRTUAL TABLE IF NOT EXISTS usage_examples_fts USING fts5(word, sound)",
+    "hanja_readings_fts": "CREATE VIRTUAL TABLE IF NOT EXISTS hanja_readings_fts USING fts5(char, sound, meaning)",
+}
+
+def search_tokens(value: str) -> str:
+    """Splits a text into space-separated characters (letters and digits only) for the FTS tables."""
+    return " ".join(ch for ch in value if ch.isalnum()) if value else ""
+
+event.listen(UsageExample.__table__, "after_create", DDL(SEARCH_TABLES["usage_examples_fts"]))
+event.listen(HanjaReading.__table__, "after_create", DDL(SEARCH_TABLES["hanja_readings_fts"]))
+
+# Kept in sync from every ORM flush (ingest, progress import, ...), one executemany per table
+@event.listens_for(Session, "after_flush")
+def _sync_search_index(session, flush_context):
+    changed = [obj for obj in (*session.new, *session.dirty) if isinstance(obj, (UsageExample, HanjaReading))]
+    deleted = [obj for obj in session.deleted if isinstance(obj, (UsageExample, HanjaReading))]
+    if not (changed or deleted):
+        return
+    connection = session.connection()
+    words = [
+        {"id": obj.id, "word": search_tokens(obj.word), "sound": search_tokens(obj.sound)}
+        for obj in changed if isinstance(obj, UsageExample)
+    ]
+    if words:
+        connection.execute(
+            text("INSERT OR REPLACE INTO usage_examples_fts (rowid, word, sound) VALUES (:id, :word, :sound)"), words
+        )
+    readings = [
+        {"id": obj.id, "hanja_id": obj.hanja_id, "sound": search_tokens(obj.sound), "meaning": search_tokens(obj.meaning)}
+        for obj in changed if isinstance(obj, HanjaReading)
+    ]
+    if readings:
+        # The character comes from hanja_info in SQL; obj.hanja may not be loaded
+        connection.execute(text(
+            "INSERT OR REPLACE INTO hanja_readings_fts (rowid, char, sound, meaning) "
+            "SELECT :id, char, :sound, :meaning FROM hanja_info WHERE id = :hanja_id"
+        ), readings)
+    for model, table in [(UsageExample, "usage_examples_fts"), (HanjaReading, "hanja_readings_fts")]:
+        ids = [{"id": obj.id} for obj in deleted if isinstance(obj, model)]
+        if ids:
+            connection.execute(text(f"DELETE FROM {table} WHERE rowid = :id"), ids)
 
 def init_db(db_url="sqlite:///hanja.db"):
     from sqlalchemy import create_engine
+    from src.migrations import upgrade_database
+    from src.instrumentation import profiling_enabled, instrument_engine
+    from src.database import configure_sqlite
     engine = create_engine(db_url)
-    Base.metadata.create_all(engine)
+    configure_sqlite(engine)
+    if profiling_enabled():
+        instrument_engine(engine)
+    upgrade_database(engine)
     return sessionmaker(bind=engine)
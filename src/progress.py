@@ -0,0 +1,144 @@
+import threading
+
+from src.models import DEFAULT_USER_ID
+from src.repository import HanjaRepository
+
+DEFAULT_IMPORTANCE_LEVEL = 5
+
+class BatchedProgressWriter:
+    """
+    Buffers quiz answer results in memory and writes them to UserProgress in
+    batches, so answering a question does not cost a write transaction.
+
+    Only pending levels are kept in memory: the first answer for a (learner,
+    target) since the last flush reads its stored level from the DB, later answers
+    until the flush are applied to the pending level (default 5, correct -1, wrong
+    +1, never below 0 — the same rules as HanjaRepository.update_importance_level).
+    Flushed keys are dropped, so memory is bounded by the pending batch and answers
+    recorded meanwhile by another process are read again. Pending levels are flushed when
+    `batch_size` targets are dirty, every `flush_interval` seconds from a
+    background thread, and on close(). With a `writer` (src.database.SingleWriter)
+    the batches are written through it, together with the process's other writes.
+    """
+
+    def __init__(self, session_factory, repository=None, batch_size: int = 100, flush_interval: float = 1.0,
+                 writer=None):
+        self.Session = session_factory
+        self.writer = writer
+        self.repository = repository or HanjaRepository()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._dirty = {}
+        self._flushing = {} # batch being written: still the latest level of its keys
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _key(hanja_id: int = None, word_id: int = None, user_id: str = DEFAULT_USER_ID) -> tuple:
+        if hanja_id:
+            return (user_id, 'hanja', hanja_id)
+        if word_id:
+            return (user_id, 'word', word_id)
+        raise ValueError("Either hanja_id or word_id must be provided.")
+
+    def _load_level(self, key: tuple, session=None):
+        own_session = session is None
+        if own_session:
+            session = self.Session()
+        try:
+            user_id, kind, target_id = key
+            if kind == 'hanja':
+                progress = self.repository.get_user_progress(session, hanja_id=target_id, user_id=user_id)
+            else:
+                progress = self.repository.get_user_progress(session, word_id=target_id, user_id=user_id)
+            return progress.importance_level if progress else None
+        finally:
+            if own_session:
+                session.close()
+
+    def record(self, hanja_id: int = None, word_id: int = None, change: int = 0, session=None,
+               user_id: str = DEFAULT_USER_ID) -> int:
+        """
+        Applies an importance change and returns the new level. The DB write is deferred.
+        Pass the caller's session to read the stored level without checking out another connection.
+        """
+        key = self._key(hanja_id, word_id, user_id)
+        with self._lock:
+            known = key in self._dirty or key in self._flushing
+        loaded = None if known else self._load_level(key, session)
+
+        with self._lock:
+            level = self._dirty.get(key, self._flushing.get(key))
+            if level is None:
+                level = loaded if loaded is not None else DEFAULT_IMPORTANCE_LEVEL
+            new_level = max(0, level + change)
+            self._dirty[key] = new_level
+            should_flush = len(self._dirty) >= self.batch_size
+
+        self._ensure_thread()
+        if should_flush:
+            self.flush()
+        return new_level
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._dirty)
+
+    def flush(self) -> int:
+        """Writes all pending levels in one transaction. Returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._dirty = self._dirty, {}
+                self._flushing = batch
+            if not batch:
+                return 0
+            try:
+                self._write_levels(batch)
+                return len(batch)
+            except Exception:
+                # Put the batch back without overwriting newer levels recorded meanwhile
+                with self._lock:
+                    for key, level in batch.items():
+                        self._dirty.setdefault(key, level)
+                raise
+            finally:
+                with self._lock:
+                    self._flushing = {}
+
+    def _write_levels(self, batch: dict):
+        if self.writer is not None:
+            self.writer.run(lambda session: self.repository.set_importance_levels(session, batch))
+            return
+        session = self.Session()
+        try:
+            self.repository.set_importance_levels(session, batch)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _ensure_thread(self):
+        if self._thread is not None or self.flush_interval is None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="progress-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing progress: {e}")
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
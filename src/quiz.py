@@ -1,40 +1,106 @@
 import random
-from sqlalchemy.sql import func, desc
-from src.models import HanjaInfo, UsageExample, DocumentHanja, DocumentWord, UserProgress
+import threading
+from collections import OrderedDict, deque
+from src.models import UserProgress, DEFAULT_USER_ID
+from src.metrics import record_cache
+from src.readmodel import ReadModelCache, HanjaRecord, WordRecord
+
+class SamplerCache:
+    """
+    LRU cache of per-learner importance levels ({('hanja'|'word', id): level})
+    used for weighted sampling, so a learner's progress rows are read once
+    instead of for every question. The least recently used learners are
+    evicted beyond `max_learners`.
+    """
+
+    def __init__(self, max_learners: int = 1000):
+        self.max_learners = max_learners
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, user_id: str, loader) -> dict:
+        """Returns the cached levels of user_id, calling loader() on a miss."""
+        with self._lock:
+            levels = self._entries.get(user_id)
+            if levels is not None:
+                self._entries.move_to_end(user_id)
+        record_cache("quiz_sampler", hit=levels is not None)
+        if levels is not None:
+            return levels
+
+        levels = loader()
+        with self._lock:
+            # Another request may have loaded the same learner meanwhile; keep one copy
+            levels = self._entries.setdefault(user_id, levels)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_learners:
+                self._entries.popitem(last=False)
+        return levels
+
+    def update(self, user_id: str, key: tuple, level: int):
+        """Applies a new level to a cached learner (no-op if the learner is not cached)."""
+        with self._lock:
+            levels = self._entries.get(user_id)
+            if levels is not None:
+                levels[key] = level
+
+    def invalidate(self, user_id: str = None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
 
 class QuizGenerator:
-    def __init__(self, session_factory):
+    """
+    Quiz questions drawn from the in-memory read model (src.readmodel): candidates,
+    distractors and answers come from the snapshot of the current data version,
+    only the learner's progress is read from the database.
+    """
+
+    def __init__(self, session_factory, sampler_cache_size: int = 1000, read_models: ReadModelCache = None):
         self.Session = session_factory
+        self.samplers = SamplerCache(sampler_cache_size)
+        self.read_models = read_models or ReadModelCache()
+
+    def get_progress_levels(self, session, user_id: str = DEFAULT_USER_ID) -> dict:
+        """A learner's importance levels keyed by ('hanja', id) / ('word', id), from the sampler cache."""
+        def load():
+            rows = session.query(UserProgress.hanja_id, UserProgress.word_id, UserProgress.importance_level).filter(
+                UserProgress.user_id == user_id
+            ).all()
+            return {('hanja', h) if h else ('word', w): level for h, w, level in rows}
+        return self.samplers.get(user_id, load)
+
+    def update_cached_level(self, user_id: str = DEFAULT_USER_ID, hanja_id: int = None, word_id: int = None, level: int = None):
+        """Keeps the sampler cache in step with a recorded answer."""
+        key = ('hanja', hanja_id) if hanja_id else ('word', word_id)
+        self.samplers.update(user_id, key, level)
 
-    def get_weighted_hanja(self, session, limit=100, radical=None):
+    def get_weighted_hanja(self, session, limit=100, radical=None, user_id: str = DEFAULT_USER_ID):
         """
-        Fetch Hanjas weighted by importance level (SRS).
+        Fetch Hanjas weighted by the learner's importance level (SRS).
         Default importance is 5.
         """
-        # 1. Fetch all Hanja candidates (filtered by radical if needed)
-        query = session.query(HanjaInfo)
-        if radical:
-            query = query.filter(HanjaInfo.radical == radical)
-        
-        # Use a reasonable limit to avoid fetching too many if DB is huge, 
+        # 1. Hanja candidates from the read model (filtered by radical if needed)
+        # Use a reasonable limit to avoid weighting too many if DB is huge, 
         # but for SRS we ideally want to consider many.
-        # For now, let's fetch up to 1000 candidates to pick from.
-        candidates = query.limit(1000).all()
+        # For now, let's take up to 1000 candidates to pick from.
+        candidates = self.read_models.get(session).hanja_candidates(radical or None, limit=1000)
         
         if not candidates:
             return []
 
-        # 2. Fetch Progress for these candidates
-        candidate_ids = [h.id for h in candidates]
-        progress_map = {}
-        progress_entries = session.query(UserProgress).filter(UserProgress.hanja_id.in_(candidate_ids)).all()
-        for p in progress_entries:
-            progress_map[p.hanja_id] = p.importance_level
+        # 2. Progress of this learner (cached per learner)
+        levels = self.get_progress_levels(session, user_id)
             
         # 3. Build weighted list
         weighted_candidates = []
         for h in candidates:
-            weight = progress_map.get(h.id, 5) # Default weight 5
+            weight = levels.get(('hanja', h.id), 5) # Default weight 5
             # Ensure weight is at least 1 to give a chance to 'mastered' items (optional, or keep 0 to hide)
             # Let's give at least small chance even if 0? Or strict 0? 
             # Requirement: "higher importance -> more frequent". 0 means master.
@@ -51,164 +117,195 @@ class QuizGenerator:
         
         return weighted_candidates[:limit]
 
-    def generate_quiz(self, mode='random', q_type='hanja_to_meaning', radical=None, min_importance_level=0):
+    def generate_quiz(self, mode='random', q_type='hanja_to_meaning', radical=None, min_importance_level=0, user_id: str = DEFAULT_USER_ID):
         """
         Generates a single quiz question based on mode and type.
         Modes: 'random', 'radical', 'word', 'importance_review'
         Types: 'hanja_to_meaning', 'meaning_to_hanja', 'word_to_sound', 'sound_to_word'
         min_importance_level: Only for 'importance_review' mode, filter by importance level.
+        user_id: Learner whose importance levels weight the selection.
+        """
+        session = self.Session()
+        try:
+            model = self.read_models.get(session)
+            return self._generate_quiz(model, session, mode, q_type, radical, min_importance_level, user_id)
+        finally:
+            session.close()
+
+    def generate_batch(self, count: int, mode='random', q_type='hanja_to_meaning', radical=None, min_importance_level=0, user_id: str = DEFAULT_USER_ID):
+        """
+        Generates up to `count` questions using a single session.
+        Generation can fail for an individual pick (e.g. not enough distractors), so up to 2*count attempts are made.
         """
         session = self.Session()
         try:
-            question_data = None
+            model = self.read_models.get(session)
+            # The weighted candidate list is shared by the whole batch instead of reloaded per question
+            candidates = (
+                self.get_weighted_hanja(session, limit=200, radical=radical, user_id=user_id)
+                if mode in ['random', 'radical'] else None
+            )
+            questions = []
+            for _ in range(count * 2):
+                q = self._generate_quiz(model, session, mode, q_type, radical, min_importance_level, user_id, candidates)
+                if q:
+                    questions.append(q)
+                if len(questions) >= count:
+                    break
+            return questions
+        finally:
+            session.close()
+
+    def _generate_quiz(self, model, session, mode, q_type, radical, min_importance_level, user_id=DEFAULT_USER_ID, candidates=None):
+        question_data = None
+        
+        # --- Importance Review Mode ---
+        if mode == 'importance_review':
+            question_data = self._generate_importance_review_quiz(model, session, q_type, min_importance_level, user_id)
+            if question_data:
+                random.shuffle(question_data['options'])
+                return question_data
             
-            # --- Importance Review Mode ---
-            if mode == 'importance_review':
-                question_data = self._generate_importance_review_quiz(session, q_type, min_importance_level)
-                if question_data:
-                    random.shuffle(question_data['options'])
-                    return question_data
-                
-            # --- Hanja Quiz (Random / Radical) ---
-            if mode in ['random', 'radical']:
-                # 1. Select Target Hanja (Weighted)
-                candidates = self.get_weighted_hanja(session, limit=200, radical=radical)
-                if not candidates:
-                    return None
-                
-                # Weighted random choice
-                total_weight = sum(w for h, w in candidates)
-                if total_weight == 0: return None
-                pick_val = random.uniform(0, total_weight)
-                current = 0
-                target = None
-                for h, w in candidates:
-                    current += w
-                    if current > pick_val:
-                        target = h
-                        break
-                
-                if not target or not target.readings:
-                    return None # Skip if no reading info
+        # --- Hanja Quiz (Random / Radical) ---
+        if mode in ['random', 'radical']:
+            # 1. Select Target Hanja (Weighted)
+            if candidates is None:
+                candidates = self.get_weighted_hanja(session, limit=200, radical=radical, user_id=user_id)
+            if not candidates:
+                return None
+            
+            # Weighted random choice
+            total_weight = sum(w for h, w in candidates)
+            if total_weight == 0: return None
+            pick_val = random.uniform(0, total_weight)
+            current = 0
+            target = None
+            for h, w in candidates:
+                current += w
+                if current > pick_val:
+                    target = h
+                    break
+            
+            if not target or not target.readings:
+                return None # Skip if no reading info
 
-                reading = target.readings[0]
-                meaning_sound = f"{reading.meaning} {reading.sound}"
-                
-                # 2. Select Distractors
-                distractors = []
-                others_query = session.query(HanjaInfo).filter(HanjaInfo.id != target.id)
-                if radical: 
-                    others_query = others_query.filter(HanjaInfo.radical != radical) # Get distractors from other radicals
-                
-                # Try to get enough unique distractors
-                possible_distractors = others_query.order_by(func.random()).limit(min(50, others_query.count())).all()
-                for o in possible_distractors:
-                    if o.readings:
-                        r = o.readings[0]
-                        ms = f"{r.meaning} {r.sound}"
-                        
-                        # Ensure val is always assigned before use
-                        if q_type == 'hanja_to_meaning':
-                            val = ms
-                        else: # meaning_to_hanja
-                            val = o.char
-                            
-                        if val not in distractors and val != meaning_sound and val != target.char: # Avoid correct answer and duplicates
-                            distractors.append(val)
-                        if len(distractors) == 3:
-                            break
-                
-                if len(distractors) < 3: return None
-
-                # 3. Formulate Question
-                if q_type == 'hanja_to_meaning':
-                    question_data = {
-                        "q_text": target.char,
-                        "correct": meaning_sound,
-                        "options": distractors + [meaning_sound],
-                        "info": f"부수: {target.radical}, 획수: {target.strokes}",
-                        "hanja_id": target.id, # For mistake tracking
-                        "word_id": None
-                    }
-                else: # meaning_to_hanja
-                    question_data = {
-                        "q_text": meaning_sound,
-                        "correct": target.char,
-                        "options": distractors + [target.char],
-                        "info": f"부수: {target.radical}, 획수: {target.strokes}",
-                        "hanja_id": target.id, # For mistake tracking
-                        "word_id": None
-                    }
-
-            # --- Word Quiz ---
-            elif mode == 'word':
-                # Get random word from UsageExample
-                target = session.query(UsageExample).filter(UsageExample.sound != None).order_by(func.random()).first()
-                if not target: return None
-                
-                distractors = []
-                others = session.query(UsageExample).filter(UsageExample.id != target.id, UsageExample.sound != None).order_by(func.random()).limit(min(50, session.query(UsageExample).count())).all()
-                
-                for o in others:
-                    if q_type == 'word_to_sound':
-                        val = o.sound
-                    else: # sound_to_word
-                        val = o.word
+            reading = target.readings[0]
+            meaning_sound = f"{reading.meaning} {reading.sound}"
+            
+            # 2. Select Distractors
+            distractors = []
+            # Try to get enough unique distractors (from other radicals in radical mode)
+            possible_distractors = model.sample_hanja(50, exclude_radical=radical or None)
+            for o in possible_distractors:
+                if o.id != target.id:
+                    r = o.readings[0]
+                    ms = f"{r.meaning} {r.sound}"
                     
-                    if val not in distractors and val != target.sound and val != target.word: # Avoid correct answer and duplicates
+                    # Ensure val is always assigned before use
+                    if q_type == 'hanja_to_meaning':
+                        val = ms
+                    else: # meaning_to_hanja
+                        val = o.char
+                        
+                    if val not in distractors and val != meaning_sound and val != target.char: # Avoid correct answer and duplicates
                         distractors.append(val)
                     if len(distractors) == 3:
                         break
-                
-                if len(distractors) < 3: return None
+            
+            if len(distractors) < 3: return None
 
+            # 3. Formulate Question
+            if q_type == 'hanja_to_meaning':
+                question_data = {
+                    "q_text": target.char,
+                    "correct": meaning_sound,
+                    "options": distractors + [meaning_sound],
+                    "info": f"부수: {target.radical}, 획수: {target.strokes}",
+                    "hanja_id": target.id, # For mistake tracking
+                    "word_id": None
+                }
+            else: # meaning_to_hanja
+                question_data = {
+                    "q_text": meaning_sound,
+                    "correct": target.char,
+                    "options": distractors + [target.char],
+                    "info": f"부수: {target.radical}, 획수: {target.strokes}",
+                    "hanja_id": target.id, # For mistake tracking
+                    "word_id": None
+                }
+
+        # --- Word Quiz ---
+        elif mode == 'word':
+            # Get random word (with a sound) from the read model
+            sample = model.sample_words(1)
+            if not sample: return None
+            target = sample[0]
+            
+            distractors = []
+            others = [o for o in model.sample_words(50) if o.id != target.id]
+            
+            for o in others:
                 if q_type == 'word_to_sound':
-                    question_data = {
-                        "q_text": target.word,
-                        "correct": target.sound,
-                        "options": distractors + [target.sound],
-                        "info": "",
-                        "hanja_id": None,
-                        "word_id": target.id # For mistake tracking
-                    }
+                    val = o.sound
                 else: # sound_to_word
-                    question_data = {
-                        "q_text": target.sound,
-                        "correct": target.word,
-                        "options": distractors + [target.word],
-                        "info": "",
-                        "hanja_id": None,
-                        "word_id": target.id # For mistake tracking
-                    }
+                    val = o.word
+                
+                if val not in distractors and val != target.sound and val != target.word: # Avoid correct answer and duplicates
+                    distractors.append(val)
+                if len(distractors) == 3:
+                    break
+            
+            if len(distractors) < 3: return None
 
-            if question_data:
-                random.shuffle(question_data['options'])
-            return question_data
-        finally:
-            session.close()
+            if q_type == 'word_to_sound':
+                question_data = {
+                    "q_text": target.word,
+                    "correct": target.sound,
+                    "options": distractors + [target.sound],
+                    "info": "",
+                    "hanja_id": None,
+                    "word_id": target.id # For mistake tracking
+                }
+            else: # sound_to_word
+                question_data = {
+                    "q_text": target.sound,
+                    "correct": target.word,
+                    "options": distractors + [target.word],
+                    "info": "",
+                    "hanja_id": None,
+                    "word_id": target.id # For mistake tracking
+                }
 
-    def _generate_importance_review_quiz(self, session, q_type: str, min_importance_level: int):
+        if question_data:
+            random.shuffle(question_data['options'])
+        return question_data
+
+    def _generate_importance_review_quiz(self, model, session, q_type: str, min_importance_level: int, user_id: str = DEFAULT_USER_ID):
         """
-        Generates a quiz question from UserProgress, weighted by importance_level.
+        Generates a quiz question from the learner's UserProgress, weighted by importance_level.
         """
         # Collect candidates based on q_type and importance level
         candidates = []
         if q_type in ['hanja_to_meaning', 'meaning_to_hanja']:
-            progress_entries = session.query(UserProgress).filter(
+            progress_entries = session.query(UserProgress.hanja_id, UserProgress.importance_level).filter(
+                UserProgress.user_id == user_id,
                 UserProgress.hanja_id != None,
                 UserProgress.importance_level >= min_importance_level
             ).all()
-            for up in progress_entries:
-                if up.hanja and up.hanja.readings: # Ensure hanja object is loaded and has readings
-                    candidates.append((up.hanja, up.importance_level + 1)) # +1 to ensure non-zero weight
+            for hanja_id, level in progress_entries:
+                hanja = model.hanja_by_id(hanja_id)
+                if hanja and hanja.readings: # Ensure the hanja exists and has readings
+                    candidates.append((hanja, level + 1)) # +1 to ensure non-zero weight
         elif q_type in ['word_to_sound', 'sound_to_word']:
-            progress_entries = session.query(UserProgress).filter(
+            progress_entries = session.query(UserProgress.word_id, UserProgress.importance_level).filter(
+                UserProgress.user_id == user_id,
                 UserProgress.word_id != None,
                 UserProgress.importance_level >= min_importance_level
             ).all()
-            for up in progress_entries:
-                if up.word and up.word.sound: # Ensure word object is loaded and has sound
-                    candidates.append((up.word, up.importance_level + 1)) # +1 to ensure non-zero weight
+            for word_id, level in progress_entries:
+                word = model.word_by_id(word_id)
+                if word and word.sound: # Ensure the word exists and has sound
+                    candidates.append((word, level + 1)) # +1 to ensure non-zero weight
         
         if not candidates:
             return None # No items to review at this importance level
@@ -227,17 +324,16 @@ class QuizGenerator:
         
         if not target: return None
 
-        # Generate question based on target (HanjaInfo or UsageExample)
-        if isinstance(target, HanjaInfo):
+        # Generate question based on target (HanjaRecord or WordRecord)
+        if isinstance(target, HanjaRecord):
             reading = target.readings[0]
             meaning_sound = f"{reading.meaning} {reading.sound}"
             
             distractors = []
-            others_query = session.query(HanjaInfo).filter(HanjaInfo.id != target.id)
-            possible_distractors = others_query.order_by(func.random()).limit(min(50, others_query.count())).all()
+            possible_distractors = model.sample_hanja(50)
 
             for o in possible_distractors:
-                if o.readings:
+                if o.id != target.id:
                     r = o.readings[0]
                     ms = f"{r.meaning} {r.sound}"
                     val = ms if q_type == 'hanja_to_meaning' else o.char
@@ -266,9 +362,9 @@ class QuizGenerator:
                     "word_id": None
                 }
         
-        elif isinstance(target, UsageExample):
+        elif isinstance(target, WordRecord):
             distractors = []
-            others = session.query(UsageExample).filter(UsageExample.id != target.id, UsageExample.sound != None).order_by(func.random()).limit(min(50, session.query(UsageExample).count())).all()
+            others = [o for o in model.sample_words(50) if o.id != target.id]
             for o in others:
                 val = o.sound if q_type == 'word_to_sound' else o.word
                 if val not in distractors and val != target.sound and val != target.word:
@@ -301,7 +397,121 @@ class QuizGenerator:
     def get_all_radicals(self):
         session = self.Session()
         try:
-            radicals = session.query(HanjaInfo.radical).distinct().filter(HanjaInfo.radical != None).all()
-            return sorted([r[0] for r in radicals])
+            return list(self.read_models.get(session).radicals)
         finally:
-            session.close()
\ No newline at end of file
+            session.close()
+
+    def get_correct_answer(self, session, q_type: str, hanja_id: int = None, word_id: int = None):
+        """
+        Recomputes the correct answer of a question from its target, so answer
+        submission does not depend on server-side question state.
+        Returns None if the target does not exist.
+        """
+        model = self.read_models.get(session)
+        if q_type in ['hanja_to_meaning', 'meaning_to_hanja'] and hanja_id:
+            target = model.hanja_by_id(hanja_id)
+            if not target or not target.readings:
+                return None
+            reading = target.readings[0]
+            return f"{reading.meaning} {reading.sound}" if q_type == 'hanja_to_meaning' else target.char
+        if q_type in ['word_to_sound', 'sound_to_word'] and word_id:
+            target = model.word_by_id(word_id)
+            if not target:
+                return None
+            return target.sound if q_type == 'word_to_sound' else target.word
+        return None
+
+
+class QuestionPool:
+    """
+    In-memory pool of pre-generated questions per (user_id, mode, q_type, radical, min_importance_level).
+    Questions are generated in batches with one session, so serving a question is
+    usually a deque pop instead of several queries. When a queue runs low it is
+    refilled by a background thread, so requests rarely wait for generation.
+    Weights reflect importance levels at generation time; a small batch size keeps
+    that staleness short. At most `max_queues` queues are kept (least recently used
+    learners/settings are dropped).
+    """
+
+    def __init__(self, quiz_gen: QuizGenerator, batch_size: int = 20, prefetch: bool = True, max_queues: int = 5000):
+        self.quiz_gen = quiz_gen
+        self.batch_size = batch_size
+        self.low_water = max(1, batch_size // 2)
+        self.prefetch = prefetch
+        self.max_queues = max_queues
+        self._queues = OrderedDict()
+        self._refill_locks = {}
+        self._prefetching = set()
+        self._lock = threading.Lock()
+
+    def _queue(self, key) -> deque:
+        # Caller holds self._lock
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+            while len(self._queues) > self.max_queues:
+                evicted, _ = self._queues.popitem(last=False)
+                self._refill_locks.pop(evicted, None)
+        else:
+            self._queues.move_to_end(key)
+        return queue
+
+    def _pop(self, key, count: int) -> list:
+        with self._lock:
+            queue = self._queue(key)
+            return [queue.popleft() for _ in range(min(count, len(queue)))]
+
+    def _refill(self, key, missing: int = 0) -> list:
+        """Generates a batch for key, queues it and returns the first `missing` questions. Caller holds the refill lock."""
+        user_id, mode, q_type, radical, min_importance_level = key
+        batch = self.quiz_gen.generate_batch(
+            max(self.batch_size, missing), mode=mode, q_type=q_type,
+            radical=radical, min_importance_level=min_importance_level, user_id=user_id
+        )
+        with self._lock:
+            self._queue(key).extend(batch[missing:])
+        return batch[:missing]
+
+    def _refill_lock(self, key) -> threading.Lock:
+        with self._lock:
+            return self._refill_locks.setdefault(key, threading.Lock())
+
+    def get(self, count: int = 1, mode='random', q_type='hanja_to_meaning', radical=None, min_importance_level=0,
+            user_id: str = DEFAULT_USER_ID) -> list:
+        key = (user_id, mode, q_type, radical, min_importance_level)
+        questions = self._pop(key, count)
+        if len(questions) < count:
+            # One request refills a key at a time; concurrent requests wait and take from that batch
+            with self._refill_lock(key):
+                questions.extend(self._pop(key, count - len(questions)))
+                missing = count - len(questions)
+                if missing > 0:
+                    questions.extend(self._refill(key, missing))
+        if self.prefetch:
+            self._maybe_prefetch(key)
+        return questions
+
+    def _maybe_prefetch(self, key):
+        with self._lock:
+            if len(self._queue(key)) >= self.low_water or key in self._prefetching:
+                return
+            self._prefetching.add(key)
+        threading.Thread(target=self._prefetch, args=(key,), name="question-prefetch", daemon=True).start()
+
+    def _prefetch(self, key):
+        try:
+            with self._refill_lock(key):
+                with self._lock:
+                    low = len(self._queue(key)) < self.low_water
+                if low:
+                    self._refill(key)
+        except Exception as e:
+            print(f"Error prefetching questions: {e}")
+        finally:
+            with self._lock:
+                self._prefetching.discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._queues.clear()
+            self._refill_locks.clear()
@@ -1,5 +1,6 @@
 import os
-from pypdf import PdfReader
+
+SUPPORTED_EXTENSIONS = (".txt", ".pdf")
 
 def read_text_file(file_path: str) -> str:
     """
@@ -12,6 +13,7 @@ def read_pdf_file(file_path: str) -> str:
     """
     Extracts text from a PDF file.
     """
+    from pypdf import PdfReader # imported on first use: most runs only read text files
     text = ""
     try:
         reader = PdfReader(file_path)
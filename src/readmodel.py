@@ -0,0 +1,506 @@
+"""
+Immutable in-memory read model of the collected data, for serving.
+
+The global analysis tables, the quiz candidate pools and distractors and the
+radical list only change when the data version is bumped (ingestion, the
+dictionary refresh, collection edits). `ReadModel.load` reads hanja_info,
+hanja_readings, usage_examples, word_chars and the occurrence totals once and
+keeps everything as flat NumPy arrays, named in `ReadModel.arrays`:
+
+    *_ids              sorted int64 ids: id -> position by binary search
+    *_frequencies      summed occurrence counts per position
+    strings            UTF-8 blob + offsets (+ null mask) per text column
+    readings, words    CSR layouts (indptr into the reading / word positions)
+    rankings           precomputed position orders for the top-N tables
+
+Serving a page or a question is a slice or a sample over those arrays;
+`HanjaRecord` / `WordRecord` are views of one position that decode their
+fields on access, so a snapshot holds no per-row Python objects.
+
+Shared snapshot file: with a `path` (HANJA_SNAPSHOT_PATH), the arrays are
+written to one flat file (`ReadModel.save`) and mapped read-only
+(`ReadModel.open`) instead of kept on the heap, so several API workers,
+Streamlit and main.py share a single physical copy through the page cache.
+The file records the data version and a fingerprint of the database; a
+process that finds it stale rebuilds it and replaces it atomically
+(os.replace), the others map the new file on their next version check.
+main.py and the upload queue regenerate it right after ingestion.
+
+`ReadModelCache.get(session)` checks the data version (one primary-key read)
+and returns the current snapshot. Readers keep the snapshot they got; the new
+one replaces it with a single reference assignment, so a reader never sees a
+half-built model.
+
+NumPy is imported on first use (the first model built or mapped), so importing
+this module (main.py, the quiz) does not load it.
+"""
+import json
+import mmap
+import os
+import random
+import threading
+from collections import Counter
+from itertools import chain
+from typing import TYPE_CHECKING
+
+from sqlalchemy import text
+
+from src.metrics import REGISTRY, record_cache
+from src.repository import HanjaRepository
+
+if TYPE_CHECKING:
+    import numpy as np
+
+SNAPSHOT_PATH_ENV = "HANJA_SNAPSHOT_PATH"
+SNAPSHOT_MAGIC = b"HANJARM1"
+_HEADER_START = len(SNAPSHOT_MAGIC) + 8 # magic, header length (uint64 LE), JSON header
+_ALIGNMENT = 64
+
+READ_MODEL_BYTES = REGISTRY.gauge("hanja_read_model_bytes", "Size of the arrays of the current read model snapshot.")
+
+def get_snapshot_path():
+    return os.environ.get(SNAPSHOT_PATH_ENV) or None
+
+class ReadingRecord:
+    __slots__ = ("sound", "meaning")
+
+    def __init__(self, sound: str, meaning: str):
+        self.sound = sound
+        self.meaning = meaning
+
+class HanjaRecord:
+    """View of one Hanja of a ReadModel, with the attributes of HanjaInfo (readings in id order)."""
+    __slots__ = ("_model", "_position")
+
+    def __init__(self, model: "ReadModel", position: int):
+        self._model = model
+        self._position = position
+
+    @property
+    def id(self) -> int:
+        return int(self._model.hanja_ids[self._position])
+
+    @property
+    def char(self) -> str:
+        return chr(self._model.arrays["hanja_chars"][self._position])
+
+    @property
+    def radical(self):
+        code = self._model.radical_codes[self._position]
+        return None if code < 0 else self._model.radicals[code]
+
+    @property
+    def strokes(self):
+        strokes = int(self._model.arrays["hanja_strokes"][self._position])
+        return None if strokes < 0 else strokes
+
+    @property
+    def readings(self) -> tuple:
+        return self._model._readings(self._position)
+
+class WordRecord:
+    """View of one word of a ReadModel, with the attributes of UsageExample."""
+    __slots__ = ("_model", "_position")
+
+    def __init__(self, model: "ReadModel", position: int):
+        self._model = model
+        self._position = position
+
+    @property
+    def id(self) -> int:
+        return int(self._model.word_ids[self._position])
+
+    @property
+    def word(self) -> str:
+        return self._model._strings["words"][self._position]
+
+    @property
+    def sound(self):
+        return self._model._strings["word_sounds"][self._position]
+
+class _Strings:
+    """Column of UTF-8 strings (or None): value i is blob[offsets[i]:offsets[i + 1]], None where nulls[i]."""
+
+    def __init__(self, arrays: dict, name: str):
+        self.blob = arrays[f"{name}.blob"]
+        self.offsets = arrays[f"{name}.offsets"]
+        self.nulls = arrays[f"{name}.nulls"]
+
+    @staticmethod
+    def encode(name: str, values) -> dict:
+        import numpy as np
+        encoded = [b"" if v is None else v.encode("utf-8") for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return {
+            f"{name}.blob": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            f"{name}.offsets": offsets,
+            f"{name}.nulls": np.fromiter((v is None for v in values), dtype=bool, count=len(values)),
+        }
+
+    def __len__(self):
+        return len(self.nulls)
+
+    def __getitem__(self, i: int):
+        if self.nulls[i]:
+            return None
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+def _int_array(values, count: int) -> "np.ndarray":
+    import numpy as np
+    return np.fromiter(values, dtype=np.int64, count=count)
+
+def _codepoints(chars) -> "np.ndarray":
+    import numpy as np
+    return np.fromiter((ord(c) for c in chars), dtype=np.uint32)
+
+def _positions(ids: "np.ndarray", values: "np.ndarray") -> tuple:
+    """(positions, known) of `values` in the sorted `ids`; known is False for values not in ids."""
+    import numpy as np
+    positions = np.searchsorted(ids, values)
+    known = positions < len(ids)
+    known[known] = ids[positions[known]] == values[known]
+    return positions, known
+
+def _totals(session, sql: str, ids: "np.ndarray") -> tuple:
+    """(frequencies, occurs) aligned with `ids` from (id, total) rows; unknown ids are ignored."""
+    import numpy as np
+    rows = session.execute(text(sql)).all()
+    pairs = _int_array(chain.from_iterable(rows), 2 * len(rows)).reshape(-1, 2)
+    positions, known = _positions(ids, pairs[:, 0])
+    frequencies = np.zeros(len(ids), dtype=np.int64)
+    occurs = np.zeros(len(ids), dtype=bool)
+    frequencies[positions[known]] = pairs[known, 1]
+    occurs[positions[known]] = True
+    return frequencies, occurs
+
+def _align(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+def database_fingerprint(session, data_version: int) -> list:
+    """Data version plus the highest ids, so a snapshot file of another (or a recreated) database is not reused."""
+    maxima = session.execute(text(
+        "SELECT (SELECT MAX(id) FROM hanja_info), (SELECT MAX(id) FROM usage_examples), (SELECT MAX(id) FROM documents)"
+    )).one()
+    return [data_version] + [m or 0 for m in maxima]
+
+class ReadModel:
+    """
+    Snapshot of the serving data at one data version: `arrays` (name -> NumPy
+    array) and `meta` (JSON-serialisable scalars). Build it with `load`, or
+    map a saved one with `open`.
+    """
+
+    def __init__(self, arrays: dict, meta: dict, buffer=None):
+        self.arrays = arrays
+        self.meta = meta
+        self._buffer = buffer # keeps the mapping of an opened snapshot alive
+        self.data_version = meta["data_version"]
+        self.fingerprint = meta.get("fingerprint")
+        self.nbytes = sum(a.nbytes for a in arrays.values())
+        self.mapped = buffer is not None
+
+        self.hanja_ids = arrays["hanja_ids"]
+        self.hanja_frequencies = arrays["hanja_frequencies"]
+        self.radical_codes = arrays["radical_codes"]
+        self.word_ids = arrays["word_ids"]
+        self.word_frequencies = arrays["word_frequencies"]
+        self._strings = {
+            name: _Strings(arrays, name) for name in ("radicals", "reading_sounds", "reading_meanings", "words", "word_sounds")
+        }
+        # A few hundred strings: decoded once rather than per access
+        self.radicals = tuple(self._strings["radicals"][i] for i in range(len(self._strings["radicals"])))
+        self._code_by_radical = {radical: i for i, radical in enumerate(self.radicals)}
+
+    @classmethod
+    def load(cls, session, data_version: int, fingerprint: list = None) -> "ReadModel":
+        """
+        Reads the serving data through `session`. The snapshot is labelled with the
+        version read before loading, so rows written during the build only cause
+        another build on the next `ReadModelCache.get`.
+        """
+        import numpy as np
+        hanja = session.execute(text("SELECT id, char, radical, strokes FROM hanja_info ORDER BY id")).all()
+        readings = session.execute(text(
+            "SELECT hanja_id, sound, meaning FROM hanja_readings ORDER BY hanja_id, id"
+        )).all()
+        words = session.execute(text("SELECT id, word, sound FROM usage_examples ORDER BY id")).all()
+        hanja_ids = _int_array((row[0] for row in hanja), len(hanja))
+        word_ids = _int_array((row[0] for row in words), len(words))
+        hanja_frequencies, hanja_occurs = _totals(
+            session, "SELECT hanja_id, SUM(frequency) FROM document_hanja GROUP BY hanja_id", hanja_ids
+        )
+        word_frequencies, word_occurs = _totals(
+            session, "SELECT word_id, SUM(frequency) FROM document_words GROUP BY word_id", word_ids
+        )
+        word_chars = session.execute(text("SELECT char, word_id FROM word_chars")).all()
+        arrays = {"hanja_ids": hanja_ids, "hanja_frequencies": hanja_frequencies,
+                  "word_ids": word_ids, "word_frequencies": word_frequencies}
+        meta = {"data_version": data_version, "fingerprint": fingerprint}
+
+        # Hanja: characters as code points, strokes -1 and radical code -1 for none
+        arrays["hanja_chars"] = _codepoints(row[1] for row in hanja)
+        arrays["hanja_strokes"] = np.fromiter(
+            (-1 if row[3] is None else row[3] for row in hanja), dtype=np.int32, count=len(hanja)
+        )
+        radicals = sorted({row[2] for row in hanja if row[2] is not None})
+        arrays.update(_Strings.encode("radicals", radicals))
+        code_by_radical = {radical: i for i, radical in enumerate(radicals)}
+        radical_codes = arrays["radical_codes"] = np.fromiter(
+            (code_by_radical.get(row[2], -1) for row in hanja), dtype=np.int32, count=len(hanja)
+        )
+        arrays["hanja_by_char"] = np.argsort(arrays["hanja_chars"], kind="stable").astype(np.int32)
+
+        # Readings of position i: reading_indptr[i]:reading_indptr[i + 1]
+        positions, known = _positions(hanja_ids, _int_array((row[0] for row in readings), len(readings)))
+        arrays["reading_indptr"] = np.searchsorted(positions[known], np.arange(len(hanja) + 1)).astype(np.int64)
+        kept = [row for row, k in zip(readings, known) if k]
+        arrays.update(_Strings.encode("reading_sounds", [row[1] for row in kept]))
+        arrays.update(_Strings.encode("reading_meanings", [row[2] for row in kept]))
+
+        # Top Hanja: most frequent first, then the highest id (as the scoped SQL ranking)
+        occurring = np.flatnonzero(hanja_occurs)
+        order = np.lexsort((-hanja_ids[occurring], -hanja_frequencies[occurring]))
+        arrays["hanja_ranking"] = occurring[order].astype(np.int32)
+
+        # Top radicals; the total counts "no radical" as one more distinct value, like the SQL count
+        codes = radical_codes[occurring]
+        with_radical = codes >= 0
+        radical_totals = np.bincount(codes[with_radical], weights=hanja_frequencies[occurring][with_radical],
+                                     minlength=len(radicals)).astype(np.int64)
+        present = np.flatnonzero(np.bincount(codes[with_radical], minlength=len(radicals)))
+        ranked = sorted(present, key=lambda c: (-radical_totals[c], radicals[c]))
+        arrays["radical_ranking"] = np.asarray(ranked, dtype=np.int32)
+        arrays["radical_ranking_frequencies"] = radical_totals[arrays["radical_ranking"]]
+        meta["radical_total"] = len(present) + int(not with_radical.all())
+
+        # Words
+        arrays.update(_Strings.encode("words", [row[1] for row in words]))
+        arrays.update(_Strings.encode("word_sounds", [row[2] for row in words]))
+
+        # Characters within words, weighted by the words' occurrences (ties in word id order)
+        counter = Counter()
+        for i in np.flatnonzero(word_occurs):
+            frequency = int(word_frequencies[i])
+            for char in words[i][1]:
+                counter[char] += frequency
+        top_chars = counter.most_common()
+        arrays["word_char_chars"] = _codepoints(char for char, _ in top_chars)
+        arrays["word_char_frequencies"] = _int_array((f for _, f in top_chars), len(top_chars))
+
+        # Words containing each character (CSR over code points): most frequent first, then by word
+        frequencies = word_frequencies.tolist()
+        rank = np.empty(len(words), dtype=np.int64)
+        rank[sorted(range(len(words)), key=lambda i: (-frequencies[i], words[i][1]))] = np.arange(len(words))
+        positions, known = _positions(word_ids, _int_array((row[1] for row in word_chars), len(word_chars)))
+        chars = _codepoints(row[0] for row in word_chars)[known].astype(np.int64)
+        pairs = np.unique(chars * (len(words) + 1) + positions[known]) # one row per (char, word)
+        chars, positions = pairs // (len(words) + 1), pairs % (len(words) + 1)
+        order = np.lexsort((rank[positions], chars))
+        chars, positions = chars[order], positions[order]
+        arrays["char_words_chars"] = np.unique(chars).astype(np.uint32)
+        arrays["char_words_indptr"] = np.searchsorted(chars, np.r_[arrays["char_words_chars"], 0x110000]).astype(np.int64)
+        arrays["char_words"] = positions.astype(np.int32)
+
+        # Quiz pools: only Hanja with a reading and words with a sound make questions
+        arrays["quiz_hanja"] = np.flatnonzero(np.diff(arrays["reading_indptr"]) > 0).astype(np.int32)
+        arrays["quiz_words"] = np.flatnonzero(~arrays["word_sounds.nulls"]).astype(np.int32)
+        return cls(arrays, meta)
+
+    # --- Snapshot file ---
+
+    def save(self, path: str):
+        """
+        Writes the arrays to `path`: magic, header length, JSON header (meta and
+        each array's dtype/shape/offset), then the raw arrays, 64-byte aligned.
+        The file is written next to `path` and moved over it atomically.
+        """
+        import numpy as np
+        layout, offset = {}, 0
+        for name, array in self.arrays.items():
+            offset = _align(offset)
+            layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset += array.nbytes
+        header = json.dumps({"meta": self.meta, "arrays": layout}).encode("utf-8")
+        data_start = _align(_HEADER_START + len(header))
+
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(SNAPSHOT_MAGIC + len(header).to_bytes(8, "little") + header)
+                for name, array in self.arrays.items():
+                    f.write(b"\0" * (data_start + layout[name]["offset"] - f.tell()))
+                    f.write(np.ascontiguousarray(array).tobytes())
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @classmethod
+    def open(cls, path: str) -> "ReadModel":
+        """Maps a saved snapshot read-only; the arrays point into the mapping (no copy). ValueError if not a snapshot."""
+        import numpy as np
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if buffer[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            buffer.close()
+            raise ValueError(f"Not a read model snapshot: {path}")
+        header_length = int.from_bytes(buffer[len(SNAPSHOT_MAGIC):_HEADER_START], "little")
+        header = json.loads(buffer[_HEADER_START:_HEADER_START + header_length])
+        data_start = _align(_HEADER_START + header_length)
+        arrays = {}
+        for name, spec in header["arrays"].items():
+            dtype, shape = np.dtype(spec["dtype"]), tuple(spec["shape"])
+            count = int(np.prod(shape))
+            arrays[name] = (
+                np.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + spec["offset"]).reshape(shape)
+                if count else np.zeros(shape, dtype=dtype)
+            )
+        return cls(arrays, header["meta"], buffer)
+
+    # --- Lookups ---
+
+    def _readings(self, position: int) -> tuple:
+        indptr = self.arrays["reading_indptr"]
+        sounds, meanings = self._strings["reading_sounds"], self._strings["reading_meanings"]
+        return tuple(ReadingRecord(sounds[j], meanings[j]) for j in range(indptr[position], indptr[position + 1]))
+
+    def _lookup(self, ids: "np.ndarray", value: int):
+        position = int(ids.searchsorted(value))
+        if position < len(ids) and ids[position] == value:
+            return position
+        return None
+
+    def hanja_by_id(self, hanja_id: int):
+        position = self._lookup(self.hanja_ids, hanja_id)
+        return None if position is None else HanjaRecord(self, position)
+
+    def hanja_by_char(self, char: str):
+        if len(char) != 1:
+            return None
+        chars, order = self.arrays["hanja_chars"], self.arrays["hanja_by_char"]
+        i = int(chars.searchsorted(ord(char), sorter=order))
+        if i < len(order) and chars[order[i]] == ord(char):
+            return HanjaRecord(self, int(order[i]))
+        return None
+
+    def word_by_id(self, word_id: int):
+        position = self._lookup(self.word_ids, word_id)
+        return None if position is None else WordRecord(self, position)
+
+    # --- Global analysis tables ---
+
+    def top_hanja(self, offset: int, size: int) -> tuple:
+        """(total, [(HanjaRecord, frequency)]) of the Hanja occurring in any document, most frequent first."""
+        ranking = self.arrays["hanja_ranking"]
+        return len(ranking), [
+            (HanjaRecord(self, int(i)), int(self.hanja_frequencies[i])) for i in ranking[offset:offset + size]
+        ]
+
+    def top_radicals(self, offset: int, size: int) -> tuple:
+        """(total, [(radical, frequency)]) summed over the occurring Hanja, most frequent first."""
+        codes = self.arrays["radical_ranking"][offset:offset + size]
+        frequencies = self.arrays["radical_ranking_frequencies"][offset:offset + size]
+        return self.meta["radical_total"], [(self.radicals[c], int(f)) for c, f in zip(codes, frequencies)]
+
+    def top_word_chars(self, offset: int, size: int) -> tuple:
+        """(total, [(char, frequency)]) of the characters within the occurring words, weighted by their frequency."""
+        chars = self.arrays["word_char_chars"]
+        frequencies = self.arrays["word_char_frequencies"][offset:offset + size]
+        return len(chars), [(chr(c), int(f)) for c, f in zip(chars[offset:offset + size], frequencies)]
+
+    def char_words(self, char: str, offset: int, size: int) -> tuple:
+        """(total, [(WordRecord, frequency)]) of the words containing `char`; words without occurrences count 0."""
+        chars = self.arrays["char_words_chars"]
+        i = int(chars.searchsorted(ord(char))) if len(char) == 1 else len(chars)
+        if i == len(chars) or chars[i] != ord(char):
+            return 0, []
+        start, end = self.arrays["char_words_indptr"][i:i + 2]
+        page = self.arrays["char_words"][start:end][offset:offset + size]
+        return int(end - start), [(WordRecord(self, int(p)), int(self.word_frequencies[p])) for p in page]
+
+    # --- Quiz pools ---
+
+    def hanja_candidates(self, radical: str = None, limit: int = None) -> list:
+        """The first `limit` Hanja in id order, optionally of one radical."""
+        if radical is None:
+            positions = range(len(self.hanja_ids))[:limit]
+        else:
+            code = self._code_by_radical.get(radical)
+            if code is None:
+                return []
+            positions = (self.radical_codes == code).nonzero()[0][:limit].tolist()
+        return [HanjaRecord(self, i) for i in positions]
+
+    def sample_hanja(self, k: int, exclude_radical: str = None) -> list:
+        """Up to k random Hanja with a reading, optionally not of `exclude_radical`."""
+        pool = self.arrays["quiz_hanja"]
+        code = self._code_by_radical.get(exclude_radical)
+        if code is not None:
+            pool = pool[self.radical_codes[pool] != code]
+        return [HanjaRecord(self, int(pool[i])) for i in random.sample(range(len(pool)), min(k, len(pool)))]
+
+    def sample_words(self, k: int) -> list:
+        """Up to k random words with a sound."""
+        pool = self.arrays["quiz_words"]
+        return [WordRecord(self, int(pool[i])) for i in random.sample(range(len(pool)), min(k, len(pool)))]
+
+class ReadModelCache:
+    """
+    Holds the current ReadModel and replaces it when the data version changes
+    (the first reader after a change builds or maps it while the others wait).
+    With `path`, the snapshot is shared through that file (see the module
+    docstring). Thread-safe.
+    """
+
+    def __init__(self, repository: HanjaRepository = None, path: str = None):
+        self.repository = repository or HanjaRepository()
+        self.path = path
+        self._model = None
+        self._lock = threading.Lock()
+
+    def get(self, session) -> ReadModel:
+        version = self.repository.get_data_version(session)
+        model = self._model
+        record_cache("read_model", hit=model is not None and model.data_version == version)
+        if model is not None and model.data_version == version:
+            return model
+        with self._lock:
+            model = self._model
+            if model is None or model.data_version != version:
+                model = self._load(session, version)
+                self._model = model
+                READ_MODEL_BYTES.set(model.nbytes)
+        return model
+
+    def _load(self, session, version: int) -> ReadModel:
+        if self.path is None:
+            return ReadModel.load(session, version)
+        fingerprint = database_fingerprint(session, version)
+        try:
+            model = ReadModel.open(self.path)
+            if model.fingerprint == fingerprint:
+                return model
+        except (OSError, ValueError, KeyError):
+            pass # missing, unreadable or of another format: rebuilt below
+        model = ReadModel.load(session, version, fingerprint)
+        try:
+            model.save(self.path)
+            return ReadModel.open(self.path)
+        except OSError as e:
+            # e.g. the file is mapped by another process on Windows: serve this process's copy
+            print(f"Could not write the read model snapshot {self.path}: {e}")
+            return model
+
+    def invalidate(self):
+        """Drops the snapshot (e.g. after writes that did not bump the data version)."""
+        with self._lock:
+            self._model = None
+
+def write_snapshot(session_factory, path: str) -> ReadModel:
+    """Brings the snapshot file at `path` up to date with the database (run after ingestion)."""
+    session = session_factory()
+    try:
+        return ReadModelCache(path=path).get(session)
+    finally:
+        session.close()
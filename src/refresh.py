@@ -0,0 +1,171 @@
+"""
+Incremental re-enrichment after the reference dictionary (hanja.csv) changes.
+
+HanjaInfo/HanjaReading rows are copied from RefHanja when a character is first
+ingested (placeholder "미상" readings if the reference lacks it), so editing
+hanja.csv used to require rebuilding the database. `DictionaryRefresher`
+instead diffs the reference snapshot stored in ref_hanja against the new CSV
+and rewrites only the collected Hanja whose enrichment changes, without
+re-reading any document.
+
+For each affected character the old and the new lookup results are compared
+with what is stored (a three-way merge), so edits made after ingest survive:
+
+    radical/strokes  replaced only while they still hold the old reference value
+                     (or are empty)
+    readings         readings from the old or the new reference are replaced by
+                     the new reference readings, in dictionary order (the first
+                     one is the quiz answer); other readings, e.g. from a
+                     progress import, are kept after them
+
+Collected Hanja are updated `batch_size` characters per transaction and the
+reference tables last, so an interrupted refresh is simply run again: the old
+snapshot is still in ref_hanja and already updated rows compare equal.
+"""
+from typing import NamedTuple
+
+from sqlalchemy.orm import selectinload
+
+from src.dictionary import HanjaDictionary
+from src.loader import REFERENCE_CSV, RefEntry, read_reference_csv
+from src.models import HanjaInfo, HanjaReading, RefHanja, RefHanjaReading
+from src.repository import HanjaRepository
+
+class ReferenceDiff(NamedTuple):
+    added: dict # char -> new RefEntry
+    changed: dict # char -> (old RefEntry, new RefEntry)
+    removed: dict # char -> old RefEntry
+
+    @property
+    def chars(self) -> set:
+        return set(self.added) | set(self.changed) | set(self.removed)
+
+def diff_reference(old: dict, new: dict) -> ReferenceDiff:
+    """Compares two {char: RefEntry} snapshots."""
+    return ReferenceDiff(
+        added={char: entry for char, entry in new.items() if char not in old},
+        changed={char: (old[char], entry) for char, entry in new.items() if char in old and old[char] != entry},
+        removed={char: entry for char, entry in old.items() if char not in new},
+    )
+
+def load_reference_snapshot(session) -> dict:
+    """The reference dictionary currently stored in ref_hanja as {char: RefEntry}."""
+    readings = {}
+    for hanja_id, sound, meaning in (
+        session.query(RefHanjaReading.hanja_id, RefHanjaReading.sound, RefHanjaReading.meaning).order_by(RefHanjaReading.id)
+    ):
+        readings.setdefault(hanja_id, []).append((sound, meaning))
+    return {
+        char: RefEntry(radical, strokes, level, tuple(readings.get(hanja_id, ())))
+        for hanja_id, char, radical, strokes, level in session.query(
+            RefHanja.id, RefHanja.char, RefHanja.radical, RefHanja.strokes, RefHanja.level
+        )
+    }
+
+class RefreshReport:
+    def __init__(self, diff: ReferenceDiff):
+        self.diff = diff
+        self.hanja_updated = 0
+        self.readings_replaced = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "added": len(self.diff.added),
+            "changed": len(self.diff.changed),
+            "removed": len(self.diff.removed),
+            "hanja_updated": self.hanja_updated,
+            "readings_replaced": self.readings_replaced,
+        }
+
+class DictionaryRefresher:
+    def __init__(self, session_factory, dictionary: HanjaDictionary = None, repository: HanjaRepository = None,
+                 batch_size: int = 500):
+        self.Session = session_factory
+        self.dictionary = dictionary or HanjaDictionary()
+        self.repository = repository or HanjaRepository()
+        self.batch_size = batch_size
+
+    def _info(self, char: str, entry: RefEntry) -> dict:
+        """What dictionary.lookup returns for `char` with this reference entry (None: not in the reference)."""
+        if entry is None:
+            return self.dictionary.fallback_info(char)
+        readings = [{'sound': sound, 'meaning': meaning} for sound, meaning in entry.readings]
+        return self.dictionary.reference_info(char, entry.radical, entry.strokes, readings)
+
+    @staticmethod
+    def _stored_readings(info: dict) -> list:
+        """(sound, meaning) pairs that repository.add_hanja_info stores for a lookup result."""
+        if info.get("readings"):
+            return [(r['sound'], r['meaning']) for r in info["readings"] if r.get('sound')]
+        return [(info["sound"], info["meaning"])]
+
+    def _merge(self, session, hanja: HanjaInfo, old: dict, new: dict, report: RefreshReport):
+        changed = False
+        for field, empty in [("radical", ""), ("strokes", 0)]:
+            current = getattr(hanja, field)
+            if current in (None, empty, old[field]) and current != new[field]:
+                setattr(hanja, field, new[field])
+                changed = True
+
+        new_readings = self._stored_readings(new)
+        managed = set(self._stored_readings(old)) | set(new_readings)
+        current = sorted(hanja.readings, key=lambda r: r.id)
+        kept = [(r.sound, r.meaning) for r in current if (r.sound, r.meaning) not in managed]
+        wanted = new_readings + [pair for pair in dict.fromkeys(kept) if pair not in new_readings]
+        if [(r.sound, r.meaning) for r in current] != wanted:
+            # Explicit deletes (not delete-orphan) so the flush hook also removes them from hanja_readings_fts
+            for reading in current:
+                session.delete(reading)
+            hanja.readings = [HanjaReading(sound=sound, meaning=meaning) for sound, meaning in wanted]
+            report.readings_replaced += len(current)
+            changed = True
+        if changed:
+            report.hanja_updated += 1
+
+    def _update_reference(self, session, diff: ReferenceDiff):
+        if diff.removed:
+            for hanja in session.query(RefHanja).filter(RefHanja.char.in_(list(diff.removed))):
+                session.delete(hanja)
+        for hanja in session.query(RefHanja).filter(RefHanja.char.in_(list(diff.changed))).options(selectinload(RefHanja.readings)):
+            entry = diff.changed[hanja.char][1]
+            hanja.radical, hanja.strokes, hanja.level = entry.radical, entry.strokes, entry.level
+            hanja.readings = [RefHanjaReading(sound=sound, meaning=meaning) for sound, meaning in entry.readings]
+        for char, entry in diff.added.items():
+            hanja = RefHanja(char=char, radical=entry.radical, strokes=entry.strokes, level=entry.level)
+            hanja.readings = [RefHanjaReading(sound=sound, meaning=meaning) for sound, meaning in entry.readings]
+            session.add(hanja)
+
+    def refresh(self, path: str = REFERENCE_CSV, dry_run: bool = False) -> RefreshReport:
+        """
+        Applies the difference between ref_hanja and the CSV at `path` to the
+        collected Hanja and then to ref_hanja. With `dry_run`, only computes the
+        diff.
+        """
+        new = read_reference_csv(path)
+        session = self.Session()
+        try:
+            old = load_reference_snapshot(session)
+            diff = diff_reference(old, new)
+            report = RefreshReport(diff)
+            if dry_run or not diff.chars:
+                return report
+
+            chars = sorted(diff.chars)
+            for start in range(0, len(chars), self.batch_size):
+                batch = chars[start:start + self.batch_size]
+                for hanja in (
+                    session.query(HanjaInfo).filter(HanjaInfo.char.in_(batch)).options(selectinload(HanjaInfo.readings))
+                ):
+                    self._merge(session, hanja, self._info(hanja.char, old.get(hanja.char)),
+                                self._info(hanja.char, new.get(hanja.char)), report)
+                session.commit()
+
+            self._update_reference(session, diff)
+            self.repository.bump_data_version(session)
+            session.commit()
+            return report
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
@@ -1,7 +1,23 @@
-from sqlalchemy.orm import sessionmaker
+from collections import Counter
+from sqlalchemy.orm import sessionmaker, aliased, selectinload
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy import update, select, delete, or_, literal
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.sql import func
-from src.models import HanjaInfo, UsageExample, Document, DocumentHanja, DocumentWord, HanjaReading, RefHanja, RefHanjaReading, UserProgress
+from src.models import HanjaInfo, UsageExample, Document, DocumentHanja, DocumentWord, HanjaReading, RefHanja, RefHanjaReading, UserProgress, DEFAULT_USER_ID, AppMeta, DATA_VERSION_KEY
+from src.models import Collection, CollectionDocument, CollectionHanja, CollectionWord, DocumentSignature, DocumentLshBucket
+
+# Precomputed collection aggregate -> (occurrence table, target column)
+COLLECTION_AGGREGATES = [
+    (CollectionHanja, DocumentHanja, "hanja_id"),
+    (CollectionWord, DocumentWord, "word_id"),
+]
+
+IN_CHUNK_SIZE = 500 # values per IN (...) list
+
+def _chunks(values: list, size: int = IN_CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
 
 class HanjaRepository:
     def __init__(self):
@@ -82,32 +98,95 @@ class HanjaRepository:
             session.add(doc_word)
         return doc_word
 
-    def get_user_progress(self, session, hanja_id: int = None, word_id: int = None) -> UserProgress:
+    def add_document_occurrences(self, session, document_id: int, hanja_infos: list, word_sounds: list):
+        """
+        Set-based equivalent of add_hanja_info + update_document_hanja_frequency for
+        every dictionary lookup result, and add_usage_example +
+        update_document_word_frequency for every (word, sound): a handful of
+        statements per document instead of several per item, so the ingest write
+        transaction stays short.
+        """
+        hanja_by_char = {}
+        for chunk in _chunks(list({info["char"] for info in hanja_infos})):
+            query = session.query(HanjaInfo).filter(HanjaInfo.char.in_(chunk)).options(selectinload(HanjaInfo.readings))
+            hanja_by_char.update((hanja.char, hanja) for hanja in query)
+        for info in hanja_infos:
+            hanja = hanja_by_char.get(info["char"])
+            if hanja is None:
+                hanja = HanjaInfo(char=info["char"], radical=info["radical"], strokes=info["strokes"])
+                session.add(hanja)
+                hanja_by_char[info["char"]] = hanja
+            else:
+                # Update info if missing
+                if info["radical"] and not hanja.radical: hanja.radical = info["radical"]
+                if info["strokes"] and not hanja.strokes: hanja.strokes = info["strokes"]
+            if info.get("readings"):
+                known = {(r.sound, r.meaning) for r in hanja.readings}
+                new = [(r.get("sound"), r.get("meaning")) for r in info["readings"] if r.get("sound")]
+            else:
+                # Single sound/meaning (legacy): matched by sound only
+                known = {r.sound for r in hanja.readings}
+                new = [(info["sound"], info["meaning"])]
+            for sound, meaning in new:
+                key = (sound, meaning) if info.get("readings") else sound
+                if key not in known:
+                    hanja.readings.append(HanjaReading(sound=sound, meaning=meaning))
+                    known.add(key)
+
+        words_by_text = {}
+        for chunk in _chunks(list({word for word, _ in word_sounds})):
+            words_by_text.update((w.word, w) for w in session.query(UsageExample).filter(UsageExample.word.in_(chunk)))
+        for word, sound in word_sounds:
+            example = words_by_text.get(word)
+            if example is None:
+                example = UsageExample(word=word, sound=sound)
+                session.add(example)
+                words_by_text[word] = example
+            elif sound and not example.sound:
+                example.sound = sound
+        session.flush()
+
+        # Occurrences: one row per target and document, incremented if it already exists
+        for model, target, counts, by_key in [
+            (DocumentHanja, "hanja_id", Counter(info["char"] for info in hanja_infos), hanja_by_char),
+            (DocumentWord, "word_id", Counter(word for word, _ in word_sounds), words_by_text),
+        ]:
+            if not counts:
+                continue
+            stmt = sqlite_insert(model)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["document_id", target], set_={"frequency": model.frequency + stmt.excluded.frequency}
+            )
+            session.execute(stmt, [
+                {"document_id": document_id, target: by_key[key].id, "frequency": count} for key, count in counts.items()
+            ])
+
+    def get_user_progress(self, session, hanja_id: int = None, word_id: int = None, user_id: str = DEFAULT_USER_ID) -> UserProgress:
         if hanja_id:
-            return session.query(UserProgress).filter_by(hanja_id=hanja_id).first()
+            return session.query(UserProgress).filter_by(user_id=user_id, hanja_id=hanja_id).first()
         elif word_id:
-            return session.query(UserProgress).filter_by(word_id=word_id).first()
+            return session.query(UserProgress).filter_by(user_id=user_id, word_id=word_id).first()
         return None
 
-    def update_importance_level(self, session, hanja_id: int = None, word_id: int = None, change: int = 0) -> UserProgress:
+    def update_importance_level(self, session, hanja_id: int = None, word_id: int = None, change: int = 0, user_id: str = DEFAULT_USER_ID) -> UserProgress:
         if not (hanja_id or word_id):
             raise ValueError("Either hanja_id or word_id must be provided.")
 
         progress = None
         if hanja_id:
-            progress = session.query(UserProgress).filter_by(hanja_id=hanja_id).first()
+            progress = session.query(UserProgress).filter_by(user_id=user_id, hanja_id=hanja_id).first()
             if not progress:
                 # Default start level is 5. If correct (-1) -> 4, if wrong (+1) -> 6
                 initial_level = 5
-                progress = UserProgress(hanja_id=hanja_id, importance_level=max(0, initial_level + change))
+                progress = UserProgress(user_id=user_id, hanja_id=hanja_id, importance_level=max(0, initial_level + change))
                 session.add(progress)
             else:
                 progress.importance_level = max(0, progress.importance_level + change)
         elif word_id:
-            progress = session.query(UserProgress).filter_by(word_id=word_id).first()
+            progress = session.query(UserProgress).filter_by(user_id=user_id, word_id=word_id).first()
             if not progress:
                 initial_level = 5
-                progress = UserProgress(word_id=word_id, importance_level=max(0, initial_level + change))
+                progress = UserProgress(user_id=user_id, word_id=word_id, importance_level=max(0, initial_level + change))
                 session.add(progress)
             else:
                 progress.importance_level = max(0, progress.importance_level + change)
@@ -115,17 +194,115 @@ class HanjaRepository:
         session.flush()
         return progress
 
-    def get_all_user_progress(self, session, min_importance: int = 0):
-        query = session.query(UserProgress).filter(UserProgress.importance_level >= min_importance)
+    def set_importance_levels(self, session, levels: dict) -> int:
+        """
+        Writes absolute importance levels in bulk.
+        levels: {(user_id, 'hanja', hanja_id) or (user_id, 'word', word_id): level}
+        Existing progress rows are fetched with one IN query per learner and kind; missing rows are inserted.
+        """
+        groups = {}
+        for (user_id, kind, target_id), level in levels.items():
+            groups.setdefault((user_id, kind), {})[target_id] = level
+
+        for (user_id, kind), targets in groups.items():
+            column = UserProgress.hanja_id if kind == 'hanja' else UserProgress.word_id
+            existing = session.query(UserProgress).filter(
+                UserProgress.user_id == user_id, column.in_(list(targets))
+            ).all()
+            for up in existing:
+                target_id = up.hanja_id if kind == 'hanja' else up.word_id
+                up.importance_level = targets.pop(target_id)
+            for target_id, level in targets.items():
+                if kind == 'hanja':
+                    session.add(UserProgress(user_id=user_id, hanja_id=target_id, importance_level=level))
+                else:
+                    session.add(UserProgress(user_id=user_id, word_id=target_id, importance_level=level))
+        session.flush()
+        return len(levels)
+
+    def get_all_user_progress(self, session, min_importance: int = 0, user_id: str = DEFAULT_USER_ID):
+        query = session.query(UserProgress).filter(
+            UserProgress.user_id == user_id, UserProgress.importance_level >= min_importance
+        )
         return query.order_by(UserProgress.importance_level.desc(), UserProgress.last_tested_at.asc()).all()
     
-    def get_user_progress_hanja(self, session, hanja_id: int) -> UserProgress:
-        return session.query(UserProgress).filter_by(hanja_id=hanja_id).first()
+    def get_user_progress_hanja(self, session, hanja_id: int, user_id: str = DEFAULT_USER_ID) -> UserProgress:
+        return session.query(UserProgress).filter_by(user_id=user_id, hanja_id=hanja_id).first()
+
+    def get_user_progress_word(self, session, word_id: int, user_id: str = DEFAULT_USER_ID) -> UserProgress:
+        return session.query(UserProgress).filter_by(user_id=user_id, word_id=word_id).first()
+
+    def get_importance_histogram(self, session, user_id: str = DEFAULT_USER_ID) -> list:
+        """
+        Counts a learner's tracked Hanja and words per importance level with a single GROUP BY.
+        Returns [(importance_level, hanja_count, word_count)] ordered by level.
+        """
+        rows = (
+            session.query(UserProgress.importance_level, func.count(UserProgress.hanja_id), func.count())
+            .filter(UserProgress.user_id == user_id)
+            .group_by(UserProgress.importance_level)
+            .order_by(UserProgress.importance_level)
+            .all()
+        )
+        # Hanja and word progress are mutually exclusive, so the rest of each group are words
+        return [(level, hanja_count, total - hanja_count) for level, hanja_count, total in rows]
+
+    def get_progress_page(self, session, kind: str, page: int = 1, size: int = 50, min_level: int = None,
+                          max_level: int = None, search: str = None, user_id: str = DEFAULT_USER_ID):
+        """
+        Returns one page of a learner's Hanja (kind='hanja') or word (kind='word') progress,
+        most important and least recently tested first, with the filters applied in SQL.
+        `search` matches the Hanja/word or its reading. Returns (total, rows) where rows are
+        dicts with target, meaning, sound, radical, importance_level and last_tested_at.
+        """
+        if kind == 'hanja':
+            # First reading per Hanja (same as readings[0]) joined in, instead of a lazy load per row
+            first_reading = aliased(HanjaReading)
+            first_reading_id = (
+                select(func.min(first_reading.id))
+                .where(first_reading.hanja_id == HanjaInfo.id)
+                .correlate(HanjaInfo)
+                .scalar_subquery()
+            )
+            target_column = UserProgress.hanja_id
+            columns = [HanjaInfo.char, HanjaReading.meaning, HanjaReading.sound, HanjaInfo.radical]
+            query = (
+                session.query(UserProgress.id)
+                .join(HanjaInfo, UserProgress.hanja_id == HanjaInfo.id)
+                .outerjoin(HanjaReading, HanjaReading.id == first_reading_id)
+            )
+            search_columns = [HanjaInfo.char, HanjaReading.meaning, HanjaReading.sound]
+        elif kind == 'word':
+            target_column = UserProgress.word_id
+            columns = [UsageExample.word, literal(None), UsageExample.sound, literal(None)]
+            query = session.query(UserProgress.id).join(UsageExample, UserProgress.word_id == UsageExample.id)
+            search_columns = [UsageExample.word, UsageExample.sound]
+        else:
+            raise ValueError(f"Unknown progress kind: {kind}")
 
-    def get_user_progress_word(self, session, word_id: int) -> UserProgress:
-        return session.query(UserProgress).filter_by(word_id=word_id).first()
+        filters = [UserProgress.user_id == user_id, target_column != None]
+        if min_level is not None:
+            filters.append(UserProgress.importance_level >= min_level)
+        if max_level is not None:
+            filters.append(UserProgress.importance_level <= max_level)
+        query = query.filter(*filters)
+        if search:
+            query = query.filter(or_(*(column.contains(search, autoescape=True) for column in search_columns)))
+            total = query.with_entities(func.count()).scalar()
+        else:
+            # Without a search the joins cannot drop rows; count from the progress indexes alone
+            total = session.query(func.count(UserProgress.id)).filter(*filters).scalar()
+        rows = (
+            query.with_entities(*columns, UserProgress.importance_level, UserProgress.last_tested_at)
+            .order_by(UserProgress.importance_level.desc(), UserProgress.last_tested_at.asc())
+            .offset((page - 1) * size)
+            .limit(size)
+            .all()
+        )
+        keys = ('target', 'meaning', 'sound', 'radical', 'importance_level', 'last_tested_at')
+        return total, [dict(zip(keys, row)) for row in rows]
 
-    def get_flat_progress(self, session):
+    def get_flat_progress(self, session, user_id: str = DEFAULT_USER_ID):
         """
         Returns a flat list of user progress for CSV export.
         Format: [{'type': 'hanja'/'word', 'target': char/word, 'meaning': ..., 'sound': ..., 'importance_level': ...}]
@@ -133,7 +310,7 @@ class HanjaRepository:
         results = []
         
         # 1. Hanja Progress
-        hanja_progress = session.query(UserProgress).filter(UserProgress.hanja_id != None).all()
+        hanja_progress = session.query(UserProgress).filter(UserProgress.user_id == user_id, UserProgress.hanja_id != None).all()
         for up in hanja_progress:
             if up.hanja:
                 reading = up.hanja.readings[0] if up.hanja.readings else None
@@ -148,7 +325,7 @@ class HanjaRepository:
                 })
         
         # 2. Word Progress
-        word_progress = session.query(UserProgress).filter(UserProgress.word_id != None).all()
+        word_progress = session.query(UserProgress).filter(UserProgress.user_id == user_id, UserProgress.word_id != None).all()
         for up in word_progress:
             if up.word:
                 results.append({
@@ -161,7 +338,7 @@ class HanjaRepository:
                 
         return results
 
-    def import_progress_data(self, session, data_list):
+    def import_progress_data(self, session, data_list, user_id: str = DEFAULT_USER_ID):
         """
         Imports progress data from a list of dicts.
         Creates Hanja/Word/Readings if they don't exist, then updates UserProgress.
@@ -193,11 +370,11 @@ class HanjaRepository:
                     session.add(reading)
                 
                 # Create/Update Progress
-                up = session.query(UserProgress).filter_by(hanja_id=hanja.id).first()
+                up = session.query(UserProgress).filter_by(user_id=user_id, hanja_id=hanja.id).first()
                 if up:
                     up.importance_level = level
                 else:
-                    session.add(UserProgress(hanja_id=hanja.id, importance_level=level))
+                    session.add(UserProgress(user_id=user_id, hanja_id=hanja.id, importance_level=level))
                 count += 1
 
             elif p_type == 'word':
@@ -209,13 +386,15 @@ class HanjaRepository:
                     session.flush()
                 
                 # Create/Update Progress
-                up = session.query(UserProgress).filter_by(word_id=word.id).first()
+                up = session.query(UserProgress).filter_by(user_id=user_id, word_id=word.id).first()
                 if up:
                     up.importance_level = level
                 else:
-                    session.add(UserProgress(word_id=word.id, importance_level=level))
+                    session.add(UserProgress(user_id=user_id, word_id=word.id, importance_level=level))
                 count += 1
                 
+        if count:
+            self.bump_data_version(session)
         session.commit()
         return count
 
@@ -224,3 +403,132 @@ class HanjaRepository:
 
     def get_all_usage_examples(self, session):
         return session.query(UsageExample).all()
+
+    def get_all_words(self, session) -> list:
+        """Returns only the word strings of all UsageExamples (no ORM objects)."""
+        return [w for (w,) in session.query(UsageExample.word).all()]
+
+    # --- Near-duplicate detection (src/minhash.py) ---
+
+    def add_document_signature(self, session, document_id: int, signature: bytes, buckets: list,
+                               near_duplicate_of: int = None, similarity: float = None) -> DocumentSignature:
+        record = DocumentSignature(document_id=document_id, signature=signature,
+                                   near_duplicate_of=near_duplicate_of, similarity=similarity)
+        session.add(record)
+        session.add_all([DocumentLshBucket(document_id=document_id, bucket=bucket) for bucket in buckets])
+        session.flush()
+        return record
+
+    def has_document_signature(self, session, document_id: int) -> bool:
+        return session.get(DocumentSignature, document_id) is not None
+
+    def get_signature_candidates(self, session, buckets: list) -> list:
+        """[(document_id, filename, signature)] of the documents sharing at least one LSH bucket."""
+        candidates = select(DocumentLshBucket.document_id).where(DocumentLshBucket.bucket.in_(buckets)).distinct()
+        return session.query(Document.id, Document.filename, DocumentSignature.signature) \
+            .join(DocumentSignature, DocumentSignature.document_id == Document.id) \
+            .filter(Document.id.in_(candidates)).all()
+
+    # --- Collections ---
+
+    def get_collection(self, session, name: str) -> Collection:
+        return session.query(Collection).filter_by(name=name).first()
+
+    def list_collections(self, session) -> list:
+        """Returns [(Collection, document_count)] ordered by name."""
+        document_count = func.count(CollectionDocument.id)
+        return session.query(Collection, document_count).outerjoin(CollectionDocument) \
+            .group_by(Collection.id).order_by(Collection.name).all()
+
+    def add_documents_to_collection(self, session, name: str, document_ids) -> Collection:
+        """
+        Adds documents to a collection (created if missing) and adds their occurrence
+        counts to the collection's precomputed aggregates. Unknown and already-member
+        ids are ignored; the data version is bumped only if documents were added.
+        Flushes; the caller commits.
+        """
+        collection = self.get_collection(session, name)
+        if collection is None:
+            collection = Collection(name=name)
+            session.add(collection)
+            session.flush()
+        members = select(CollectionDocument.document_id).where(CollectionDocument.collection_id == collection.id)
+        new_ids = session.execute(
+            select(Document.id).where(Document.id.in_(list(document_ids)), Document.id.not_in(members))
+        ).scalars().all()
+        if new_ids:
+            session.add_all([CollectionDocument(collection_id=collection.id, document_id=i) for i in new_ids])
+            session.flush()
+            self._add_collection_aggregates(session, collection.id, new_ids)
+            self.bump_data_version(session)
+        return collection
+
+    def set_collection_documents(self, session, name: str, document_ids) -> Collection:
+        """Replaces a collection's documents (created if missing) and recomputes its aggregates."""
+        collection = self.get_collection(session, name)
+        if collection is not None:
+            members = set(self._collection_document_ids(session, collection.id))
+            document_ids = session.execute(
+                select(Document.id).where(Document.id.in_(list(document_ids)))
+            ).scalars().all()
+            if members == set(document_ids):
+                return collection
+            session.execute(delete(CollectionDocument).where(CollectionDocument.collection_id == collection.id))
+            for aggregate, _, _ in COLLECTION_AGGREGATES:
+                session.execute(delete(aggregate).where(aggregate.collection_id == collection.id))
+            session.expire(collection, ["documents"])
+            if members and not document_ids:
+                self.bump_data_version(session) # emptied: nothing is added below
+        return self.add_documents_to_collection(session, name, document_ids)
+
+    def delete_collection(self, session, name: str) -> bool:
+        collection = self.get_collection(session, name)
+        if collection is None:
+            return False
+        had_documents = bool(self._collection_document_ids(session, collection.id))
+        for aggregate, _, _ in COLLECTION_AGGREGATES:
+            session.execute(delete(aggregate).where(aggregate.collection_id == collection.id))
+        session.delete(collection)
+        if had_documents:
+            self.bump_data_version(session)
+        return True
+
+    def _collection_document_ids(self, session, collection_id: int) -> list:
+        return session.execute(
+            select(CollectionDocument.document_id).where(CollectionDocument.collection_id == collection_id)
+        ).scalars().all()
+
+    def _add_collection_aggregates(self, session, collection_id: int, document_ids):
+        # One INSERT ... SELECT ... GROUP BY per table over the covering occurrence index;
+        # targets already counted for the collection are incremented (UPSERT)
+        for aggregate, occurrence, target in COLLECTION_AGGREGATES:
+            target_column = getattr(occurrence, target)
+            rows = (
+                select(literal(collection_id), target_column, func.sum(occurrence.frequency))
+                .where(occurrence.document_id.in_(document_ids))
+                .group_by(target_column)
+            )
+            stmt = sqlite_insert(aggregate).from_select(["collection_id", target, "frequency"], rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["collection_id", target],
+                set_={"frequency": aggregate.frequency + stmt.excluded.frequency},
+            )
+            session.execute(stmt)
+
+    def get_data_version(self, session) -> int:
+        value = session.query(AppMeta.value).filter(AppMeta.key == DATA_VERSION_KEY).scalar()
+        return value or 0
+
+    def bump_data_version(self, session) -> int:
+        """
+        Increments the data version in the caller's transaction. Call it whenever
+        documents, collected Hanja/words or imported progress change, so caches
+        keyed by the version (e.g. the Streamlit analysis tables) are recomputed.
+        """
+        result = session.execute(
+            update(AppMeta).where(AppMeta.key == DATA_VERSION_KEY).values(value=AppMeta.value + 1)
+        )
+        if result.rowcount == 0:
+            session.add(AppMeta(key=DATA_VERSION_KEY, value=1))
+        session.flush()
+        return self.get_data_version(session)
@@ -1,5 +1,7 @@
+from datetime import date, datetime
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from src.models import DEFAULT_USER_ID
 
 class HanjaReadingResponse(BaseModel):
     sound: str
@@ -56,3 +58,101 @@ class PaginatedWordCharResponse(BaseModel):
     items: List[WordCharFrequencyResponse]
     page: int
     size: int
+
+class QuizQuestionResponse(BaseModel):
+    q_text: str
+    options: List[str]
+    info: Optional[str] = None
+    q_type: str
+    hanja_id: Optional[int] = None
+    word_id: Optional[int] = None
+
+class QuizBatchResponse(BaseModel):
+    items: List[QuizQuestionResponse]
+
+class QuizAnswerRequest(BaseModel):
+    q_type: str
+    answer: str
+    user_id: str = Field(DEFAULT_USER_ID, min_length=1, max_length=64)
+    hanja_id: Optional[int] = None
+    word_id: Optional[int] = None
+
+class QuizAnswerResponse(BaseModel):
+    correct: bool
+    correct_answer: str
+    importance_level: int
+
+class WordResponse(BaseModel):
+    id: int
+    word: str
+    sound: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class WordFrequencyResponse(BaseModel):
+    word: WordResponse
+    frequency: int
+
+class PaginatedWordResponse(BaseModel):
+    total: int
+    items: List[WordFrequencyResponse]
+    page: int
+    size: int
+
+class RelatedHanjaResponse(BaseModel):
+    hanja: HanjaInfoResponse
+    count: int # documents/words shared with the queried character
+    score: float # cosine similarity
+
+class RelatedHanjaListResponse(BaseModel):
+    char: str
+    source: str
+    items: List[RelatedHanjaResponse]
+
+class SearchResponse(BaseModel):
+    query: str
+    hanja: List[HanjaInfoResponse]
+    words: List[WordResponse]
+
+class CollectionRequest(BaseModel):
+    # Documents selected by any combination (AND) of these filters; see src.scope
+    document_ids: List[int] = []
+    filename: Optional[str] = None
+    ingested_from: Optional[date] = None
+    ingested_to: Optional[date] = None
+
+class CollectionResponse(BaseModel):
+    name: str
+    document_count: int
+    created_at: Optional[datetime] = None
+
+class DistinctiveItemResponse(BaseModel):
+    hanja: Optional[HanjaInfoResponse] = None # kind=hanja
+    word: Optional[WordResponse] = None # kind=word
+    frequency: int # within the selected documents
+    corpus_frequency: int
+    score: float
+
+class DistinctiveResponse(BaseModel):
+    kind: str
+    method: str
+    documents: int # selected documents with occurrences
+    items: List[DistinctiveItemResponse]
+
+class IngestJobResponse(BaseModel):
+    id: int
+    filename: str
+    collection: Optional[str] = None
+    status: str # queued, running, done or failed
+    attempts: int
+    error: Optional[str] = None
+    result: Optional[str] = None # done: ingested, or skipped (duplicate)
+    document_id: Optional[int] = None
+    near_duplicate_of: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,75 @@
+"""
+Document scopes: restrict the analysis aggregates to a subset of documents.
+
+A scope combines (AND) any of: explicit document ids, a filename pattern
+(shell-style, `*` and `?`, matched with SQLite GLOB), an ingest date range and
+a named collection. It compiles to a `SELECT documents.id` subquery that the
+aggregate queries filter their occurrence rows with; the covering indexes
+(document_id, target_id, frequency) on document_hanja/document_words make that
+a range scan per document.
+
+A scope that is only a collection is answered from the collection's
+precomputed aggregates (collection_hanja, collection_words) instead, so it is
+as cheap as the global rankings.
+"""
+from datetime import date, timedelta
+
+from sqlalchemy import String, literal, select
+
+from src.models import Collection, CollectionDocument, Document, DocumentWord
+
+def _date_bound(day: date):
+    # SQLite stores created_at as 'YYYY-MM-DD HH:MM:SS' text; a bare 'YYYY-MM-DD' sorts
+    # before every time of that day (a datetime bind would add '.000000' and miss midnight)
+    return literal(day.isoformat(), String)
+
+class DocumentScope:
+    def __init__(self, document_ids: list = None, filename: str = None, ingested_from: date = None,
+                 ingested_to: date = None, collection: str = None):
+        self.document_ids = list(document_ids) if document_ids else None
+        self.filename = filename or None
+        self.ingested_from = ingested_from
+        self.ingested_to = ingested_to # inclusive
+        self.collection = collection or None
+
+    def __repr__(self):
+        filters = {k: v for k, v in vars(self).items() if v is not None}
+        return f"<DocumentScope({filters})>"
+
+    @property
+    def is_global(self) -> bool:
+        """True if the scope selects every document."""
+        return all(v is None for v in vars(self).values())
+
+    @property
+    def collection_only(self) -> bool:
+        """True if the scope is exactly one collection (served from its precomputed aggregates)."""
+        return self.collection is not None and all(
+            v is None for k, v in vars(self).items() if k != "collection"
+        )
+
+    def collection_id_query(self):
+        return select(Collection.id).where(Collection.name == self.collection).scalar_subquery()
+
+    def document_ids_query(self):
+        """SELECT of the ids of the documents in the scope."""
+        query = select(Document.id)
+        if self.document_ids is not None:
+            query = query.where(Document.id.in_(self.document_ids))
+        if self.filename is not None:
+            query = query.where(Document.filename.op("GLOB")(self.filename))
+        if self.ingested_from is not None:
+            query = query.where(Document.created_at >= _date_bound(self.ingested_from))
+        if self.ingested_to is not None:
+            query = query.where(Document.created_at < _date_bound(self.ingested_to + timedelta(days=1)))
+        if self.collection is not None:
+            query = query.join(CollectionDocument, CollectionDocument.document_id == Document.id).where(
+                CollectionDocument.collection_id == self.collection_id_query()
+            )
+        return query
+
+    def word_ids_query(self):
+        """SELECT of the ids of the words occurring in the scope's documents."""
+        return select(DocumentWord.word_id).where(DocumentWord.document_id.in_(self.document_ids_query())).distinct()
+
+GLOBAL_SCOPE = DocumentScope()
@@ -0,0 +1,99 @@
+"""
+Full-text search over collected words and Hanja readings.
+
+Backed by the FTS5 tables declared in `src.models` (`usage_examples_fts`,
+`hanja_readings_fts`), which hold every text one character per token and are
+kept in sync by ORM flush events. A query is turned into an FTS phrase of its
+characters, so it matches any substring of the indexed text (or, with
+`prefix=True`, only texts starting with it) through the FTS index instead of a
+`LIKE '%...%'` scan.
+"""
+from sqlalchemy import text
+from sqlalchemy.orm import selectinload
+
+from src.models import HanjaInfo, SEARCH_TABLES, search_tokens
+
+SEARCH_FIELDS = {
+    # field: (usage_examples_fts columns, hanja_readings_fts columns)
+    "all": (["word", "sound"], ["char", "sound", "meaning"]),
+    "text": (["word"], ["char"]),
+    "sound": (["sound"], ["sound"]),
+    "meaning": ([], ["meaning"]),
+}
+
+def match_expression(query: str, columns: list, prefix: bool = False) -> str:
+    """
+    Builds an FTS5 MATCH expression for `query` restricted to `columns`, e.g.
+    '{word sound} : "大 學"'. Returns None if the query has no searchable characters.
+    """
+    tokens = search_tokens(query)
+    if not tokens or not columns:
+        return None
+    # search_tokens keeps letters and digits only, so the phrase needs no escaping
+    return f'{{{" ".join(columns)}}} : {"^ " if prefix else ""}"{tokens}"'
+
+def search_words(session, query: str, field: str = "all", prefix: bool = False, limit: int = 20) -> list:
+    """Returns [(id, word, sound)] of words matching the query, best match (shortest text) first."""
+    expression = match_expression(query, SEARCH_FIELDS[field][0], prefix)
+    if expression is None:
+        return []
+    rows = session.execute(text("""
+        SELECT usage_examples.id, usage_examples.word, usage_examples.sound
+        FROM usage_examples_fts
+        JOIN usage_examples ON usage_examples.id = usage_examples_fts.rowid
+        WHERE usage_examples_fts MATCH :expression
+        ORDER BY rank
+        LIMIT :limit
+    """), {"expression": expression, "limit": limit}).all()
+    return [tuple(row) for row in rows]
+
+def search_hanja(session, query: str, field: str = "all", prefix: bool = False, limit: int = 20) -> list:
+    """Returns HanjaInfo objects (readings loaded) with a character or reading matching the query."""
+    expression = match_expression(query, SEARCH_FIELDS[field][1], prefix)
+    if expression is None:
+        return []
+    hanja_ids = session.execute(text("""
+        SELECT hanja_readings.hanja_id
+        FROM hanja_readings_fts
+        JOIN hanja_readings ON hanja_readings.id = hanja_readings_fts.rowid
+        WHERE hanja_readings_fts MATCH :expression
+        GROUP BY hanja_readings.hanja_id
+        ORDER BY MIN(rank)
+        LIMIT :limit
+    """), {"expression": expression, "limit": limit}).scalars().all()
+    if not hanja_ids:
+        return []
+    hanja = session.query(HanjaInfo).options(selectinload(HanjaInfo.readings)).filter(HanjaInfo.id.in_(hanja_ids))
+    by_id = {h.id: h for h in hanja}
+    return [by_id[i] for i in hanja_ids]
+
+def rebuild_search_index(engine, batch_size: int = 5000):
+    """
+    Creates the FTS tables if needed and refills them from usage_examples and
+    hanja_readings, `batch_size` rows per transaction. Used to backfill existing
+    databases; afterwards the ORM flush events keep the index current.
+    """
+    with engine.begin() as conn:
+        for ddl in SEARCH_TABLES.values():
+            conn.execute(text(ddl))
+        conn.execute(text("DELETE FROM usage_examples_fts"))
+        conn.execute(text("DELETE FROM hanja_readings_fts"))
+
+    sources = [
+        ("SELECT id, word, sound FROM usage_examples WHERE id > :last ORDER BY id LIMIT :limit",
+         "INSERT INTO usage_examples_fts (rowid, word, sound) VALUES (:id, :word, :sound)",
+         lambda row: {"id": row[0], "word": search_tokens(row[1]), "sound": search_tokens(row[2])}),
+        ("SELECT r.id, h.char, r.sound, r.meaning FROM hanja_readings r JOIN hanja_info h ON h.id = r.hanja_id "
+         "WHERE r.id > :last ORDER BY r.id LIMIT :limit",
+         "INSERT INTO hanja_readings_fts (rowid, char, sound, meaning) VALUES (:id, :char, :sound, :meaning)",
+         lambda row: {"id": row[0], "char": row[1], "sound": search_tokens(row[2]), "meaning": search_tokens(row[3])}),
+    ]
+    for select_sql, insert_sql, to_params in sources:
+        last = 0
+        while True:
+            with engine.begin() as conn:
+                rows = conn.execute(text(select_sql), {"last": last, "limit": batch_size}).fetchall()
+                if not rows:
+                    break
+                conn.execute(text(insert_sql), [to_params(row) for row in rows])
+            last = rows[-1][0]
@@ -64,3 +64,384 @@ def test_pagination():
     # Ensure items are different (assuming we have enough data)
     if data1["total"] > 5:
         assert data1["items"][0]["hanja"]["id"] != data2["items"][0]["hanja"]["id"]
+
+def test_query_profile_disabled_by_default():
+    import src.instrumentation as instrumentation
+    previous = instrumentation._active_stats
+    instrumentation._active_stats = None
+    try:
+        response = client.get("/debug/queries")
+        assert response.status_code == 404
+    finally:
+        instrumentation._active_stats = previous
+
+def test_metrics_endpoint():
+    client.get("/analysis/hanja?page=1&size=5")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    
+    assert 'hanja_http_request_duration_seconds_count{method="GET",route="/analysis/hanja",status="200"}' in body
+    assert "hanja_db_pool_checkouts_total" in body
+    assert 'hanja_db_table_rows{table="hanja_info"}' in body
+    assert "hanja_db_size_bytes" in body
+    assert "hanja_cache_requests_total" in body
+
+# --- Quiz API (seeded in-memory database) ---
+
+import os
+import pytest
+import src.api as api_module
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from src.api import get_db, get_question_pool, get_progress_writer, get_cooccurrence_index, get_ingest_queue, get_read_models
+from src.extractor import HanjaExtractor
+from src.ingest import IngestionPipeline
+from src.jobs import IngestJobQueue
+from src.cooccurrence import CooccurrenceIndex
+from src.models import Base, Document, DocumentHanja, DocumentWord, HanjaInfo, HanjaReading, UsageExample, UserProgress
+from src.quiz import QuizGenerator, QuestionPool
+from src.progress import BatchedProgressWriter
+
+@pytest.fixture
+def quiz_client():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine)
+    session = SessionLocal()
+    chars = [("學", "배울", "학"), ("校", "학교", "교"), ("生", "날", "생"), ("人", "사람", "인"), ("山", "메", "산")]
+    for char, meaning, sound in chars:
+        h = HanjaInfo(char=char, radical="?", strokes=1)
+        session.add(h)
+        session.flush()
+        session.add(HanjaReading(hanja_id=h.id, sound=sound, meaning=meaning))
+    session.commit()
+    session.close()
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    pool = QuestionPool(QuizGenerator(SessionLocal), batch_size=5)
+    writer = BatchedProgressWriter(SessionLocal, flush_interval=None)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_question_pool] = lambda: pool
+    app.dependency_overrides[get_read_models] = lambda: pool.quiz_gen.read_models
+    app.dependency_overrides[get_progress_writer] = lambda: writer
+    try:
+        yield TestClient(app), SessionLocal, writer
+    finally:
+        app.dependency_overrides.clear()
+
+def test_quiz_next_question(quiz_client):
+    client, _, _ = quiz_client
+    response = client.get("/quiz/next?mode=random&q_type=hanja_to_meaning")
+    assert response.status_code == 200
+    data = response.json()
+    
+    assert len(data["options"]) == 4
+    assert data["hanja_id"] is not None
+    assert "correct" not in data # Answer is not leaked
+
+def test_quiz_batch(quiz_client):
+    client, _, _ = quiz_client
+    response = client.get("/quiz/batch?count=7&q_type=meaning_to_hanja")
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 7
+
+def test_quiz_invalid_mode(quiz_client):
+    client, _, _ = quiz_client
+    assert client.get("/quiz/next?mode=unknown").status_code == 422
+
+def test_quiz_answer_records_progress(quiz_client):
+    client, SessionLocal, writer = quiz_client
+    q = client.get("/quiz/next?q_type=meaning_to_hanja").json()
+    session = SessionLocal()
+    correct = session.get(HanjaInfo, q["hanja_id"]).char
+    session.close()
+    
+    response = client.post("/quiz/answer", json={"q_type": "meaning_to_hanja", "hanja_id": q["hanja_id"], "answer": correct})
+    assert response.json() == {"correct": True, "correct_answer": correct, "importance_level": 4}
+    
+    response = client.post("/quiz/answer", json={"q_type": "meaning_to_hanja", "hanja_id": q["hanja_id"], "answer": "X"})
+    assert response.json()["correct"] is False
+    assert response.json()["importance_level"] == 5
+    
+    # Written in batches: nothing stored until flushed
+    assert writer.pending() == 1
+    writer.flush()
+    session = SessionLocal()
+    assert session.query(UserProgress).filter_by(hanja_id=q["hanja_id"]).one().importance_level == 5
+    session.close()
+
+def test_quiz_answer_unknown_target(quiz_client):
+    client, _, _ = quiz_client
+    response = client.post("/quiz/answer", json={"q_type": "hanja_to_meaning", "hanja_id": 999, "answer": "X"})
+    assert response.status_code == 404
+
+def test_quiz_answer_per_learner(quiz_client):
+    client, SessionLocal, writer = quiz_client
+    q = client.get("/quiz/next?q_type=meaning_to_hanja&user_id=alice").json()
+    
+    body = {"q_type": "meaning_to_hanja", "hanja_id": q["hanja_id"], "answer": "X"}
+    assert client.post("/quiz/answer", json={**body, "user_id": "alice"}).json()["importance_level"] == 6
+    assert client.post("/quiz/answer", json={**body, "user_id": "alice"}).json()["importance_level"] == 7
+    assert client.post("/quiz/answer", json=body).json()["importance_level"] == 6
+    
+    writer.flush()
+    session = SessionLocal()
+    levels = {up.user_id: up.importance_level for up in session.query(UserProgress).filter_by(hanja_id=q["hanja_id"])}
+    session.close()
+    assert levels == {"alice": 7, "default": 6}
+
+def test_search_endpoint(quiz_client):
+    client, SessionLocal, _ = quiz_client
+    session = SessionLocal()
+    session.add_all([UsageExample(word="學校", sound="학교"), UsageExample(word="人生", sound="인생")])
+    session.commit()
+    session.close()
+
+    data = client.get("/search", params={"q": "學"}).json()
+    assert data["query"] == "學"
+    assert [h["char"] for h in data["hanja"]] == ["學"]
+    assert data["hanja"][0]["readings"] == [{"sound": "학", "meaning": "배울"}]
+    assert [w["word"] for w in data["words"]] == ["學校"]
+
+    data = client.get("/search", params={"q": "학", "field": "sound"}).json()
+    assert [h["char"] for h in data["hanja"]] == ["學"]
+    assert [w["word"] for w in data["words"]] == ["學校"]
+
+    data = client.get("/search", params={"q": "학교", "field": "meaning"}).json()
+    assert [h["char"] for h in data["hanja"]] == ["校"] and data["words"] == []
+
+    assert client.get("/search", params={"q": "生", "prefix": True}).json()["words"] == []
+    assert client.get("/search", params={"q": "學", "field": "radical"}).status_code == 422
+    assert client.get("/search", params={"q": ""}).status_code == 422
+
+def test_words_for_char(quiz_client):
+    client, SessionLocal, _ = quiz_client
+    session = SessionLocal()
+    doc = Document(filename="a", file_hash="a")
+    words = [UsageExample(word=w) for w in ["學校", "大學", "學生", "人生"]]
+    session.add(doc)
+    session.add_all(words)
+    session.flush()
+    session.add_all([
+        DocumentWord(document_id=doc.id, word_id=words[1].id, frequency=3),
+        DocumentWord(document_id=doc.id, word_id=words[2].id, frequency=1),
+    ])
+    session.commit()
+    session.close()
+
+    data = client.get("/analysis/chars/學/words").json()
+    assert data["total"] == 3
+    # Most frequent first; words without occurrences last
+    assert [(item["word"]["word"], item["frequency"]) for item in data["items"]] == [("大學", 3), ("學生", 1), ("學校", 0)]
+
+    data = client.get("/analysis/chars/學/words?page=2&size=2").json()
+    assert [item["word"]["word"] for item in data["items"]] == ["學校"]
+    assert client.get("/analysis/chars/校/words").json()["total"] == 1
+    assert client.get("/analysis/chars/學校/words").status_code == 422
+
+def test_related_hanja(quiz_client):
+    client, SessionLocal, _ = quiz_client
+    session = SessionLocal()
+    ids = {h.char: h.id for h in session.query(HanjaInfo)}
+    for name, chars in [("a", "學校生"), ("b", "學校"), ("c", "人山")]:
+        doc = Document(filename=name, file_hash=name)
+        session.add(doc)
+        session.flush()
+        session.add_all([DocumentHanja(document_id=doc.id, hanja_id=ids[c], frequency=1) for c in chars])
+    session.commit()
+    session.close()
+    index = CooccurrenceIndex()
+    app.dependency_overrides[get_cooccurrence_index] = lambda: index
+
+    data = client.get("/analysis/chars/學/related").json()
+    assert data["char"] == "學" and data["source"] == "document"
+    assert [(item["hanja"]["char"], item["count"]) for item in data["items"]] == [("校", 2), ("生", 1)]
+    assert data["items"][0]["hanja"]["readings"] == [{"sound": "교", "meaning": "학교"}]
+    assert data["items"][0]["score"] == 1.0
+
+    assert client.get("/analysis/chars/學/related?source=word").json()["items"] == []
+    assert client.get("/analysis/chars/學/related?source=radical").status_code == 422
+    assert client.get("/analysis/chars/木/related").status_code == 404
+
+def add_scoped_documents(SessionLocal):
+    # 2022 paper: 學x3 校x1, 學校x2; 2023 papers: 學 生x4 人, 學生 人生x2 / 山x2 學 (ingested at midnight)
+    session = SessionLocal()
+    ids = {h.char: h.id for h in session.query(HanjaInfo)}
+    papers = [
+        ("2022_a.pdf", datetime(2022, 11, 17, 9), {"學": 3, "校": 1}, {"學校": 2}),
+        ("2023_a.pdf", datetime(2023, 11, 16, 9), {"學": 1, "生": 4, "人": 1}, {"學生": 1, "人生": 2}),
+        ("2023_b.pdf", datetime(2023, 11, 17), {"山": 2, "學": 1}, {}),
+    ]
+    for filename, created_at, hanja, words in papers:
+        doc = Document(filename=filename, file_hash=filename, created_at=created_at)
+        session.add(doc)
+        session.flush()
+        session.add_all([DocumentHanja(document_id=doc.id, hanja_id=ids[c], frequency=f) for c, f in hanja.items()])
+        for word, freq in words.items():
+            w = UsageExample(word=word)
+            session.add(w)
+            session.flush()
+            session.add(DocumentWord(document_id=doc.id, word_id=w.id, frequency=freq))
+    session.commit()
+    session.close()
+
+def hanja_frequencies(response):
+    assert response.status_code == 200
+    return {item["hanja"]["char"]: item["frequency"] for item in response.json()["items"]}
+
+def test_scoped_analysis(quiz_client):
+    client, SessionLocal, _ = quiz_client
+    add_scoped_documents(SessionLocal)
+
+    assert hanja_frequencies(client.get("/analysis/hanja?filename=2023_*")) == {"學": 2, "生": 4, "人": 1, "山": 2}
+    assert hanja_frequencies(client.get("/analysis/hanja?document_id=1&document_id=3")) == {"學": 4, "校": 1, "山": 2}
+    assert hanja_frequencies(client.get("/analysis/hanja?ingested_from=2023-11-17")) == {"山": 2, "學": 1}
+    assert hanja_frequencies(client.get("/analysis/hanja?ingested_to=2023-11-16&filename=*_a.pdf")) == {"學": 4, "校": 1, "生": 4, "人": 1}
+    assert client.get("/analysis/hanja?filename=2021_*").json()["total"] == 0
+
+    data = client.get("/analysis/hanja?filename=2023_*&size=1").json()
+    assert data["total"] == 4 and data["items"][0]["hanja"]["char"] == "生"
+    assert client.get("/analysis/radicals?filename=2023_*").json()["items"] == [{"radical": "?", "frequency": 9}]
+
+    data = client.get("/analysis/words/chars?filename=2023_a.pdf").json()
+    assert [(item["char"], item["frequency"]) for item in data["items"]] == [("生", 3), ("人", 2), ("學", 1)]
+
+    # Scoped word lists only keep words occurring in the scope
+    data = client.get("/analysis/chars/學/words?ingested_to=2022-12-31").json()
+    assert data["total"] == 1 and [(i["word"]["word"], i["frequency"]) for i in data["items"]] == [("學校", 2)]
+
+    data = client.get("/analysis/chars/學/related?filename=2023_*").json()
+    assert {item["hanja"]["char"] for item in data["items"]} == {"生", "人", "山"}
+    data = client.get("/analysis/chars/學/related?source=word&filename=2023_*").json()
+    assert [item["hanja"]["char"] for item in data["items"]] == ["生"]
+
+    assert client.get("/analysis/hanja?ingested_from=yesterday").status_code == 422
+
+def test_collections(quiz_client):
+    client, SessionLocal, _ = quiz_client
+    add_scoped_documents(SessionLocal)
+
+    response = client.put("/collections/2023", json={"filename": "2023_*"})
+    assert response.status_code == 200 and response.json()["document_count"] == 2
+    assert client.put("/collections/empty", json={}).status_code == 422
+
+    # Precomputed collection aggregates answer exactly like the equivalent ad-hoc scope
+    for path in ["/analysis/hanja", "/analysis/radicals", "/analysis/words/chars", "/analysis/chars/學/words", "/analysis/chars/學/related"]:
+        assert client.get(f"{path}?collection=2023").json() == client.get(f"{path}?filename=2023_*").json()
+        assert client.get(f"{path}?collection=2022").status_code == 404
+    # Combined with other filters: the collection's documents matching them
+    assert hanja_frequencies(client.get("/analysis/hanja?collection=2023&document_id=3")) == {"山": 2, "學": 1}
+
+    response = client.post("/collections/2023/documents", json={"document_ids": [1, 2]})
+    assert response.json()["document_count"] == 3
+    assert hanja_frequencies(client.get("/analysis/hanja?collection=2023")) == hanja_frequencies(client.get("/analysis/hanja"))
+
+    assert [(c["name"], c["document_count"]) for c in client.get("/collections").json()] == [("2023", 3)]
+    assert client.delete("/collections/2023").status_code == 204
+    assert client.delete("/collections/2023").status_code == 404
+    assert client.get("/analysis/hanja?collection=2023").status_code == 404
+
+def test_distinctive(quiz_client):
+    client, SessionLocal, _ = quiz_client
+    add_scoped_documents(SessionLocal)
+    client.put("/collections/2023", json={"filename": "2023_*"})
+
+    data = client.get("/analysis/distinctive?collection=2023&k=2").json()
+    assert data["kind"] == "hanja" and data["method"] == "log_odds" and data["documents"] == 2
+    # 生 and 山 only occur in 2023; 學 is mostly from 2022
+    assert [item["hanja"]["char"] for item in data["items"]] == ["生", "山"]
+    assert data["items"][0]["frequency"] == data["items"][0]["corpus_frequency"] == 4
+
+    data = client.get("/analysis/distinctive?document_id=1&kind=word&method=tfidf").json()
+    assert [(item["word"]["word"], item["frequency"], item["hanja"]) for item in data["items"]] == [("學校", 2, None)]
+
+    assert client.get("/analysis/distinctive").status_code == 422
+    assert client.get("/analysis/distinctive?document_id=1&method=chi2").status_code == 422
+    assert client.get("/analysis/distinctive?collection=2021").status_code == 404
+
+def test_upload_document(quiz_client, tmp_path):
+    client, SessionLocal, _ = quiz_client
+    jobs = IngestJobQueue(
+        SessionLocal, str(tmp_path), workers=1,
+        pipeline_factory=lambda collection: IngestionPipeline(SessionLocal, extractor=HanjaExtractor(), collection=collection),
+    )
+    app.dependency_overrides[get_ingest_queue] = lambda: jobs
+    headers = {"Content-Type": "application/octet-stream"}
+
+    # Returns before the document is processed
+    response = client.post("/documents?filename=exam.txt&collection=2023", content="學校에서 人生을".encode("utf-8"), headers=headers)
+    assert response.status_code == 202
+    job = response.json()
+    assert (job["filename"], job["collection"], job["status"], job["attempts"]) == ("exam.txt", "2023", "queued", 0)
+    assert [j["id"] for j in client.get("/jobs?status=queued").json()] == [job["id"]]
+
+    jobs.start()
+    assert jobs.wait_idle(timeout=30)
+    jobs.close()
+    job = client.get(f"/jobs/{job['id']}").json()
+    assert (job["status"], job["result"], job["attempts"]) == ("done", "ingested", 1)
+    assert client.get(f"/analysis/hanja?document_id={job['document_id']}").json()["total"] == 4
+    assert client.get("/analysis/hanja?collection=2023").json()["total"] == 4
+
+    assert client.post("/documents?filename=exam.doc", content=b"x", headers=headers).status_code == 422
+    assert client.post("/documents?filename=empty.txt", content=b"", headers=headers).status_code == 422
+
+def test_upload_size_limit(quiz_client, tmp_path, monkeypatch):
+    client, SessionLocal, _ = quiz_client
+    jobs = IngestJobQueue(SessionLocal, str(tmp_path / "uploads"), workers=1)
+    app.dependency_overrides[get_ingest_queue] = lambda: jobs
+    monkeypatch.setattr(api_module, "MAX_UPLOAD_BYTES", 10)
+    headers = {"Content-Type": "application/octet-stream"}
+
+    # Rejected on the Content-Length header, or while streaming a chunked body
+    assert client.post("/documents?filename=big.txt", content=b"x" * 11, headers=headers).status_code == 413
+    chunks = iter([b"x" * 6, b"x" * 6])
+    assert client.post("/documents?filename=big.txt", content=chunks, headers=headers).status_code == 413
+    assert os.listdir(tmp_path / "uploads") == []
+    assert client.post("/documents?filename=ok.txt", content=iter([b"x" * 5, b"x" * 5]), headers=headers).status_code == 202
+    assert len(os.listdir(tmp_path / "uploads")) == 1
+    assert client.get("/jobs/999").status_code == 404
+    assert client.get("/jobs?status=lost").status_code == 422
+
+def test_upload_open_error_is_not_hidden(quiz_client, tmp_path, monkeypatch):
+    client, SessionLocal, _ = quiz_client
+    jobs = IngestJobQueue(SessionLocal, str(tmp_path / "uploads"), workers=1)
+    app.dependency_overrides[get_ingest_queue] = lambda: jobs
+
+    def fail_open(*args, **kwargs):
+        raise OSError("No space left on device")
+
+    # No file was created, so the cleanup must not replace the error with FileNotFoundError
+    monkeypatch.setattr(api_module, "open", fail_open, raising=False)
+    with pytest.raises(OSError, match="No space left"):
+        client.post("/documents?filename=a.txt", content=b"x", headers={"Content-Type": "application/octet-stream"})
+
+def test_singletons_created_once(monkeypatch):
+    import threading
+    import time
+    created = []
+    class SlowWriter:
+        def __init__(self, session_factory):
+            created.append(self)
+            time.sleep(0.05) # widen the check-then-create window
+    monkeypatch.setattr(api_module, "_db_writer", None)
+    monkeypatch.setattr(api_module, "get_session_factory", lambda: None)
+    monkeypatch.setattr(api_module, "SingleWriter", SlowWriter)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(api_module.get_db_writer())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 1
+    assert all(writer is created[0] for writer in results)
@@ -0,0 +1,95 @@
+import pytest
+
+pytest.importorskip("aiosqlite")
+pytest.importorskip("greenlet")
+
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from src import api
+from src.api_async import app, get_async_db, to_async_url
+from src.scope import GLOBAL_SCOPE
+from src.readmodel import ReadModelCache
+from src.models import init_db, Document, DocumentHanja, DocumentWord, HanjaInfo, HanjaReading, UsageExample
+
+@pytest.fixture
+def db_url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'async.db'}"
+    Session = init_db(url)
+    session = Session()
+    doc = Document(filename="a", file_hash="a")
+    session.add(doc)
+    for i, (char, radical, freq) in enumerate([("學", "子", 5), ("校", "木", 3), ("生", "生", 1)]):
+        h = HanjaInfo(char=char, radical=radical, strokes=i + 1)
+        session.add(h)
+        session.flush()
+        session.add(HanjaReading(hanja_id=h.id, sound="음", meaning="뜻"))
+        session.add(DocumentHanja(document_id=doc.id, hanja_id=h.id, frequency=freq))
+    for word, freq in [("學校", 2), ("學生", 1)]:
+        w = UsageExample(word=word)
+        session.add(w)
+        session.flush()
+        session.add(DocumentWord(document_id=doc.id, word_id=w.id, frequency=freq))
+    session.commit()
+    session.close()
+    return url
+
+@pytest.fixture
+def client(db_url):
+    engine = create_async_engine(to_async_url(db_url))
+    AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    read_models = ReadModelCache()
+    app.dependency_overrides[api.get_read_models] = lambda: read_models
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
+
+def test_to_async_url():
+    assert to_async_url("sqlite:///hanja.db") == "sqlite+aiosqlite:///hanja.db"
+    assert to_async_url("sqlite://") == "sqlite+aiosqlite://"
+
+def test_async_top_hanja(client):
+    data = client.get("/analysis/hanja?page=1&size=2").json()
+    assert data["total"] == 3
+    assert [item["hanja"]["char"] for item in data["items"]] == ["學", "校"]
+    assert data["items"][0]["hanja"]["readings"] == [{"sound": "음", "meaning": "뜻"}]
+
+def test_async_matches_sync_handlers(client, db_url):
+    session = init_db(db_url)()
+    try:
+        for path, handler in [
+            ("/analysis/hanja", api.get_top_hanja),
+            ("/analysis/radicals", api.get_top_radicals),
+            ("/analysis/words/chars", api.get_top_hanja_in_words),
+        ]:
+            expected = handler(page=1, size=20, scope=GLOBAL_SCOPE, db=session, read_models=ReadModelCache())
+            response = client.get(f"{path}?page=1&size=20")
+            assert response.status_code == 200
+            assert response.json()["total"] == expected["total"]
+            assert response.json()["items"] == [item.model_dump() for item in expected["items"]]
+    finally:
+        session.close()
+
+def test_async_words_chars(client):
+    data = client.get("/analysis/words/chars").json()
+    # 學 appears in both words (2 + 1); 校 and 生 once each
+    assert data["items"][0] == {"char": "學", "frequency": 3, "hanja_info": data["items"][0]["hanja_info"]}
+    assert data["items"][0]["hanja_info"]["char"] == "學"
+    assert data["total"] == 3
+
+def test_async_words_for_char(client, db_url):
+    session = init_db(db_url)()
+    try:
+        expected = api.get_words_for_char(char="學", page=1, size=20, scope=GLOBAL_SCOPE, db=session, read_models=ReadModelCache())
+    finally:
+        session.close()
+    data = client.get("/analysis/chars/學/words").json()
+    assert data["total"] == expected["total"] == 2
+    assert data["items"] == [item.model_dump() for item in expected["items"]]
+    assert [item["word"]["word"] for item in data["items"]] == ["學校", "學生"]
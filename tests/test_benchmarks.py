@@ -0,0 +1,43 @@
+from benchmarks.corpus import CorpusConfig, generate_corpus
+from benchmarks.compare import compare
+from benchmarks.run import app_imports, heavy_imports, import_times, statement_imports
+
+def test_generate_corpus_is_deterministic():
+    config = CorpusConfig(n_documents=3, chars_per_document=300, vocabulary_size=50, seed=7)
+    
+    first = generate_corpus(config)
+    second = generate_corpus(config)
+    
+    assert first == second
+    assert len(first) == 3
+    assert all(len(text) >= 300 for _, text in first)
+    assert generate_corpus(CorpusConfig(n_documents=3, chars_per_document=300, vocabulary_size=50, seed=8)) != first
+
+def test_compare_flags_regressions():
+    baseline = {"a": {"median": 1.0}, "b": {"median": 1.0}, "only_base": {"median": 1.0}}
+    current = {"a": {"median": 1.05}, "b": {"median": 1.5}}
+    
+    rows = {name: regressed for name, _, _, _, regressed in compare(baseline, current, threshold=0.10)}
+    
+    assert rows == {"a": False, "b": True}
+
+def test_statement_imports_keeps_the_statement_subtrees():
+    # Children precede their parent; "site" was imported at start-up
+    rows = [(1, "encodings", 0.1), (0, "site", 0.2), (1, "sqlalchemy", 0.3), (0, "src.models", 0.4), (0, "gc", 0.0)]
+    assert statement_imports(rows, {"site", "gc"}) == [(1, "sqlalchemy", 0.3), (0, "src.models", 0.4)]
+
+def test_entry_points_defer_heavy_imports():
+    main_modules = {module for _, module, _ in import_times("import main")}
+    assert "src.ingest" in main_modules and "pypdf" not in main_modules and "numpy" not in main_modules
+    assert heavy_imports("main", main_modules) == {}
+    app_modules = {module for _, module, _ in import_times(app_imports())}
+    assert "src.analysis" in app_modules and "fastapi" not in app_modules
+    assert "unexpected" not in heavy_imports("app", app_modules).values()
+    api_modules = {module for _, module, _ in import_times("import src.api")}
+    assert "unexpected" not in heavy_imports("api", api_modules).values()
+
+def test_extractor_benchmark_reports_ratio():
+    from benchmarks.bench_extractor import run
+    result = run(repeat=1, config=CorpusConfig(n_documents=2, chars_per_document=500, vocabulary_size=50))
+    assert result["chars"] > 1000 and result["repeat"] == 1
+    assert result["ratio"] > 0
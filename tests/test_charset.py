@@ -0,0 +1,46 @@
+import pytest
+from src.charset import HanjaCharset, NOT_HANJA, HANJA, HANJA_COMPAT
+
+def test_classify_default_blocks():
+    charset = HanjaCharset()
+    
+    assert charset.classify("學") == HANJA
+    assert charset.classify("㐀") == HANJA            # Ext A
+    assert charset.classify("\U0002A700") == HANJA        # Ext C
+    assert charset.classify("\U00030000") == HANJA        # Ext G
+    assert charset.classify("六") == HANJA_COMPAT     # compat 六
+    assert charset.classify("가") == NOT_HANJA
+    assert charset.classify("A") == NOT_HANJA
+    assert charset.classify("\U0010FFFF") == NOT_HANJA
+
+def test_compat_block_unified_characters_are_not_folded():
+    charset = HanjaCharset()
+    
+    # U+FA0E has no decomposition; it is a genuine ideograph inside the compat block.
+    assert charset.classify("﨎") == HANJA
+    assert charset.fold("﨎") == "﨎"
+
+def test_fold():
+    charset = HanjaCharset()
+    
+    assert charset.fold("六年") == "六年"
+    assert charset.fold("學校") == "學校"
+
+def test_restricted_blocks():
+    charset = HanjaCharset(blocks=["unified"])
+    
+    assert charset.is_hanja("學")
+    assert not charset.is_hanja("㐀")
+    assert not charset.is_hanja("六")
+    assert charset.find_runs("學㐀校") == ["學", "校"]
+
+def test_unknown_block_raises_error():
+    with pytest.raises(ValueError):
+        HanjaCharset(blocks=["klingon"])
+
+def test_find_runs_splits_on_codepoints_between_astral_blocks():
+    charset = HanjaCharset(blocks=["unified", "ext_b", "ext_g"])
+    
+    # U+2A700 (Ext C) lies between the enabled Ext B and Ext G blocks.
+    text = "學\U00020000\U0002A700\U00030000校"
+    assert charset.find_runs(text) == ["學\U00020000", "\U00030000校"]
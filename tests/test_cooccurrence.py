@@ -0,0 +1,156 @@
+import numpy as np
+import pytest
+from src.models import Document, DocumentHanja, HanjaInfo, UsageExample
+from src.repository import HanjaRepository
+from src.cooccurrence import IncidenceMatrix, CooccurrenceIndex
+
+def add_document(session, name, chars, words=()):
+    doc = Document(filename=name, file_hash=name)
+    session.add(doc)
+    session.flush()
+    for char in chars:
+        hanja = session.query(HanjaInfo).filter_by(char=char).first()
+        if hanja is None:
+            hanja = HanjaInfo(char=char)
+            session.add(hanja)
+            session.flush()
+        session.add(DocumentHanja(document_id=doc.id, hanja_id=hanja.id, frequency=1))
+    session.add_all([UsageExample(word=word) for word in words])
+    HanjaRepository().bump_data_version(session)
+    session.commit()
+
+def hanja_id(session, char):
+    return session.query(HanjaInfo.id).filter_by(char=char).scalar()
+
+def chars(session, related):
+    by_id = {h.id: h.char for h in session.query(HanjaInfo)}
+    return [by_id[i] for i, _, _ in related]
+
+def test_incidence_matrix_matches_dense_gram_matrix():
+    rng = np.random.default_rng(0)
+    dense = (rng.random((30, 12)) < 0.3).astype(int)
+    rows, columns = np.nonzero(dense)
+    # Appended in two batches of rows; duplicate pairs are ignored
+    split = np.searchsorted(rows, 15)
+    matrix = IncidenceMatrix(12).with_rows(rows[:split] + 100, columns[:split], 12)
+    matrix = matrix.with_rows(np.r_[rows[split:], rows[-1]] + 100, np.r_[columns[split:], columns[-1]], 12)
+
+    gram = dense.T @ dense
+    assert matrix.n_rows == len(np.unique(rows))
+    assert list(matrix.column_counts()) == list(np.diag(gram))
+    for column in range(12):
+        assert list(matrix.cooccurrence_row(column)) == list(gram[column])
+
+def test_incidence_matrix_append_merges_columns():
+    rng = np.random.default_rng(1)
+    dense = (rng.random((40, 20)) < 0.25).astype(int)
+    dense[:20, 15:] = 0 # the first batch only knows 15 columns
+    rows, columns = np.nonzero(dense)
+    split = np.searchsorted(rows, 20)
+    matrix = IncidenceMatrix(15).with_rows(rows[:split], columns[:split], 15)
+    matrix = matrix.with_rows(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), 17)
+    matrix = matrix.with_rows(rows[split:], columns[split:], 20)
+
+    # The merged CSC side equals the one sorted from scratch
+    full = IncidenceMatrix(20, matrix.indptr, matrix.indices, matrix.row_keys)
+    assert list(matrix.col_indptr) == list(full.col_indptr)
+    assert list(matrix.col_rows) == list(full.col_rows)
+    assert list(matrix.column_counts()) == list(dense.sum(axis=0))
+
+def test_related_by_document(session):
+    add_document(session, "a", "學校生")
+    add_document(session, "b", "學校人")
+    add_document(session, "c", "學山")
+    index = CooccurrenceIndex()
+
+    related = index.related(session, hanja_id(session, "學"), k=10)
+    # 校 shares 2 of 學's 3 documents; cosine 2 / sqrt(3 * 2)
+    assert chars(session, related)[0] == "校"
+    assert related[0][1] == 2
+    assert related[0][2] == pytest.approx(2 / np.sqrt(6))
+    assert set(chars(session, related)) == {"校", "生", "人", "山"}
+    assert len(index.related(session, hanja_id(session, "學"), k=2)) == 2
+
+def test_related_within_rows(session):
+    add_document(session, "a", "學校生")
+    add_document(session, "b", "學校人")
+    add_document(session, "c", "學山")
+    index = CooccurrenceIndex()
+    ids = {doc.filename: doc.id for doc in session.query(Document)}
+
+    related = index.related(session, hanja_id(session, "學"), row_keys=[ids["b"], ids["c"]])
+    assert set(chars(session, related)) == {"校", "人", "山"}
+    # Counts and the diagonal are taken over the selected documents only: 學 is in 2 of them
+    assert [count for _, count, _ in related] == [1, 1, 1]
+    assert [score for _, _, score in related] == pytest.approx([1 / np.sqrt(2)] * 3)
+    assert index.related(session, hanja_id(session, "學"), row_keys=[]) == []
+
+def test_related_by_word(session):
+    add_document(session, "a", "學校生大", words=["學校", "學生", "大學"])
+    index = CooccurrenceIndex()
+
+    assert set(chars(session, index.related(session, hanja_id(session, "學"), source="word"))) == {"校", "生", "大"}
+    assert chars(session, index.related(session, hanja_id(session, "校"), source="word")) == ["學"]
+    # Same document, but never in the same word
+    assert index.related(session, hanja_id(session, "校"), source="word")[0][1] == 1
+    assert "生" not in chars(session, index.related(session, hanja_id(session, "校"), source="word"))
+
+def test_incremental_refresh_matches_rebuild(session):
+    index = CooccurrenceIndex()
+    add_document(session, "a", "學校", words=["校長"]) # 長 not collected yet
+    assert index.related(session, hanja_id(session, "校"), source="word") == []
+
+    add_document(session, "b", "學長人", words=["學人"])
+    assert index.refresh(session)
+    assert not index.refresh(session) # unchanged data version
+    fresh = CooccurrenceIndex()
+    for char in "學校長人":
+        for source in ("document", "word"):
+            assert index.related(session, hanja_id(session, char), source) == fresh.related(session, hanja_id(session, char), source)
+    # The older word 校長 now links to the newly collected 長
+    assert chars(session, index.related(session, hanja_id(session, "校"), source="word")) == ["長"]
+
+def test_refresh_rebuilds_when_hanja_removed(session):
+    index = CooccurrenceIndex()
+    add_document(session, "a", "學校")
+    add_document(session, "b", "學山")
+    assert index.related(session, hanja_id(session, "學"))
+    # 山 is removed and 人 collected: as many Hanja as before, but the columns moved
+    session.query(DocumentHanja).filter_by(hanja_id=hanja_id(session, "山")).delete()
+    session.query(HanjaInfo).filter_by(char="山").delete()
+    add_document(session, "c", "學人")
+
+    assert chars(session, index.related(session, hanja_id(session, "學"))) == chars(
+        session, CooccurrenceIndex().related(session, hanja_id(session, "學"))
+    )
+    assert set(chars(session, index.related(session, hanja_id(session, "學")))) == {"校", "人"}
+
+def test_refresh_leaves_rows_of_uncollected_hanja_for_later(session, monkeypatch):
+    index = CooccurrenceIndex()
+    add_document(session, "a", "學校")
+    assert index.refresh(session)
+    add_document(session, "b", "學山")
+    load_hanja = index._load_hanja
+
+    def load_then_commit(session):
+        result = load_hanja(session)
+        add_document(session, "c", "學人") # committed between the Hanja and the pair reads
+        return result
+
+    monkeypatch.setattr(index, "_load_hanja", load_then_commit)
+    assert index.refresh(session)
+    monkeypatch.undo()
+    assert list(index.matrices["document"].row_keys) == [1, 2] # c waits: 人 has no column yet
+
+    # The version bumped by that commit brings document c in on the next refresh
+    assert index.refresh(session)
+    for char in "學校山人":
+        assert index.related(session, hanja_id(session, char)) == CooccurrenceIndex().related(session, hanja_id(session, char))
+
+def test_related_unknown(session):
+    add_document(session, "a", "學")
+    index = CooccurrenceIndex()
+    assert index.related(session, hanja_id(session, "學")) == []
+    assert index.related(session, 999) == []
+    with pytest.raises(ValueError):
+        index.related(session, hanja_id(session, "學"), source="radical")
@@ -0,0 +1,124 @@
+import random
+import threading
+import pytest
+from sqlalchemy import text
+from src.models import init_db, Document, HanjaInfo, UserProgress, AppMeta
+from src.database import BUSY_TIMEOUT_ENV, SingleWriter
+from src.extractor import HanjaExtractor
+from src.ingest import IngestionPipeline
+from src.progress import BatchedProgressWriter
+from src.quiz import QuizGenerator
+
+@pytest.fixture
+def db_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'hanja.db'}"
+
+def test_connections_use_wal_and_busy_timeout(db_url, monkeypatch):
+    monkeypatch.setenv(BUSY_TIMEOUT_ENV, "1234")
+    session = init_db(db_url)()
+    assert session.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+    assert session.execute(text("PRAGMA busy_timeout")).scalar() == 1234
+    assert session.execute(text("PRAGMA synchronous")).scalar() == 1 # NORMAL
+    session.close()
+
+def test_single_writer_batches_writes(db_url):
+    Session = init_db(db_url)
+    writer = SingleWriter(Session)
+    gate = threading.Event()
+    sessions = []
+
+    def write(key, value):
+        def fn(session):
+            sessions.append(session)
+            session.add(AppMeta(key=key, value=value))
+            session.flush()
+            return value
+        return fn
+
+    def fail(session):
+        session.add(AppMeta(key="bad", value=0))
+        session.flush()
+        raise ValueError("rejected")
+
+    started = threading.Event()
+
+    def block(session):
+        started.set()
+        return gate.wait(5)
+
+    blocked = writer.submit(block)
+    assert started.wait(5) # the writer is busy with its own batch
+    # Queued while the writer is busy: run together in the next transaction
+    futures = [writer.submit(write("a", 1)), writer.submit(fail), writer.submit(write("b", 2))]
+    gate.set()
+    assert blocked.result(5) is True
+    assert futures[0].result(5) == 1 and futures[2].result(5) == 2
+    with pytest.raises(ValueError):
+        futures[1].result(5)
+    assert sessions[0] is sessions[1]
+
+    # Only the failed function's writes were rolled back
+    session = Session()
+    assert dict(session.query(AppMeta.key, AppMeta.value)) == {"a": 1, "b": 2}
+    session.close()
+    with pytest.raises(RuntimeError):
+        writer.run(lambda session: writer.run(lambda inner: None))
+    writer.close()
+    with pytest.raises(RuntimeError):
+        writer.submit(lambda session: None)
+
+def random_text(rng, n):
+    return "".join(chr(0x4E00 + rng.randrange(400)) + ("의 " if rng.random() < 0.3 else "") for _ in range(n))
+
+def test_concurrent_ingest_and_quiz_traffic(db_url):
+    Session = init_db(db_url)
+    rng = random.Random(0)
+    IngestionPipeline(Session, extractor=HanjaExtractor()).ingest_text(random_text(rng, 300), "seed")
+    writer = SingleWriter(Session)
+    progress = BatchedProgressWriter(Session, batch_size=5, flush_interval=None, writer=writer)
+    quiz = QuizGenerator(Session)
+    texts = [random_text(rng, 400) for _ in range(6)]
+    errors, reports, answered_keys = [], [], set()
+    ingesting = threading.Event()
+    ingesting.set()
+
+    def ingest(batch, shared):
+        # Workers share the writer; the last thread stands for main.py in another process
+        pipeline = IngestionPipeline(
+            Session if shared else init_db(db_url), extractor=HanjaExtractor(), writer=writer if shared else None
+        )
+        for i, content in batch:
+            reports.append(pipeline.ingest_text(content, f"doc{i}"))
+
+    def answer(user):
+        answered = 0
+        try:
+            while ingesting.is_set() or answered < 20:
+                question = quiz.generate_quiz(user_id=user)
+                if question is not None:
+                    progress.record(hanja_id=question["hanja_id"], change=rng.choice([-1, 1]), user_id=user)
+                    answered_keys.add((user, question["hanja_id"]))
+                    answered += 1
+        except Exception as e:
+            errors.append(e)
+
+    numbered = list(enumerate(texts))
+    ingesters = [threading.Thread(target=ingest, args=(numbered[i::3], i < 2)) for i in range(3)]
+    answerers = [threading.Thread(target=answer, args=(f"user{i}",)) for i in range(3)]
+    for thread in ingesters + answerers:
+        thread.start()
+    for thread in ingesters:
+        thread.join()
+    ingesting.clear()
+    for thread in answerers:
+        thread.join()
+    progress.close()
+    writer.close()
+
+    assert errors == []
+    assert sorted((r.filename, r.status, r.error) for r in reports) == [(f"doc{i}", "ingested", None) for i in range(6)]
+    session = Session()
+    assert session.query(Document).count() == 7
+    assert session.query(UserProgress).count() == len(answered_keys)
+    assert session.query(HanjaInfo).count() <= 400
+    session.close()
@@ -1,15 +1,10 @@
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from src.models import Base, RefHanja, RefHanjaReading
+from src.models import RefHanja, RefHanjaReading
 from src.dictionary import HanjaDictionary
 
 @pytest.fixture
-def session():
-    engine = create_engine("sqlite:///:memory:")
-    Base.metadata.create_all(engine)
-    Session = sessionmaker(bind=engine)
-    session = Session()
+def session(session_factory):
+    session = session_factory()
     
     # Seed Reference Dictionary
     hanja = RefHanja(char="學", radical="子", strokes=16, level="8급")
@@ -60,4 +55,18 @@ def test_lookup_invalid_input(session):
 def test_get_word_sound():
     dictionary = HanjaDictionary()
     sound = dictionary.get_word_sound("學校")
-    assert sound == "학교"
\ No newline at end of file
+    assert sound == "학교"
+
+def test_lookup_compatibility_ideograph_folds_to_unified(session):
+    dictionary = HanjaDictionary()
+    
+    # U+F9D1 is the compatibility form of 六; looked up as the unified form.
+    result = dictionary.lookup(session, "六")
+    assert result['char'] == "六"
+
+def test_lookup_accepts_extension_a(session):
+    dictionary = HanjaDictionary()
+    
+    result = dictionary.lookup(session, "㐀")
+    assert result['char'] == "㐀"
+    assert result['meaning'] == "미상"
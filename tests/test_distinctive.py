@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from src.models import Document, DocumentHanja, HanjaInfo
+from src.repository import HanjaRepository
+from src.distinctive import CountMatrix, DistinctiveIndex, log_odds_scores, tfidf_scores
+
+def add_document(session, name, counts):
+    doc = Document(filename=name, file_hash=name)
+    session.add(doc)
+    session.flush()
+    for char, frequency in counts.items():
+        hanja = session.query(HanjaInfo).filter_by(char=char).first()
+        if hanja is None:
+            hanja = HanjaInfo(char=char)
+            session.add(hanja)
+            session.flush()
+        session.add(DocumentHanja(document_id=doc.id, hanja_id=hanja.id, frequency=frequency))
+    HanjaRepository().bump_data_version(session)
+    session.commit()
+    return doc.id
+
+def chars(session, ranked):
+    by_id = {h.id: h.char for h in session.query(HanjaInfo)}
+    return [by_id[target_id] for target_id, _, _, _ in ranked]
+
+def test_count_matrix_matches_dense_sums():
+    rng = np.random.default_rng(0)
+    dense = rng.integers(0, 4, size=(20, 9)) * (rng.random((20, 9)) < 0.4)
+    documents, targets = np.nonzero(dense)
+    matrix = CountMatrix.from_triples(documents + 10, targets * 3 + 1, dense[documents, targets])
+
+    used = np.flatnonzero(dense.sum(axis=0))
+    assert list(matrix.column_ids) == list(used * 3 + 1)
+    assert list(matrix.corpus_counts) == list(dense.sum(axis=0)[used])
+    assert list(matrix.document_frequencies) == list((dense > 0).sum(axis=0)[used])
+    selected = [12, 15, 19, 99]
+    mask = matrix.row_mask(selected)
+    assert list(matrix.column_totals(mask)) == list(dense[[2, 5, 9]].sum(axis=0)[used])
+
+def test_scores():
+    counts = np.array([10.0, 1.0, 0.0])
+    corpus = np.array([12.0, 40.0, 50.0])
+    # Concentrated in the selection: positive; under-represented: negative
+    z = log_odds_scores(counts, corpus)
+    assert z[0] > 0 > z[1]
+    assert tfidf_scores(counts, np.array([1, 5, 5]), 5) == pytest.approx(
+        counts / 11 * (np.log(6 / np.array([2, 6, 6])) + 1)
+    )
+    assert list(log_odds_scores(np.array([3.0]), np.array([5.0]))) == [0.0]
+
+def test_distinctive_against_corpus(session):
+    common = {"學": 20, "人": 15}
+    doc = add_document(session, "2023", {**common, "校": 12, "山": 1})
+    for i in range(4):
+        add_document(session, f"other{i}", {**common, "山": 3})
+    index = DistinctiveIndex()
+
+    documents, ranked = index.distinctive(session, [doc])
+    assert documents == 1
+    # 校 only occurs here; the common characters are more frequent but not distinctive
+    assert chars(session, ranked)[0] == "校"
+    assert ranked[0][1:3] == (12, 12)
+    # Everything else has a lower share here than in the rest of the corpus
+    assert [char for char, item in zip(chars(session, ranked), ranked) if item[3] > 0] == ["校"]
+    assert chars(session, index.distinctive(session, [doc], method="tfidf", k=1)[1]) == ["校"]
+    assert index.distinctive(session, [999]) == (0, [])
+    with pytest.raises(ValueError):
+        index.distinctive(session, [doc], method="chi2")
+
+def test_distinctive_reloads_on_data_version(session):
+    index = DistinctiveIndex()
+    first = add_document(session, "a", {"學": 1})
+    matrix = index.matrix(session, "hanja")
+    assert index.matrix(session, "hanja") is matrix
+    add_document(session, "b", {"校": 2})
+    assert index.matrix(session, "hanja") is not matrix
+    assert index.distinctive(session, [first], kind="word") == (0, [])
@@ -40,4 +40,80 @@ def test_extract_mixed_content():
     chars, words = extractor.extract(text)
     
     assert set(chars) == {'混', '合'}
-    assert words == ['混合']
\ No newline at end of file
+    assert words == ['混合']
+
+def test_extract_extension_blocks():
+    extractor = HanjaExtractor()
+    # U+3400 (Ext A), U+20000 (Ext B)
+    text = "古文 㐀\U00020000 끝"
+    
+    chars, words = extractor.extract(text)
+    
+    assert set(chars) == {'古', '文', '㐀', '\U00020000'}
+    assert set(words) == {'古文', '㐀\U00020000'}
+
+def test_extract_folds_compatibility_ideographs():
+    extractor = HanjaExtractor()
+    # U+F9D1 (compat 六) -> U+516D (六), U+F98E (compat 年) -> U+5E74 (年)
+    text = "六年 기출"
+    
+    chars, words = extractor.extract(text)
+    
+    assert set(chars) == {'六', '年'}
+    assert words == ['六年']
+
+def test_extract_with_restricted_charset():
+    from src.charset import HanjaCharset
+    extractor = HanjaExtractor(charset=HanjaCharset(blocks=["unified"]))
+    text = "學㐀校"
+    
+    chars, words = extractor.extract(text)
+    
+    assert set(chars) == {'學', '校'}
+    assert words == []
+
+def test_segmenter_splits_long_run_into_known_words():
+    from src.extractor import WordSegmenter
+    segmenter = WordSegmenter(["學校", "生活", "敎育", "制度", "改革"])
+    
+    assert segmenter.segment("學校生活敎育制度改革案") == ["學校", "生活", "敎育", "制度", "改革"]
+
+def test_segmenter_prefers_longest_cover():
+    from src.extractor import WordSegmenter
+    segmenter = WordSegmenter(["科學", "技術", "科學技術", "學技"])
+    
+    # Full coverage with the fewest words wins
+    assert segmenter.segment("科學技術發展") == ["科學技術"]
+
+def test_segmenter_short_runs():
+    from src.extractor import WordSegmenter
+    segmenter = WordSegmenter(["學校", "人生"])
+    
+    assert segmenter.segment("人生") == ["人生"]
+    assert segmenter.segment("學校長") == ["學校長"] # Not fully covered: kept whole as a new word
+    assert segmenter.segment("學") == []
+
+def test_segmenter_ignores_overlong_vocabulary():
+    from src.extractor import WordSegmenter
+    segmenter = WordSegmenter(["天地玄黃宇宙洪荒", "天地"], max_word_length=4)
+    
+    assert len(segmenter) == 1
+    assert segmenter.segment("天地玄黃宇宙洪荒") == ["天地"]
+
+def test_extract_with_segmenter():
+    from src.extractor import WordSegmenter
+    extractor = HanjaExtractor(segmenter=WordSegmenter(["大韓民國", "國民", "敎育"]))
+    text = "大韓民國國民敎育憲章 그리고 人生"
+    
+    chars, words = extractor.extract(text)
+    
+    assert set(words) == {"大韓民國", "國民", "敎育", "人生"}
+    assert {"憲", "章"} <= set(chars)
+
+def test_load_word_list():
+    from src.extractor import load_word_list
+    words = load_word_list()
+    
+    assert "學校" in words
+    assert all(not w.startswith("#") for w in words)
+    assert load_word_list("/nonexistent/words.txt") == []
@@ -0,0 +1,116 @@
+import pytest
+from src.models import HanjaInfo, UsageExample, DocumentHanja, DocumentWord, CollectionDocument, CollectionHanja
+from src.models import DocumentSignature, DocumentLshBucket
+from src.extractor import HanjaExtractor
+from src.ingest import IngestionPipeline, DocumentReport, summarize, STAGES
+from src.repository import HanjaRepository
+from src.minhash import LSH_BANDS
+
+def test_ingest_text_stores_data_and_times_stages(session_factory):
+    pipeline = IngestionPipeline(session_factory, extractor=HanjaExtractor())
+    progress = []
+    
+    report = pipeline.ingest_text("學校에서 人生을", "doc1", on_progress=lambda done, total: progress.append((done, total)))
+    
+    assert report.status == "ingested"
+    assert report.hanja_count == 4
+    assert report.word_count == 2
+    assert set(report.stage_seconds) == set(STAGES)
+    assert report.stage_seconds["lookup"] > 0
+    assert report.stage_seconds["db_write"] > 0
+    assert progress[-1] == (6, 6)
+    
+    session = session_factory()
+    assert session.query(HanjaInfo).count() == 4
+    assert session.query(UsageExample).count() == 2
+    assert session.query(DocumentHanja).count() == 4
+    assert session.query(DocumentWord).count() == 2
+    session.close()
+
+def test_ingest_duplicate_is_skipped(session_factory):
+    pipeline = IngestionPipeline(session_factory, extractor=HanjaExtractor())
+    
+    pipeline.ingest_text("學校", "doc1")
+    report = pipeline.ingest_text("學校", "doc1-copy")
+    
+    assert report.status == "skipped"
+    
+    # Only the ingested document changed the data version
+    session = session_factory()
+    assert HanjaRepository().get_data_version(session) == 1
+    session.close()
+
+def test_ingest_into_collection(session_factory):
+    pipeline = IngestionPipeline(session_factory, extractor=HanjaExtractor(), collection="2023")
+
+    pipeline.ingest_text("學校", "doc1")
+    IngestionPipeline(session_factory, extractor=HanjaExtractor()).ingest_text("人生", "doc2")
+    # Already ingested documents are still added to the collection
+    assert pipeline.ingest_text("人生", "doc2-copy").status == "skipped"
+
+    session = session_factory()
+    frequencies = session.query(HanjaInfo.char, CollectionHanja.frequency).join(CollectionHanja, CollectionHanja.hanja_id == HanjaInfo.id)
+    assert sorted(frequencies) == [("人", 1), ("學", 1), ("校", 1), ("生", 1)]
+    assert session.query(CollectionDocument).count() == 2
+    session.close()
+
+def test_ingest_near_duplicates(session_factory):
+    text = "다음 중 學校의 뜻으로 옳은 것은? 人生은 短하고 藝術은 長하다. 天地玄黃 宇宙洪荒 日月盈昃 辰宿列張 寒來暑往 秋收冬藏"
+    # Re-scanned copy: different Hangul and spacing, one Hanja misread
+    rescan = text.replace("다음 중", "다음중").replace("秋", "禾") + " (2쪽)"
+    pipeline = IngestionPipeline(session_factory, extractor=HanjaExtractor(), similarity_threshold=0.6)
+    pipeline.ingest_text(text, "exam.pdf")
+
+    report = pipeline.ingest_text(rescan, "exam-rescan.pdf")
+    assert report.status == "ingested"
+    assert report.near_duplicate_of == "exam.pdf" and 0.6 <= report.similarity < 1
+    session = session_factory()
+    flagged = session.query(DocumentSignature).filter(DocumentSignature.near_duplicate_of.isnot(None)).one()
+    assert flagged.similarity == report.similarity
+    session.close()
+
+    skipping = IngestionPipeline(session_factory, extractor=HanjaExtractor(), near_duplicates="skip", similarity_threshold=0.6)
+    report = skipping.ingest_text(rescan + " ", "exam-rescan2.pdf")
+    assert report.status == "skipped" and report.near_duplicate_of in ("exam.pdf", "exam-rescan.pdf")
+    assert skipping.ingest_text("山川草木 春夏秋冬 東西南北", "other.pdf").near_duplicate_of is None
+    unchecked = IngestionPipeline(session_factory, extractor=HanjaExtractor(), near_duplicates="off")
+    assert unchecked.ingest_text(rescan + "  ", "exam-rescan3.pdf").near_duplicate_of is None
+    assert summarize([report], 1.0)["near_duplicates"] == 1
+
+def test_ingest_duplicate_backfills_signature(session_factory):
+    IngestionPipeline(session_factory, extractor=HanjaExtractor(), near_duplicates="off").ingest_text("天地玄黃 宇宙洪荒", "old.pdf")
+    session = session_factory()
+    assert session.query(DocumentSignature).count() == 0
+    session.close()
+
+    # Seeing the same file again stores the signature it was ingested without
+    report = IngestionPipeline(session_factory, extractor=HanjaExtractor()).ingest_text("天地玄黃 宇宙洪荒", "old.pdf")
+    assert report.status == "skipped" and report.near_duplicate_of is None
+    session = session_factory()
+    assert session.query(DocumentSignature).count() == 1
+    assert session.query(DocumentLshBucket).count() == LSH_BANDS
+    session.close()
+
+def test_ingest_file_read_error(session_factory):
+    pipeline = IngestionPipeline(session_factory, extractor=HanjaExtractor())
+    
+    report = pipeline.ingest_file("missing.doc")
+    
+    assert report.status == "error"
+    assert "Error reading file" in report.error
+
+def test_summarize():
+    r1 = DocumentReport("a")
+    r1.status, r1.chars = "ingested", 1000
+    r1.stage_seconds["extract"] = 0.5
+    r2 = DocumentReport("b")
+    r2.status = "skipped"
+    
+    summary = summarize([r1, r2], wall_seconds=2.0)
+    
+    assert summary["ingested"] == 1
+    assert summary["skipped"] == 1
+    assert summary["docs_per_sec"] == 0.5
+    assert summary["chars_per_sec"] == 500
+    assert summary["stage_seconds"]["extract"] == 0.5
+    assert r1.to_dict()["chars_per_sec"] == 2000
@@ -0,0 +1,68 @@
+import logging
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+from src.models import HanjaInfo
+from src.repository import HanjaRepository
+from src.instrumentation import QueryStats, instrument_engine, find_caller
+
+def test_records_counts_and_callers(engine):
+    stats = instrument_engine(engine, slow_threshold_ms=10_000)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    repository = HanjaRepository()
+    
+    repository.add_hanja_info(session, char="學", sound="학", meaning="배울")
+    repository.add_hanja_info(session, char="校", sound="교", meaning="학교")
+    session.commit()
+    
+    rows = stats.report()
+    callers = {r["caller"] for r in rows}
+    assert "HanjaRepository.add_hanja_info" in callers
+    
+    select_rows = [r for r in rows if r["caller"] == "HanjaRepository.add_hanja_info" and r["statement"].startswith("SELECT hanja_info")]
+    assert select_rows and select_rows[0]["count"] == 2
+    assert all(r["p95_ms"] <= r["max_ms"] for r in rows)
+    assert stats.summary()["queries"] == sum(r["count"] for r in rows)
+    session.close()
+
+def test_instrument_engine_is_idempotent(engine):
+    stats1 = instrument_engine(engine)
+    stats2 = instrument_engine(engine)
+    assert stats1 is stats2
+    
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert stats1.summary()["queries"] == 1 # Listeners attached only once
+
+def test_slow_query_logged(caplog):
+    stats = QueryStats(slow_threshold_ms=5)
+    with caplog.at_level(logging.WARNING, logger="src.instrumentation"):
+        stats.record("SELECT  *\n FROM x", "caller", 0.010)
+        stats.record("SELECT * FROM x", "caller", 0.001)
+    
+    assert stats.slow_queries == 1
+    assert "Slow query" in caplog.text
+    rows = stats.report()
+    assert len(rows) == 1 # Whitespace-normalised into one statement
+    assert rows[0]["count"] == 2
+    
+    stats.reset()
+    assert stats.report() == []
+
+def test_stats_memory_is_bounded():
+    stats = QueryStats(sample_size=100)
+    stats._rng.seed(0)
+    for i in range(1, 10001):
+        stats.record("SELECT 1", "caller", i / 1e6) # 1 us .. 10 ms, uniform
+    
+    row = stats.report()[0]
+    assert row["count"] == 10000
+    assert row["total_ms"] == pytest.approx(sum(range(1, 10001)) / 1e3)
+    assert row["max_ms"] == pytest.approx(10.0)
+    assert len(stats._timings[("SELECT 1", "caller")].sample) == 100
+    # Estimated from the sample: the true p95 is 9.5 ms
+    assert row["p95_ms"] == pytest.approx(9.5, abs=1.0)
+
+def test_find_caller_reports_test_function():
+    assert find_caller().endswith("test_find_caller_reports_test_function")
@@ -0,0 +1,131 @@
+import os
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from src.models import Base, Document, IngestJob, CollectionDocument
+from src.extractor import HanjaExtractor
+from src.ingest import IngestionPipeline
+from src.jobs import IngestJobQueue
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+def make_queue(session_factory, tmp_path, **kwargs):
+    factory = kwargs.pop("pipeline_factory", None) or (
+        lambda collection: IngestionPipeline(session_factory, extractor=HanjaExtractor(), collection=collection)
+    )
+    return IngestJobQueue(session_factory, str(tmp_path / "uploads"), pipeline_factory=factory, **kwargs)
+
+def job(session_factory, job_id):
+    session = session_factory()
+    try:
+        return session.get(IngestJob, job_id)
+    finally:
+        session.close()
+
+def test_jobs_are_ingested_in_the_background(session_factory, tmp_path):
+    ingested = []
+    jobs = make_queue(session_factory, tmp_path, workers=2, on_ingested=lambda report: ingested.append(report.filename))
+    jobs.start()
+    try:
+        first = jobs.submit("2023.txt", "學校에서 人生을".encode("utf-8"), collection="2023")
+        second = jobs.submit("2022.txt", "山川".encode("utf-8"))
+        assert jobs.wait_idle(timeout=30)
+        copy = jobs.submit("2023-copy.txt", "學校에서 人生을".encode("utf-8"))
+        assert jobs.wait_idle(timeout=30)
+    finally:
+        jobs.close()
+
+    # Concurrent writers may have been locked out once and retried
+    done = [job(session_factory, job_id) for job_id in (first, second, copy)]
+    assert [(j.status, j.error) for j in done] == [("done", None)] * 3
+    assert sorted(j.result for j in done) == ["ingested", "ingested", "skipped"]
+    assert sorted(ingested) == ["2022.txt", "2023.txt"] # not called for the duplicate
+    # The uploaded name is the document name; the duplicate points to the same document
+    session = session_factory()
+    documents = {d.id: d.filename for d in session.query(Document)}
+    assert sorted(documents.values()) == ["2022.txt", "2023.txt"]
+    assert done[2].document_id == done[0].document_id and documents[done[0].document_id] == "2023.txt"
+    assert session.query(CollectionDocument.document_id).scalar() == done[0].document_id
+    session.close()
+    assert os.listdir(tmp_path / "uploads") == []
+
+def test_failed_attempts_are_retried(session_factory, tmp_path):
+    calls = []
+
+    class FlakyPipeline(IngestionPipeline):
+        def ingest_text(self, text, filename, report=None, on_progress=None):
+            calls.append(filename)
+            if filename == "broken.txt" or len(calls) == 1:
+                report.status, report.error = "error", "database is locked"
+                return report
+            return super().ingest_text(text, filename, report=report, on_progress=on_progress)
+
+    jobs = make_queue(session_factory, tmp_path, workers=1, max_attempts=3, retry_delay=0.01,
+                      pipeline_factory=lambda collection: FlakyPipeline(session_factory, extractor=HanjaExtractor()))
+    jobs.start()
+    try:
+        retried = jobs.submit("exam.txt", "學校".encode("utf-8"))
+        assert jobs.wait_idle(timeout=30)
+        broken = jobs.submit("broken.txt", "人生".encode("utf-8"))
+        assert jobs.wait_idle(timeout=30)
+    finally:
+        jobs.close()
+
+    retried, broken = job(session_factory, retried), job(session_factory, broken)
+    assert (retried.status, retried.attempts, retried.result) == ("done", 2, "ingested")
+    assert (broken.status, broken.attempts, broken.error, broken.document_id) == ("failed", 3, "database is locked", None)
+    assert os.path.exists(broken.path) # kept for inspection
+
+def test_unfinished_jobs_resume_on_start(session_factory, tmp_path):
+    jobs = make_queue(session_factory, tmp_path)
+    queued = jobs.submit("a.txt", "學校".encode("utf-8")) # never started: no worker
+    stale = jobs.submit("b.txt", "人生".encode("utf-8"))
+    live = jobs.submit("c.txt", "山川".encode("utf-8"))
+    session = session_factory()
+    # Interrupted mid-ingest an hour ago / still being ingested by another process
+    session.get(IngestJob, stale).status = "running"
+    session.get(IngestJob, stale).started_at = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=1)
+    session.get(IngestJob, live).status = "running"
+    session.get(IngestJob, live).started_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    session.commit()
+    session.close()
+
+    restarted = make_queue(session_factory, tmp_path)
+    restarted.start()
+    try:
+        assert restarted.wait_idle(timeout=30)
+    finally:
+        restarted.close()
+    assert [job(session_factory, job_id).status for job_id in (queued, stale, live)] == ["done", "done", "running"]
+    assert job(session_factory, live).attempts == 0
+    with pytest.raises(RuntimeError):
+        restarted.submit("b.txt", b"x")
+
+def test_crashed_jobs_are_released_and_close_keeps_counts(session_factory, tmp_path):
+    class CrashingPipeline:
+        def ingest_file(self, path, filename=None):
+            raise RuntimeError("worker crashed")
+
+    jobs = make_queue(session_factory, tmp_path, workers=1, max_attempts=2, retry_delay=0.01,
+                      pipeline_factory=lambda collection: CrashingPipeline())
+    jobs.start()
+    try:
+        crashed = jobs.submit("a.txt", "學校".encode("utf-8"))
+        assert jobs.wait_idle(timeout=30)
+    finally:
+        jobs.close()
+    crashed = job(session_factory, crashed)
+    assert (crashed.status, crashed.attempts, crashed.error) == ("failed", 2, "RuntimeError: worker crashed")
+
+    # Jobs dropped by close() (queued or waiting for a retry) no longer count as unfinished
+    stopped = make_queue(session_factory, tmp_path, workers=1, retry_delay=60)
+    backlog = [stopped.submit(f"{i}.txt", "人生".encode("utf-8")) for i in range(3)] # no worker started
+    stopped._retry_later(stopped._queue.get_nowait(), 60) # taken by a worker, failed, waiting for a retry
+    stopped.close()
+    assert stopped.wait_idle(timeout=1)
+    assert {job(session_factory, job_id).status for job_id in backlog} == {"queued"}
@@ -0,0 +1,95 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+from src.models import Base
+from src.metrics import Registry, DatabaseStatsCollector, instrument_pool, POOL_CHECKOUTS, CACHE_REQUESTS
+
+def test_counter_and_gauge_render():
+    registry = Registry()
+    counter = registry.counter("c_total", "A counter.", ["kind"])
+    gauge = registry.gauge("g", "A gauge.")
+    
+    counter.inc(kind="a")
+    counter.inc(2, kind="a")
+    gauge.set(1.5)
+    body = registry.render()
+    
+    assert "# TYPE c_total counter" in body
+    assert 'c_total{kind="a"} 3' in body
+    assert "g 1.5" in body
+    with pytest.raises(ValueError):
+        counter.inc(other="x")
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    hist = registry.histogram("h_seconds", "A histogram.", ["route"], buckets=(0.1, 1.0))
+    
+    for value in (0.05, 0.5, 5.0):
+        hist.observe(value, route="/x")
+    body = registry.render()
+    
+    assert 'h_seconds_bucket{route="/x",le="0.1"} 1' in body
+    assert 'h_seconds_bucket{route="/x",le="1"} 2' in body
+    assert 'h_seconds_bucket{route="/x",le="+Inf"} 3' in body
+    assert 'h_seconds_count{route="/x"} 3' in body
+    assert hist.get_count(route="/x") == 3
+
+def test_registry_returns_existing_metric():
+    registry = Registry()
+    assert registry.counter("x_total", "x") is registry.counter("x_total", "x")
+
+def test_database_stats_are_cached(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE VIRTUAL TABLE notes_fts USING fts5(body)"))
+    registry = Registry()
+    collector = DatabaseStatsCollector(engine, registry=registry, refresh_seconds=3600)
+    
+    # A scrape never queries the database: nothing until the first refresh
+    collector()
+    assert collector.rows_gauge.get(table="hanja_info") == 0
+    collector.refresh()
+    assert collector.rows_gauge.get(table="hanja_info") == 0
+    
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO hanja_info (char) VALUES ('學')"))
+    hits = CACHE_REQUESTS.get(cache="db_stats", result="hit")
+    collector()
+    # Not refreshed within the interval
+    assert collector.rows_gauge.get(table="hanja_info") == 0
+    assert CACHE_REQUESTS.get(cache="db_stats", result="hit") == hits + 1
+    
+    collector.refresh()
+    assert collector.rows_gauge.get(table="hanja_info") == 1
+    assert collector.size_gauge.get() > 0
+    # Only the model tables are counted, not the FTS5 table or its shadow tables
+    body = registry.render()
+    assert 'table="hanja_info"' in body
+    assert "notes_fts" not in body
+
+def test_database_stats_refresh_in_background():
+    engine = create_engine("sqlite:///:memory:", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    collector = DatabaseStatsCollector(engine, registry=Registry(), refresh_seconds=0.05)
+    collector.start()
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO hanja_info (char) VALUES ('學')"))
+        deadline = time.monotonic() + 5
+        while collector.rows_gauge.get(table="hanja_info") != 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert collector.rows_gauge.get(table="hanja_info") == 1
+    finally:
+        collector.close()
+
+def test_instrument_pool_counts_checkouts():
+    engine = create_engine("sqlite:///:memory:")
+    instrument_pool(engine)
+    instrument_pool(engine) # Idempotent
+    before = POOL_CHECKOUTS.get()
+    
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    
+    assert POOL_CHECKOUTS.get() == before + 1
@@ -0,0 +1,182 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+from src.models import Base
+from src.search import search_words, search_hanja
+from src.migrations import (
+    Migration, get_schema_version, set_schema_version, run_migrations,
+    upgrade_database, latest_version, merge_duplicate_occurrences, backfill_word_chars,
+    rebuild_lsh_buckets
+)
+from src.minhash import MinHasher, signature_to_bytes
+
+MIGRATION_1_INDEXES = [
+    "ix_document_hanja_document_hanja",
+    "ix_document_hanja_hanja_id",
+    "ix_document_words_document_word",
+    "ix_document_words_word_id",
+    "ix_hanja_readings_hanja_id",
+    "ix_hanja_info_radical",
+]
+
+MIGRATION_6_INDEXES = [
+    "ix_documents_created_at",
+    "ix_document_hanja_document_cover",
+    "ix_document_words_document_cover",
+]
+
+@pytest.fixture
+def engine():
+    return create_engine("sqlite:///:memory:")
+
+@pytest.fixture
+def legacy_engine(engine):
+    # Simulate a database created before migration 1 (no indexes, no schema_version table)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for name in MIGRATION_1_INDEXES + MIGRATION_6_INDEXES:
+            conn.execute(text(f"DROP INDEX {name}"))
+        conn.execute(text("INSERT INTO documents (id, filename, file_hash) VALUES (1, 'a', 'a')"))
+        conn.execute(text("INSERT INTO hanja_info (id, char) VALUES (1, '學'), (2, '校')"))
+        conn.execute(text(
+            "INSERT INTO document_hanja (document_id, hanja_id, frequency) VALUES (1, 1, 2), (1, 1, 3), (1, 2, 1)"
+        ))
+        # Single-learner progress table from before migration 2
+        conn.execute(text("DROP TABLE user_progress"))
+        conn.execute(text("""
+            CREATE TABLE user_progress (
+                id INTEGER NOT NULL PRIMARY KEY,
+                hanja_id INTEGER UNIQUE REFERENCES hanja_info (id),
+                word_id INTEGER UNIQUE REFERENCES usage_examples (id),
+                importance_level INTEGER,
+                last_tested_at DATETIME DEFAULT (CURRENT_TIMESTAMP)
+            )
+        """))
+        conn.execute(text("INSERT INTO user_progress (id, hanja_id, importance_level) VALUES (1, 1, 7), (2, 2, 3)"))
+        # No full-text index before migration 4
+        conn.execute(text("DROP TABLE usage_examples_fts"))
+        conn.execute(text("DROP TABLE hanja_readings_fts"))
+        conn.execute(text("INSERT INTO usage_examples (id, word, sound) VALUES (1, '學校', '학교')"))
+        conn.execute(text("INSERT INTO hanja_readings (hanja_id, sound, meaning) VALUES (1, '학', '배울')"))
+    return engine
+
+def index_names(engine):
+    names = set()
+    insp = inspect(engine)
+    for table in insp.get_table_names():
+        names |= {ix["name"] for ix in insp.get_indexes(table)}
+    return names
+
+def test_fresh_database_is_stamped_latest(engine):
+    applied = upgrade_database(engine)
+    assert applied == []
+    assert get_schema_version(engine) == latest_version()
+    assert set(MIGRATION_1_INDEXES) <= index_names(engine)
+
+def test_legacy_database_is_migrated(legacy_engine):
+    assert get_schema_version(legacy_engine) == 0
+    
+    applied = upgrade_database(legacy_engine)
+    
+    assert [m.version for m in applied][0] == 1
+    assert get_schema_version(legacy_engine) == latest_version()
+    assert set(MIGRATION_1_INDEXES + MIGRATION_6_INDEXES) <= index_names(legacy_engine)
+    
+    with legacy_engine.connect() as conn:
+        rows = conn.execute(text("SELECT hanja_id, frequency FROM document_hanja ORDER BY hanja_id")).fetchall()
+    # Duplicate rows merged with frequencies summed
+    assert [tuple(r) for r in rows] == [(1, 5), (2, 1)]
+    
+    # Running again is a no-op
+    assert upgrade_database(legacy_engine) == []
+
+def test_run_migrations_in_order_and_records_version(engine):
+    calls = []
+    migrations = [
+        Migration(2, "second", lambda e: calls.append(2)),
+        Migration(1, "first", lambda e: calls.append(1)),
+        Migration(3, "third", lambda e: calls.append(3)),
+    ]
+    set_schema_version(engine, 1)
+    
+    applied = run_migrations(engine, migrations)
+    
+    assert calls == [2, 3]
+    assert [m.version for m in applied] == [2, 3]
+    assert get_schema_version(engine) == 3
+
+def test_failed_migration_keeps_previous_version(engine):
+    def broken(e):
+        raise RuntimeError("boom")
+    migrations = [Migration(1, "ok", lambda e: None), Migration(2, "broken", broken)]
+    
+    with pytest.raises(RuntimeError):
+        run_migrations(engine, migrations)
+    assert get_schema_version(engine) == 1
+
+def test_merge_duplicate_occurrences_in_batches(legacy_engine):
+    with legacy_engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO document_hanja (document_id, hanja_id, frequency) VALUES (1, 2, 4)"
+        ))
+    
+    merged = merge_duplicate_occurrences(legacy_engine, "document_hanja", "hanja_id", batch_size=1)
+    
+    assert merged == 2
+    with legacy_engine.connect() as conn:
+        rows = conn.execute(text("SELECT hanja_id, frequency FROM document_hanja ORDER BY hanja_id")).fetchall()
+    assert [tuple(r) for r in rows] == [(1, 5), (2, 5)]
+
+def test_progress_rebuilt_with_user_id(legacy_engine):
+    upgrade_database(legacy_engine)
+    
+    with legacy_engine.begin() as conn:
+        rows = conn.execute(text("SELECT id, user_id, hanja_id, importance_level FROM user_progress ORDER BY id")).fetchall()
+        # Existing progress is kept for the default learner
+        assert [tuple(r) for r in rows] == [(1, "default", 1, 7), (2, "default", 2, 3)]
+        # Another learner can now track the same Hanja
+        conn.execute(text("INSERT INTO user_progress (user_id, hanja_id, importance_level) VALUES ('alice', 1, 5)"))
+    
+    assert {"ix_user_progress_user_hanja", "ix_user_progress_user_word"} <= index_names(legacy_engine)
+    assert not inspect(legacy_engine).has_table("user_progress_old")
+
+def test_search_index_backfilled(legacy_engine):
+    upgrade_database(legacy_engine)
+
+    session = sessionmaker(bind=legacy_engine)()
+    try:
+        assert [word for _, word, _ in search_words(session, "校")] == ["學校"]
+        assert [h.char for h in search_hanja(session, "배울")] == ["學"]
+    finally:
+        session.close()
+
+def test_word_chars_backfilled(legacy_engine):
+    with legacy_engine.begin() as conn:
+        conn.execute(text("INSERT INTO usage_examples (id, word) VALUES (2, '大學'), (3, '校長')"))
+    upgrade_database(legacy_engine)
+
+    with legacy_engine.connect() as conn:
+        rows = conn.execute(text("SELECT word_id, position, char FROM word_chars ORDER BY word_id, position")).fetchall()
+    assert [tuple(r) for r in rows] == [(1, 0, "學"), (1, 1, "校"), (2, 0, "大"), (2, 1, "學"), (3, 0, "校"), (3, 1, "長")]
+    # Already indexed words are skipped on a second run
+    assert backfill_word_chars(legacy_engine, batch_size=1) == 0
+
+def test_lsh_buckets_rebuilt(engine):
+    Base.metadata.create_all(engine)
+    old, hasher = MinHasher(bands=16), MinHasher()
+    signatures = {1: old.signature("學校人生山川"), 2: old.signature("大學校長人生")}
+    with engine.begin() as conn:
+        for document_id, signature in signatures.items():
+            conn.execute(text("INSERT INTO documents (id, filename, file_hash) VALUES (:id, 'x.txt', :id)"), {"id": document_id})
+            conn.execute(text("INSERT INTO document_signatures (document_id, signature) VALUES (:id, :signature)"),
+                         {"id": document_id, "signature": signature_to_bytes(signature)})
+            for bucket in old.buckets(signature):
+                conn.execute(text("INSERT INTO document_lsh_buckets (document_id, bucket) VALUES (:id, :bucket)"),
+                             {"id": document_id, "bucket": bucket})
+
+    assert rebuild_lsh_buckets(engine, batch_size=1) == 2
+    with engine.connect() as conn:
+        for document_id, signature in signatures.items():
+            buckets = conn.execute(text("SELECT bucket FROM document_lsh_buckets WHERE document_id = :id"),
+                                   {"id": document_id}).scalars().all()
+            assert sorted(buckets) == sorted(hasher.buckets(signature))
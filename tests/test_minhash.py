@@ -0,0 +1,68 @@
+import random
+
+import numpy as np
+import pytest
+from src.minhash import (
+    DEFAULT_SIMILARITY_THRESHOLD, LSH_BANDS, NUM_PERM, MinHasher, estimate_similarity,
+    signature_from_bytes, signature_to_bytes,
+)
+
+def random_hanja(rng, n):
+    return "".join(chr(0x4E00 + rng.randrange(3000)) for _ in range(n))
+
+def jaccard(a, b):
+    a, b = set(a.tolist()), set(b.tolist())
+    return len(a & b) / len(a | b)
+
+def test_shingles_ignore_non_hanja():
+    hasher = MinHasher()
+    assert len(hasher.shingles("學校에서 人生을")) == 2 # 學校人, 校人生
+    assert len(hasher.shingles("學校 學校 學校")) == 2 # 學校學, 校學校 (distinct only)
+    assert len(hasher.shingles("學校")) == 0
+    assert hasher.signature("한글만 있는 문서") is None
+    # Compatibility ideographs are folded like in the extractor (U+F9B5 -> U+4F8B)
+    assert list(hasher.shingles("學校\uf9b5")) == list(hasher.shingles("學校\u4f8b"))
+
+def test_signature_estimates_jaccard():
+    rng = random.Random(0)
+    hasher = MinHasher()
+    text = random_hanja(rng, 2000)
+    for edits in [10, 100, 600]:
+        chars = list(text)
+        for i in rng.sample(range(len(chars)), edits):
+            chars[i] = random_hanja(rng, 1)
+        variant = "".join(chars)
+        expected = jaccard(hasher.shingles(text), hasher.shingles(variant))
+        estimate = estimate_similarity(hasher.signature(text), hasher.signature(variant))
+        assert estimate == pytest.approx(expected, abs=0.12)
+
+def test_buckets():
+    rng = random.Random(1)
+    hasher = MinHasher()
+    text = random_hanja(rng, 1000)
+    near = text[:500] + "。" + text[500:990]
+    buckets = hasher.buckets(hasher.signature(text))
+    assert len(buckets) == 32 and len(set(buckets)) == 32
+    assert set(buckets) & set(hasher.buckets(hasher.signature(near)))
+    assert not set(buckets) & set(hasher.buckets(hasher.signature(random_hanja(rng, 1000))))
+
+    signature = hasher.signature(text)
+    assert np.array_equal(signature_from_bytes(signature_to_bytes(signature)), signature)
+    with pytest.raises(ValueError):
+        MinHasher(num_perm=100, bands=16)
+
+def test_lsh_recall_at_threshold():
+    rng = random.Random(2)
+    text = random_hanja(rng, 1000)
+    variant = text[:400] + random_hanja(rng, 111) + text[511:]
+    hasher = MinHasher()
+    assert jaccard(hasher.shingles(text), hasher.shingles(variant)) <= DEFAULT_SIMILARITY_THRESHOLD
+    rows = NUM_PERM // LSH_BANDS
+    assert 1 - (1 - DEFAULT_SIMILARITY_THRESHOLD ** rows) ** LSH_BANDS > 0.999
+    # A pair at the threshold is a candidate under (nearly) every hash family
+    missed = 0
+    for seed in range(200):
+        hasher = MinHasher(seed=seed)
+        if not set(hasher.buckets(hasher.signature(text))) & set(hasher.buckets(hasher.signature(variant))):
+            missed += 1
+    assert missed <= 1
@@ -0,0 +1,93 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from src.models import Document, HanjaInfo, DocumentHanja, UsageExample, UserProgress, WordChar
+
+def query_plan(engine, sql, **params):
+    with engine.connect() as conn:
+        rows = conn.execute(text("EXPLAIN QUERY PLAN " + sql), params).fetchall()
+    return " | ".join(row[-1] for row in rows)
+
+def test_occurrence_lookup_uses_composite_index(engine):
+    plan = query_plan(engine, "SELECT * FROM document_hanja WHERE document_id = :d AND hanja_id = :h", d=1, h=1)
+    assert "ix_document_hanja_document_hanja" in plan
+
+    plan = query_plan(engine, "SELECT * FROM document_words WHERE document_id = :d AND word_id = :w", d=1, w=1)
+    assert "ix_document_words_document_word" in plan
+
+def test_target_lookup_uses_single_column_index(engine):
+    plan = query_plan(engine, "SELECT SUM(frequency) FROM document_hanja WHERE hanja_id = :h", h=1)
+    assert "ix_document_hanja_hanja_id" in plan
+
+    plan = query_plan(engine, "SELECT SUM(frequency) FROM document_words WHERE word_id = :w", w=1)
+    assert "ix_document_words_word_id" in plan
+
+    plan = query_plan(engine, "SELECT * FROM hanja_readings WHERE hanja_id = :h", h=1)
+    assert "ix_hanja_readings_hanja_id" in plan
+
+    plan = query_plan(engine, "SELECT id FROM hanja_info WHERE radical = :r", r="子")
+    assert "ix_hanja_info_radical" in plan
+
+def test_duplicate_occurrence_rejected(engine):
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    doc = Document(filename="a", file_hash="a")
+    hanja = HanjaInfo(char="學")
+    session.add_all([doc, hanja])
+    session.flush()
+    session.add(DocumentHanja(document_id=doc.id, hanja_id=hanja.id, frequency=1))
+    session.flush()
+    session.add(DocumentHanja(document_id=doc.id, hanja_id=hanja.id, frequency=1))
+    with pytest.raises(IntegrityError):
+        session.flush()
+    session.rollback()
+
+def test_progress_lookup_uses_per_user_index(engine):
+    plan = query_plan(engine, "SELECT importance_level FROM user_progress WHERE user_id = :u AND hanja_id = :h", u="a", h=1)
+    assert "ix_user_progress_user_hanja" in plan
+
+    plan = query_plan(engine, "SELECT importance_level FROM user_progress WHERE user_id = :u AND word_id = :w", u="a", w=1)
+    assert "ix_user_progress_user_word" in plan
+
+def test_progress_unique_per_user(engine):
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    hanja = HanjaInfo(char="學")
+    session.add(hanja)
+    session.flush()
+    # Different learners may track the same Hanja
+    session.add_all([UserProgress(user_id="a", hanja_id=hanja.id), UserProgress(user_id="b", hanja_id=hanja.id)])
+    session.flush()
+    session.add(UserProgress(user_id="a", hanja_id=hanja.id))
+    with pytest.raises(IntegrityError):
+        session.flush()
+    session.rollback()
+
+def test_progress_page_reads_level_index_in_order(engine):
+    sql = "SELECT id FROM user_progress WHERE user_id = :u ORDER BY importance_level DESC, last_tested_at ASC LIMIT 50"
+    plan = query_plan(engine, sql, u="a")
+    assert "ix_user_progress_user_level" in plan
+    assert "TEMP B-TREE" not in plan
+
+    plan = query_plan(engine, "SELECT importance_level, COUNT(hanja_id), COUNT(*) FROM user_progress WHERE user_id = :u GROUP BY importance_level", u="a")
+    assert "COVERING INDEX ix_user_progress_user_level" in plan
+
+def test_word_chars_created_with_word(engine):
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    word = UsageExample(word="人人", sound="인인")
+    session.add(word)
+    session.commit()
+    assert [(c.position, c.char) for c in word.chars] == [(0, "人"), (1, "人")]
+
+    session.delete(word)
+    session.commit()
+    assert session.query(WordChar).count() == 0
+
+def test_char_lookup_uses_word_chars_index(engine):
+    plan = query_plan(engine, "SELECT word_id FROM word_chars WHERE char = :c", c="學")
+    assert "COVERING INDEX ix_word_chars_char_word" in plan
+
+    plan = query_plan(engine, "SELECT char FROM word_chars WHERE word_id = :w ORDER BY position", w=1)
+    assert "ix_word_chars_word_position" in plan
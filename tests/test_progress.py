@@ -0,0 +1,92 @@
+import pytest
+from src.models import HanjaInfo, UsageExample, UserProgress
+from src.progress import BatchedProgressWriter
+
+@pytest.fixture
+def session_factory(session_factory):
+    session = session_factory()
+    h = HanjaInfo(char="學")
+    w = UsageExample(word="學校", sound="학교")
+    session.add_all([h, w])
+    session.flush()
+    session.add(UserProgress(hanja_id=h.id, importance_level=8))
+    session.commit()
+    session.close()
+    return session_factory
+
+def test_record_applies_levels_in_memory(session_factory):
+    writer = BatchedProgressWriter(session_factory, flush_interval=None)
+    
+    assert writer.record(hanja_id=1, change=-1) == 7   # Starts from the stored level 8
+    assert writer.record(word_id=1, change=+1) == 6    # Default 5
+    assert writer.record(word_id=1, change=-10) == 0   # Never below 0
+    assert writer.pending() == 2
+    
+    session = session_factory()
+    assert session.query(UserProgress).filter_by(hanja_id=1).one().importance_level == 8
+    session.close()
+
+def test_flush_writes_batch(session_factory):
+    writer = BatchedProgressWriter(session_factory, flush_interval=None)
+    writer.record(hanja_id=1, change=+1)
+    writer.record(word_id=1, change=-1)
+    
+    assert writer.flush() == 2
+    assert writer.pending() == 0
+    
+    session = session_factory()
+    assert session.query(UserProgress).filter_by(hanja_id=1).one().importance_level == 9
+    assert session.query(UserProgress).filter_by(word_id=1).one().importance_level == 4
+    session.close()
+
+def test_flush_when_batch_full(session_factory):
+    writer = BatchedProgressWriter(session_factory, batch_size=2, flush_interval=None)
+    writer.record(hanja_id=1, change=+1)
+    assert writer.pending() == 1
+    writer.record(word_id=1, change=+1)
+    assert writer.pending() == 0
+
+def test_close_flushes_pending(session_factory):
+    writer = BatchedProgressWriter(session_factory, flush_interval=60)
+    writer.record(word_id=1, change=+2)
+    
+    writer.close()
+    
+    session = session_factory()
+    assert session.query(UserProgress).filter_by(word_id=1).one().importance_level == 7
+    session.close()
+
+def test_record_requires_target(session_factory):
+    writer = BatchedProgressWriter(session_factory, flush_interval=None)
+    with pytest.raises(ValueError):
+        writer.record(change=1)
+
+def test_levels_kept_per_user(session_factory):
+    writer = BatchedProgressWriter(session_factory, flush_interval=None)
+    
+    assert writer.record(hanja_id=1, change=+1, user_id="alice") == 6 # alice starts from the default
+    assert writer.record(hanja_id=1, change=+1) == 9                   # default learner has level 8
+    writer.flush()
+    
+    session = session_factory()
+    levels = {up.user_id: up.importance_level for up in session.query(UserProgress).filter_by(hanja_id=1)}
+    assert levels == {"default": 9, "alice": 6}
+    session.close()
+
+def test_flushed_levels_are_read_again(session_factory):
+    writer = BatchedProgressWriter(session_factory, flush_interval=None)
+    assert writer.record(hanja_id=1, change=+1) == 9
+    writer.flush()
+    assert writer._dirty == {} and writer._flushing == {} # nothing kept once written
+
+    # Another process (or app.py) records an answer meanwhile
+    session = session_factory()
+    session.query(UserProgress).filter_by(hanja_id=1).one().importance_level = 3
+    session.commit()
+    session.close()
+
+    assert writer.record(hanja_id=1, change=+1) == 4
+    writer.flush()
+    session = session_factory()
+    assert session.query(UserProgress).filter_by(hanja_id=1).one().importance_level == 4
+    session.close()
@@ -1,15 +1,10 @@
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from src.models import Base, HanjaInfo, HanjaReading, UsageExample, DocumentHanja, Document, UserProgress
+from src.models import HanjaInfo, HanjaReading, UsageExample, DocumentHanja, Document, UserProgress
 from src.quiz import QuizGenerator
 
 @pytest.fixture
-def session():
-    engine = create_engine("sqlite:///:memory:")
-    Base.metadata.create_all(engine)
-    Session = sessionmaker(bind=engine)
-    session = Session()
+def session(session_factory):
+    session = session_factory()
     
     # Seed Data for HanjaInfo, UsageExample
     h1 = HanjaInfo(char="學", radical="子", strokes=16)
@@ -169,4 +164,93 @@ def test_generate_quiz_importance_review_min_importance_filter(quiz_gen):
     session = quiz_gen.Session()
     h1_id = session.query(HanjaInfo.id).filter_by(char="學").scalar()
     
-    assert q['hanja_id'] == h1_id # Should only pick 學 (level 5)
\ No newline at end of file
+    assert q['hanja_id'] == h1_id # Should only pick 學 (level 5)
+def test_generate_batch(quiz_gen):
+    questions = quiz_gen.generate_batch(5, mode='word', q_type='word_to_sound')
+    assert len(questions) == 5
+    assert all(q['word_id'] is not None for q in questions)
+
+def test_question_pool_serves_from_batches(quiz_gen):
+    from src.quiz import QuestionPool
+    pool = QuestionPool(quiz_gen, batch_size=10, prefetch=False)
+    
+    first = pool.get(3, mode='word', q_type='sound_to_word')
+    assert len(first) == 3
+    # The rest of the batch stays queued for the same settings
+    assert len(pool._queues[('default', 'word', 'sound_to_word', None, 0)]) == 7
+    
+    second = pool.get(7, mode='word', q_type='sound_to_word')
+    assert len(second) == 7
+    assert len(pool._queues[('default', 'word', 'sound_to_word', None, 0)]) == 0
+
+def test_get_correct_answer(quiz_gen):
+    session = quiz_gen.Session()
+    h1 = session.query(HanjaInfo).filter_by(char="學").one()
+    w1 = session.query(UsageExample).filter_by(word="學校").one()
+    
+    assert quiz_gen.get_correct_answer(session, 'hanja_to_meaning', hanja_id=h1.id) == "배울 학"
+    assert quiz_gen.get_correct_answer(session, 'meaning_to_hanja', hanja_id=h1.id) == "學"
+    assert quiz_gen.get_correct_answer(session, 'word_to_sound', word_id=w1.id) == "학교"
+    assert quiz_gen.get_correct_answer(session, 'sound_to_word', word_id=w1.id) == "學校"
+    assert quiz_gen.get_correct_answer(session, 'hanja_to_meaning', hanja_id=9999) is None
+
+def test_question_pool_prefetches_when_low():
+    import time
+    from src.quiz import QuestionPool
+
+    class StubGenerator:
+        def generate_batch(self, count, **kwargs):
+            return [{"q_text": str(i)} for i in range(count)]
+
+    pool = QuestionPool(StubGenerator(), batch_size=4)
+    key = ('default', 'random', 'hanja_to_meaning', None, 0)
+    
+    pool.get(3) # 1 left, below the low-water mark of 2
+    deadline = time.monotonic() + 5
+    while len(pool._queues[key]) < 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(pool._queues[key]) == 5
+
+def test_weighted_hanja_per_learner(quiz_gen):
+    session = quiz_gen.Session()
+    h2 = session.query(HanjaInfo).filter_by(char="校").one()
+    session.add(UserProgress(user_id="alice", hanja_id=h2.id, importance_level=9))
+    session.commit()
+    
+    # alice's own level makes 校 the heaviest; the default learner's rows do not apply to her
+    alice = dict((h.char, w) for h, w in quiz_gen.get_weighted_hanja(session, limit=10, user_id="alice"))
+    assert alice["校"] == 10
+    assert alice["學"] == 6
+    default = dict((h.char, w) for h, w in quiz_gen.get_weighted_hanja(session, limit=10))
+    assert default["校"] == 2
+
+def test_importance_review_scoped_per_learner(quiz_gen):
+    assert quiz_gen.generate_quiz(mode='importance_review', q_type='hanja_to_meaning', user_id="nobody") is None
+    assert quiz_gen.generate_quiz(mode='importance_review', q_type='hanja_to_meaning') is not None
+
+def test_sampler_cache_lru_eviction():
+    from src.quiz import SamplerCache
+    cache = SamplerCache(max_learners=2)
+    loads = []
+    def loader(user):
+        return lambda: loads.append(user) or {('hanja', 1): 5}
+    
+    cache.get("a", loader("a"))
+    cache.get("b", loader("b"))
+    cache.get("a", loader("a")) # hit, a becomes most recent
+    cache.get("c", loader("c")) # evicts b
+    assert loads == ["a", "b", "c"]
+    assert len(cache) == 2
+    
+    cache.get("b", loader("b"))
+    assert loads[-1] == "b"
+
+def test_sampler_cache_tracks_answers(quiz_gen):
+    session = quiz_gen.Session()
+    h1 = session.query(HanjaInfo).filter_by(char="學").one()
+    quiz_gen.get_progress_levels(session, "alice")
+    
+    quiz_gen.update_cached_level("alice", hanja_id=h1.id, level=9)
+    
+    weights = dict((h.char, w) for h, w in quiz_gen.get_weighted_hanja(session, limit=10, user_id="alice"))
+    assert weights["學"] == 10
@@ -10,7 +10,7 @@ def test_read_text_file():
 
 def test_read_pdf_file():
     # Mock PdfReader and its pages
-    with patch("src.reader.PdfReader") as MockPdfReader:
+    with patch("pypdf.PdfReader") as MockPdfReader: # imported by read_pdf_file on first use
         mock_reader_instance = MockPdfReader.return_value
         
         page1 = MagicMock()
@@ -0,0 +1,125 @@
+import pytest
+from src.models import Document, DocumentHanja, DocumentWord, HanjaInfo, HanjaReading, UsageExample
+from src.repository import HanjaRepository
+from src.readmodel import ReadModel, ReadModelCache, write_snapshot
+from src.analysis import top_hanja_queries, top_radicals_queries, word_frequencies_query, char_words_queries, count_word_chars
+
+@pytest.fixture
+def session(session_factory):
+    session = session_factory()
+    doc = Document(filename="a", file_hash="a")
+    session.add(doc)
+    # 水 has no radical, 木 no reading, 天 never occurs
+    hanja = {}
+    for char, radical, frequency in [("學", "子", 4), ("校", "木", 2), ("木", "木", 2), ("水", None, 1), ("天", "大", None)]:
+        h = hanja[char] = HanjaInfo(char=char, radical=radical, strokes=1)
+        session.add(h)
+        session.flush()
+        if char != "木":
+            session.add(HanjaReading(hanja_id=h.id, sound=char, meaning="뜻"))
+        if frequency:
+            session.add(DocumentHanja(document_id=doc.id, hanja_id=h.id, frequency=frequency))
+    for word, sound, frequency in [("學校", "학교", 3), ("大學", None, 1), ("學生", "학생", None)]:
+        w = UsageExample(word=word, sound=sound)
+        session.add(w)
+        session.flush()
+        if frequency:
+            session.add(DocumentWord(document_id=doc.id, word_id=w.id, frequency=frequency))
+    session.commit()
+    yield session
+    session.close()
+
+def test_read_model_matches_global_queries(session):
+    model = ReadModel.load(session, 0)
+
+    total_query, items_query = top_hanja_queries(0, 10)
+    top = [(h.char, f) for h, f in session.execute(items_query)]
+    total, items = model.top_hanja(0, 10)
+    assert total == session.execute(total_query).scalar() == 4
+    assert sorted(top, key=lambda item: -item[1])[0] == ("學", 4)
+    assert sorted((h.char, f) for h, f in items) == sorted(top)
+    # Ties: the highest id first, as the scoped ranking
+    assert [h.char for h, _ in items] == ["學", "木", "校", "水"]
+    assert [h.char for h, _ in model.top_hanja(1, 2)[1]] == ["木", "校"]
+
+    total_query, items_query = top_radicals_queries(0, 10)
+    assert model.top_radicals(0, 10) == (session.execute(total_query).scalar(), [("子", 4), ("木", 4)])
+    assert model.top_radicals(0, 10)[1] == sorted(session.execute(items_query).all(), key=lambda r: (-r[1], r[0]))
+
+    assert model.top_word_chars(0, 100)[1] == count_word_chars(session.execute(word_frequencies_query()).all())
+    for char in ["學", "校", "生", "木"]:
+        total_query, items_query = char_words_queries(char, 0, 10)
+        total, items = model.char_words(char, 0, 10)
+        assert total == session.execute(total_query).scalar()
+        assert [(w.word, f) for w, f in items] == [(w.word, f) for w, f in session.execute(items_query)]
+
+    # Records mirror the ORM rows
+    learn = model.hanja_by_char("學")
+    assert (learn.radical, [(r.sound, r.meaning) for r in learn.readings]) == ("子", [("學", "뜻")])
+    assert model.hanja_by_id(learn.id).char == "學" and model.hanja_by_id(999) is None
+    assert model.radicals == ("大", "子", "木")
+    assert [h.char for h in model.hanja_candidates("木")] == ["校", "木"]
+    assert model.hanja_candidates("?") == []
+    # Quiz pools keep only Hanja with readings and words with sounds
+    assert {h.char for h in model.sample_hanja(10)} == {"學", "校", "水", "天"}
+    assert {h.char for h in model.sample_hanja(10, exclude_radical="木")} == {"學", "水", "天"}
+    assert {w.word for w in model.sample_words(10)} == {"學校", "學生"}
+    assert model.nbytes > 0
+
+def test_cache_swaps_snapshot_on_data_version(session):
+    cache = ReadModelCache()
+    first = cache.get(session)
+    assert cache.get(session) is first
+
+    h = session.query(HanjaInfo).filter_by(char="天").one()
+    session.add(DocumentHanja(document_id=1, hanja_id=h.id, frequency=9))
+    session.commit()
+    # Not visible until the data version changes
+    assert cache.get(session) is first
+    HanjaRepository().bump_data_version(session)
+    session.commit()
+
+    second = cache.get(session)
+    assert second is not first and second.top_hanja(0, 1)[1][0][0].char == "天"
+    # Readers holding the old snapshot keep a consistent view
+    assert first.top_hanja(0, 1)[1][0][0].char == "學"
+
+def test_snapshot_file_roundtrip(session, tmp_path):
+    built = ReadModel.load(session, 3, fingerprint=[3, 0, 0, 0])
+    built.save(tmp_path / "model.bin")
+    mapped = ReadModel.open(tmp_path / "model.bin")
+    assert mapped.mapped and not built.mapped
+    assert (mapped.data_version, mapped.fingerprint, mapped.nbytes) == (3, [3, 0, 0, 0], built.nbytes)
+    assert not mapped.hanja_ids.flags.writeable
+    for name, array in built.arrays.items():
+        assert mapped.arrays[name].dtype == array.dtype and (mapped.arrays[name] == array).all(), name
+    assert [(h.char, f) for h, f in mapped.top_hanja(0, 10)[1]] == [(h.char, f) for h, f in built.top_hanja(0, 10)[1]]
+    assert mapped.top_radicals(0, 10) == built.top_radicals(0, 10)
+    assert [(w.word, w.sound) for w, _ in mapped.char_words("學", 0, 10)[1]] == [("學校", "학교"), ("大學", None), ("學生", "학생")]
+    assert mapped.hanja_by_char("水").radical is None and mapped.hanja_by_char("?") is None
+
+    (tmp_path / "other.bin").write_bytes(b"not a snapshot")
+    with pytest.raises(ValueError):
+        ReadModel.open(tmp_path / "other.bin")
+
+def test_cache_shares_snapshot_file(session, tmp_path, monkeypatch):
+    path = str(tmp_path / "model.bin")
+    first = ReadModelCache(path=path).get(session)
+    assert first.mapped
+
+    # Another worker maps the file instead of reading the tables
+    def no_build(*args, **kwargs):
+        raise AssertionError("snapshot rebuilt")
+    monkeypatch.setattr(ReadModel, "load", no_build)
+    assert ReadModelCache(path=path).get(session).top_hanja(0, 1)[1][0][0].char == "學"
+    monkeypatch.undo()
+
+    # A data version bump regenerates the file; the old mapping stays readable
+    h = session.query(HanjaInfo).filter_by(char="天").one()
+    session.add(DocumentHanja(document_id=1, hanja_id=h.id, frequency=9))
+    HanjaRepository().bump_data_version(session)
+    session.commit()
+    second = write_snapshot(lambda: session, path)
+    assert second.data_version == first.data_version + 1 and second.top_hanja(0, 1)[1][0][0].char == "天"
+    assert first.top_hanja(0, 1)[1][0][0].char == "學"
+    assert ReadModel.open(path).fingerprint == second.fingerprint
@@ -0,0 +1,92 @@
+import pytest
+from src.models import HanjaInfo, HanjaReading, RefHanja
+from src.dictionary import HanjaDictionary
+from src.loader import DictionaryLoader, RefEntry, read_reference_csv
+from src.repository import HanjaRepository
+from src.refresh import DictionaryRefresher, diff_reference
+from src.search import search_hanja
+
+HEADER = "main_sound,level,hanja,meaning,radical,strokes,total_strokes\n"
+
+def write_csv(path, rows):
+    path.write_text(HEADER + "".join(f'{row}\n' for row in rows), encoding="utf-8")
+    return str(path)
+
+OLD_ROWS = [
+    '학,8급,學,"[[[\'배울\'], [\'학\']]]",子,13,16',
+    '교,8급,校,"[[[\'학교\'], [\'교\']]]",木,6,10',
+    '인,8급,人,"[[[\'사람\'], [\'인\']]]",人,0,2',
+]
+
+def ingest_chars(session_factory, chars):
+    session = session_factory()
+    dictionary, repository = HanjaDictionary(), HanjaRepository()
+    for char in chars:
+        info = dictionary.lookup(session, char)
+        repository.add_hanja_info(session, char=info["char"], sound=info["sound"], meaning=info["meaning"],
+                                  radical=info["radical"], strokes=info["strokes"], readings=info.get("readings"))
+    session.commit()
+    session.close()
+
+def readings(session, char):
+    hanja = session.query(HanjaInfo).filter_by(char=char).one()
+    return [(r.sound, r.meaning) for r in sorted(hanja.readings, key=lambda r: r.id)]
+
+def test_read_reference_csv_and_diff(tmp_path):
+    old = read_reference_csv(write_csv(tmp_path / "old.csv", OLD_ROWS))
+    assert old["學"] == RefEntry("子", 16, "8급", (("학", "배울"),))
+
+    new = dict(old)
+    new["學"] = old["學"]._replace(readings=(("학", "배울"), ("교", "가르칠")))
+    new["生"] = RefEntry("生", 5, "8급", (("생", "날"),))
+    del new["校"]
+    diff = diff_reference(old, new)
+    assert list(diff.added) == ["生"]
+    assert diff.changed == {"學": (old["學"], new["學"])}
+    assert list(diff.removed) == ["校"]
+    assert diff.chars == {"學", "生", "校"}
+    assert not diff_reference(new, new).chars
+
+def test_refresh_updates_only_affected_hanja(tmp_path, session_factory):
+    DictionaryLoader(session_factory).load_csv_data(write_csv(tmp_path / "old.csv", OLD_ROWS))
+    ingest_chars(session_factory, ["學", "校", "人", "生"])
+
+    session = session_factory()
+    assert readings(session, "生") == [("생", "미상")]
+    # Adjusted after ingest: kept by the refresh
+    session.query(HanjaInfo).filter_by(char="學").one().radical = "学"
+    session.add(HanjaReading(hanja_id=session.query(HanjaInfo).filter_by(char="學").one().id, sound="학", meaning="공부"))
+    unchanged = [r.id for r in session.query(HanjaInfo).filter_by(char="人").one().readings]
+    version = HanjaRepository().get_data_version(session)
+    session.commit()
+    session.close()
+
+    new_csv = write_csv(tmp_path / "new.csv", [
+        '학,8급,學,"[[[\'가르칠\'], [\'교\']], [[\'배울\'], [\'학\']]]",子,13,16',
+        OLD_ROWS[2],
+        '생,8급,生,"[[[\'날\'], [\'생\']]]",生,0,5',
+    ])
+    refresher = DictionaryRefresher(session_factory, batch_size=1)
+    assert refresher.refresh(new_csv, dry_run=True).to_dict()["hanja_updated"] == 0
+    report = refresher.refresh(new_csv)
+    assert report.to_dict() == {"added": 1, "changed": 1, "removed": 1, "hanja_updated": 3, "readings_replaced": 4}
+
+    session = session_factory()
+    # New reference readings first (the first one is the quiz answer), the imported one kept
+    assert readings(session, "學") == [("교", "가르칠"), ("학", "배울"), ("학", "공부")]
+    assert session.query(HanjaInfo).filter_by(char="學").one().radical == "学"
+    # The placeholder is replaced once the reference knows the character
+    assert readings(session, "生") == [("생", "날")]
+    generated = session.query(HanjaInfo).filter_by(char="生").one()
+    assert (generated.radical, generated.strokes) == ("生", 5)
+    # Removed from the reference: back to the fallback
+    assert readings(session, "校") == [("교", "미상")]
+    assert [r.id for r in session.query(HanjaInfo).filter_by(char="人").one().readings] == unchanged
+    assert [h.char for h in search_hanja(session, "날")] == ["生"]
+    assert search_hanja(session, "미상") and "生" not in [h.char for h in search_hanja(session, "미상")]
+    assert sorted(h.char for h in session.query(RefHanja)) == sorted(["學", "人", "生"])
+    assert HanjaRepository().get_data_version(session) == version + 1
+    session.close()
+
+    # The reference now matches the CSV: nothing left to do
+    assert refresher.refresh(new_csv).to_dict() == {"added": 0, "changed": 0, "removed": 0, "hanja_updated": 0, "readings_replaced": 0}
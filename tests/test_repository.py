@@ -2,19 +2,10 @@ import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from src.models import Base, HanjaInfo, UsageExample, Document, DocumentHanja, DocumentWord, HanjaReading, RefHanja, RefHanjaReading, UserProgress
+from src.models import CollectionDocument, CollectionHanja, CollectionWord
 from src.repository import HanjaRepository
 from datetime import datetime, timedelta
 
-@pytest.fixture
-def session():
-    # Use in-memory SQLite for testing
-    engine = create_engine("sqlite:///:memory:")
-    Base.metadata.create_all(engine)
-    Session = sessionmaker(bind=engine)
-    session = Session()
-    yield session
-    session.close()
-
 @pytest.fixture
 def repository():
     return HanjaRepository()
@@ -72,6 +63,58 @@ def test_add_usage_example(session, repository, seed_data):
     w_existing = repository.add_usage_example(session, word="學校", sound="학교")
     assert w_existing.id == seed_data["w1"].id
 
+def test_add_document_occurrences_matches_item_methods(repository):
+    def collected(session):
+        hanja = {h.char: (h.radical, h.strokes, sorted((r.sound, r.meaning or "") for r in h.readings)) for h in session.query(HanjaInfo)}
+        words = {w.word: w.sound for w in session.query(UsageExample)}
+        occurrences = sorted(
+            [(o.hanja.char, o.frequency) for o in session.query(DocumentHanja)]
+            + [(o.word.word, o.frequency) for o in session.query(DocumentWord)]
+        )
+        return hanja, words, occurrences
+
+    hanja_infos = [
+        # Existing: missing radical filled in, known reading not duplicated
+        {"char": "學", "sound": "학", "meaning": "배울", "radical": "子", "strokes": 16,
+         "readings": [{"sound": "학", "meaning": "배울"}, {"sound": "학", "meaning": "공부"}]},
+        # New, reading list with a duplicate and an empty sound
+        {"char": "樂", "sound": "락", "meaning": "즐길", "radical": "木", "strokes": 15,
+         "readings": [{"sound": "락", "meaning": "즐길"}, {"sound": "악", "meaning": "노래"}, {"sound": "락", "meaning": "즐길"}, {"sound": "", "meaning": "x"}]},
+        # Legacy single sound/meaning: matched by sound
+        {"char": "校", "sound": "교", "meaning": "미상", "radical": "?", "strokes": 0, "readings": []},
+        # Compatibility form folded by the lookup: counted twice
+        {"char": "樂", "sound": "락", "meaning": "즐길", "radical": "木", "strokes": 15, "readings": [{"sound": "락", "meaning": "즐길"}]},
+    ]
+    word_sounds = [("學校", "학교"), ("音樂", "음악"), ("人生", "인생")]
+    results = []
+    for bulk in (False, True):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        session.add_all([HanjaInfo(char="學", strokes=16), HanjaInfo(char="校", radical="木"), UsageExample(word="學校")])
+        session.flush()
+        session.add(HanjaReading(hanja_id=1, sound="학", meaning="배울"))
+        session.add(HanjaReading(hanja_id=2, sound="교", meaning="학교"))
+        doc = repository.create_document(session, "doc", "hash")
+        if bulk:
+            repository.add_document_occurrences(session, doc.id, hanja_infos, word_sounds)
+        else:
+            for info in hanja_infos:
+                repository.add_hanja_info(session, char=info["char"], sound=info["sound"], meaning=info["meaning"],
+                                          radical=info["radical"], strokes=info["strokes"], readings=info["readings"])
+                repository.update_document_hanja_frequency(session, doc.id, info["char"])
+            for word, sound in word_sounds:
+                repository.add_usage_example(session, word=word, sound=sound)
+                repository.update_document_word_frequency(session, doc.id, word)
+        session.commit()
+        results.append(collected(session))
+        session.close()
+    assert results[0] == results[1]
+    hanja, words, occurrences = results[1]
+    assert hanja["學"] == ("子", 16, [("학", "공부"), ("학", "배울")])
+    assert hanja["樂"][2] == [("락", "즐길"), ("악", "노래")]
+    assert words["學校"] == "학교" and ("樂", 2) in occurrences
+
 def test_update_document_hanja_frequency(session, repository, seed_data):
     doc = repository.create_document(session, "doc1", "h1")
     
@@ -173,3 +216,155 @@ def test_get_all_user_progress(session, repository, seed_data):
     assert len(high_importance_progress) == 2
     assert high_importance_progress[0].hanja.char == "學" # Level 10
     assert high_importance_progress[1].word.word == "學校" # Level 8
+
+def test_get_all_words(session, repository, seed_data):
+    words = repository.get_all_words(session)
+    assert set(words) == {"學校", "人生"}
+
+def test_importance_level_scoped_per_user(session, repository, seed_data):
+    hanja = seed_data["h1"]
+    
+    repository.update_importance_level(session, hanja_id=hanja.id, change=+2, user_id="alice") # 7
+    repository.update_importance_level(session, hanja_id=hanja.id, change=-1, user_id="bob") # 4
+    repository.update_importance_level(session, hanja_id=hanja.id, change=+1) # default learner: 6
+    session.commit()
+    
+    assert repository.get_user_progress(session, hanja_id=hanja.id, user_id="alice").importance_level == 7
+    assert repository.get_user_progress(session, hanja_id=hanja.id, user_id="bob").importance_level == 4
+    assert repository.get_user_progress(session, hanja_id=hanja.id).importance_level == 6
+    assert len(repository.get_all_user_progress(session, user_id="alice")) == 1
+    assert repository.get_all_user_progress(session, user_id="carol") == []
+
+def test_set_importance_levels(session, repository, seed_data):
+    h1, w1 = seed_data["h1"], seed_data["w1"]
+    repository.update_importance_level(session, hanja_id=h1.id, change=0, user_id="alice") # existing row (5)
+    
+    repository.set_importance_levels(session, {
+        ("alice", "hanja", h1.id): 8,
+        ("alice", "word", w1.id): 2,
+        ("bob", "hanja", h1.id): 1,
+    })
+    session.commit()
+    
+    assert repository.get_user_progress(session, hanja_id=h1.id, user_id="alice").importance_level == 8
+    assert repository.get_user_progress(session, word_id=w1.id, user_id="alice").importance_level == 2
+    assert repository.get_user_progress(session, hanja_id=h1.id, user_id="bob").importance_level == 1
+    assert session.query(UserProgress).count() == 3
+
+def test_data_version(session, repository):
+    assert repository.get_data_version(session) == 0
+    assert repository.bump_data_version(session) == 1
+    assert repository.bump_data_version(session) == 2
+    session.commit()
+    assert repository.get_data_version(session) == 2
+
+def test_import_progress_bumps_data_version(session, repository, seed_data):
+    count = repository.import_progress_data(session, [
+        {"type": "hanja", "target": "學", "importance_level": 7},
+    ])
+    assert count == 1
+    assert repository.get_data_version(session) == 1
+
+def test_importance_histogram(session, repository, seed_data):
+    repository.set_importance_levels(session, {
+        ("default", "hanja", seed_data["h1"].id): 7,
+        ("default", "hanja", seed_data["h2"].id): 3,
+        ("default", "word", seed_data["w1"].id): 7,
+        ("default", "word", seed_data["w2"].id): 7,
+        ("other", "hanja", seed_data["h1"].id): 1,
+    })
+    session.commit()
+
+    assert repository.get_importance_histogram(session) == [(3, 1, 0), (7, 1, 2)]
+    assert repository.get_importance_histogram(session, user_id="other") == [(1, 1, 0)]
+    assert repository.get_importance_histogram(session, user_id="nobody") == []
+
+def test_get_progress_page(session, repository, seed_data):
+    session.add(HanjaReading(hanja_id=seed_data["h1"].id, sound="교", meaning="가르칠")) # second reading
+    for i in range(5):
+        h = HanjaInfo(char=chr(0x4E00 + i), radical="一")
+        session.add(h)
+        session.flush()
+        session.add(UserProgress(hanja_id=h.id, importance_level=i))
+    session.add_all([
+        UserProgress(hanja_id=seed_data["h1"].id, importance_level=9),
+        UserProgress(hanja_id=seed_data["h2"].id, importance_level=9, last_tested_at=datetime.now() - timedelta(days=1)),
+        UserProgress(word_id=seed_data["w1"].id, importance_level=6),
+        UserProgress(user_id="other", hanja_id=seed_data["h1"].id, importance_level=1),
+    ])
+    session.commit()
+
+    total, rows = repository.get_progress_page(session, "hanja", page=1, size=3)
+    assert total == 7
+    # Level desc, then least recently tested first
+    assert [r["target"] for r in rows] == ["校", "學", chr(0x4E00 + 4)]
+    assert rows[1]["meaning"] == "배울" and rows[1]["sound"] == "학" and rows[1]["radical"] == "子"
+    assert rows[2]["meaning"] is None
+
+    total, rows = repository.get_progress_page(session, "hanja", page=3, size=3)
+    assert total == 7 and [r["importance_level"] for r in rows] == [0]
+
+    total, rows = repository.get_progress_page(session, "hanja", min_level=2, max_level=3)
+    assert total == 2 and [r["importance_level"] for r in rows] == [3, 2]
+
+    # Search by reading matches the first reading only, like readings[0]
+    total, rows = repository.get_progress_page(session, "hanja", search="배울")
+    assert total == 1 and rows[0]["target"] == "學"
+    assert repository.get_progress_page(session, "hanja", search="%")[0] == 0
+
+    total, rows = repository.get_progress_page(session, "word", search="학")
+    assert total == 1
+    assert rows[0]["target"] == "學校" and rows[0]["sound"] == "학교" and rows[0]["importance_level"] == 6
+
+    total, rows = repository.get_progress_page(session, "hanja", user_id="other")
+    assert total == 1 and rows[0]["importance_level"] == 1
+
+    with pytest.raises(ValueError):
+        repository.get_progress_page(session, "radical")
+
+def test_collection_aggregates(session, repository, seed_data):
+    h1, h2, w1 = seed_data["h1"], seed_data["h2"], seed_data["w1"]
+    docs = [Document(filename=f"doc{i}", file_hash=f"doc{i}") for i in range(3)]
+    session.add_all(docs)
+    session.flush()
+    for doc, (f1, f2) in zip(docs, [(2, 1), (3, 0), (1, 4)]):
+        session.add(DocumentHanja(document_id=doc.id, hanja_id=h1.id, frequency=f1))
+        if f2:
+            session.add(DocumentHanja(document_id=doc.id, hanja_id=h2.id, frequency=f2))
+        session.add(DocumentWord(document_id=doc.id, word_id=w1.id, frequency=1))
+    session.commit()
+
+    def aggregates(collection):
+        hanja = {row.hanja_id: row.frequency for row in session.query(CollectionHanja).filter_by(collection_id=collection.id)}
+        words = {row.word_id: row.frequency for row in session.query(CollectionWord).filter_by(collection_id=collection.id)}
+        return hanja, words
+
+    collection = repository.add_documents_to_collection(session, "exam", [docs[0].id, 999])
+    assert aggregates(collection) == ({h1.id: 2, h2.id: 1}, {w1.id: 1})
+    # Incremental: members already counted are not counted twice
+    repository.add_documents_to_collection(session, "exam", [docs[0].id, docs[1].id])
+    assert aggregates(collection) == ({h1.id: 5, h2.id: 1}, {w1.id: 2})
+
+    repository.set_collection_documents(session, "exam", [docs[2].id])
+    session.commit()
+    assert aggregates(collection) == ({h1.id: 1, h2.id: 4}, {w1.id: 1})
+    assert [(c.name, count) for c, count in repository.list_collections(session)] == [("exam", 1)]
+
+    # The data version (and the caches keyed by it) only moves when membership changes
+    version = repository.get_data_version(session)
+    repository.add_documents_to_collection(session, "exam", [docs[2].id])
+    repository.set_collection_documents(session, "exam", [docs[2].id, 999])
+    repository.add_documents_to_collection(session, "empty", [])
+    assert repository.delete_collection(session, "empty")
+    assert repository.get_data_version(session) == version
+    assert aggregates(collection) == ({h1.id: 1, h2.id: 4}, {w1.id: 1})
+    repository.set_collection_documents(session, "exam", [])
+    assert repository.get_data_version(session) == version + 1
+    repository.set_collection_documents(session, "exam", [docs[2].id])
+    assert repository.get_data_version(session) == version + 2
+
+    assert repository.delete_collection(session, "exam")
+    assert repository.get_data_version(session) == version + 3
+    assert not repository.delete_collection(session, "exam")
+    session.commit()
+    assert session.query(CollectionHanja).count() == session.query(CollectionDocument).count() == 0
@@ -0,0 +1,89 @@
+import pytest
+from sqlalchemy import text
+from src.models import HanjaInfo, HanjaReading, UsageExample, search_tokens
+from src.search import match_expression, search_words, search_hanja, rebuild_search_index
+
+@pytest.fixture
+def session(session_factory):
+    session = session_factory()
+    for char, readings in [("學", [("학", "배울")]), ("校", [("교", "학교")]), ("樂", [("락", "즐길"), ("악", "노래")])]:
+        h = HanjaInfo(char=char)
+        session.add(h)
+        session.flush()
+        session.add_all([HanjaReading(hanja_id=h.id, sound=sound, meaning=meaning) for sound, meaning in readings])
+    session.add_all([
+        UsageExample(word="學校", sound="학교"),
+        UsageExample(word="大學", sound="대학"),
+        UsageExample(word="大學校", sound="대학교"),
+        UsageExample(word="音樂", sound="음악"),
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+def words(results):
+    return [word for _, word, _ in results]
+
+def test_search_tokens():
+    assert search_tokens("學校") == "學 校"
+    assert search_tokens("배울 학, \"x\"") == "배 울 학 x"
+    assert search_tokens(None) == ""
+
+def test_match_expression():
+    assert match_expression("大學", ["word", "sound"]) == '{word sound} : "大 學"'
+    assert match_expression("학", ["sound"], prefix=True) == '{sound} : ^ "학"'
+    # Nothing searchable, or no column to search
+    assert match_expression('"*-', ["word"]) is None
+    assert match_expression("學", []) is None
+
+def test_search_words_substring(session):
+    # Shortest (best ranked) match first
+    assert words(search_words(session, "學")) == ["學校", "大學", "大學校"]
+    assert words(search_words(session, "大學")) == ["大學", "大學校"]
+    assert words(search_words(session, "學大")) == []
+    assert words(search_words(session, "學", limit=1)) == ["學校"]
+
+def test_search_words_by_field_and_prefix(session):
+    assert sorted(words(search_words(session, "학", field="sound"))) == ["大學", "大學校", "學校"]
+    assert words(search_words(session, "학", field="sound", prefix=True)) == ["學校"]
+    assert words(search_words(session, "學", field="text", prefix=True)) == ["學校"]
+    assert search_words(session, "학", field="meaning") == []
+
+def test_search_hanja(session):
+    assert [h.char for h in search_hanja(session, "배울")] == ["學"]
+    # Any reading may match; each Hanja is returned once with its readings loaded
+    result = search_hanja(session, "노래")
+    assert [h.char for h in result] == ["樂"]
+    assert {r.sound for r in result[0].readings} == {"락", "악"}
+    assert [h.char for h in search_hanja(session, "學", field="text")] == ["學"]
+    # "학교" is the meaning of 校 but not a sound
+    assert [h.char for h in search_hanja(session, "학교")] == ["校"]
+    assert search_hanja(session, "학교", field="sound") == []
+
+def test_index_follows_updates_and_deletes(session):
+    word = session.query(UsageExample).filter_by(word="音樂").one()
+    word.sound = "음락"
+    session.commit()
+    assert words(search_words(session, "음락")) == ["音樂"]
+    assert search_words(session, "음악") == []
+
+    session.delete(word)
+    reading = session.query(HanjaReading).filter_by(sound="악").one()
+    session.delete(reading)
+    session.commit()
+    assert search_words(session, "音") == []
+    assert search_hanja(session, "노래") == []
+    assert [h.char for h in search_hanja(session, "즐길")] == ["樂"]
+
+def test_rebuild_search_index(engine, session):
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM usage_examples_fts"))
+        conn.execute(text("DROP TABLE hanja_readings_fts"))
+    assert search_words(session, "學") == []
+
+    rebuild_search_index(engine, batch_size=2)
+    assert words(search_words(session, "學")) == ["學校", "大學", "大學校"]
+    assert [h.char for h in search_hanja(session, "즐길")] == ["樂"]
+    # Rebuilding again does not duplicate entries
+    rebuild_search_index(engine)
+    assert len(search_words(session, "學")) == 3